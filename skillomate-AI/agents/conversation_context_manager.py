@@ -6,6 +6,10 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 
+from core.llm_gateway import LLMGateway
+from core.deadline import DeadlineExceeded
+from core.nlu import analyze
+
 # Load environment variables
 load_dotenv()
 
@@ -23,67 +27,14 @@ class ConversationContextManager:
             raise ValueError("OPENAI_API_KEY is required but not found")
         
         self.client = openai.OpenAI(api_key=self.openai_api_key)
+        self.llm = LLMGateway(self.client, agent="context_manager")
         self.max_context_length = 2000  # Maximum characters for context summary
     
     def detect_subject_from_question(self, question: str) -> str:
         """
         Detect the subject/topic from the current question
         """
-        question_lower = question.lower()
-        
-        # Mathematics keywords
-        math_keywords = [
-            'solve', 'equation', 'calculate', 'math', 'algebra', 'geometry', 
-            'trigonometry', 'calculus', 'statistics', 'probability', 'fraction',
-            'decimal', 'percentage', 'ratio', 'proportion', 'graph', 'function',
-            'derivative', 'integral', 'matrix', 'vector', 'polynomial', 'quadratic',
-            'linear', 'exponential', 'logarithm', 'triangle', 'circle', 'square',
-            'rectangle', 'area', 'perimeter', 'volume', 'angle', 'degree', 'radian',
-            '=', '+', '-', '*', '/', 'x', 'y', 'z', '2x', '3x', '4x', '5x', '6x', '7x', '8x', '9x',
-            'plus', 'minus', 'times', 'divided', 'equals', 'equal to', 'sum', 'difference',
-            'product', 'quotient', 'add', 'subtract', 'multiply', 'divide'
-        ]
-        
-        # History keywords
-        history_keywords = [
-            'gandhi', 'independence', 'freedom', 'british', 'colonial', 'history',
-            'war', 'battle', 'revolution', 'empire', 'king', 'queen', 'emperor',
-            'ancient', 'medieval', 'modern', 'century', 'year', 'date', 'timeline',
-            'civilization', 'culture', 'tradition', 'heritage', 'monument', 'temple',
-            'palace', 'fort', 'museum', 'archaeology', 'artifact', 'document'
-        ]
-        
-        # Science keywords
-        science_keywords = [
-            'photosynthesis', 'cell', 'atom', 'molecule', 'element', 'compound',
-            'reaction', 'experiment', 'hypothesis', 'theory', 'law', 'principle',
-            'biology', 'chemistry', 'physics', 'laboratory', 'microscope', 'test',
-            'observation', 'data', 'analysis', 'conclusion', 'energy', 'force',
-            'motion', 'gravity', 'electricity', 'magnetism', 'light', 'sound',
-            'heat', 'temperature', 'pressure', 'density', 'mass', 'weight'
-        ]
-        
-        # English keywords
-        english_keywords = [
-            'grammar', 'essay', 'poem', 'literature', 'writing', 'reading',
-            'comprehension', 'vocabulary', 'spelling', 'pronunciation', 'sentence',
-            'paragraph', 'story', 'novel', 'character', 'plot', 'theme', 'setting',
-            'author', 'poet', 'writer', 'book', 'chapter', 'verse', 'stanza',
-            'metaphor', 'simile', 'alliteration', 'rhyme', 'prose', 'poetry'
-        ]
-        
-        # Check for subject keywords (order matters - more specific first)
-        if any(keyword in question_lower for keyword in history_keywords):
-            return 'History'
-        elif any(keyword in question_lower for keyword in science_keywords):
-            return 'Science'
-        elif any(keyword in question_lower for keyword in english_keywords):
-            return 'English'
-        elif any(keyword in question_lower for keyword in math_keywords):
-            return 'Mathematics'
-        else:
-            return 'General'
-    
+        return analyze(question).subject
     
     def generate_conversation_summary(self, conversation_history: List[Dict], user_context: Dict) -> str:
         """
@@ -116,7 +67,8 @@ Recent Conversation:
 
 Summary:"""
             
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
+                hedge=True,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that creates concise, accurate summaries of educational conversations."},
@@ -129,6 +81,8 @@ Summary:"""
             summary = response.choices[0].message.content.strip()
             return summary
             
+        except DeadlineExceeded:
+            return ""
         except Exception as e:
             logger.error(f"Error generating conversation summary: {str(e)}")
             return ""
@@ -225,7 +179,8 @@ Respond in JSON format:
     "continuity_level": "new/related/strong_followup"
 }}"""
             
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
+                hedge=True,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are an expert at analyzing conversation flow and continuity."},
@@ -242,36 +197,10 @@ Respond in JSON format:
                 analysis = json.loads(analysis_text)
                 return analysis
             except json.JSONDecodeError:
-                # Fallback analysis
-                current_lower = current_question.lower()
-                last_lower = last_assistant_msg.lower()
-                
-                # Simple keyword matching for follow-up detection (more conservative)
-                strong_followup_indicators = [
-                    "what about", "how about", "what if", "explain more", 
-                    "tell me more", "what else", "and then", "next", 
-                    "after that", "also", "too", "as well", "following up",
-                    "continuing", "related to", "about that"
-                ]
-                
-                weak_followup_indicators = [
-                    "can you", "could you", "please", "help me"
-                ]
-                
-                # Check for strong follow-up indicators
-                is_strong_followup = any(indicator in current_lower for indicator in strong_followup_indicators)
-                
-                # Check for weak follow-up indicators (only if there's recent conversation)
-                is_weak_followup = any(indicator in current_lower for indicator in weak_followup_indicators) and len(conversation_history) > 2
-                
-                is_followup = is_strong_followup or is_weak_followup
-                
-                return {
-                    "is_followup": is_followup,
-                    "related_topic": "general follow-up" if is_followup else None,
-                    "continuity_level": "strong_followup" if is_strong_followup else ("related" if is_weak_followup else "new")
-                }
+                return self._keyword_flow_analysis(current_question, conversation_history)
                 
+        except DeadlineExceeded:
+            return self._keyword_flow_analysis(current_question, conversation_history)
         except Exception as e:
             logger.error(f"Error analyzing conversation flow: {str(e)}")
             return {
@@ -280,6 +209,36 @@ Respond in JSON format:
                 "continuity_level": "new"
             }
     
+    def _keyword_flow_analysis(self, current_question: str, conversation_history: List[Dict]) -> Dict[str, Any]:
+        """Follow-up detection by keywords, used when the LLM analysis is unavailable"""
+        current_lower = current_question.lower()
+        
+        # Simple keyword matching for follow-up detection (more conservative)
+        strong_followup_indicators = [
+            "what about", "how about", "what if", "explain more", 
+            "tell me more", "what else", "and then", "next", 
+            "after that", "also", "too", "as well", "following up",
+            "continuing", "related to", "about that"
+        ]
+        
+        weak_followup_indicators = [
+            "can you", "could you", "please", "help me"
+        ]
+        
+        # Check for strong follow-up indicators
+        is_strong_followup = any(indicator in current_lower for indicator in strong_followup_indicators)
+        
+        # Check for weak follow-up indicators (only if there's recent conversation)
+        is_weak_followup = any(indicator in current_lower for indicator in weak_followup_indicators) and len(conversation_history) > 2
+        
+        is_followup = is_strong_followup or is_weak_followup
+        
+        return {
+            "is_followup": is_followup,
+            "related_topic": "general follow-up" if is_followup else None,
+            "continuity_level": "strong_followup" if is_strong_followup else ("related" if is_weak_followup else "new")
+        }
+    
     def enhance_response_with_context(self, ai_response: str, conversation_flow: Dict[str, Any], 
                                     user_context: Dict) -> str:
         """
@@ -290,9 +249,12 @@ Respond in JSON format:
         return ai_response
     
     def get_conversation_context(self, current_question: str, conversation_history: List[Dict], 
-                               user_context: Dict) -> Dict[str, Any]:
+                               user_context: Dict, use_llm: bool = True,
+                               conversation_summary: Optional[str] = None) -> Dict[str, Any]:
         """
         Get comprehensive conversation context for the AI
+        use_llm=False skips the summary and detects follow-ups by keywords (no LLM calls)
+        A conversation_summary kept from an earlier turn is used instead of generating one
         """
         # Get current subject for context
         current_subject = self.detect_subject_from_question(current_question)
@@ -324,11 +286,16 @@ CONVERSATION FLOW INSTRUCTIONS:
             }
         
         
-        # Generate conversation summary for existing sessions
-        conversation_summary = self.generate_conversation_summary(conversation_history, user_context)
-        
-        # Analyze conversation flow
-        flow_analysis = self.analyze_conversation_flow(current_question, conversation_history)
+        if use_llm:
+            # Generate conversation summary for existing sessions
+            if conversation_summary is None:
+                conversation_summary = self.generate_conversation_summary(conversation_history, user_context)
+            
+            # Analyze conversation flow
+            flow_analysis = self.analyze_conversation_flow(current_question, conversation_history)
+        else:
+            conversation_summary = conversation_summary or ""
+            flow_analysis = self._keyword_flow_analysis(current_question, conversation_history)
         
         # Create context prompt
         context_prompt = self.create_context_prompt(
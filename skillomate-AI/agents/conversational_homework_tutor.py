@@ -5,6 +5,10 @@ import logging
 from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 
+from core.llm_gateway import LLMGateway
+from core.model_router import ModelRouter
+from core.nlu import analyze
+
 # Load environment variables
 load_dotenv()
 
@@ -27,6 +31,26 @@ class ConversationalHomeworkTutor:
             raise ValueError("OPENAI_API_KEY is required but not found")
         
         self.client = openai.OpenAI(api_key=self.openai_api_key)
+        self.llm = LLMGateway(self.client, agent="conversational_tutor")
+        self.router = ModelRouter()
+    
+    def configure_routing(self, router: ModelRouter):
+        """Use a router built from the configured model and routing table"""
+        self.router = router
+    
+    def _routed_chat(self, handler: str, question: str, prompt: str, answer_style: str,
+                     user_context: Optional[Dict]) -> Any:
+        """Chat call with model, max_tokens and temperature chosen by the router"""
+        route = self.router.route(handler, question, answer_style, user_context)
+        response = self.llm.chat(
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": question}
+            ],
+            **self.router.chat_kwargs(route)
+        )
+        self.router.record(route, response)
+        return response
     
     def generate_conversational_response(self, question: str, user_context: Optional[Dict] = None, 
                                        conversation_history: List[Dict] = None, 
@@ -37,34 +61,32 @@ class ConversationalHomeworkTutor:
         try:
             # Get answer style from user context
             answer_style = user_context.get('answer_style', 'Detailed') if user_context else 'Detailed'
-            logger.info(f"Answer style: {answer_style}")
-            logger.info(f"User context received: {user_context}")
             
             # Analyze the question type
             question_type = self._analyze_question_type(question)
-            logger.info(f"Question: '{question}' -> Detected type: {question_type}")
+            logger.debug("Question type %s, answer style %s", question_type, answer_style)
             
             # Generate appropriate response based on type with enhanced context
             if question_type == "greeting":
-                logger.info("Handling as greeting")
+                logger.debug("Handling as greeting")
                 return self._handle_greeting(question, user_context, context_data)
             elif question_type == "identity":
-                logger.info("Handling as identity question")
+                logger.debug("Handling as identity question")
                 return self._handle_identity(question, user_context, conversation_history, context_data)
             elif question_type == "math_problem":
-                logger.info("Handling as math problem")
+                logger.debug("Handling as math problem")
                 return self._handle_math_problem(question, user_context, conversation_history, context_data, answer_style)
             elif question_type == "concept_explanation":
-                logger.info("Handling as concept explanation")
+                logger.debug("Handling as concept explanation")
                 return self._handle_concept_explanation(question, user_context, conversation_history, context_data, answer_style)
             elif question_type == "step_by_step":
-                logger.info("Handling as step-by-step")
+                logger.debug("Handling as step-by-step")
                 return self._handle_step_by_step(question, user_context, conversation_history, context_data, answer_style)
             elif question_type == "factual":
-                logger.info("Handling as factual question")
+                logger.debug("Handling as factual question")
                 return self._handle_factual_question(question, user_context, context_data, answer_style)
             else:
-                logger.info("Handling as general question")
+                logger.debug("Handling as general question")
                 return self._handle_general_question(question, user_context, conversation_history, context_data, answer_style)
                 
         except Exception as e:
@@ -72,53 +94,17 @@ class ConversationalHomeworkTutor:
             return {
                 "success": True,
                 "response": "I'm here to help! Let me guide you through this step by step. What specific part are you stuck on?",
+                "fallback": True,
                 "interactive": True,
                 "suggestions": ["Can you show me what you've tried so far?", "What's the first step you think we should take?"]
             }
     
     def _analyze_question_type(self, question: str) -> str:
         """Analyze what type of question this is"""
-        question_lower = question.lower().strip()
-        
-        # Math problems - Check this FIRST to avoid false positives
-        if any(word in question_lower for word in ['solve', 'calculate', 'find', 'equation', 'formula']):
-            return "math_problem"
-        
-        # Check for mathematical operators (+, -, *, /, =)
-        if any(op in question_lower for op in ['+', '-', '*', '/', '=']):
-            return "math_problem"
-        
-        # Greetings - Check for exact word matches, not substrings
-        greeting_words = ['hi', 'hello', 'hey', 'namaste', 'good morning', 'good afternoon', 'good evening']
-        if any(word == question_lower or question_lower.startswith(word + ' ') for word in greeting_words):
-            return "greeting"
-        
-        # Identity questions
-        if any(phrase in question_lower for phrase in ['who am i', 'what is my name', 'do you know me']):
-            return "identity"
-        
-        # Concept explanations
-        if any(word in question_lower for word in ['explain', 'what is', 'how does', 'why does', 'define']):
-            return "concept_explanation"
-        
-        # Step-by-step guidance
-        if any(word in question_lower for word in ['how to', 'steps', 'procedure', 'method']):
-            return "step_by_step"
-        
-        # Factual questions
-        if any(word in question_lower for word in ['when', 'where', 'who', 'what year']):
-            return "factual"
-        
-        return "general"
+        return analyze(question).tutor_type
     
     def _handle_greeting(self, question: str, user_context: Optional[Dict], context_data: Optional[Dict] = None) -> Dict[str, Any]:
         """Handle greetings with homework focus"""
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        logger.info(f"Greeting handler - user_context: {user_context}")
-        logger.info(f"Greeting handler - context_data: {context_data}")
-        
         user_name = user_context.get("name") if user_context else None
         user_grade = user_context.get("grade") if user_context else None
         user_board = user_context.get("board") if user_context else None
@@ -205,15 +191,7 @@ MATH PROBLEM: {question}
 
 Provide a structured response with clear guidance and include the solution following board-specific format and the requested answer style."""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
+        response = self._routed_chat("math_problem", question, prompt, answer_style, user_context)
         
         tutor_response = response.choices[0].message.content.strip()
         
@@ -288,15 +266,7 @@ Explain this concept as their helpful homework buddy who:
 
 KEEP IT GUIDED: Under 60 words, encourage them to think and ask questions."""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=300,
-            temperature=0.8
-        )
+        response = self._routed_chat("concept_explanation", question, prompt, answer_style, user_context)
         
         tutor_response = response.choices[0].message.content.strip()
         
@@ -351,15 +321,7 @@ STUDENT QUESTION: {question}
 
 Give them just the FIRST STEP and ask if they can do it. Don't give all steps at once. Guide them to discover the process themselves."""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=200,
-            temperature=0.8
-        )
+        response = self._routed_chat("step_by_step", question, prompt, answer_style, user_context)
         
         tutor_response = response.choices[0].message.content.strip()
         
@@ -409,15 +371,7 @@ STUDENT QUESTION: {question}
 
 Give a simple, conversational answer."""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=150,
-            temperature=0.7
-        )
+        response = self._routed_chat("factual", question, prompt, answer_style, user_context)
         
         tutor_response = response.choices[0].message.content.strip()
         
@@ -494,15 +448,7 @@ Answer as their helpful homework assistant who:
 
 KEEP IT GUIDED: Under 50 words, encourage thinking and discovery."""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=250,
-            temperature=0.8
-        )
+        response = self._routed_chat("general", question, prompt, answer_style, user_context)
         
         tutor_response = response.choices[0].message.content.strip()
         
@@ -1,10 +1,17 @@
 import openai
 import os
+import re
 import json
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+from core.llm_gateway import LLMGateway
+from core.curriculum_index import CurriculumIndex, DEFAULT_BOARD, DEFAULT_GRADE
+from core.metrics import record_cache_lookup
+
 # Load environment variables
 load_dotenv()
 
@@ -14,9 +21,11 @@ class CurriculumMapperAgent:
     """
     Agent 1: Curriculum Mapper
     Detects board + grade → Adjusts explanation depth, vocabulary, formatting.
+    Context is detected locally from a compiled curriculum index; the LLM is only asked when the
+    local guess is below llm_fallback_threshold. Results are memoized per question.
     """
     
-    def __init__(self):
+    def __init__(self, llm_fallback_threshold: float = 0.6, context_cache_size: int = 2048):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         
         # Check if API key is available
@@ -25,7 +34,14 @@ class CurriculumMapperAgent:
         
         # Initialize OpenAI client
         self.client = openai.OpenAI(api_key=self.openai_api_key)
+        self.llm = LLMGateway(self.client, agent="curriculum_mapper")
         self.curriculum_data = self._load_curriculum_data()
+        self.curriculum_index = CurriculumIndex(self.curriculum_data)
+        self.llm_fallback_threshold = llm_fallback_threshold
+        self.context_cache_size = context_cache_size
+        self._context_cache = OrderedDict()  # (question, board, grade, subject) -> context, LRU order
+        self._context_lock = threading.Lock()
+        self.detection_counts = {"local": 0, "llm": 0, "default": 0, "cached": 0}
         
     def _load_curriculum_data(self) -> Dict[str, Any]:
         """Load curriculum data for different boards and grades"""
@@ -74,6 +90,55 @@ class CurriculumMapperAgent:
         """
         Detect board, grade level, and subject from question and user context
         """
+        user_context = user_context or {}
+        key = (
+            " ".join((question or "").lower().split()),
+            user_context.get("board"), user_context.get("grade"), user_context.get("subject")
+        )
+        with self._context_lock:
+            cached = self._context_cache.get(key)
+            if cached is not None:
+                self._context_cache.move_to_end(key)
+                self.detection_counts["cached"] += 1
+        record_cache_lookup("curriculum_context", cached is not None)
+        if cached is not None:
+            return dict(cached)
+
+        analysis = self.curriculum_index.detect(question or "")
+        analysis["source"] = "local"
+        llm_failed = False
+        if analysis["confidence"] < self.llm_fallback_threshold:
+            llm_analysis = self._detect_context_llm(question, user_context)
+            llm_failed = llm_analysis is None
+            if llm_analysis is not None:
+                analysis = llm_analysis
+            elif analysis["subject"] == "General":
+                analysis["source"] = "default"
+
+        analysis["board"] = analysis.get("board") or DEFAULT_BOARD
+        analysis["grade"] = analysis.get("grade") or DEFAULT_GRADE
+
+        # Override with user context if provided
+        if user_context:
+            analysis.update({
+                "board": user_context.get("board", analysis.get("board")),
+                "grade": user_context.get("grade", analysis.get("grade")),
+                "subject": user_context.get("subject", analysis.get("subject"))
+            })
+        analysis["grade_band"] = self.curriculum_index.band_for_grade(analysis["grade"])
+
+        with self._context_lock:
+            self.detection_counts[analysis["source"]] += 1
+            # A guess made because the LLM call failed is not remembered, so the question gets another try
+            if not llm_failed:
+                self._context_cache[key] = analysis
+                while len(self._context_cache) > self.context_cache_size:
+                    self._context_cache.popitem(last=False)
+
+        return dict(analysis)
+
+    def _detect_context_llm(self, question: str, user_context: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """Ask the LLM for board, grade, subject and topic, returns None if the call fails"""
         try:
             # Use OpenAI to analyze the question and extract context
             system_prompt = """You are an expert in Indian education curriculum analysis. 
@@ -104,7 +169,7 @@ class CurriculumMapperAgent:
             
             Remember: Respond with ONLY the JSON object, no explanations or additional text."""
             
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -125,7 +190,6 @@ class CurriculumMapperAgent:
                 logger.warning(f"Raw response: {response_content}")
                 
                 # Fallback: try to extract JSON from the response
-                import re
                 json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
                 if json_match:
                     try:
@@ -149,42 +213,18 @@ class CurriculumMapperAgent:
                         "confidence": 0.5
                     }
             
-            # Override with user context if provided
-            if user_context:
-                analysis.update({
-                    "board": user_context.get("board", analysis.get("board")),
-                    "grade": user_context.get("grade", analysis.get("grade")),
-                    "subject": user_context.get("subject", analysis.get("subject"))
-                })
-            
+            analysis["source"] = "llm"
             return analysis
             
         except Exception as e:
             logger.error(f"Error in context detection: {str(e)}")
-            return {
-                "board": "CBSE",
-                "grade": "8", 
-                "subject": "General",
-                "topic": "General",
-                "confidence": 0.5
-            }
+            return None
     
     def get_curriculum_style(self, board: str, grade: str) -> Dict[str, Any]:
         """Get curriculum-specific style guidelines"""
-        board_data = self.curriculum_data["boards"].get(board, {})
-        
-        # Determine grade level category
-        grade_level = "primary"
-        for level, data in self.curriculum_data["grade_levels"].items():
-            if grade in data["grades"]:
-                grade_level = level
-                break
-        
-        grade_data = self.curriculum_data["grade_levels"].get(grade_level, {})
-        
         return {
-            "board_style": board_data.get("style", "comprehensive"),
-            "grade_style": grade_data.get("style", "detailed"),
+            "board_style": self.curriculum_index.board_style(board),
+            "grade_style": self.curriculum_index.grade_style(grade),
             "vocabulary_level": self._get_vocabulary_level(grade),
             "explanation_depth": self._get_explanation_depth(grade),
             "localization": self._get_localization_guidelines(board)
@@ -192,29 +232,11 @@ class CurriculumMapperAgent:
     
     def _get_vocabulary_level(self, grade: str) -> str:
         """Get appropriate vocabulary level for grade"""
-        grade_num = int(grade) if grade.isdigit() else 8
-        
-        if grade_num <= 5:
-            return "simple, basic words, short sentences"
-        elif grade_num <= 8:
-            return "moderate, clear explanations, examples"
-        elif grade_num <= 10:
-            return "standard, subject-specific terms"
-        else:
-            return "advanced, technical terms, detailed explanations"
+        return self.curriculum_index.vocabulary_level(grade)
     
     def _get_explanation_depth(self, grade: str) -> str:
         """Get appropriate explanation depth for grade"""
-        grade_num = int(grade) if grade.isdigit() else 8
-        
-        if grade_num <= 5:
-            return "very detailed, step-by-step, visual aids"
-        elif grade_num <= 8:
-            return "detailed with examples, clear steps"
-        elif grade_num <= 10:
-            return "comprehensive, exam-ready format"
-        else:
-            return "concise, analytical, research-oriented"
+        return self.curriculum_index.explanation_depth(grade)
     
     def _get_localization_guidelines(self, board: str) -> Dict[str, str]:
         """Get India-specific localization guidelines"""
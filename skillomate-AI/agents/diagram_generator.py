@@ -10,11 +10,14 @@ import base64
 import json
 import logging
 import os
+import time
 from typing import Dict, Any, List, Optional, Tuple
 import seaborn as sns
 from matplotlib.patches import Circle, Rectangle, Polygon, FancyBboxPatch
 import matplotlib.patches as mpatches
 
+from core.metrics import DIAGRAM_RENDER_SECONDS
+
 logger = logging.getLogger(__name__)
 
 class DiagramGeneratorAgent:
@@ -71,6 +74,7 @@ class DiagramGeneratorAgent:
         Generate a diagram based on type, subject, and context
         """
         try:
+            render_start = time.perf_counter()
             grade = context.get("grade", "8")
             board = context.get("board", "CBSE")
             
@@ -91,6 +95,7 @@ class DiagramGeneratorAgent:
             
             # Convert to base64 for web display
             diagram_base64 = self._convert_to_base64(diagram_data["figure"])
+            DIAGRAM_RENDER_SECONDS.observe(time.perf_counter() - render_start, generator="agent", diagram_type=diagram_type)
             logger.info(f"Diagram generated successfully. Base64 length: {len(diagram_base64) if diagram_base64 else 0}")
             
             return {
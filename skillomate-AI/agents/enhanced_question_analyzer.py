@@ -6,6 +6,9 @@ import re
 from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from core.llm_gateway import LLMGateway
+from core.nlu import analyze
+
 # Load environment variables
 load_dotenv()
 
@@ -24,61 +27,7 @@ class EnhancedQuestionAnalyzer:
             raise ValueError("OPENAI_API_KEY is required but not found")
         
         self.client = openai.OpenAI(api_key=self.openai_api_key)
-        
-        # Question type patterns
-        self.question_patterns = {
-            "mathematical": [
-                r'\b(solve|calculate|find|compute|evaluate|simplify|factor|expand|derive|integrate|differentiate)\b',
-                r'[\+\-\*\/\=\<\>\(\)\[\]\{\}]',
-                r'\b(equation|formula|theorem|proof|problem)\b',
-                r'\d+[\+\-\*\/]\d+',
-                r'\b(percentage|fraction|decimal|ratio|proportion)\b'
-            ],
-            "conceptual": [
-                r'\b(explain|describe|define|what is|how does|why does|compare|contrast|analyze)\b',
-                r'\b(concept|theory|principle|mechanism|process|system)\b',
-                r'\b(understand|meaning|significance|importance|role)\b'
-            ],
-            "factual": [
-                r'\b(when|where|who|what year|which|how many|how much)\b',
-                r'\b(date|year|place|person|number|amount|quantity)\b',
-                r'\b(fact|information|data|statistic|figure)\b'
-            ],
-            "analytical": [
-                r'\b(analyze|evaluate|assess|examine|investigate|study)\b',
-                r'\b(cause|effect|relationship|correlation|impact|influence)\b',
-                r'\b(argument|opinion|perspective|viewpoint|position)\b'
-            ],
-            "creative": [
-                r'\b(imagine|create|design|develop|invent|suggest|propose)\b',
-                r'\b(story|essay|poem|drawing|model|project)\b',
-                r'\b(creative|original|unique|innovative)\b'
-            ],
-            "practical": [
-                r'\b(how to|steps|procedure|method|technique|approach)\b',
-                r'\b(apply|implement|use|practice|demonstrate)\b',
-                r'\b(real-world|practical|application|example)\b'
-            ]
-        }
-        
-        # Complexity indicators
-        self.complexity_indicators = {
-            "basic": [
-                r'\b(simple|basic|easy|fundamental|elementary)\b',
-                r'\b(what is|define|explain|describe)\b',
-                r'\b(one|single|first|basic)\b'
-            ],
-            "intermediate": [
-                r'\b(compare|contrast|analyze|evaluate)\b',
-                r'\b(relationship|connection|difference|similarity)\b',
-                r'\b(example|case|scenario|situation)\b'
-            ],
-            "advanced": [
-                r'\b(synthesize|evaluate|critique|assess)\b',
-                r'\b(theory|hypothesis|research|study)\b',
-                r'\b(complex|advanced|sophisticated|detailed)\b'
-            ]
-        }
+        self.llm = LLMGateway(self.client, agent="question_analyzer")
     
     def analyze_question(self, question: str, user_context: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -121,35 +70,12 @@ class EnhancedQuestionAnalyzer:
     
     def _analyze_patterns(self, question: str) -> Dict[str, Any]:
         """Analyze question using pattern matching"""
-        question_lower = question.lower()
-        
-        # Analyze question types
-        type_scores = {}
-        for qtype, patterns in self.question_patterns.items():
-            score = 0
-            for pattern in patterns:
-                matches = re.findall(pattern, question_lower)
-                score += len(matches)
-            type_scores[qtype] = score
-        
-        # Analyze complexity
-        complexity_scores = {}
-        for complexity, patterns in self.complexity_indicators.items():
-            score = 0
-            for pattern in patterns:
-                matches = re.findall(pattern, question_lower)
-                score += len(matches)
-            complexity_scores[complexity] = score
-        
-        # Determine primary type and complexity
-        primary_type = max(type_scores, key=type_scores.get) if any(type_scores.values()) else "general"
-        complexity = max(complexity_scores, key=complexity_scores.get) if any(complexity_scores.values()) else "intermediate"
-        
+        features = analyze(question)
         return {
-            "type_scores": type_scores,
-            "complexity_scores": complexity_scores,
-            "primary_type": primary_type,
-            "complexity": complexity
+            "type_scores": dict(features.type_scores),
+            "complexity_scores": dict(features.complexity_scores),
+            "primary_type": features.primary_type,
+            "complexity": features.complexity
         }
     
     def _ai_analyze_question(self, question: str, user_context: Optional[Dict] = None) -> Dict[str, Any]:
@@ -178,7 +104,8 @@ Respond with ONLY a valid JSON object:
 
             context_info = f"User Context: {user_context}" if user_context else "No user context provided"
             
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
+                hedge=True,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -3,21 +3,43 @@ import os
 import json
 import logging
 import re
-from typing import Dict, Any, List, Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from core.llm_gateway import LLMGateway
+from core.metrics import record_cache_lookup
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Line shapes recognised by the local formatter
+HEADING_PATTERN = re.compile(r'^\s*(?:#{1,6}\s+(.+?)\s*#*|\*\*([^*\n]{1,80}?):?\*\*:?)\s*$')
+BULLET_PATTERN = re.compile(r'^\s*[-•*]\s+')
+STEP_PATTERN = re.compile(r'^\s*(?:\*\*)?(?:step\s*)?(\d+)[.)](?:\*\*)?\s+', re.IGNORECASE)
+FINAL_ANSWER_PATTERN = re.compile(r'^\W*(?:final answer|answer|therefore|hence|thus)\b', re.IGNORECASE)
+KEY_TERM_PATTERN = re.compile(r'(?<!\*)\b(Answer|Solution|Therefore|Hence|Thus)\b(?!\*)', re.IGNORECASE)
+# One equation (or chain a = b = c): terms such as x, 2x or 3.5 joined by operators, then = and a
+# right side that ends at , ; and/or/then/so/where, a full stop or colon, the next "identifier =" on the line,
+# or a word not joined to it by an operator
+FORMULA_TERM = r'(?:(?:\d+(?:\.\d+)?)?[A-Za-z]\w*|\d+(?:\.\d+)?)'
+FORMULA_PATTERN = re.compile(
+    rf'(?<![\w`)^.])({FORMULA_TERM}(?:\s*[-+*/^×÷]\s*{FORMULA_TERM})*(?:\s*=\s*[^\s,;:=`][^,;:=`\n]*?)+?)'
+    r'(?=\s*(?:[,;]|\b(?:and|or|then|so|where)\b|[.:](?:\s|$)|$)|\s+[A-Za-z]\w*\s*=|(?<![-+*/^×÷])\s+[A-Za-z]{2,}\b)'
+)
+
 class FormatterAgent:
     """
     Agent 3: Formatter Agent
     Structures answer in neat steps, headings, bullet points → ensures teacher-friendly output.
+    Formatting is rule-based by default; the LLM rewrite is an opt-in quality mode (use_llm).
     """
     
-    def __init__(self):
+    def __init__(self, use_llm: bool = False, cache_size: int = 1024):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         
         # Check if API key is available
@@ -26,7 +48,41 @@ class FormatterAgent:
         
         # Initialize OpenAI client
         self.client = openai.OpenAI(api_key=self.openai_api_key)
+        self.llm = LLMGateway(self.client, agent="formatter")
         self.formatting_templates = self._load_formatting_templates()
+        self.use_llm = use_llm
+        self.cache_size = cache_size
+        self._format_cache = OrderedDict()  # hash of (mode, style, context, content) -> formatted content, LRU order
+        self._format_lock = threading.Lock()
+    
+    def configure_formatting(self, use_llm: bool, cache_size: int):
+        """Choose the default formatting mode and how many formatted answers to remember"""
+        with self._format_lock:
+            self.use_llm = use_llm
+            self.cache_size = cache_size
+            while len(self._format_cache) > self.cache_size:
+                self._format_cache.popitem(last=False)
+    
+    def _cache_key(self, mode: str, format_style: str, context: Dict[str, Any], content: str) -> str:
+        key = "|".join([
+            mode, format_style, str(context.get("subject", "General")).lower(),
+            str(context.get("grade", "8")), str(context.get("board", "CBSE")), content
+        ])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    
+    def _cached_format(self, key: str) -> Optional[str]:
+        with self._format_lock:
+            formatted = self._format_cache.get(key)
+            if formatted is not None:
+                self._format_cache.move_to_end(key)
+        record_cache_lookup("formatter", formatted is not None)
+        return formatted
+    
+    def _store_format(self, key: str, formatted: str):
+        with self._format_lock:
+            self._format_cache[key] = formatted
+            while len(self._format_cache) > self.cache_size:
+                self._format_cache.popitem(last=False)
     
     def _load_formatting_templates(self) -> Dict[str, Any]:
         """Load formatting templates for different subjects and styles"""
@@ -59,7 +115,7 @@ class FormatterAgent:
         }
     
     def format_answer(self, content: str, context: Dict[str, Any], 
-                     format_style: str = "teacher_approved") -> Dict[str, Any]:
+                     format_style: str = "teacher_approved", use_llm: Optional[bool] = None) -> Dict[str, Any]:
         """
         Format the answer according to teacher-approved standards
         """
@@ -67,37 +123,49 @@ class FormatterAgent:
             subject = context.get("subject", "General").lower()
             grade = context.get("grade", "8")
             board = context.get("board", "CBSE")
+            use_llm = self.use_llm if use_llm is None else use_llm
             
             # Get formatting template
             template = self.formatting_templates.get(subject, self.formatting_templates["general"])
             
-            # Create formatting prompt
-            formatting_prompt = self._create_formatting_prompt(
-                content, context, template, format_style
-            )
-            
-            # Generate formatted answer using OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": formatting_prompt},
-                    {"role": "user", "content": content}
-                ],
-                max_tokens=1500,
-                temperature=0.5
-            )
+            key = self._cache_key("llm" if use_llm else "local", format_style, context, content)
+            final_content = self._cached_format(key)
+            cached = final_content is not None
             
-            formatted_content = response.choices[0].message.content.strip()
-            
-            # Apply additional formatting
-            final_content = self._apply_additional_formatting(formatted_content, template, grade)
+            if not cached and use_llm:
+                # Create formatting prompt
+                formatting_prompt = self._create_formatting_prompt(
+                    content, context, template, format_style
+                )
+                
+                # Generate formatted answer using OpenAI
+                response = self.llm.chat(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": formatting_prompt},
+                        {"role": "user", "content": content}
+                    ],
+                    max_tokens=1500,
+                    temperature=0.5
+                )
+                
+                formatted_content = response.choices[0].message.content.strip()
+                
+                # Apply additional formatting
+                final_content = self._apply_additional_formatting(formatted_content, template, grade)
+                self._store_format(key, final_content)
+            elif not cached:
+                final_content = self._format_locally(content, template)
+                self._store_format(key, final_content)
             
             return {
                 "success": True,
                 "formatted_content": final_content,
                 "format_style": format_style,
                 "subject_template": template,
-                "grade_appropriate": True
+                "grade_appropriate": True,
+                "formatter": "llm" if use_llm else "local",
+                "cached": cached
             }
             
         except Exception as e:
@@ -108,6 +176,128 @@ class FormatterAgent:
                 "formatted_content": content
             }
     
+    def _split_sections(self, content: str) -> List[Tuple[Optional[str], List[List[str]]]]:
+        """Split content into (heading, paragraphs) sections; text before the first heading has none"""
+        sections = [(None, [])]
+        paragraph = []
+        for line in content.strip().splitlines():
+            line = line.rstrip()
+            heading = HEADING_PATTERN.match(line)
+            if heading or not line.strip():
+                if paragraph:
+                    sections[-1][1].append(paragraph)
+                    paragraph = []
+                if heading:
+                    sections.append(((heading.group(1) or heading.group(2)).strip(" :*#"), []))
+                continue
+            paragraph.append(line.strip())
+        if paragraph:
+            sections[-1][1].append(paragraph)
+        return [section for section in sections if section[0] or section[1]]
+    
+    def _extract_final_answer(self, paragraphs: List[List[str]]) -> Optional[str]:
+        """Remove and return the last line that states the final answer; may leave an empty paragraph"""
+        for paragraph in reversed(paragraphs):
+            for i in range(len(paragraph) - 1, -1, -1):
+                label = FINAL_ANSWER_PATTERN.match(paragraph[i])
+                if not label:
+                    continue
+                # The answer block has its own heading, so drop the "Answer:" / "Therefore" lead-in
+                answer = paragraph[i][label.end():].lstrip(" :*,").rstrip("* ")
+                if not answer:
+                    continue
+                paragraph.pop(i)
+                if re.match(r'[a-z]{2,}\b', answer):
+                    answer = answer[0].upper() + answer[1:]
+                return answer
+        return None
+    
+    def _assign_sections(self, paragraphs: List[List[str]], names: List[str]) -> List[Tuple[Optional[str], List[List[str]]]]:
+        """Spread paragraphs over the template sections in order, first and last paragraphs anchored"""
+        n, k = len(paragraphs), len(names)
+        if n <= 1 or k == 0:
+            return [(None, paragraphs)] if paragraphs else []
+        if n >= k:
+            indexes = [i * k // n for i in range(n)]
+        else:
+            indexes = [round(i * (k - 1) / (n - 1)) for i in range(n)]
+        sections = []
+        for index, paragraph in zip(indexes, paragraphs):
+            if sections and sections[-1][0] == names[index]:
+                sections[-1][1].append(paragraph)
+            else:
+                sections.append((names[index], [paragraph]))
+        return sections
+    
+    def _format_line(self, line: str, template: Dict[str, Any], point: Optional[int] = None) -> str:
+        """Notebook style for one body line: bullets, bold step numbers, key terms and formulas"""
+        style = template.get("style", "")
+        step = STEP_PATTERN.match(line)
+        if step:
+            label = f"Step {step.group(1)}." if "step-by-step" in style else f"{step.group(1)}."
+            line = f"**{label}** {line[step.end():]}"
+        elif BULLET_PATTERN.match(line):
+            rest = BULLET_PATTERN.sub("", line, count=1)
+            line = f"**{point}.** {rest}" if point is not None else f"• {rest}"
+        
+        line = KEY_TERM_PATTERN.sub(r"**\1**", line)
+        if "formulas" in style:
+            line = self._mark_formulas(line)
+        return line
+    
+    def _mark_formulas(self, line: str) -> str:
+        """Wrap each equation on a line in backticks; lines that already have code spans are left alone"""
+        if "`" in line:
+            return line
+        return FORMULA_PATTERN.sub(lambda match: f"`{match.group(1).strip()}`", line)
+    
+    def _format_locally(self, content: str, template: Dict[str, Any], exam: bool = False) -> str:
+        """
+        Rule-based formatting into the template's sections without an LLM call
+        Content that already has headings keeps them; otherwise its paragraphs are spread over the
+        template structure. Exam format numbers every point and labels the final answer.
+        """
+        sections = self._split_sections(content)
+        structure = template.get("structure", [])
+        
+        final_answer = None
+        if template.get("highlight_answer", False) or exam:
+            final_answer = self._extract_final_answer([p for _, paragraphs in sections for p in paragraphs])
+            sections = [
+                (heading, [paragraph for paragraph in paragraphs if paragraph]) for heading, paragraphs in sections
+            ]
+            sections = [(heading, paragraphs) for heading, paragraphs in sections if heading or paragraphs]
+        
+        if not any(heading for heading, _ in sections):
+            paragraphs = sections[0][1] if sections else []
+            names = structure[:-1] if final_answer and len(structure) > 1 else structure
+            if len(paragraphs) <= 1 and not exam:
+                names = []
+            sections = self._assign_sections(paragraphs, names)
+        
+        blocks = []
+        for heading, paragraphs in sections:
+            point = 0
+            body = []
+            for paragraph in paragraphs:
+                lines = []
+                for line in paragraph:
+                    if exam and BULLET_PATTERN.match(line):
+                        point += 1
+                        lines.append(self._format_line(line, template, point))
+                    else:
+                        lines.append(self._format_line(line, template))
+                body.append("\n".join(lines))
+            body = "\n\n".join(body)
+            blocks.append(f"**{heading}**\n{body}" if heading else body)
+        
+        if final_answer:
+            heading = structure[-1] if template.get("highlight_answer", False) and structure else "Final Answer"
+            label = "**Final Answer:** " if exam else ""
+            blocks.append(f"**{heading}**\n{label}**{final_answer}**")
+        
+        return "\n\n".join(block for block in blocks if block.strip())
+    
     def _create_formatting_prompt(self, content: str, context: Dict[str, Any], 
                                 template: Dict[str, Any], format_style: str) -> str:
         """Create prompt for answer formatting"""
@@ -218,7 +408,7 @@ Please reformat this content according to the teacher-approved structure and for
         
         if "formulas" in style:
             # Highlight mathematical formulas
-            content = re.sub(r'([A-Za-z]+\s*=\s*[^=]+)', r'`\1`', content)
+            content = "\n".join(self._mark_formulas(line) for line in content.split("\n"))
         
         return content
     
@@ -277,7 +467,7 @@ Please reformat this content according to the teacher-approved structure and for
 
         return structure
     
-    def format_for_exam(self, content: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    def format_for_exam(self, content: str, context: Dict[str, Any], use_llm: Optional[bool] = None) -> Dict[str, Any]:
         """
         Format answer specifically for exam-style presentation
         """
@@ -285,32 +475,44 @@ Please reformat this content according to the teacher-approved structure and for
             # Modify context for exam format
             exam_context = context.copy()
             exam_context["format_style"] = "exam_ready"
+            use_llm = self.use_llm if use_llm is None else use_llm
             
             # Get exam-specific template
             subject = context.get("subject", "General").lower()
             template = self.formatting_templates.get(subject, self.formatting_templates["general"])
             
-            # Create exam-specific formatting prompt
-            exam_prompt = self._create_exam_formatting_prompt(content, context, template)
+            key = self._cache_key("llm" if use_llm else "local", "exam_ready", context, content)
+            exam_content = self._cached_format(key)
+            cached = exam_content is not None
             
-            # Generate exam-formatted answer
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": exam_prompt},
-                    {"role": "user", "content": content}
-                ],
-                max_tokens=1200,
-                temperature=0.4
-            )
-            
-            exam_content = response.choices[0].message.content.strip()
+            if not cached and use_llm:
+                # Create exam-specific formatting prompt
+                exam_prompt = self._create_exam_formatting_prompt(content, context, template)
+                
+                # Generate exam-formatted answer
+                response = self.llm.chat(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": exam_prompt},
+                        {"role": "user", "content": content}
+                    ],
+                    max_tokens=1200,
+                    temperature=0.4
+                )
+                
+                exam_content = response.choices[0].message.content.strip()
+                self._store_format(key, exam_content)
+            elif not cached:
+                exam_content = self._format_locally(content, template, exam=True)
+                self._store_format(key, exam_content)
             
             return {
                 "success": True,
                 "exam_content": exam_content,
                 "format_type": "exam_ready",
-                "includes_key_points": True
+                "includes_key_points": True,
+                "formatter": "llm" if use_llm else "local",
+                "cached": cached
             }
             
         except Exception as e:
@@ -368,15 +570,15 @@ Please reformat this content for exam presentation."""
         return content
     
     def process_formatting_request(self, content: str, context: Dict[str, Any], 
-                                 format_type: str = "teacher_approved") -> Dict[str, Any]:
+                                 format_type: str = "teacher_approved", use_llm: Optional[bool] = None) -> Dict[str, Any]:
         """
         Main method to process formatting requests
         """
         try:
             if format_type == "teacher_approved":
-                return self.format_answer(content, context, "teacher_approved")
+                return self.format_answer(content, context, "teacher_approved", use_llm)
             elif format_type == "exam_ready":
-                return self.format_for_exam(content, context)
+                return self.format_for_exam(content, context, use_llm)
             elif format_type == "structured":
                 return self.create_structured_response("", content, context)
             else:
@@ -5,6 +5,9 @@ import logging
 from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 
+from core.llm_gateway import LLMGateway
+from core.hint_ladder import HintLadder, HintLadderCache, HintLadderParser, SQLiteHintLadderStore, hint_ladder_key
+
 # Load environment variables
 load_dotenv()
 
@@ -14,6 +17,8 @@ class GuidedSolverAgent:
     """
     Agent 2: Guided Solver
     Generates hints step-by-step, adapts difficulty by grade.
+    All levels of a question come from one streamed generation (the hint ladder), cached in memory
+    and optionally in a store shared by all workers, so each "next hint" is served without another LLM call.
     """
     
     def __init__(self):
@@ -25,12 +30,51 @@ class GuidedSolverAgent:
         
         # Initialize OpenAI client
         self.client = openai.OpenAI(api_key=self.openai_api_key)
+        self.llm = LLMGateway(self.client, agent="guided_solver")
         self.hint_levels = {
             "level_1": "basic_hint",
             "level_2": "detailed_hint", 
             "level_3": "partial_solution",
             "level_4": "complete_solution"
         }
+        self.max_levels = len(self.hint_levels)
+        self.hint_ladders = HintLadderCache()
+        self.hint_wait_timeout = 60.0
+    
+    def configure_hint_ladders(self, max_entries: int, ttl: float, wait_timeout: float,
+                               store: Optional[SQLiteHintLadderStore] = None):
+        """Size the hint ladder cache and how long a request waits for a level still being generated"""
+        self.hint_ladders = HintLadderCache(max_entries=max_entries, ttl=ttl, store=store, stale_after=wait_timeout)
+        self.hint_wait_timeout = wait_timeout
+    
+    def get_hint_ladder(self, question: str, context: Dict[str, Any]) -> HintLadder:
+        """Cached hint ladder for the question, generation starts in the background on first use"""
+        key = hint_ladder_key(question, context.get("grade", "8"), context.get("subject", "General"))
+        return self.hint_ladders.get_or_create(
+            key, lambda ladder: self._generate_hint_ladder(question, context, ladder), self.max_levels
+        )
+    
+    def _generate_hint_ladder(self, question: str, context: Dict[str, Any], ladder: HintLadder):
+        """Stream every hint level in one call, publishing each level as soon as it is complete"""
+        hint_strategy = self._get_hint_strategy(context.get("grade", "8"), context.get("subject", "General"))
+        parser = HintLadderParser()
+        
+        for delta in self.llm.chat_stream(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": self._create_ladder_prompt(question, context, hint_strategy)},
+                {"role": "user", "content": question}
+            ],
+            max_tokens=2000,
+            temperature=0.7
+        ):
+            for hint in parser.feed(delta):
+                ladder.publish(hint)
+        for hint in parser.close():
+            ladder.publish(hint)
+        
+        if len(ladder.levels) < self.max_levels:
+            raise ValueError(f"Hint ladder has {len(ladder.levels)} of {self.max_levels} levels")
     
     def generate_progressive_hints(self, question: str, context: Dict[str, Any], 
                                  current_level: int = 1) -> Dict[str, Any]:
@@ -38,27 +82,12 @@ class GuidedSolverAgent:
         Generate progressive hints based on current level
         """
         try:
-            grade = context.get("grade", "8")
-            subject = context.get("subject", "General")
-            
-            # Determine hint strategy based on grade and subject
-            hint_strategy = self._get_hint_strategy(grade, subject)
-            
-            # Create level-specific prompt
-            level_prompt = self._create_level_prompt(question, context, current_level, hint_strategy)
-            
-            # Generate hint using OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": level_prompt},
-                    {"role": "user", "content": question}
-                ],
-                max_tokens=800,
-                temperature=0.7
-            )
-            
-            hint_content = response.choices[0].message.content.strip()
+            # Served from the hint ladder; a level it could not produce is generated on its own
+            hint_content = self.get_hint_ladder(question, context).wait_for(current_level, self.hint_wait_timeout)
+            source = "hint_ladder"
+            if hint_content is None:
+                hint_content = self._generate_single_hint(question, context, current_level)
+                source = "generated"
             
             # Determine next action based on current level
             next_action = self._get_next_action(current_level, context)
@@ -68,8 +97,9 @@ class GuidedSolverAgent:
                 "hint_level": current_level,
                 "hint_content": hint_content,
                 "next_action": next_action,
-                "max_levels": 4,
-                "is_complete": current_level >= 4
+                "max_levels": self.max_levels,
+                "is_complete": current_level >= self.max_levels,
+                "source": source
             }
             
         except Exception as e:
@@ -82,6 +112,30 @@ class GuidedSolverAgent:
                 "next_action": "retry"
             }
     
+    def _generate_single_hint(self, question: str, context: Dict[str, Any], current_level: int) -> str:
+        """Generate one hint level with its own LLM call"""
+        grade = context.get("grade", "8")
+        subject = context.get("subject", "General")
+        
+        # Determine hint strategy based on grade and subject
+        hint_strategy = self._get_hint_strategy(grade, subject)
+        
+        # Create level-specific prompt
+        level_prompt = self._create_level_prompt(question, context, current_level, hint_strategy)
+        
+        # Generate hint using OpenAI
+        response = self.llm.chat(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": level_prompt},
+                {"role": "user", "content": question}
+            ],
+            max_tokens=800,
+            temperature=0.7
+        )
+        
+        return response.choices[0].message.content.strip()
+    
     def _get_hint_strategy(self, grade: str, subject: str) -> Dict[str, Any]:
         """Get hint strategy based on grade and subject"""
         grade_num = int(grade) if grade.isdigit() else 8
@@ -258,6 +312,45 @@ Remember: This is hint level {level} of 4. For level 1, always ask "What do you
 
         return prompt
     
+    def _create_ladder_prompt(self, question: str, context: Dict[str, Any], strategy: Dict[str, Any]) -> str:
+        """Create the prompt that produces every hint level in one response"""
+        grade = context.get("grade", "8")
+        subject = context.get("subject", "General")
+        board = context.get("board", "CBSE")
+        
+        levels = "\n".join(
+            f"### Hint {level}\n{strategy.get(f'level_{level}', 'Provide a helpful hint')}"
+            for level in range(1, self.max_levels + 1)
+        )
+        
+        prompt = f"""You are Skillomate, an expert educational guide helping Indian students solve problems step by step.
+
+CONTEXT:
+- Grade: {grade}
+- Subject: {subject}
+- Board: {board}
+
+Write a ladder of {self.max_levels} hints for the question, each revealing a little more than the one before.
+The student sees one level at a time, so every level must make sense on its own.
+
+HINT STRATEGY PER LEVEL:
+{levels}
+
+SPECIAL INSTRUCTIONS:
+1. Hint 1 ALWAYS starts with "What do you know about [topic/concept]?" to assess understanding
+2. Hints 2 and up start with "Hint <level>:"
+3. Only Hint {self.max_levels} gives the complete answer
+4. Use age-appropriate language for grade {grade}
+5. Include Indian context where relevant
+6. End each hint with an encouraging note
+
+FORMAT:
+Put each level under its own heading line, exactly "### Hint 1" to "### Hint {self.max_levels}", in order, with nothing before "### Hint 1".
+
+Question: {question}"""
+
+        return prompt
+    
     def _get_next_action(self, current_level: int, context: Dict[str, Any]) -> str:
         """Determine the next action based on current level"""
         if current_level >= 4:
@@ -287,7 +380,7 @@ Remember: This is hint level {level} of 4. For level 1, always ask "What do you
             )
             
             # Generate explanation using OpenAI
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": explanation_prompt},
@@ -2,13 +2,93 @@ import sqlite3
 import json
 import os
 import logging
+import gzip
+import uuid
 import hashlib
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+import threading
+from typing import Dict, Any, List, Optional, Iterator
+from datetime import datetime, timedelta, timezone
 import pickle
 
+from core.metrics import record_cache_lookup, CACHE_EVICTIONS_TOTAL
+from core.background_tasks import run_after_response
+from core.db_migrations import migrate, CACHE_DB_MIGRATIONS
+from core.cache_eviction import (
+    CacheLimits, CacheJanitor, EvictionPolicy, create_eviction_policy,
+    estimate_answer_cost, DIAGRAM_REGENERATION_SECONDS
+)
+
 logger = logging.getLogger(__name__)
 
+# Tables the janitor evicts from: key column, approximate entry size and JSON mirror section
+EVICTABLE_TABLES = {
+    "qa_cache": {
+        "key": "question_hash",
+        "size": "LENGTH(question) + LENGTH(answer) + COALESCE(LENGTH(context), 0)",
+        "json_section": "qa_entries",
+        "max_entries": "max_qa_entries",
+        "metric": "qa"
+    },
+    "diagram_cache": {
+        "key": "diagram_hash",
+        "size": "COALESCE(LENGTH(image_data), 0) + COALESCE(LENGTH(metadata), 0)",
+        "json_section": "diagram_entries",
+        "max_entries": "max_diagram_entries",
+        "metric": "diagram"
+    }
+}
+
+# Format of every created_at/last_accessed value (UTC, as written by CURRENT_TIMESTAMP)
+CACHE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Line-delimited cache export: a header line, then one {"type": ..., column: value} record per line
+CACHE_EXPORT_FORMAT = "skillomate-cache"
+CACHE_EXPORT_VERSION = 1
+GZIP_MAGIC = b"\x1f\x8b"
+EXPORT_TABLES = {
+    "qa": ("qa_cache", [
+        "question_hash", "question", "answer", "subject", "grade", "board", "context",
+        "created_at", "last_accessed", "access_count", "regeneration_cost"
+    ]),
+    "diagram": ("diagram_cache", [
+        "diagram_hash", "diagram_type", "subject", "grade", "image_data", "metadata",
+        "created_at", "last_accessed", "access_count", "regeneration_cost"
+    ]),
+    "syllabus": ("syllabus_cache", ["subject", "grade", "board", "topic", "content", "created_at"])
+}
+
+# Imported records replace cached content but keep the higher access count of the two
+IMPORT_UPSERTS = {
+    "qa": '''
+        INSERT INTO qa_cache
+        (question_hash, question, answer, subject, grade, board, context,
+         created_at, last_accessed, access_count, regeneration_cost)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(question_hash) DO UPDATE SET
+            question = excluded.question, answer = excluded.answer, subject = excluded.subject,
+            grade = excluded.grade, board = excluded.board, context = excluded.context,
+            created_at = excluded.created_at, regeneration_cost = excluded.regeneration_cost,
+            access_count = MAX(qa_cache.access_count, excluded.access_count)
+    ''',
+    "diagram": '''
+        INSERT INTO diagram_cache
+        (diagram_hash, diagram_type, subject, grade, image_data, metadata,
+         created_at, last_accessed, access_count, regeneration_cost)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(diagram_hash) DO UPDATE SET
+            diagram_type = excluded.diagram_type, subject = excluded.subject, grade = excluded.grade,
+            image_data = excluded.image_data, metadata = excluded.metadata,
+            created_at = excluded.created_at, regeneration_cost = excluded.regeneration_cost,
+            access_count = MAX(diagram_cache.access_count, excluded.access_count)
+    ''',
+    "syllabus": '''
+        INSERT INTO syllabus_cache (subject, grade, board, topic, content, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(subject, grade, board, topic) DO UPDATE SET
+            content = excluded.content, created_at = excluded.created_at
+    '''
+}
+
 class OfflineCacheAgent:
     """
     Agent 5: Offline Cache Agent
@@ -25,6 +105,15 @@ class OfflineCacheAgent:
         os.makedirs(cache_dir, exist_ok=True)
         os.makedirs(self.diagram_cache_path, exist_ok=True)
         
+        # Eviction is off until start_janitor() or enforce_cache_limits() is given limits
+        self.limits = None
+        self.eviction_policy = create_eviction_policy("lru")
+        self.janitor = None
+        self._json_lock = threading.Lock()
+
+        # Access-count updates run inline until a background queue is configured
+        self.background_tasks = None
+        
         # Initialize database
         self._init_database()
         self._load_json_cache()
@@ -32,67 +121,40 @@ class OfflineCacheAgent:
     def _init_database(self):
         """Initialize SQLite database for caching"""
         try:
+            migrate(self.db_path, CACHE_DB_MIGRATIONS)
+            # WAL lets requests keep reading while the janitor deletes
             conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create tables
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS qa_cache (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    question_hash TEXT UNIQUE NOT NULL,
-                    question TEXT NOT NULL,
-                    answer TEXT NOT NULL,
-                    subject TEXT,
-                    grade TEXT,
-                    board TEXT,
-                    context TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    access_count INTEGER DEFAULT 1,
-                    is_offline_ready BOOLEAN DEFAULT 1
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS diagram_cache (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    diagram_hash TEXT UNIQUE NOT NULL,
-                    diagram_type TEXT NOT NULL,
-                    subject TEXT,
-                    grade TEXT,
-                    image_data TEXT,
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS syllabus_cache (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subject TEXT NOT NULL,
-                    grade TEXT NOT NULL,
-                    board TEXT NOT NULL,
-                    topic TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(subject, grade, board, topic)
-                )
-            ''')
-            
-            conn.commit()
+            conn.execute("PRAGMA journal_mode=WAL")
             conn.close()
             logger.info("Database initialized successfully")
             
         except Exception as e:
             logger.error(f"Error initializing database: {str(e)}")
     
+    def configure_background_tasks(self, background_tasks):
+        """Record cache hits (access counts, JSON mirror writes) on a background queue instead of in the lookup"""
+        self.background_tasks = background_tasks
+
+    def _touch_entry(self, table: str, key_column: str, key: str):
+        """Update access count and timestamp of a cache hit"""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                conn.execute(f'''
+                    UPDATE {table}
+                    SET last_accessed = CURRENT_TIMESTAMP, access_count = access_count + 1
+                    WHERE {key_column} = ?
+                ''', (key,))
+        finally:
+            conn.close()
+
     def _load_json_cache(self):
         """Load JSON cache file"""
         try:
             if os.path.exists(self.json_cache_path):
                 with open(self.json_cache_path, 'r', encoding='utf-8') as f:
                     self.json_cache = json.load(f)
+                self._normalize_json_timestamps()
             else:
                 self.json_cache = {
                     "qa_entries": {},
@@ -110,18 +172,29 @@ class OfflineCacheAgent:
             logger.error(f"Error loading JSON cache: {str(e)}")
             self.json_cache = {"qa_entries": {}, "diagram_entries": {}, "syllabus_entries": {}, "metadata": {}}
     
+    def _normalize_json_timestamps(self):
+        """Bring entry timestamps written by older versions (local time, 'T' form) to the _cache_timestamp form"""
+        for section in ("qa_entries", "diagram_entries", "syllabus_entries"):
+            for entry in self.json_cache.get(section, {}).values():
+                for field in ("created_at", "last_accessed"):
+                    if entry.get(field):
+                        entry[field] = _import_timestamp(entry[field], entry[field])
+    
     def _save_json_cache(self):
         """Save JSON cache to file"""
         try:
-            self.json_cache["metadata"]["last_updated"] = datetime.now().isoformat()
-            self.json_cache["metadata"]["total_entries"] = (
-                len(self.json_cache["qa_entries"]) + 
-                len(self.json_cache["diagram_entries"]) + 
-                len(self.json_cache["syllabus_entries"])
-            )
-            
-            with open(self.json_cache_path, 'w', encoding='utf-8') as f:
-                json.dump(self.json_cache, f, indent=2, ensure_ascii=False)
+            with self._json_lock:
+                self.json_cache["metadata"]["last_updated"] = datetime.now().isoformat()
+                self.json_cache["metadata"]["total_entries"] = (
+                    len(self.json_cache["qa_entries"]) + 
+                    len(self.json_cache["diagram_entries"]) + 
+                    len(self.json_cache["syllabus_entries"])
+                )
+                
+                # Dump a shallow copy so entries added by other threads mid-write can't break json.dump
+                snapshot = {section: dict(entries) for section, entries in self.json_cache.items()}
+                with open(self.json_cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, indent=2, ensure_ascii=False)
                 
         except Exception as e:
             logger.error(f"Error saving JSON cache: {str(e)}")
@@ -130,9 +203,11 @@ class OfflineCacheAgent:
         """Generate hash for content"""
         return hashlib.md5(content.encode('utf-8')).hexdigest()
     
-    def cache_qa(self, question: str, answer: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    def cache_qa(self, question: str, answer: str, context: Dict[str, Any],
+                 regeneration_cost: Optional[float] = None) -> Dict[str, Any]:
         """
         Cache a question-answer pair
+        regeneration_cost is the seconds it took to produce the answer (estimated from its length if omitted)
         """
         try:
             question_hash = self._generate_hash(question)
@@ -145,10 +220,11 @@ class OfflineCacheAgent:
                 "grade": context.get("grade", "8"),
                 "board": context.get("board", "CBSE"),
                 "context": json.dumps(context),
-                "created_at": datetime.now().isoformat(),
-                "last_accessed": datetime.now().isoformat(),
+                "created_at": _cache_timestamp(),
+                "last_accessed": _cache_timestamp(),
                 "access_count": 1,
-                "is_offline_ready": True
+                "is_offline_ready": True,
+                "regeneration_cost": regeneration_cost if regeneration_cost is not None else estimate_answer_cost(answer)
             }
             
             # Cache in SQLite
@@ -158,13 +234,13 @@ class OfflineCacheAgent:
             cursor.execute('''
                 INSERT OR REPLACE INTO qa_cache 
                 (question_hash, question, answer, subject, grade, board, context, 
-                 created_at, last_accessed, access_count, is_offline_ready)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 created_at, last_accessed, access_count, is_offline_ready, regeneration_cost)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 question_hash, qa_data["question"], qa_data["answer"], 
                 qa_data["subject"], qa_data["grade"], qa_data["board"], 
                 qa_data["context"], qa_data["created_at"], qa_data["last_accessed"],
-                qa_data["access_count"], qa_data["is_offline_ready"]
+                qa_data["access_count"], qa_data["is_offline_ready"], qa_data["regeneration_cost"]
             ))
             
             conn.commit()
@@ -210,15 +286,12 @@ class OfflineCacheAgent:
             result = cursor.fetchone()
             
             if result:
-                # Update access count and timestamp
-                cursor.execute('''
-                    UPDATE qa_cache 
-                    SET last_accessed = CURRENT_TIMESTAMP, access_count = access_count + 1
-                    WHERE question_hash = ?
-                ''', (question_hash,))
-                
-                conn.commit()
                 conn.close()
+                record_cache_lookup("qa", True)
+
+                # Update access count and timestamp after the response
+                run_after_response(self.background_tasks, "cache_touch", self._touch_entry,
+                                   "qa_cache", "question_hash", question_hash)
                 
                 return {
                     "success": True,
@@ -240,9 +313,10 @@ class OfflineCacheAgent:
             # Try JSON cache as fallback
             if question_hash in self.json_cache["qa_entries"]:
                 qa_data = self.json_cache["qa_entries"][question_hash]
-                qa_data["last_accessed"] = datetime.now().isoformat()
+                qa_data["last_accessed"] = _cache_timestamp()
                 qa_data["access_count"] += 1
-                self._save_json_cache()
+                run_after_response(self.background_tasks, "json_cache_save", self._save_json_cache)
+                record_cache_lookup("qa", True)
                 
                 return {
                     "success": True,
@@ -259,6 +333,7 @@ class OfflineCacheAgent:
                     }
                 }
             
+            record_cache_lookup("qa", False)
             return {
                 "success": True,
                 "found": False,
@@ -274,7 +349,8 @@ class OfflineCacheAgent:
             }
     
     def cache_diagram(self, diagram_type: str, subject: str, context: Dict[str, Any], 
-                     image_data: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+                     image_data: str, metadata: Dict[str, Any],
+                     regeneration_cost: float = DIAGRAM_REGENERATION_SECONDS) -> Dict[str, Any]:
         """
         Cache a diagram
         """
@@ -288,11 +364,11 @@ class OfflineCacheAgent:
             cursor.execute('''
                 INSERT OR REPLACE INTO diagram_cache 
                 (diagram_hash, diagram_type, subject, grade, image_data, metadata, 
-                 created_at, last_accessed)
-                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                 created_at, last_accessed, access_count, regeneration_cost)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 1, ?)
             ''', (
                 diagram_hash, diagram_type, subject, context.get("grade", "8"),
-                image_data, json.dumps(metadata)
+                image_data, json.dumps(metadata), regeneration_cost
             ))
             
             conn.commit()
@@ -305,8 +381,10 @@ class OfflineCacheAgent:
                 "grade": context.get("grade", "8"),
                 "image_data": image_data,
                 "metadata": metadata,
-                "created_at": datetime.now().isoformat(),
-                "last_accessed": datetime.now().isoformat()
+                "created_at": _cache_timestamp(),
+                "last_accessed": _cache_timestamp(),
+                "access_count": 1,
+                "regeneration_cost": regeneration_cost
             }
             self._save_json_cache()
             
@@ -345,15 +423,12 @@ class OfflineCacheAgent:
             result = cursor.fetchone()
             
             if result:
-                # Update access timestamp
-                cursor.execute('''
-                    UPDATE diagram_cache 
-                    SET last_accessed = CURRENT_TIMESTAMP
-                    WHERE diagram_hash = ?
-                ''', (diagram_hash,))
-                
-                conn.commit()
                 conn.close()
+                record_cache_lookup("diagram", True)
+
+                # Update access count and timestamp after the response
+                run_after_response(self.background_tasks, "cache_touch", self._touch_entry,
+                                   "diagram_cache", "diagram_hash", diagram_hash)
                 
                 return {
                     "success": True,
@@ -369,8 +444,10 @@ class OfflineCacheAgent:
             # Try JSON cache as fallback
             if diagram_hash in self.json_cache["diagram_entries"]:
                 diagram_data = self.json_cache["diagram_entries"][diagram_hash]
-                diagram_data["last_accessed"] = datetime.now().isoformat()
-                self._save_json_cache()
+                diagram_data["last_accessed"] = _cache_timestamp()
+                diagram_data["access_count"] = diagram_data.get("access_count", 1) + 1
+                run_after_response(self.background_tasks, "json_cache_save", self._save_json_cache)
+                record_cache_lookup("diagram", True)
                 
                 return {
                     "success": True,
@@ -381,6 +458,7 @@ class OfflineCacheAgent:
                     "last_accessed": diagram_data["last_accessed"]
                 }
             
+            record_cache_lookup("diagram", False)
             return {
                 "success": True,
                 "found": False,
@@ -422,7 +500,7 @@ class OfflineCacheAgent:
                 "board": board,
                 "topic": topic,
                 "content": content,
-                "created_at": datetime.now().isoformat()
+                "created_at": _cache_timestamp()
             }
             self._save_json_cache()
             
@@ -461,6 +539,7 @@ class OfflineCacheAgent:
             conn.close()
             
             if result:
+                record_cache_lookup("syllabus", True)
                 return {
                     "success": True,
                     "found": True,
@@ -472,6 +551,7 @@ class OfflineCacheAgent:
             key = f"{subject}_{grade}_{board}_{topic}"
             if key in self.json_cache["syllabus_entries"]:
                 syllabus_data = self.json_cache["syllabus_entries"][key]
+                record_cache_lookup("syllabus", True)
                 return {
                     "success": True,
                     "found": True,
@@ -479,6 +559,7 @@ class OfflineCacheAgent:
                     "created_at": syllabus_data["created_at"]
                 }
             
+            record_cache_lookup("syllabus", False)
             return {
                 "success": True,
                 "found": False,
@@ -508,7 +589,7 @@ class OfflineCacheAgent:
             search_query = '''
                 SELECT question, answer, subject, grade, board, created_at, access_count
                 FROM qa_cache 
-                WHERE question LIKE ? OR answer LIKE ?
+                WHERE (question LIKE ? OR answer LIKE ?)
             '''
             params = [f"%{query}%", f"%{query}%"]
             
@@ -580,18 +661,27 @@ class OfflineCacheAgent:
             
             conn.close()
             
+            stats = {
+                "qa_entries": qa_count,
+                "diagram_entries": diagram_count,
+                "syllabus_entries": syllabus_count,
+                "total_entries": qa_count + diagram_count + syllabus_count,
+                "top_accessed_qa": [
+                    {"question": row[0], "subject": row[1], "grade": row[2], "access_count": row[3]}
+                    for row in top_qa
+                ]
+            }
+            
+            if self.limits is not None:
+                stats["eviction"] = {
+                    "policy": self.eviction_policy.name,
+                    "limits": self.limits.to_dict(),
+                    "janitor": self.janitor.get_stats() if self.janitor else None
+                }
+            
             return {
                 "success": True,
-                "stats": {
-                    "qa_entries": qa_count,
-                    "diagram_entries": diagram_count,
-                    "syllabus_entries": syllabus_count,
-                    "total_entries": qa_count + diagram_count + syllabus_count,
-                    "top_accessed_qa": [
-                        {"question": row[0], "subject": row[1], "grade": row[2], "access_count": row[3]}
-                        for row in top_qa
-                    ]
-                }
+                "stats": stats
             }
             
         except Exception as e:
@@ -606,7 +696,7 @@ class OfflineCacheAgent:
         Clear old cache entries
         """
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
+            cutoff_date = _cache_timestamp(datetime.now(timezone.utc) - timedelta(days=days))
             
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -615,7 +705,7 @@ class OfflineCacheAgent:
             cursor.execute('''
                 DELETE FROM qa_cache 
                 WHERE last_accessed < ?
-            ''', (cutoff_date.isoformat(),))
+            ''', (cutoff_date,))
             
             qa_deleted = cursor.rowcount
             
@@ -623,7 +713,7 @@ class OfflineCacheAgent:
             cursor.execute('''
                 DELETE FROM diagram_cache 
                 WHERE last_accessed < ?
-            ''', (cutoff_date.isoformat(),))
+            ''', (cutoff_date,))
             
             diagram_deleted = cursor.rowcount
             
@@ -637,7 +727,7 @@ class OfflineCacheAgent:
                     "diagram_entries": diagram_deleted,
                     "total": qa_deleted + diagram_deleted
                 },
-                "cutoff_date": cutoff_date.isoformat()
+                "cutoff_date": cutoff_date
             }
             
         except Exception as e:
@@ -647,19 +737,264 @@ class OfflineCacheAgent:
                 "error": str(e)
             }
     
-    def export_cache(self, export_path: str) -> Dict[str, Any]:
+    def start_janitor(self, limits: CacheLimits, policy: str = "lru", interval: float = 300.0,
+                      batch_size: int = 200) -> CacheJanitor:
+        """
+        Enforce capacity limits in a background thread every `interval` seconds
+        """
+        self.limits = limits
+        self.eviction_policy = create_eviction_policy(policy)
+        if self.janitor is None:
+            self.janitor = CacheJanitor(lambda: self.enforce_cache_limits(batch_size=batch_size), interval)
+            self.janitor.start()
+        return self.janitor
+    
+    def enforce_cache_limits(self, limits: Optional[CacheLimits] = None, policy: Optional[EvictionPolicy] = None,
+                             batch_size: int = 200) -> Dict[str, Any]:
+        """
+        One incremental eviction pass over qa_cache, diagram_cache and the JSON mirror
+        Each rule (age, subject quota, entry count, total size) evicts at most batch_size entries per
+        table in its own short transaction; "done" is False while any limit is still exceeded.
+        """
+        try:
+            limits = limits or self.limits
+            policy = policy or self.eviction_policy
+            evicted = {table: [] for table in EVICTABLE_TABLES}
+            done = True
+            
+            if limits is None:
+                return {"success": True, "evicted": {"qa_entries": 0, "diagram_entries": 0, "total": 0}, "done": True}
+            
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                # Rules run in order (age, subject quota, entry count, total size) and a rule only runs once
+                # the ones before it are satisfied, so the broad limits never evict entries a narrower
+                # rule was about to remove anyway
+                for table, spec in EVICTABLE_TABLES.items():
+                    table_done = True
+                    if limits.max_age_days is not None:
+                        cutoff = _cache_timestamp(datetime.now(timezone.utc) - timedelta(days=limits.max_age_days))
+                        victims = self._select_victims(conn, table, "last_accessed ASC", batch_size,
+                                                       "last_accessed < ?", (cutoff,))
+                        self._evict_rows(conn, table, victims, "age", evicted)
+                        table_done = len(victims) < batch_size
+                    
+                    for subject, quota in limits.subject_quotas.items():
+                        if not table_done:
+                            break
+                        count = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE subject = ?", (subject,)).fetchone()[0]
+                        if count > quota:
+                            victims = self._select_victims(conn, table, policy.order_by, min(count - quota, batch_size),
+                                                           "subject = ?", (subject,))
+                            self._evict_rows(conn, table, victims, "quota", evicted)
+                            table_done = count - quota <= batch_size
+                    
+                    max_entries = getattr(limits, spec["max_entries"])
+                    if table_done and max_entries is not None:
+                        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                        if count > max_entries:
+                            victims = self._select_victims(conn, table, policy.order_by,
+                                                           min(count - max_entries, batch_size))
+                            self._evict_rows(conn, table, victims, "entries", evicted)
+                            table_done = count - max_entries <= batch_size
+                    
+                    done = done and table_done
+                
+                if done and limits.max_bytes is not None:
+                    done = self._evict_bytes(conn, limits.max_bytes, policy, batch_size, evicted)
+            finally:
+                conn.close()
+            
+            self._prune_json_mirror(limits, policy, evicted, apply_entry_caps=done)
+            
+            qa_evicted = len(evicted["qa_cache"])
+            diagram_evicted = len(evicted["diagram_cache"])
+            return {
+                "success": True,
+                "evicted": {
+                    "qa_entries": qa_evicted,
+                    "diagram_entries": diagram_evicted,
+                    "total": qa_evicted + diagram_evicted
+                },
+                "done": done
+            }
+            
+        except Exception as e:
+            logger.error(f"Error enforcing cache limits: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _select_victims(self, conn: sqlite3.Connection, table: str, order_by: str, limit: int,
+                        where: str = "1", params: tuple = ()) -> List[tuple]:
+        """(id, key, size) of the first `limit` rows in eviction order"""
+        spec = EVICTABLE_TABLES[table]
+        return conn.execute(f'''
+            SELECT id, key, size_bytes FROM (
+                SELECT id, {spec["key"]} AS key, last_accessed, access_count, regeneration_cost,
+                       {spec["size"]} AS size_bytes
+                FROM {table}
+                WHERE {where}
+            )
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', (*params, limit)).fetchall()
+    
+    def _evict_rows(self, conn: sqlite3.Connection, table: str, victims: List[tuple], reason: str,
+                    evicted: Dict[str, List[str]]):
+        """Delete victims in one short transaction and remember their keys for the JSON mirror"""
+        if not victims:
+            return
+        with conn:
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row[0],) for row in victims])
+        evicted[table].extend(row[1] for row in victims)
+        CACHE_EVICTIONS_TOTAL.inc(len(victims), cache=EVICTABLE_TABLES[table]["metric"], reason=reason)
+    
+    def _evict_bytes(self, conn: sqlite3.Connection, max_bytes: int, policy: EvictionPolicy, batch_size: int,
+                     evicted: Dict[str, List[str]]) -> bool:
+        """Evict across both tables in policy order until the total size fits, returns True when it does"""
+        total = sum(
+            conn.execute(f"SELECT COALESCE(SUM({spec['size']}), 0) FROM {table}").fetchone()[0]
+            for table, spec in EVICTABLE_TABLES.items()
+        )
+        excess = total - max_bytes
+        if excess <= 0:
+            return True
+        
+        candidates = " UNION ALL ".join(
+            f"SELECT '{table}' AS source, id, {spec['key']} AS key, last_accessed, access_count, "
+            f"regeneration_cost, {spec['size']} AS size_bytes FROM {table}"
+            for table, spec in EVICTABLE_TABLES.items()
+        )
+        rows = conn.execute(f'''
+            SELECT source, id, key, size_bytes FROM ({candidates})
+            ORDER BY {policy.order_by}
+            LIMIT ?
+        ''', (batch_size,)).fetchall()
+        
+        victims = {table: [] for table in EVICTABLE_TABLES}
+        freed = 0
+        for source, row_id, key, size in rows:
+            if freed >= excess:
+                break
+            victims[source].append((row_id, key, size))
+            freed += size or 0
+        
+        for table, table_victims in victims.items():
+            self._evict_rows(conn, table, table_victims, "bytes", evicted)
+        return freed >= excess
+    
+    def _prune_json_mirror(self, limits: CacheLimits, policy: EvictionPolicy, evicted: Dict[str, List[str]],
+                           apply_entry_caps: bool = True):
+        """
+        Drop evicted entries from the JSON mirror and hold it to the same age and entry limits
+        Entry caps wait until SQLite is within its limits, so entries only in the JSON file
+        (e.g. imported ones) are trimmed without the mirror drifting from the database.
+        """
+        removed = 0
+        cutoff = None
+        if limits.max_age_days is not None:
+            cutoff = _cache_timestamp(datetime.now(timezone.utc) - timedelta(days=limits.max_age_days))
+        
+        with self._json_lock:
+            for table, spec in EVICTABLE_TABLES.items():
+                section = self.json_cache.get(spec["json_section"], {})
+                stale = set(evicted[table])
+                if cutoff:
+                    stale.update(key for key, entry in section.items() if (entry.get("last_accessed") or "") < cutoff)
+                
+                max_entries = getattr(limits, spec["max_entries"])
+                if apply_entry_caps and max_entries is not None and len(section) - len(stale) > max_entries:
+                    remaining = sorted((key for key in section if key not in stale),
+                                       key=lambda key: policy.sort_key(section[key]))
+                    stale.update(remaining[:len(remaining) - max_entries])
+                
+                for key in stale:
+                    if section.pop(key, None) is not None:
+                        removed += 1
+        
+        if removed:
+            self._save_json_cache()
+    
+    def iter_export_records(self, subject: Optional[str] = None, grade: Optional[str] = None,
+                            board: Optional[str] = None, since: Optional[str] = None,
+                            fetch_size: int = 200) -> Iterator[Dict[str, Any]]:
+        """
+        Yield a header record, then every matching cache row, read from one consistent snapshot
+        since keeps rows created at or after that time; board does not apply to diagrams, which have none.
+        """
+        filters = {"subject": subject, "grade": grade, "board": board, "since": since}
+        since = _normalize_timestamp(since) if since else None
+        yield {
+            "type": "header",
+            "format": CACHE_EXPORT_FORMAT,
+            "version": CACHE_EXPORT_VERSION,
+            "exported_at": datetime.now().isoformat(),
+            "filters": {key: value for key, value in filters.items() if value}
+        }
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # A read transaction keeps the export consistent while requests keep writing
+            conn.execute("BEGIN")
+            for record_type, (table, columns) in EXPORT_TABLES.items():
+                conditions, params = [], []
+                for column, value in (("subject", subject), ("grade", grade), ("board", board)):
+                    if value and column in columns:
+                        conditions.append(f"{column} = ?")
+                        params.append(value)
+                if since:
+                    conditions.append("created_at >= ?")
+                    params.append(since)
+                
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} {where}", params)
+                while True:
+                    rows = cursor.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield {"type": record_type, **dict(zip(columns, row))}
+        finally:
+            conn.close()
+    
+    def iter_export_lines(self, **filters) -> Iterator[str]:
+        """NDJSON lines of iter_export_records()"""
+        for record in self.iter_export_records(**filters):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    
+    def export_cache(self, export_path: str, subject: Optional[str] = None, grade: Optional[str] = None,
+                     board: Optional[str] = None, since: Optional[str] = None,
+                     compress: Optional[bool] = None) -> Dict[str, Any]:
         """
-        Export cache to file
+        Export cache to a line-delimited JSON file, gzip-compressed when compress is set or the path ends in .gz
         """
         try:
-            # Export JSON cache
-            with open(export_path, 'w', encoding='utf-8') as f:
-                json.dump(self.json_cache, f, indent=2, ensure_ascii=False)
+            if compress is None:
+                compress = export_path.endswith(".gz")
+            counts = {record_type: 0 for record_type in EXPORT_TABLES}
+            
+            # Write next to the target and rename, so readers never see a half-written export
+            temp_path = f"{export_path}.{threading.get_ident()}.tmp"
+            try:
+                with _open_ndjson(temp_path, "w", compress) as f:
+                    for record in self.iter_export_records(subject=subject, grade=grade, board=board, since=since):
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        if record["type"] in counts:
+                            counts[record["type"]] += 1
+                os.replace(temp_path, export_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
             
             return {
                 "success": True,
                 "exported": True,
                 "path": export_path,
+                "compressed": compress,
+                "counts": counts,
+                "total": sum(counts.values()),
                 "message": "Cache exported successfully"
             }
             
@@ -671,25 +1006,97 @@ class OfflineCacheAgent:
                 "exported": False
             }
     
-    def import_cache(self, import_path: str) -> Dict[str, Any]:
+    def import_cache(self, import_path: str, batch_size: int = 500, resume: bool = True,
+                     force: bool = False) -> Dict[str, Any]:
         """
-        Import cache from file
+        Import a cache export into SQLite
+        Records are streamed and upserted batch_size at a time, each batch committed together with a
+        checkpoint, so an interrupted import of the same file picks up where it stopped. A file that
+        was already imported completely is skipped unless force is set.
+        Legacy single-document JSON exports are still accepted and merged into the JSON cache.
         """
         try:
-            with open(import_path, 'r', encoding='utf-8') as f:
-                imported_cache = json.load(f)
-            
-            # Merge with existing cache
-            self.json_cache["qa_entries"].update(imported_cache.get("qa_entries", {}))
-            self.json_cache["diagram_entries"].update(imported_cache.get("diagram_entries", {}))
-            self.json_cache["syllabus_entries"].update(imported_cache.get("syllabus_entries", {}))
-            
-            self._save_json_cache()
+            if not _is_ndjson_export(import_path):
+                return self._import_legacy_json(import_path)
+            
+            stat = os.stat(import_path)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                job = conn.execute('''
+                    SELECT import_id, status, lines_done, imported, failed
+                    FROM cache_imports
+                    WHERE file_path = ? AND file_size = ? AND file_mtime = ?
+                    ORDER BY created_at DESC LIMIT 1
+                ''', (os.path.abspath(import_path), stat.st_size, stat.st_mtime)).fetchone()
+                
+                if job and job[1] == "completed" and not force:
+                    return {
+                        "success": True,
+                        "imported": True,
+                        "path": import_path,
+                        "import_id": job[0],
+                        "already_imported": True,
+                        "records": job[3],
+                        "failed": job[4],
+                        "message": "Cache file was already imported"
+                    }
+                
+                if job and job[1] != "completed" and resume and not force:
+                    import_id, _, lines_done, imported, failed = job
+                else:
+                    import_id, lines_done, imported, failed = str(uuid.uuid4()), 0, 0, 0
+                    with conn:
+                        conn.execute('''
+                            INSERT INTO cache_imports (import_id, file_path, file_size, file_mtime, status)
+                            VALUES (?, ?, ?, ?, 'running')
+                        ''', (import_id, os.path.abspath(import_path), stat.st_size, stat.st_mtime))
+                resumed_from = lines_done
+                
+                batch = {record_type: [] for record_type in EXPORT_TABLES}
+                batch_records = 0
+                line_number = 0
+                try:
+                    with _open_ndjson(import_path, "r") as f:
+                        for line_number, line in enumerate(f, 1):
+                            if line_number <= lines_done or not line.strip():
+                                continue
+                            try:
+                                record = json.loads(line)
+                                record_type = record.get("type")
+                                if record_type == "header":
+                                    continue
+                                batch[record_type].append(self._import_row(record_type, record))
+                                batch_records += 1
+                            except Exception:
+                                failed += 1
+                                continue
+                            
+                            if batch_records >= batch_size:
+                                imported += batch_records
+                                self._write_import_batch(conn, import_id, batch, line_number, imported, failed)
+                                batch = {record_type: [] for record_type in EXPORT_TABLES}
+                                batch_records = 0
+                    
+                    imported += batch_records
+                    self._write_import_batch(conn, import_id, batch, line_number, imported, failed, status="completed")
+                except Exception as e:
+                    with conn:
+                        conn.execute('''
+                            UPDATE cache_imports SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                            WHERE import_id = ?
+                        ''', (str(e), import_id))
+                    raise
+            finally:
+                conn.close()
             
             return {
                 "success": True,
                 "imported": True,
                 "path": import_path,
+                "import_id": import_id,
+                "resumed_from_line": resumed_from,
+                "records": imported,
+                "failed": failed,
                 "message": "Cache imported successfully"
             }
             
@@ -700,3 +1107,120 @@ class OfflineCacheAgent:
                 "error": str(e),
                 "imported": False
             }
+    
+    def _import_row(self, record_type: str, record: Dict[str, Any]) -> tuple:
+        """Column values for one exported record, in EXPORT_TABLES order"""
+        now = _cache_timestamp()
+        created_at = _import_timestamp(record.get("created_at"), now)
+        if record_type == "qa":
+            return (
+                record.get("question_hash") or self._generate_hash(record["question"]),
+                record["question"], record["answer"],
+                record.get("subject"), record.get("grade"), record.get("board"), record.get("context"),
+                created_at, _import_timestamp(record.get("last_accessed"), now),
+                record.get("access_count") or 1,
+                record.get("regeneration_cost") or estimate_answer_cost(record["answer"])
+            )
+        if record_type == "diagram":
+            return (
+                record["diagram_hash"], record["diagram_type"], record.get("subject"), record.get("grade"),
+                record.get("image_data"), record.get("metadata"),
+                created_at, _import_timestamp(record.get("last_accessed"), now),
+                record.get("access_count") or 1,
+                record.get("regeneration_cost") or DIAGRAM_REGENERATION_SECONDS
+            )
+        if record_type == "syllabus":
+            return (
+                record["subject"], record["grade"], record["board"], record["topic"], record["content"],
+                created_at
+            )
+        raise ValueError(f"Unknown record type: {record_type}")
+    
+    def _write_import_batch(self, conn: sqlite3.Connection, import_id: str, batch: Dict[str, List[tuple]],
+                            line_number: int, imported: int, failed: int, status: str = "running"):
+        """Upsert one batch and move the checkpoint in the same transaction"""
+        with conn:
+            for record_type, rows in batch.items():
+                if rows:
+                    conn.executemany(IMPORT_UPSERTS[record_type], rows)
+            conn.execute('''
+                UPDATE cache_imports
+                SET lines_done = ?, imported = ?, failed = ?, status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE import_id = ?
+            ''', (line_number, imported, failed, status, import_id))
+    
+    def _import_legacy_json(self, import_path: str) -> Dict[str, Any]:
+        """
+        Import a legacy single-document JSON export into the JSON cache
+        """
+        with open(import_path, 'r', encoding='utf-8') as f:
+            imported_cache = json.load(f)
+        
+        # Merge with existing cache
+        with self._json_lock:
+            self.json_cache["qa_entries"].update(imported_cache.get("qa_entries", {}))
+            self.json_cache["diagram_entries"].update(imported_cache.get("diagram_entries", {}))
+            self.json_cache["syllabus_entries"].update(imported_cache.get("syllabus_entries", {}))
+        
+        self._save_json_cache()
+        
+        return {
+            "success": True,
+            "imported": True,
+            "path": import_path,
+            "legacy_format": True,
+            "message": "Cache imported successfully"
+        }
+
+
+def _open_ndjson(path: str, mode: str, compress: Optional[bool] = None):
+    """Open an export for text reading/writing; reads detect gzip from the file's magic bytes"""
+    if compress is None:
+        with open(path, "rb") as f:
+            compress = f.read(2) == GZIP_MAGIC
+    if compress:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _is_ndjson_export(path: str) -> bool:
+    """True when the file starts with an export header line"""
+    with _open_ndjson(path, "r") as f:
+        first_line = f.readline()
+    try:
+        header = json.loads(first_line)
+    except ValueError:
+        return False
+    return isinstance(header, dict) and header.get("format") == CACHE_EXPORT_FORMAT
+
+
+def _cache_timestamp(when: Optional[datetime] = None) -> str:
+    """
+    UTC time as 'YYYY-MM-DD HH:MM:SS', the form SQLite's CURRENT_TIMESTAMP writes
+    Every timestamp in the cache uses it, so last_accessed and created_at order correctly as strings.
+    """
+    when = when or datetime.now(timezone.utc)
+    return when.astimezone(timezone.utc).strftime(CACHE_TIMESTAMP_FORMAT)
+
+
+def _normalize_timestamp(value: str) -> str:
+    """
+    ISO timestamp -> _cache_timestamp form (raises ValueError when unparseable)
+    Space-separated values without an offset were written by SQLite and are UTC already; other naive
+    values (datetime.now().isoformat(), dates given by users) are local time.
+    """
+    value = value.strip().replace("Z", "+00:00")
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None and " " in value:
+        return parsed.strftime(CACHE_TIMESTAMP_FORMAT)
+    return _cache_timestamp(parsed)
+
+
+def _import_timestamp(value: Optional[str], default: str) -> str:
+    """Normalized timestamp of an imported record, default when it is missing or unparseable"""
+    if not value:
+        return default
+    try:
+        return _normalize_timestamp(value)
+    except ValueError:
+        return default
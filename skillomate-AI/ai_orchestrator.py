@@ -3,9 +3,11 @@ import os
 import json
 import logging
 from typing import Dict, Any, Optional, List
+from contextlib import nullcontext
 from datetime import datetime
 from dotenv import load_dotenv
 import uuid
+import random
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,6 +20,14 @@ from agents.offline_cache import OfflineCacheAgent
 from agents.enhanced_question_analyzer import EnhancedQuestionAnalyzer
 from agents.conversational_homework_tutor import ConversationalHomeworkTutor
 from agents.conversation_context_manager import ConversationContextManager
+from core.llm_gateway import LLMGateway
+from core.circuit_breaker import OPEN
+from core.degraded_answers import DegradedAnswerer
+from core.deadline import Deadline, deadline_scope
+from core.background_tasks import BackgroundTaskQueue, run_after_response
+from core.metrics import ACTIVE_SESSIONS, PIPELINE_STAGES_SKIPPED_TOTAL, time_stage
+from core.session_store import SQLiteSessionStore, SessionMap
+from core.nlu import analyze, extract_features
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +49,7 @@ class GetSkilledHomeworkHelperOrchestrator:
         
         # Initialize OpenAI client
         self.client = openai.OpenAI(api_key=self.openai_api_key)
+        self.llm = LLMGateway(self.client, agent="orchestrator")
         
         # Initialize all agents
         self.curriculum_mapper = CurriculumMapperAgent()
@@ -47,6 +58,9 @@ class GetSkilledHomeworkHelperOrchestrator:
         self.diagram_generator = DiagramGeneratorAgent()
         self.offline_cache = OfflineCacheAgent()
         
+        # Offline answers served while the LLM circuit is open
+        self.degraded_answers = DegradedAnswerer(self.offline_cache)
+        
         # Initialize enhanced components
         self.question_analyzer = EnhancedQuestionAnalyzer()
         self.conversational_tutor = ConversationalHomeworkTutor()
@@ -58,6 +72,53 @@ class GetSkilledHomeworkHelperOrchestrator:
         # Conversation history management
         self.conversation_sessions = {}  # session_id -> conversation_data
         self.max_history_length = 20  # Maximum messages to keep in history
+        ACTIVE_SESSIONS.set_function(lambda: len(self.conversation_sessions))
+        
+        # Time budget per homework request, and the part of it kept for the tutor's answer
+        self.request_budget_seconds = 45.0
+        self.tutor_reserve_seconds = 20.0
+        
+        # Work the response doesn't depend on runs inline until a background queue is configured
+        self.background_tasks = None
+    
+    def configure_background_tasks(self, background_tasks: BackgroundTaskQueue):
+        """Run conversation summaries, cache writes and cache-hit bookkeeping after the response"""
+        self.background_tasks = background_tasks
+        self.offline_cache.configure_background_tasks(background_tasks)
+    
+    def after_response(self, name: str, func, *args, **kwargs) -> bool:
+        """Run func(*args, **kwargs) once the response is on its way; False when the task was dropped"""
+        return run_after_response(self.background_tasks, name, func, *args, **kwargs)
+    
+    def configure_deadlines(self, request_budget_seconds: float, tutor_reserve_seconds: float):
+        """Optional stages (question analysis and conversation flow) only run while more than tutor_reserve_seconds are left"""
+        self.request_budget_seconds = request_budget_seconds
+        self.tutor_reserve_seconds = tutor_reserve_seconds
+    
+    def configure_session_store(self, store: SQLiteSessionStore):
+        """Share sessions between worker processes through a store"""
+        sessions = SessionMap(store)
+        for session_id, session in self.conversation_sessions.items():
+            sessions[session_id] = session
+        self.conversation_sessions = sessions
+    
+    def configure_degraded_mode(self, question_bank, min_score: Optional[float] = None):
+        """Also look for answers in the offline question bank's pre-cached responses when the LLM is down"""
+        self.degraded_answers.configure(question_bank, min_score)
+    
+    def _session_lock(self, session_id: str):
+        """
+        Held around changing and saving a shared session, so a background task and a request thread
+        don't write it at the same time (in-memory sessions are never serialized and need no lock)
+        """
+        if isinstance(self.conversation_sessions, SessionMap):
+            return self.conversation_sessions.lock(session_id)
+        return nullcontext()
+    
+    def _save_session(self, session_id: str):
+        """Write a session changed in place through to the shared store, if there is one"""
+        if isinstance(self.conversation_sessions, SessionMap):
+            self.conversation_sessions.save(session_id)
     
     def _create_session(self, user_id: Optional[str] = None, user_context: Optional[Dict[str, Any]] = None) -> str:
         """Create a new conversation session with user context"""
@@ -73,7 +134,7 @@ class GetSkilledHomeworkHelperOrchestrator:
         
         # Update with provided user context
         if user_context:
-            logger.info(f"Received user context: {user_context}")
+            logger.debug("Received user context with keys %s", sorted(user_context))
             # Map backend user context to AI context
             if user_context.get('username'):
                 default_context['name'] = user_context['username']
@@ -85,8 +146,6 @@ class GetSkilledHomeworkHelperOrchestrator:
                 default_context['email'] = user_context['email']
             if user_context.get('role'):
                 default_context['role'] = user_context['role']
-            
-            logger.info(f"Mapped AI context: {default_context}")
         
         self.conversation_sessions[session_id] = {
             "user_id": user_id,
@@ -96,7 +155,7 @@ class GetSkilledHomeworkHelperOrchestrator:
             "last_activity": datetime.now()
         }
         
-        logger.info(f"Created session {session_id} with user context: {default_context}")
+        logger.info("Created session %s", session_id)
         return session_id
     
     
@@ -104,7 +163,9 @@ class GetSkilledHomeworkHelperOrchestrator:
         """Get existing session or create new one"""
         if session_id and session_id in self.conversation_sessions:
             # Update last activity
-            self.conversation_sessions[session_id]["last_activity"] = datetime.now()
+            with self._session_lock(session_id):
+                self.conversation_sessions[session_id]["last_activity"] = datetime.now()
+                self._save_session(session_id)
             return session_id
         else:
             return self._create_session(user_id)
@@ -119,16 +180,18 @@ class GetSkilledHomeworkHelperOrchestrator:
             session = self.conversation_sessions[session_id]
             user_context = session.get("user_context", {})
             
-            # Update context with new values
-            for key, value in context_updates.items():
-                if value:  # Only update if value is not empty
-                    user_context[key] = value
-            
-            # Update the session
-            session["user_context"] = user_context
-            session["last_activity"] = datetime.now()
+            with self._session_lock(session_id):
+                # Update context with new values
+                for key, value in context_updates.items():
+                    if value:  # Only update if value is not empty
+                        user_context[key] = value
+                
+                # Update the session
+                session["user_context"] = user_context
+                session["last_activity"] = datetime.now()
+                self._save_session(session_id)
             
-            logger.info(f"Updated session {session_id} context: {context_updates}")
+            logger.debug("Updated session %s context keys %s", session_id, sorted(context_updates))
             return True
             
         except Exception as e:
@@ -137,42 +200,12 @@ class GetSkilledHomeworkHelperOrchestrator:
     
     def _extract_user_info(self, message: str) -> Dict[str, Any]:
         """Extract user information from messages"""
+        features = analyze(message)
         user_info = {}
-        
-        # Extract name - Fixed patterns to be more specific and avoid conflicts
-        name_patterns = [
-            r"my name is (\w+)",  # Most specific first
-            r"i'm (\w+)",
-            r"call me (\w+)",
-            r"^i am (\w+)$",  # Only match if "i am" is at start and end
-            r"^i am (\w+)\s",  # Only match if "i am" is at start followed by space
-            r"i am abhinaya",
-            r"i'm abhinaya"
-        ]
-        
-        message_lower = message.lower().strip()
-        for pattern in name_patterns:
-            import re
-            match = re.search(pattern, message_lower)
-            if match:
-                user_info["name"] = match.group(1).title()
-                break
-        
-        # Extract grade/class - Fixed to handle "grade 8" format properly
-        grade_patterns = [
-            r"grade (\d+)",  # Most specific first - "grade 8"
-            r"class (\d+)",  # "class 8"
-            r"(\d+)(?:st|nd|rd|th) class",
-            r"(\d+)(?:st|nd|rd|th) grade"
-        ]
-        
-        for pattern in grade_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                grade_num = int(match.group(1))
-                user_info["grade"] = f"Class {grade_num}"  # Store as "Class 8" format
-                break
-        
+        if features.name:
+            user_info["name"] = features.name
+        if features.grade:
+            user_info["grade"] = features.grade  # Stored as "Class 8"
         return user_info
     
     def _update_user_context(self, session_id: str, message: str):
@@ -184,10 +217,13 @@ class GetSkilledHomeworkHelperOrchestrator:
         user_info = self._extract_user_info(message)
         
         # Update user context
-        if user_info.get("name"):
-            session["user_context"]["name"] = user_info["name"]
-        if user_info.get("grade"):
-            session["user_context"]["grade"] = user_info["grade"]
+        with self._session_lock(session_id):
+            if user_info.get("name"):
+                session["user_context"]["name"] = user_info["name"]
+            if user_info.get("grade"):
+                session["user_context"]["grade"] = user_info["grade"]
+            if user_info:
+                self._save_session(session_id)
     
     def _get_conversation_context(self, session_id: str) -> str:
         """Get conversation context for AI prompt"""
@@ -225,16 +261,44 @@ class GetSkilledHomeworkHelperOrchestrator:
         if session_id not in self.conversation_sessions:
             return
         
-        session = self.conversation_sessions[session_id]
-        session["conversation_history"].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now()
-        })
-        
-        # Keep only the last max_history_length messages
-        if len(session["conversation_history"]) > self.max_history_length:
-            session["conversation_history"] = session["conversation_history"][-self.max_history_length:]
+        with self._session_lock(session_id):
+            session = self.conversation_sessions[session_id]
+            session["conversation_history"].append({
+                "role": role,
+                "content": content,
+                "timestamp": datetime.now()
+            })
+            
+            # Keep only the last max_history_length messages
+            if len(session["conversation_history"]) > self.max_history_length:
+                session["conversation_history"] = session["conversation_history"][-self.max_history_length:]
+            self._save_session(session_id)
+    
+    def refresh_conversation_summary(self, session_id: str, conversation_history: List[Dict[str, Any]],
+                                     user_context: Dict[str, Any]):
+        """Summarize the conversation so far for the session's next question"""
+        summary = self.context_manager.generate_conversation_summary(conversation_history, user_context)
+        if not summary:
+            raise RuntimeError("Conversation summary could not be generated")
+        with self._session_lock(session_id):
+            session = self.conversation_sessions.get(session_id)
+            if session is None:
+                return
+            session["conversation_summary"] = summary
+            self._save_session(session_id)
+    
+    def cache_answer(self, question: str, answer: str, context: Dict[str, Any], regeneration_cost: Optional[float] = None):
+        """Store an answer in the offline cache, raising if the write failed so it can be retried"""
+        result = self.offline_cache.cache_qa(question, answer, context, regeneration_cost)
+        if not result.get("success"):
+            raise RuntimeError(result.get("error", "Failed to cache answer"))
+    
+    def cache_diagram(self, diagram_type: str, subject: str, context: Dict[str, Any], image_data: str,
+                      metadata: Dict[str, Any]):
+        """Store a generated diagram in the offline cache, raising if the write failed so it can be retried"""
+        result = self.offline_cache.cache_diagram(diagram_type, subject, context, image_data, metadata)
+        if not result.get("success"):
+            raise RuntimeError(result.get("error", "Failed to cache diagram"))
     
     def _store_conversation(self, session_id: str, user_message: str, ai_response: str):
         """Store a complete conversation exchange"""
@@ -250,82 +314,106 @@ class GetSkilledHomeworkHelperOrchestrator:
         # Update last activity
         self.conversation_sessions[session_id]["last_activity"] = datetime.now()
         
-        logger.info(f"Stored conversation for session {session_id}: {len(self.conversation_sessions[session_id]['conversation_history'])} messages")
+        logger.debug("Stored conversation for session %s: %d messages",
+                     session_id, len(self.conversation_sessions[session_id]['conversation_history']))
     
     def _is_greeting(self, question: str) -> bool:
         """
         Check if the question is a greeting
         """
-        greeting_words = [
-            'hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 
-            'good evening', 'namaste', 'namaskar', 'sup', 'yo', 'what\'s up',
-            'how are you', 'howdy', 'hi there', 'hello there'
-        ]
-        
-        question_lower = question.lower().strip()
-        
-        # Check for exact matches
-        if question_lower in greeting_words:
-            return True
-            
-        # Check if question starts with greeting words
-        for greeting in greeting_words:
-            if question_lower.startswith(greeting):
-                return True
-                
-        return False
+        return analyze(question).small_talk in ("greeting", "wellbeing", "introduction")
     
     def _is_identity_question(self, question: str) -> bool:
         """
         Check if the question is asking about identity
         """
-        identity_questions = [
-            'who am i', 'who am i?', 'what is my name', 'what is my name?',
-            'do you know my name', 'do you know my name?', 'what do you know about me',
-            'what do you know about me?', 'tell me about myself', 'tell me about myself?'
-        ]
+        return analyze(question).small_talk == "identity"
+    
+    def _small_talk_result(self, question: str, session_id: str, answer: str, response_type: str,
+                           start_time: datetime, suggestions: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Record a canned exchange in the session and build the response"""
+        self._add_to_conversation_history(session_id, "user", question)
+        self._add_to_conversation_history(session_id, "assistant", answer)
         
-        question_lower = question.lower().strip()
+        return {
+            "success": True,
+            "source": response_type,
+            "answer": answer,
+            "response": answer,  # Compatibility field
+            "context": {"type": response_type},
+            "session_id": session_id,
+            "interactive": True,
+            "suggestions": suggestions or [],
+            "metadata": {
+                "response_type": response_type,
+                "processing_time": (datetime.now() - start_time).total_seconds(),
+                "llm_calls": 0
+            }
+        }
+    
+    def _degraded_result(self, question: str, session_id: str, user_context: Dict[str, Any],
+                         start_time: datetime) -> Dict[str, Any]:
+        """Answer from offline content because the LLM is failing or its circuit is open"""
+        offline = self.degraded_answers.answer(question, user_context)
+        self._add_to_conversation_history(session_id, "user", question)
+        self._add_to_conversation_history(session_id, "assistant", offline["answer"])
+        logger.warning("Degraded answer (match %s, score %.2f), LLM circuit %s",
+                       offline["match"], offline["score"], self.llm.breaker.state)
         
-        return question_lower in identity_questions
+        return {
+            "success": True,
+            "source": "degraded",
+            "answer": offline["answer"],
+            "response": offline["answer"],  # Compatibility field
+            "context": user_context or {},
+            "session_id": session_id,
+            "interactive": False,
+            "suggestions": [],
+            "degraded": True,
+            "metadata": {
+                "response_type": "degraded",
+                "match": offline["match"],
+                "matched_question": offline["matched_question"],
+                "match_score": offline["score"],
+                "processing_time": (datetime.now() - start_time).total_seconds(),
+                "llm_calls": 0
+            }
+        }
     
-    def _handle_identity_question(self, question: str, session_id: str) -> Dict[str, Any]:
+    def _handle_identity_question(self, question: str, session_id: str,
+                                  start_time: Optional[datetime] = None) -> Dict[str, Any]:
         """
         Handle identity questions with context awareness
         """
         session = self.conversation_sessions.get(session_id, {})
         user_context = session.get("user_context", {})
         user_name = user_context.get("name")
+        user_grade = user_context.get("grade")
         
         if user_name:
-            response = f"You are {user_name}! Based on our conversation, you introduced yourself as {user_name}. You're a student who's here to learn and get help with your studies. I remember you from when you said 'Hi, I am {user_name}' earlier in our conversation."
+            grade_text = f" in {user_grade}" if user_grade else ""
+            response = f"You are {user_name}{grade_text}! You introduced yourself earlier in our conversation, and you're here to learn and get help with your studies."
         else:
             response = "I don't have your name yet, but I'm here to help you with your studies! What should I call you?"
         
-        # Add to conversation history
-        self._add_to_conversation_history(session_id, "user", question)
-        self._add_to_conversation_history(session_id, "assistant", response)
-        
-        return {
-            "success": True,
-            "source": "identity_response",
-            "answer": response,
-            "context": {"type": "identity_question"},
-            "session_id": session_id,
-            "metadata": {
-                "response_type": "identity_question",
-                "processing_time": 0.1
-            }
-        }
+        return self._small_talk_result(question, session_id, response, "identity_question", start_time or datetime.now())
     
-    def _handle_greeting(self, question: str, session_id: str, user_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def _handle_greeting(self, question: str, session_id: str, user_context: Optional[Dict[str, Any]] = None,
+                         start_time: Optional[datetime] = None) -> Dict[str, Any]:
         """
         Generate a friendly, short greeting response with context awareness
         """
         session = self.conversation_sessions.get(session_id, {})
         user_name = session.get("user_context", {}).get("name")
         
-        if user_name:
+        if user_name and analyze(question).name:
+            # They just introduced themselves
+            greetings = [
+                f"Nice to meet you, {user_name}! 👋 What subject are we working on today?",
+                f"Hi {user_name}! 😊 Great to meet you. What homework can I help you with?",
+                f"Namaste {user_name}! 🙏 Lovely to meet you. What would you like to learn today?"
+            ]
+        elif user_name:
             greetings = [
                 f"Hi {user_name}! 👋 Great to see you again! How can I help with your studies today?",
                 f"Hello {user_name}! 😊 Ready to continue learning? What would you like to work on?",
@@ -342,30 +430,61 @@ class GetSkilledHomeworkHelperOrchestrator:
                 "Hi! 📚 I'm here to help with your homework. What should I call you?"
             ]
         
-        import random
-        greeting = random.choice(greetings)
-        
-        # Add to conversation history
-        self._add_to_conversation_history(session_id, "user", question)
-        self._add_to_conversation_history(session_id, "assistant", greeting)
+        return self._small_talk_result(question, session_id, random.choice(greetings), "greeting", start_time or datetime.now())
+    
+    def _handle_small_talk(self, intent: str, question: str, session_id: str, start_time: datetime) -> Dict[str, Any]:
+        """Answer greetings, identity questions and other small talk from session state, without the LLM"""
+        if intent in ("greeting", "introduction"):
+            return self._handle_greeting(question, session_id, start_time=start_time)
+        if intent == "identity":
+            return self._handle_identity_question(question, session_id, start_time)
         
-        return {
-            "success": True,
-            "source": "greeting",
-            "answer": greeting,
-            "context": {"type": "greeting"},
-            "session_id": session_id,
-            "metadata": {
-                "response_type": "greeting",
-                "processing_time": 0.1
-            }
+        user_name = self.conversation_sessions.get(session_id, {}).get("user_context", {}).get("name")
+        name_text = f", {user_name}" if user_name else ""
+        replies = {
+            "wellbeing": [
+                f"I'm doing great{name_text}, thanks for asking! 😊 What are you studying today?",
+                f"All good here{name_text}! 📚 Ready to help with any homework question."
+            ],
+            "thanks": [
+                f"You're welcome{name_text}! 😊 Ask me anytime you're stuck.",
+                f"Happy to help{name_text}! 🎓 Is there anything else you'd like to work on?"
+            ],
+            "goodbye": [
+                f"Bye{name_text}! 👋 Keep practising, and come back whenever you need help.",
+                f"See you soon{name_text}! 📚 All the best with your studies."
+            ],
+            "capabilities": [
+                "I'm GetSkilled Homework Helper, your AI tutor for CBSE, ICSE, IB and State Board homework. 🎓 "
+                "I can explain concepts, solve problems step by step, give hints, draw diagrams and answer in your board's style. "
+                "What would you like help with?"
+            ]
         }
+        suggestions = ["Help me solve a maths problem", "Explain a science concept"] if intent != "goodbye" else []
+        return self._small_talk_result(question, session_id, random.choice(replies[intent]), intent, start_time, suggestions)
     
     def process_homework_request(self, question: str, user_context: Optional[Dict[str, Any]] = None, 
-                               mode: str = "comprehensive", session_id: Optional[str] = None) -> Dict[str, Any]:
+                               mode: str = "comprehensive", session_id: Optional[str] = None,
+                               budget_seconds: Optional[float] = None) -> Dict[str, Any]:
         """
         Main method to process homework requests with all agents
+        Every LLM call made for the request gets at most the time left of budget_seconds.
         """
+        deadline = Deadline(budget_seconds or self.request_budget_seconds)
+        with deadline_scope(deadline):
+            return self._process_homework_request(question, user_context, mode, session_id, deadline)
+    
+    def _optional_stage(self, stage: str, deadline: Deadline, skipped_stages: List[str]) -> Optional[Deadline]:
+        """Deadline for an optional stage, or None (and the stage is recorded as skipped) when there is no time for it"""
+        stage_deadline = deadline.child(self.tutor_reserve_seconds)
+        if stage_deadline.expired:
+            skipped_stages.append(stage)
+            PIPELINE_STAGES_SKIPPED_TOTAL.inc(stage=stage)
+            return None
+        return stage_deadline
+    
+    def _process_homework_request(self, question: str, user_context: Optional[Dict[str, Any]], mode: str,
+                                  session_id: Optional[str], deadline: Deadline) -> Dict[str, Any]:
         try:
             start_time = datetime.now()
             
@@ -375,8 +494,20 @@ class GetSkilledHomeworkHelperOrchestrator:
             # Update user context based on message
             self._update_user_context(session_id, question)
             
-            # Enhanced question analysis
-            question_analysis = self.question_analyzer.analyze_question(question, user_context)
+            # Greetings, identity questions and other small talk are answered from session state
+            intent = analyze(question).small_talk
+            if intent:
+                with time_stage("small_talk"):
+                    return self._handle_small_talk(intent, question, session_id, start_time)
+            
+            # While the LLM circuit is open, skip the LLM pipeline and answer from offline content
+            if self.llm.breaker.state == OPEN:
+                session_context = dict(self.conversation_sessions.get(session_id, {}).get("user_context", {}))
+                session_context.update(user_context or {})
+                with time_stage("degraded_answer"):
+                    return self._degraded_result(question, session_id, session_context, start_time)
+            
+            skipped_stages = []
             
             # Get conversation history for context
             session = self.conversation_sessions.get(session_id, {})
@@ -387,20 +518,24 @@ class GetSkilledHomeworkHelperOrchestrator:
             if user_context:
                 user_context_from_session.update(user_context)
             
-            # Get comprehensive conversation context
-            context_data = self.context_manager.get_conversation_context(
-                question, conversation_history, user_context_from_session
-            )
+            # Get comprehensive conversation context (flow analysis only when there is time); the
+            # summary was written after the previous answer, so it costs no LLM call here
+            stage_deadline = self._optional_stage("conversation_context", deadline, skipped_stages)
+            with deadline_scope(stage_deadline or deadline), time_stage("conversation_context"):
+                context_data = self.context_manager.get_conversation_context(
+                    question, conversation_history, user_context_from_session, use_llm=stage_deadline is not None,
+                    conversation_summary=session.get("conversation_summary", "")
+                )
             
             
             # Generate conversational response with enhanced context
-            logger.info(f"Processing question: '{question}'")
-            logger.info(f"User context: {user_context_from_session}")
-            logger.info(f"Conversation history length: {len(conversation_history)}")
+            logger.debug("Processing question (%d chars), history length %d, context keys %s",
+                         len(question), len(conversation_history), sorted(user_context_from_session))
             
-            response_result = self.conversational_tutor.generate_conversational_response(
-                question, user_context_from_session, conversation_history, context_data
-            )
+            with time_stage("tutor_response"):
+                response_result = self.conversational_tutor.generate_conversational_response(
+                    question, user_context_from_session, conversation_history, context_data
+                )
             
             if not response_result.get("success", True):
                 return {
@@ -409,6 +544,11 @@ class GetSkilledHomeworkHelperOrchestrator:
                     "session_id": session_id
                 }
             
+            # The tutor's LLM call failed: the best offline answer beats a canned reply
+            if response_result.get("fallback"):
+                with time_stage("degraded_answer"):
+                    return self._degraded_result(question, session_id, user_context_from_session, start_time)
+            
             # Add user message to conversation history
             self._add_to_conversation_history(session_id, "user", question)
             
@@ -426,9 +566,10 @@ class GetSkilledHomeworkHelperOrchestrator:
                 board_templates = BoardSpecificTemplates()
                 board = user_context_from_session.get("board", "CBSE")
                 subject = user_context_from_session.get("subject", "Mathematics")
-                enhanced_response = board_templates.apply_board_template(
-                    enhanced_response, board, subject, "general"
-                )
+                with time_stage("board_template"):
+                    enhanced_response = board_templates.apply_board_template(
+                        enhanced_response, board, subject, "general"
+                    )
             except Exception as e:
                 logger.warning(f"Board formatting failed: {e}")
             
@@ -436,13 +577,14 @@ class GetSkilledHomeworkHelperOrchestrator:
             try:
                 from core.india_context_enhancer import IndiaContextEnhancer
                 india_enhancer = IndiaContextEnhancer()
-                enhanced_response = india_enhancer.enhance_with_indian_context(
-                    enhanced_response,
-                    user_context_from_session.get("subject", "Mathematics"),
-                    user_context_from_session.get("topic", "general"),
-                    user_context_from_session.get("grade", None),
-                    user_context_from_session.get("board", "CBSE")
-                )
+                with time_stage("india_context"):
+                    enhanced_response = india_enhancer.enhance_with_indian_context(
+                        enhanced_response,
+                        user_context_from_session.get("subject", "Mathematics"),
+                        user_context_from_session.get("topic", "general"),
+                        user_context_from_session.get("grade", None),
+                        user_context_from_session.get("board", "CBSE")
+                    )
             except Exception as e:
                 logger.warning(f"Indian context enhancement failed: {e}")
 
@@ -452,6 +594,13 @@ class GetSkilledHomeworkHelperOrchestrator:
             # Use enhanced response as final response
             final_response = enhanced_response
             
+            # Summarize the conversation for the next question after this response is sent
+            self.after_response(
+                "conversation_summary", self.refresh_conversation_summary, session_id,
+                list(self.conversation_sessions.get(session_id, {}).get("conversation_history", [])),
+                dict(user_context_from_session)
+            )
+            
             # Return conversational response
             return {
                 "success": True,
@@ -467,7 +616,9 @@ class GetSkilledHomeworkHelperOrchestrator:
                 "metadata": {
                     "response_type": "conversational",
                     "processing_time": (datetime.now() - start_time).total_seconds(),
-                    "context_used": True
+                    "context_used": True,
+                    "skipped_stages": skipped_stages,
+                    "budget_remaining": round(deadline.remaining(), 2)
                 }
             }
             
@@ -514,10 +665,8 @@ class GetSkilledHomeworkHelperOrchestrator:
             if self._needs_diagram(question, ai_response):
                 diagram_result = self._generate_relevant_diagram(question, context, ai_response)
             
-            # Step 4: Cache the result
-            cache_result = self.offline_cache.cache_qa(
-                question, ai_response, context
-            )
+            # Step 4: Cache the result after the response
+            cached = self.after_response("cache_answer", self.cache_answer, question, ai_response, context)
             
             # Step 5: Prepare final response
             final_response = {
@@ -538,8 +687,9 @@ class GetSkilledHomeworkHelperOrchestrator:
                     "type": diagram_result["diagram_type"]
                 }
                 
-                # Cache the diagram
-                self.offline_cache.cache_diagram(
+                # Cache the diagram after the response
+                self.after_response(
+                    "cache_diagram", self.cache_diagram,
                     diagram_result["diagram_type"],
                     context["subject"],
                     context,
@@ -548,7 +698,7 @@ class GetSkilledHomeworkHelperOrchestrator:
                 )
             
             final_response["metadata"] = {
-                "cached": cache_result.get("cached", False),
+                "cached": cached,
                 "processing_time": datetime.now().isoformat(),
                 "mode": "comprehensive"
             }
@@ -640,8 +790,9 @@ class GetSkilledHomeworkHelperOrchestrator:
             if not diagram_result["success"]:
                 return diagram_result
             
-            # Cache the diagram
-            self.offline_cache.cache_diagram(
+            # Cache the diagram after the response
+            self.after_response(
+                "cache_diagram", self.cache_diagram,
                 diagram_type,
                 context["subject"],
                 context,
@@ -774,14 +925,14 @@ IMPORTANT FORMATTING RULES:
                 })
             
             # DEBUG: Log the exact messages being sent to OpenAI
-            logger.info(f"Messages being sent to OpenAI:")
-            for i, msg in enumerate(messages):
-                logger.info(f"Message {i}: Role={msg['role']}, Content={msg['content'][:200]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, msg in enumerate(messages):
+                    logger.debug("Message %d: role=%s, %d chars", i, msg['role'], len(msg['content']))
             
             # Add the current question
             messages.append({"role": "user", "content": question})
             
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
                 model=self.default_model,
                 messages=messages,
                 max_tokens=1000,  # Reduced to prevent timeout
@@ -807,56 +958,31 @@ IMPORTANT FORMATTING RULES:
     
     def _needs_diagram(self, question: str, answer: str) -> bool:
         """Determine if a diagram is needed based on question and answer"""
-        diagram_keywords = [
-            'draw', 'sketch', 'diagram', 'graph', 'chart', 'figure', 'plot',
-            'visualize', 'show', 'illustrate', 'represent', 'geometry',
-            'triangle', 'circle', 'rectangle', 'coordinate', 'axis',
-            'circuit', 'cell', 'atom', 'molecule', 'timeline', 'map'
-        ]
-        
-        question_lower = question.lower()
-        answer_lower = answer.lower()
-        
-        return any(keyword in question_lower or keyword in answer_lower 
-                  for keyword in diagram_keywords)
+        return analyze(question).needs_diagram or extract_features(answer).needs_diagram
     
     def _extract_diagram_type(self, question: str, subject: str) -> str:
         """Extract diagram type from question"""
-        question_lower = question.lower()
-        
-        if subject.lower() in ["mathematics", "math"]:
-            if any(word in question_lower for word in ["triangle", "triangle"]):
-                return "triangle"
-            elif any(word in question_lower for word in ["circle", "circular"]):
-                return "circle"
-            elif any(word in question_lower for word in ["graph", "plot", "chart"]):
-                return "bar_graph"
-            elif any(word in question_lower for word in ["coordinate", "axis", "point"]):
-                return "coordinate_plane"
-            else:
-                return "triangle"  # default
-        
-        elif subject.lower() in ["science", "physics", "chemistry", "biology"]:
-            if any(word in question_lower for word in ["circuit", "electric", "battery"]):
-                return "circuit"
-            elif any(word in question_lower for word in ["cell", "nucleus"]):
-                return "cell"
-            elif any(word in question_lower for word in ["atom", "molecule"]):
-                return "atom"
-            else:
-                return "circuit"  # default
-        
-        elif subject.lower() in ["geography"]:
-            if any(word in question_lower for word in ["climate", "weather", "temperature"]):
-                return "climate_graph"
-            else:
-                return "climate_graph"  # default
-        
-        elif subject.lower() in ["social studies", "history", "civics"]:
-            if any(word in question_lower for word in ["timeline", "history", "event"]):
-                return "timeline"
-            else:
-                return "timeline"  # default
+        intents = analyze(question).diagram_intents
+        subject = subject.lower()
+        
+        if subject in ["mathematics", "math"]:
+            for intent, diagram_type in [("triangle", "triangle"), ("circle", "circle"), ("graph", "bar_graph"),
+                                         ("chart", "bar_graph"), ("coordinate", "coordinate_plane")]:
+                if intent in intents:
+                    return diagram_type
+            return "triangle"  # default
+        
+        elif subject in ["science", "physics", "chemistry", "biology"]:
+            for intent in ["circuit", "cell", "atom"]:
+                if intent in intents:
+                    return intent
+            return "circuit"  # default
+        
+        elif subject in ["geography"]:
+            return "climate_graph"
+        
+        elif subject in ["social studies", "history", "civics"]:
+            return "timeline"
         
         else:
             return "general_diagram"
@@ -879,9 +1005,63 @@ IMPORTANT FORMATTING RULES:
                 "details": str(e)
             }
     
-    def get_next_hint(self, question: str, current_level: int, context: Dict[str, Any]) -> Dict[str, Any]:
+    def open_guided_session(self, question: str, context: Dict[str, Any], session_id: Optional[str] = None) -> str:
+        """Record the question at level 1 in the session and start generating its hint ladder"""
+        session_id = self._get_or_create_session(session_id, context.get("user_id") if context else None)
+        with self._session_lock(session_id):
+            session = self.conversation_sessions[session_id]
+            guided_context = dict(session.get("user_context", {}))
+            guided_context.update(context or {})
+            session["guided"] = {"question": question, "context": guided_context, "level": 1}
+            self._save_session(session_id)
+        self.guided_solver.get_hint_ladder(question, guided_context)
+        return session_id
+    
+    def start_guided_learning(self, question: str, context: Dict[str, Any],
+                              session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Start progressive hints for a question; the session remembers the question and level"""
+        try:
+            session_id = self.open_guided_session(question, context, session_id)
+            guided = self.conversation_sessions[session_id]["guided"]
+            
+            result = self.guided_solver.generate_progressive_hints(question, guided["context"], 1)
+            result["mode"] = "guided"
+            result["session_id"] = session_id
+            return result
+        except Exception as e:
+            logger.error(f"Error starting guided learning: {str(e)}")
+            return {
+                "success": False,
+                "error": "Failed to start guided learning",
+                "details": str(e)
+            }
+    
+    def get_guided_state(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Question, context and hint level of the session's guided learning, if one is in progress"""
+        session = self.conversation_sessions.get(session_id) if session_id else None
+        return session.get("guided") if session else None
+    
+    def get_next_hint(self, question: str, current_level: int, context: Dict[str, Any],
+                      session_id: Optional[str] = None) -> Dict[str, Any]:
         """Get the next hint in progressive learning"""
         try:
+            guided = self.get_guided_state(session_id)
+            if guided and question and question != guided["question"]:
+                # The session's ladder belongs to another question: guide this one from the requested level
+                session_id = self.open_guided_session(question, context, session_id)
+                guided = self.get_guided_state(session_id)
+                guided["level"] = current_level
+            if guided:
+                # The session knows the question and level, so the client doesn't have to send them
+                with self._session_lock(session_id):
+                    guided["level"] = min(guided["level"] + 1, self.guided_solver.max_levels)
+                    self._save_session(session_id)
+                result = self.guided_solver.generate_progressive_hints(
+                    guided["question"], guided["context"], guided["level"]
+                )
+                result["session_id"] = session_id
+                return result
+            
             return self.guided_solver.generate_progressive_hints(
                 question, context, current_level + 1
             )
@@ -910,10 +1090,13 @@ IMPORTANT FORMATTING RULES:
         """Clear old cache entries"""
         return self.offline_cache.clear_old_cache(days)
     
-    def export_cache(self, export_path: str) -> Dict[str, Any]:
+    def export_cache(self, export_path: str, subject: Optional[str] = None, grade: Optional[str] = None,
+                     board: Optional[str] = None, since: Optional[str] = None,
+                     compress: Optional[bool] = None) -> Dict[str, Any]:
         """Export cache to file"""
-        return self.offline_cache.export_cache(export_path)
+        return self.offline_cache.export_cache(export_path, subject, grade, board, since, compress)
     
-    def import_cache(self, import_path: str) -> Dict[str, Any]:
+    def import_cache(self, import_path: str, batch_size: int = 500, resume: bool = True,
+                     force: bool = False) -> Dict[str, Any]:
         """Import cache from file"""
-        return self.offline_cache.import_cache(import_path)
+        return self.offline_cache.import_cache(import_path, batch_size, resume, force)
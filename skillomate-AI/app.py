@@ -1,17 +1,24 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Request, request, jsonify, render_template, g, Response, stream_with_context
 from flask_cors import CORS
 import openai
 import os
 import json
 import speech_recognition as sr
-import tempfile
+from io import BytesIO
 
 
 
 import logging
 from datetime import datetime
 import uuid
+import time
+import base64
+import zlib
+import gzip
+import hmac
+from functools import wraps
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Load environment variables from .env file
 load_dotenv()
@@ -26,34 +33,185 @@ from core.response_formatter import TeacherApprovedFormatter
 from core.india_context_enhancer import IndiaContextEnhancer
 from core.board_templates import BoardSpecificTemplates
 from diagrams.advanced_diagram_generator import EducationalDiagramGenerator
-from core.offline_question_bank import OfflineQuestionBank
+from core.offline_question_bank import OfflineQuestionBank, BulkCacheBusyError, make_tutor_response_generator
+from core.rate_limiter import create_rate_limiter
+from core.llm_gateway import LLMGateway, LLM_CIRCUIT, LLM_LATENCY, configure_llm_gateway, configure_hedging
+from core.voice_input import StreamingTranscriber, create_recognizer_backend, AudioDecodeError
+from core.voice_output import TextToSpeechService, AudioCache, create_synthesizer
+from core.metrics import registry as metrics_registry, REQUEST_SECONDS
+from core.cache_eviction import CacheLimits
+from core.response_encoding import FastJSONProvider, ResponseCompressor
+from core.model_router import ModelRouter, load_routing_table
+from core.logging_setup import configure_logging, parse_sampling, set_request_id, get_request_id
+from core.session_store import SQLiteSessionStore
+from core.hint_ladder import SQLiteHintLadderStore
+from core.warmup import acquire_process_lock
+from core.background_tasks import BackgroundTaskQueue
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: records are written by a background thread, sampled and redacted
+configure_logging(
+    LOG_LEVEL, json_format=LOG_JSON, sampling=parse_sampling(LOG_SAMPLING),
+    redact_pii=LOG_REDACT_PII, queue_size=LOG_QUEUE_SIZE
+)
 logger = logging.getLogger(__name__)
 
+class InMemoryUploadRequest(Request):
+    """Keep uploaded files in memory instead of spooling them to temporary files"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BytesIO()
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
+app.json = FastJSONProvider(app)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+# Take the client address from the hops our own proxies appended, never from what the client sent
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
 CORS(app, origins=env_config['CORS_ORIGINS'], 
      supports_credentials=True, methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
+# Registered before the other after_request hooks so it runs last, on the final body and headers
+if RESPONSE_COMPRESSION_ENABLED:
+    ResponseCompressor(
+        min_size=RESPONSE_COMPRESSION_MIN_BYTES,
+        gzip_level=RESPONSE_GZIP_LEVEL,
+        brotli_quality=RESPONSE_BROTLI_QUALITY
+    ).init_app(app)
+
 # OpenAI Configuration
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
+# Every LLM call gets a timeout and goes through a shared circuit breaker
+configure_llm_gateway(
+    LLM_TIMEOUT_SECONDS,
+    window_seconds=LLM_CIRCUIT_WINDOW_SECONDS,
+    min_calls=LLM_CIRCUIT_MIN_CALLS,
+    failure_rate=LLM_CIRCUIT_FAILURE_RATE,
+    slow_call_seconds=LLM_CIRCUIT_SLOW_CALL_SECONDS,
+    slow_call_rate=LLM_CIRCUIT_SLOW_CALL_RATE,
+    open_seconds=LLM_CIRCUIT_OPEN_SECONDS,
+    max_open_seconds=LLM_CIRCUIT_MAX_OPEN_SECONDS
+)
+configure_hedging(LLM_HEDGING_ENABLED, LLM_HEDGE_DEFAULT_DELAY_SECONDS, LLM_HEDGE_MIN_DELAY_SECONDS, LLM_HEDGE_WORKERS)
+
 # Initialize the AI orchestrator
 ai_orchestrator = GetSkilledHomeworkHelperOrchestrator()
 
+# Each homework request has an end-to-end time budget; optional stages give way to the tutor's answer
+ai_orchestrator.configure_deadlines(REQUEST_BUDGET_SECONDS, TUTOR_RESERVE_SECONDS)
+
+# Summaries, cache writes and cache-hit bookkeeping run after the response on a bounded queue
+background_tasks = None
+if BACKGROUND_TASKS_ENABLED:
+    background_tasks = BackgroundTaskQueue(
+        max_size=BACKGROUND_TASK_QUEUE_SIZE,
+        workers=BACKGROUND_TASK_WORKERS,
+        max_retries=BACKGROUND_TASK_MAX_RETRIES,
+        retry_delay=BACKGROUND_TASK_RETRY_DELAY_SECONDS,
+        drain_seconds=BACKGROUND_TASK_DRAIN_SECONDS
+    )
+    ai_orchestrator.configure_background_tasks(background_tasks)
+
+# Conversation sessions shared by all worker processes
+if SESSION_STORE == 'sqlite':
+    ai_orchestrator.configure_session_store(SQLiteSessionStore(SESSION_STORE_DB_PATH, SESSION_TTL_HOURS * 3600))
+
+def start_cache_janitor():
+    """Keep the offline cache bounded in the background"""
+    ai_orchestrator.offline_cache.start_janitor(
+        CacheLimits(
+            max_qa_entries=CACHE_MAX_QA_ENTRIES,
+            max_diagram_entries=CACHE_MAX_DIAGRAM_ENTRIES,
+            max_bytes=CACHE_MAX_MB * 1024 * 1024,
+            subject_quotas=CACHE_SUBJECT_QUOTAS,
+            max_age_days=CACHE_RETENTION_DAYS
+        ),
+        policy=CACHE_EVICTION_POLICY,
+        interval=CACHE_JANITOR_INTERVAL,
+        batch_size=CACHE_EVICTION_BATCH_SIZE
+    )
+
+def start_worker_services():
+    """
+    Called by gunicorn in each worker right after fork
+    Threads don't survive a fork, so the log writer is restarted here; the cache janitor runs in
+    whichever worker holds the janitor lock.
+    """
+    configure_logging(
+        LOG_LEVEL, json_format=LOG_JSON, sampling=parse_sampling(LOG_SAMPLING),
+        redact_pii=LOG_REDACT_PII, queue_size=LOG_QUEUE_SIZE
+    )
+    if acquire_process_lock(JANITOR_LOCK_PATH):
+        start_cache_janitor()
+        logger.info("Worker %d runs the cache janitor", os.getpid())
+
+# Under the pre-fork server no background thread is started before the workers are forked
+if not PREFORK:
+    start_cache_janitor()
+
+# Tutor calls pick model and output budget from answer style, complexity and grade
+ai_orchestrator.conversational_tutor.configure_routing(
+    ModelRouter(OPENAI_MODEL, load_routing_table(MODEL_ROUTING_FILE), OPENAI_ADVANCED_MODEL)
+)
+
+# Answers are formatted by local rules unless the LLM quality mode is switched on
+ai_orchestrator.formatter_agent.configure_formatting(FORMATTER_USE_LLM, FORMATTER_CACHE_SIZE)
+
+# One streamed generation per question serves every hint level, in whichever worker the next hint lands
+ai_orchestrator.guided_solver.configure_hint_ladders(
+    HINT_LADDER_CACHE_SIZE, HINT_LADDER_TTL_SECONDS, HINT_WAIT_TIMEOUT_SECONDS,
+    store=SQLiteHintLadderStore(SESSION_STORE_DB_PATH) if SESSION_STORE == 'sqlite' else None
+)
+
 # Initialize enhancement features
 response_formatter = TeacherApprovedFormatter()
 india_context_enhancer = IndiaContextEnhancer()
 board_templates = BoardSpecificTemplates()
 diagram_generator = EducationalDiagramGenerator()
-offline_question_bank = OfflineQuestionBank()
+offline_question_bank = OfflineQuestionBank(
+    OFFLINE_QUESTION_BANK_DB_PATH,
+    response_generator=make_tutor_response_generator(ai_orchestrator.conversational_tutor, board_templates),
+    bulk_workers=OFFLINE_BULK_CACHE_WORKERS,
+    bulk_batch_size=OFFLINE_BULK_CACHE_BATCH_SIZE,
+    bulk_max_jobs=OFFLINE_BULK_CACHE_MAX_JOBS,
+    bulk_max_questions=OFFLINE_BULK_CACHE_MAX_QUESTIONS,
+    bulk_stale_seconds=OFFLINE_BULK_CACHE_STALE_SECONDS,
+    question_bank_dir=OFFLINE_QUESTION_BANK_DIR,
+    popularity_half_life_hours=POPULARITY_HALF_LIFE_HOURS,
+    popularity_flush_seconds=POPULARITY_FLUSH_SECONDS,
+    popularity_top_k=POPULARITY_TOP_K,
+    bundle_chunk_size=OFFLINE_BUNDLE_CHUNK_SIZE,
+    bundle_keep_versions=OFFLINE_BUNDLE_KEEP_VERSIONS
+)
+
+# While the LLM is down, questions are answered from the cache and the question bank's pre-cached responses
+ai_orchestrator.configure_degraded_mode(offline_question_bank, DEGRADED_MIN_MATCH_SCORE)
+
+# Speech recognition for voice input
+RAW_AUDIO_MIMETYPES = {'audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave', 'audio/aiff',
+                       'audio/x-aiff', 'audio/flac', 'audio/x-flac', 'application/octet-stream'}
+voice_transcriber = StreamingTranscriber(
+    create_recognizer_backend(VOICE_RECOGNIZER_BACKEND, VOICE_RECOGNITION_LANGUAGE),
+    chunk_seconds=VOICE_CHUNK_SECONDS,
+    max_workers=VOICE_RECOGNITION_WORKERS
+)
+
+# Speech synthesis for voice output
+text_to_speech = TextToSpeechService(
+    create_synthesizer(VOICE_SYNTHESIZER_BACKEND),
+    AudioCache(VOICE_AUDIO_CACHE_DIR, VOICE_AUDIO_CACHE_MAX_MB * 1024 * 1024),
+    prefetch=VOICE_SYNTHESIS_PREFETCH,
+    default_voice=VOICE_DEFAULT_VOICE,
+    max_workers=VOICE_SYNTHESIS_WORKERS
+)
 
 class GetSkilledHomeworkHelperAI:
     def __init__(self):
         self.conversation_history = []
         # Initialize OpenAI client
         self.client = openai.OpenAI(api_key=openai.api_key)
+        self.llm = LLMGateway(self.client, agent="homework_helper")
         self.system_prompt = """You are GetSkilled Homework Helper, an intelligent educational AI assistant designed to help students with their academic doubts and questions. 
 
 Key characteristics:
@@ -85,7 +243,7 @@ Always maintain a helpful, encouraging tone and focus on educational value."""
                 messages.append({"role": "system", "content": context_message})
             
             # Call OpenAI API
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
                 model="gpt-3.5-turbo",
                 messages=messages,
                 max_tokens=1000,
@@ -114,6 +272,103 @@ Always maintain a helpful, encouraging tone and focus on educational value."""
 
 
 
+@app.before_request
+def start_request_timer():
+    """Remember when the request started for latency metrics and tag its log records"""
+    g.request_start = time.perf_counter()
+    set_request_id(request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex)
+
+@app.after_request
+def record_request_latency(response):
+    """Observe request latency per endpoint"""
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=endpoint, method=request.method, status=str(response.status_code)
+        )
+    response.headers['X-Request-ID'] = get_request_id()
+    return response
+
+# Initialize rate limiter
+rate_limiter = create_rate_limiter(
+    API_RATE_LIMIT, API_RATE_WINDOW,
+    endpoint_costs=API_ENDPOINT_COSTS,
+    storage=API_RATE_LIMIT_STORAGE,
+    db_path=API_RATE_LIMIT_DB_PATH
+)
+
+def _authenticated_user_id():
+    """Get the user id the Node backend vouches for; None unless the request carries the service token"""
+    token = request.headers.get('X-Service-Token', '')
+    if not SERVICE_AUTH_TOKEN or not hmac.compare_digest(token.encode(), SERVICE_AUTH_TOKEN.encode()):
+        return None
+
+    user_id = None
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        if isinstance(data, dict):
+            context = data.get('context') if isinstance(data.get('context'), dict) else {}
+            user_id = data.get('user_id') or context.get('user_id')
+    if not user_id and request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        user_id = request.form.get('user_id')
+
+    if user_id and user_id != 'anonymous':
+        return str(user_id)
+    return None
+
+def _rate_limit_identities():
+    """Get the rate-limit buckets a request is charged to (the authenticated user, else the client IP)"""
+    user_id = _authenticated_user_id()
+    if user_id:
+        # Requests relayed by the backend all share its IP, so only the user's own bucket applies
+        return [f"user:{user_id}"]
+    return [f"ip:{request.remote_addr or 'unknown'}"]
+
+def require_admin_token(view):
+    """Allow a route only with a matching X-Admin-Token header; closed entirely while ADMIN_API_TOKEN is unset"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get('X-Admin-Token', '')
+        if not ADMIN_API_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_API_TOKEN.encode()):
+            return jsonify({
+                'success': False,
+                'error': 'Admin token required'
+            }), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.before_request
+def enforce_rate_limit():
+    """Reject requests from clients that have spent their token budget"""
+    if not API_RATE_LIMIT_ENABLED or request.method == 'OPTIONS':
+        return None
+
+    endpoint = request.url_rule.rule if request.url_rule else request.path
+    result = rate_limiter.check(_rate_limit_identities(), endpoint)
+    request.rate_limit_result = result
+
+    if not result['allowed']:
+        logger.warning(f"Rate limit exceeded for {request.remote_addr} on {endpoint}")
+        response = jsonify({
+            'success': False,
+            'error': 'Rate limit exceeded. Please slow down and try again later.',
+            'retry_after': result['retry_after']
+        })
+        response.status_code = 429
+        return response
+
+    return None
+
+@app.after_request
+def add_rate_limit_headers(response):
+    """Attach rate-limit headers to every charged response"""
+    result = getattr(request, 'rate_limit_result', None)
+    if result and result['cost'] > 0:
+        response.headers.update(rate_limiter.headers(result))
+    return response
+
 # Initialize AI orchestrator (already done above)
 
 @app.route('/')
@@ -142,6 +397,7 @@ def index():
             "cache_stats": "/api/cache/stats",
             "search_cache": "/api/cache/search",
             "health": "/api/health",
+            "metrics": "/api/metrics",
             "session_create": "/api/session/create",
             "session_info": "/api/session/<session_id>",
             "session_delete": "/api/session/<session_id>",
@@ -158,9 +414,17 @@ def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "openai_key": "configured" if openai.api_key else "missing",
-        "ai_orchestrator": "initialized"
+        "ai_orchestrator": "initialized",
+        "llm_circuit": LLM_CIRCUIT.get_stats(),
+        "llm_p95_seconds": LLM_LATENCY.get_stats(),
+        "background_tasks": background_tasks.get_stats() if background_tasks else None
     })
 
+@app.route('/api/metrics')
+def metrics():
+    """Expose latency, token, cache and session metrics in Prometheus text format"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/homework', methods=['POST'])
 def homework_assistance():
     """Enhanced homework assistance endpoint"""
@@ -193,20 +457,51 @@ def guided_learning():
         question = data.get('question', '')
         user_context = data.get('context', {})
         current_level = data.get('current_level', 1)
+        session_id = data.get('session_id')
+        stream = data.get('stream', False)
+        
+        # A session with guided learning in progress remembers the question and level;
+        # sending the question again at level 1 starts over
+        guided = ai_orchestrator.get_guided_state(session_id)
+        if guided and (not question or (question == guided['question'] and current_level > 1)):
+            question = guided['question']
+        else:
+            guided = None
         
         if not question:
             return jsonify({'success': False, 'error': 'Question is required'}), 400
         
-        if current_level > 1:
+        if stream:
+            # One JSON line per hint level, sent as soon as that level has been generated
+            if not guided:
+                session_id = ai_orchestrator.open_guided_session(question, user_context, session_id)
+                guided = ai_orchestrator.get_guided_state(session_id)
+            ladder = ai_orchestrator.guided_solver.get_hint_ladder(question, guided['context'])
+            
+            def generate():
+                try:
+                    for level, hint in ladder.iter_levels(HINT_WAIT_TIMEOUT_SECONDS):
+                        yield json.dumps({'level': level, 'hint': hint}) + '\n'
+                    if ladder.failed:
+                        yield json.dumps({'error': 'Failed to generate hints'}) + '\n'
+                    yield json.dumps({'done': True, 'session_id': session_id}) + '\n'
+                except Exception as e:
+                    logger.error(f"Guided learning streaming error: {str(e)}")
+                    yield json.dumps({'error': 'Failed to generate hints'}) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        if guided or current_level > 1:
             # Get next hint
-            result = ai_orchestrator.get_next_hint(question, current_level - 1, user_context)
+            result = ai_orchestrator.get_next_hint(question, current_level - 1, user_context, session_id)
         else:
             # Start guided learning with level 1
-            user_context['current_level'] = 1
-            result = ai_orchestrator.process_homework_request(question, user_context, "guided")
+            result = ai_orchestrator.start_guided_learning(question, user_context, session_id)
         
         # Ensure consistent response format
         if result.get('success'):
+            if 'hint_content' in result and 'hint' not in result:
+                result['hint'] = result['hint_content']
             if 'hint' in result and 'answer' not in result:
                 result['answer'] = result['hint']  # Map hint to answer for compatibility
             if 'answer' in result:
@@ -234,6 +529,12 @@ def generate_diagram():
             result = ai_orchestrator.diagram_generator.generate_diagram(
                 diagram_type, user_context.get('subject', 'General'), user_context
             )
+            if result.get('success') and result.get('image_data'):
+                ai_orchestrator.after_response(
+                    "cache_diagram", ai_orchestrator.cache_diagram, diagram_type,
+                    user_context.get('subject', 'General'), user_context,
+                    result['image_data'], result.get('metadata', {})
+                )
         else:
             # Process diagram mode
             result = ai_orchestrator.process_homework_request(question, user_context, "diagram")
@@ -314,14 +615,49 @@ def clear_cache():
         logging.error(f"Error clearing cache: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _gzip_stream(lines, chunk_bytes=64 * 1024):
+    """gzip-compress an iterator of text lines into chunks of roughly chunk_bytes"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    buffer = []
+    size = 0
+    for line in lines:
+        encoded = line.encode('utf-8')
+        buffer.append(encoded)
+        size += len(encoded)
+        if size >= chunk_bytes:
+            chunk = compressor.compress(b''.join(buffer))
+            buffer, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
+
 @app.route('/api/cache/export', methods=['POST'])
 def export_cache():
-    """Export cache to file"""
+    """
+    Export cache as line-delimited JSON, to a server file or (download: true) streamed in the response
+    Optional filters: subject, grade, board and since (ISO timestamp, for incremental exports)
+    """
     try:
-        data = request.get_json()
-        export_path = data.get('path', 'cache_export.json')
+        data = request.get_json() or {}
+        filters = {key: data.get(key) for key in ('subject', 'grade', 'board', 'since')}
+        if filters['since']:
+            try:
+                datetime.fromisoformat(filters['since'].replace('Z', '+00:00'))
+            except ValueError:
+                return jsonify({'success': False, 'error': 'since must be an ISO timestamp'}), 400
+        
+        if data.get('download'):
+            compress = bool(data.get('compress', False))
+            lines = ai_orchestrator.offline_cache.iter_export_lines(**filters)
+            filename = 'cache_export.ndjson.gz' if compress else 'cache_export.ndjson'
+            return Response(
+                stream_with_context(_gzip_stream(lines) if compress else lines),
+                mimetype='application/gzip' if compress else 'application/x-ndjson',
+                headers={'Content-Disposition': f'attachment; filename={filename}'}
+            )
         
-        result = ai_orchestrator.export_cache(export_path)
+        export_path = data.get('path', 'cache_export.ndjson')
+        result = ai_orchestrator.export_cache(export_path, compress=data.get('compress'), **filters)
         # Ensure consistent response format
         if result.get('success') and 'answer' in result:
             result['response'] = result['answer']  # Map answer to response for compatibility
@@ -341,7 +677,12 @@ def import_cache():
         if not import_path:
             return jsonify({'success': False, 'error': 'Import path is required'}), 400
         
-        result = ai_orchestrator.import_cache(import_path)
+        result = ai_orchestrator.import_cache(
+            import_path,
+            batch_size=int(data.get('batch_size', CACHE_IMPORT_BATCH_SIZE)),
+            resume=data.get('resume', True),
+            force=data.get('force', False)
+        )
         # Ensure consistent response format
         if result.get('success') and 'answer' in result:
             result['response'] = result['answer']  # Map answer to response for compatibility
@@ -583,6 +924,7 @@ def start_new_chat():
         # Mark this session as a new chat to prevent context bleeding
         if session_id in ai_orchestrator.conversation_sessions:
             ai_orchestrator.conversation_sessions[session_id]['is_new_chat'] = True
+            ai_orchestrator._save_session(session_id)
         
         # If there's an initial message, process it
         if initial_message:
@@ -791,19 +1133,125 @@ def get_question_bank(grade, subject):
             'error': 'Failed to get question bank'
         }), 500
 
+def _gzipped_json_response(compressed, etag=None, immutable=False):
+    """Serve stored gzip JSON as-is to clients that accept gzip, decompressed otherwise"""
+    if etag and etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    
+    if 'gzip' in request.accept_encodings:
+        response = Response(compressed, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(gzip.decompress(compressed), mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if etag:
+        response.headers['ETag'] = f'"{etag}"'
+    if immutable:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/api/offline/bundles/<grade>/<subject>/manifest', methods=['GET'])
+def get_offline_bundle_manifest(grade, subject):
+    """Current offline bundle manifest (gzip JSON), rebuilt first if the question bank changed"""
+    try:
+        board = request.args.get('board', 'CBSE')
+        manifest, compressed = offline_question_bank.bundles.get_compressed_manifest(grade, subject, board)
+        return _gzipped_json_response(compressed, etag=f"{grade}/{subject}/{board}/v{manifest['version']}")
+    except Exception as e:
+        logger.error(f"Error getting offline bundle manifest: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get offline bundle manifest'
+        }), 500
+
+@app.route('/api/offline/bundles/<grade>/<subject>/sync', methods=['POST'])
+def sync_offline_bundle(grade, subject):
+    """Chunks a client must download to move from its bundle version to the current one"""
+    try:
+        data = request.get_json() or {}
+        client_version = data.get('version')
+        have = data.get('have', [])
+        
+        if client_version is not None and not isinstance(client_version, int):
+            return jsonify({'success': False, 'error': 'version must be an integer'}), 400
+        if not isinstance(have, list):
+            return jsonify({'success': False, 'error': 'have must be a list of chunk ids'}), 400
+        
+        result = offline_question_bank.bundles.sync(grade, subject, data.get('board', 'CBSE'), client_version, have)
+        return jsonify({
+            'success': True,
+            **result,
+            'chunk_url': '/api/offline/bundles/chunks/{id}'
+        })
+    except Exception as e:
+        logger.error(f"Error syncing offline bundle: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to sync offline bundle'
+        }), 500
+
+@app.route('/api/offline/bundles/chunks/<chunk_id>', methods=['GET'])
+def get_offline_bundle_chunk(chunk_id):
+    """One content-addressed bundle chunk; never changes, so clients and proxies may cache it forever"""
+    try:
+        compressed = offline_question_bank.bundles.get_chunk(chunk_id)
+        if compressed is None:
+            return jsonify({'success': False, 'error': 'Chunk not found'}), 404
+        return _gzipped_json_response(compressed, etag=chunk_id, immutable=True)
+    except Exception as e:
+        logger.error(f"Error getting offline bundle chunk: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get offline bundle chunk'
+        }), 500
+
 @app.route('/api/offline/bulk-cache', methods=['POST'])
+@require_admin_token
 def bulk_cache_responses():
-    """Bulk cache responses for offline use"""
+    """Start a background job that pre-generates and caches responses for offline use"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         questions_list = data.get('questions', [])
+        resume_job_id = data.get('job_id')
         
-        success = offline_question_bank.cache_responses_bulk(questions_list)
+        if resume_job_id:
+            status = offline_question_bank.resume_bulk_cache_job(resume_job_id)
+            if status is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Job not found'
+                }), 404
+            job_id = resume_job_id
+        else:
+            if not questions_list and data.get('grade') and data.get('subject'):
+                questions_list = offline_question_bank.get_uncached_questions(
+                    data['grade'], data['subject'], data.get('board', 'CBSE')
+                )[:OFFLINE_BULK_CACHE_MAX_QUESTIONS]
+            
+            if not questions_list:
+                return jsonify({
+                    'success': False,
+                    'error': 'Questions or grade and subject are required'
+                }), 400
+            
+            job_id = offline_question_bank.start_bulk_cache_job(questions_list, overwrite=data.get('overwrite', False))
         
         return jsonify({
-            'success': success,
-            'message': f'Successfully cached {len(questions_list)} questions' if success else 'Failed to cache questions'
-        })
+            'success': True,
+            'job_id': job_id,
+            'status_url': f'/api/offline/bulk-cache/{job_id}',
+            'message': 'Bulk caching started'
+        }), 202
+    except BulkCacheBusyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error bulk caching: {str(e)}")
         return jsonify({
@@ -811,6 +1259,30 @@ def bulk_cache_responses():
             'error': 'Failed to bulk cache responses'
         }), 500
 
+@app.route('/api/offline/bulk-cache/<job_id>', methods=['GET'])
+@require_admin_token
+def get_bulk_cache_status(job_id):
+    """Get progress of a bulk caching job"""
+    try:
+        status = offline_question_bank.get_bulk_job_status(job_id)
+        
+        if status is None:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': status
+        })
+    except Exception as e:
+        logger.error(f"Error getting bulk cache status: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get bulk cache status'
+        }), 500
+
 @app.route('/api/offline/popular-questions/<grade>/<subject>', methods=['GET'])
 def get_popular_questions(grade, subject):
     """Get popular questions for a grade and subject"""
@@ -882,105 +1354,102 @@ def get_offline_analytics():
 def voice_input():
     """Process voice input and convert to text, then get AI response"""
     try:
-        # Get the uploaded audio file
-        if 'audio' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'No audio file provided'
-            }), 400
-        
-        audio_file = request.files['audio']
-        if audio_file.filename == '':
-            return jsonify({
-                'success': False,
-                'error': 'No audio file selected'
-            }), 400
+        if request.mimetype in RAW_AUDIO_MIMETYPES:
+            # Raw audio body: decode while the upload is still arriving
+            audio_stream = request.stream
+            form = request.args
+        else:
+            # Get the uploaded audio file (kept in memory by InMemoryUploadRequest)
+            if 'audio' not in request.files:
+                return jsonify({
+                    'success': False,
+                    'error': 'No audio file provided'
+                }), 400
+            
+            audio_file = request.files['audio']
+            if audio_file.filename == '':
+                return jsonify({
+                    'success': False,
+                    'error': 'No audio file selected'
+                }), 400
+            
+            audio_stream = audio_file.stream
+            form = request.form
         
         # Get other form data
-        context = request.form.get('context', '{}')
-        session_id = request.form.get('session_id', None)
-        new_chat = request.form.get('new_chat', 'false').lower() == 'true'
+        context = form.get('context', '{}')
+        session_id = form.get('session_id', None)
+        new_chat = form.get('new_chat', 'false').lower() == 'true'
         
         try:
             context = json.loads(context) if context else {}
         except json.JSONDecodeError:
             context = {}
         
-        # Save the audio file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-            audio_file.save(temp_audio.name)
-            
-            # Initialize speech recognition
-            r = sr.Recognizer()
-            
-            # Convert audio to text
-            with sr.AudioFile(temp_audio.name) as source:
-                audio_data = r.record(source)
-                
-            try:
-                # Use Google Speech Recognition (free)
-                text = r.recognize_google(audio_data)
-                logger.info(f"Voice recognition successful: {text}")
-                
-                # Process the recognized text with AI
-                if new_chat:
-                    # Create new session for voice input
-                    session_id = ai_orchestrator._create_session(
-                        user_id=context.get('user_id'),
-                        user_context=context
-                    )
-                    logger.info(f"Created new session for voice input: {session_id}")
-                elif not session_id:
-                    # Create session if none provided
-                    session_id = ai_orchestrator._create_session(
-                        user_id=context.get('user_id'),
-                        user_context=context
-                    )
-                    logger.info(f"Created session for voice input (no session_id): {session_id}")
-                
-                # Get AI response for the recognized text
-                ai_result = ai_orchestrator.process_homework_request(
-                    text, 
-                    context, 
-                    "comprehensive",
-                    session_id
-                )
-                
-                # Clean up temp file
-                os.unlink(temp_audio.name)
-                
-                if ai_result.get('success'):
-                    return jsonify({
-                        'success': True,
-                        'text': text,
-                        'ai_response': {
-                            'response': ai_result.get('answer', ai_result.get('response', '')),
-                            'session_id': session_id
-                        },
-                        'session_id': session_id,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                else:
-                    return jsonify({
-                        'success': False,
-                        'error': 'Failed to get AI response',
-                        'text': text
-                    })
-                
-            except sr.UnknownValueError:
-                # Clean up temp file
-                os.unlink(temp_audio.name)
-                return jsonify({
-                    'success': False,
-                    'error': 'Could not understand audio'
-                })
-            except sr.RequestError as e:
-                # Clean up temp file
-                os.unlink(temp_audio.name)
-                return jsonify({
-                    'success': False,
-                    'error': f'Speech recognition service error: {str(e)}'
-                })
+        try:
+            transcription = voice_transcriber.transcribe_stream(audio_stream)
+        except sr.UnknownValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Could not understand audio'
+            })
+        except sr.RequestError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Speech recognition service error: {str(e)}'
+            })
+        except AudioDecodeError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported or corrupt audio: {str(e)}'
+            }), 400
+        
+        text = transcription['text']
+        # The transcript is student speech: keep it out of the logs
+        logger.info(f"Voice recognition successful ({transcription['chunks']} chunks, "
+                    f"{transcription['duration_seconds']}s, {transcription['backend']}, {len(text)} characters)")
+        
+        # Process the recognized text with AI
+        if new_chat:
+            # Create new session for voice input
+            session_id = ai_orchestrator._create_session(
+                user_id=context.get('user_id'),
+                user_context=context
+            )
+            logger.info(f"Created new session for voice input: {session_id}")
+        elif not session_id:
+            # Create session if none provided
+            session_id = ai_orchestrator._create_session(
+                user_id=context.get('user_id'),
+                user_context=context
+            )
+            logger.info(f"Created session for voice input (no session_id): {session_id}")
+        
+        # Get AI response for the recognized text
+        ai_result = ai_orchestrator.process_homework_request(
+            text, 
+            context, 
+            "comprehensive",
+            session_id
+        )
+        
+        if ai_result.get('success'):
+            return jsonify({
+                'success': True,
+                'text': text,
+                'ai_response': {
+                    'response': ai_result.get('answer', ai_result.get('response', '')),
+                    'session_id': session_id
+                },
+                'session_id': session_id,
+                'timestamp': datetime.now().isoformat()
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to get AI response',
+                'text': text
+            })
                 
     except Exception as e:
         logger.error(f"Voice input error: {str(e)}")
@@ -993,23 +1462,77 @@ def voice_input():
 # Voice Output Endpoint (Text to Speech)
 @app.route('/api/voice-output', methods=['POST'])
 def voice_output():
-    """Convert text to speech"""
+    """Convert text to speech, sentence by sentence"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({
+            'success': False,
+            'error': 'A JSON object body is required'
+        }), 400
+    
+    try:
+        speed = float(data.get('speed', 1.0))
+    except (TypeError, ValueError):
+        speed = None
+    if speed is None or not VOICE_MIN_SPEED <= speed <= VOICE_MAX_SPEED:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid speed value (must be between {VOICE_MIN_SPEED} and {VOICE_MAX_SPEED})'
+        }), 400
+    
     try:
-        data = request.get_json()
         text = data.get('text', '')
+        voice = data.get('voice') or VOICE_DEFAULT_VOICE
+        stream = bool(data.get('stream', False))
         
-        if not text:
+        if not text or not isinstance(text, str):
             return jsonify({
                 'success': False,
                 'error': 'Text is required'
             }), 400
         
-        # For now, return success without actual TTS implementation
-        # This can be implemented later with libraries like gTTS or Azure Speech
+        if len(text) > VOICE_MAX_TEXT_CHARS:
+            return jsonify({
+                'success': False,
+                'error': f'Text is too long (max {VOICE_MAX_TEXT_CHARS} characters)'
+            }), 400
+        
+        segments = text_to_speech.iter_segments(text, voice=voice, speed=speed)
+        
+        if stream:
+            # One JSON line per sentence, sent as soon as that sentence is synthesized
+            def generate():
+                try:
+                    for segment in segments:
+                        yield json.dumps({
+                            'index': segment['index'],
+                            'text': segment['text'],
+                            'audio': base64.b64encode(segment['audio']).decode('ascii'),
+                            'cached': segment['cached']
+                        }) + '\n'
+                    yield json.dumps({'done': True}) + '\n'
+                except Exception as e:
+                    logger.error(f"Voice output streaming error: {str(e)}")
+                    yield json.dumps({'error': 'Failed to generate speech'}) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                            headers={'X-Audio-Mimetype': text_to_speech.mimetype})
+        
+        audio_segments = [{
+            'index': segment['index'],
+            'text': segment['text'],
+            'audio': base64.b64encode(segment['audio']).decode('ascii'),
+            'cached': segment['cached']
+        } for segment in segments]
+        
         return jsonify({
             'success': True,
-            'message': 'Text-to-speech endpoint available but not implemented',
-            'text': text
+            'text': text,
+            'voice': voice,
+            'speed': speed,
+            'mimetype': text_to_speech.mimetype,
+            'segments': audio_segments,
+            'cached_segments': sum(1 for segment in audio_segments if segment['cached'])
         })
         
     except Exception as e:
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stand-in server for offline benchmarking
+Serves /v1/chat/completions with canned completions and configurable latency
+"""
+
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Canned completions, picked by the first marker found in the prompt
+DEFAULT_COMPLETIONS = [
+    {
+        "marker": '"question_type"',
+        "content": json.dumps({
+            "question_type": "conceptual",
+            "subject": "Science",
+            "complexity": "intermediate",
+            "topics": ["photosynthesis", "plants"],
+            "skills_required": ["understanding", "explanation"],
+            "response_style": "explanatory",
+            "confidence": 0.9
+        })
+    },
+    {
+        "marker": '"is_followup"',
+        "content": json.dumps({
+            "is_followup": False,
+            "related_topic": None,
+            "continuity_level": "new"
+        })
+    },
+    {
+        "marker": '"detected_board"',
+        "content": json.dumps({
+            "board": "CBSE",
+            "grade": "8",
+            "subject": "Mathematics",
+            "topic": "Linear Equations",
+            "confidence": 0.85
+        })
+    },
+    {
+        "marker": "concise, accurate summaries",
+        "content": "The student is in Class 8 (CBSE) and has been asking about photosynthesis and linear equations."
+    },
+    {
+        "marker": "",
+        "content": (
+            "**Step 1: Understand the question**\n"
+            "We need to find the value of x in the equation 2x + 5 = 13.\n\n"
+            "**Step 2: Subtract 5 from both sides**\n"
+            "2x + 5 - 5 = 13 - 5, so 2x = 8.\n\n"
+            "**Step 3: Divide both sides by 2**\n"
+            "x = 8 / 2 = 4.\n\n"
+            "**Example:** If Riya buys 2 notebooks for the same price and pays $5 for a pen, "
+            "spending $13 in total, each notebook costs $4.\n\n"
+            "**Answer:** x = 4"
+        )
+    }
+]
+
+
+class LatencyModel:
+    """
+    Samples artificial response latency in seconds
+    Spec formats: fixed:0.05, uniform:0.02,0.2, normal:0.1,0.02, lognormal:0.08,0.5 (median, sigma)
+    """
+
+    def __init__(self, spec: str = "lognormal:0.05,0.4"):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return random.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(0.0, random.gauss(self.params[0], self.params[1]))
+        # lognormal parameterised by median and sigma
+        return random.lognormvariate(math.log(self.params[0]), self.params[1])
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server that mimics the OpenAI chat-completions API
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "lognormal:0.05,0.4",
+                 completions: Optional[List[Dict[str, str]]] = None, stream_chunk_delay: float = 0.0):
+        self.latency = LatencyModel(latency)
+        self.completions = completions or DEFAULT_COMPLETIONS
+        self.stream_chunk_delay = stream_chunk_delay
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+                    return
+
+                with server._lock:
+                    server.request_count += 1
+
+                time.sleep(server.latency.sample())
+                content, prompt_tokens = server.pick_completion(body.get("messages", []))
+
+                if body.get("stream"):
+                    self._send_stream(body, content)
+                else:
+                    self._send_json(200, server.build_completion(body, content, prompt_tokens))
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, body: Dict[str, Any], content: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+                words = content.split(" ")
+                for index, word in enumerate(words):
+                    piece = word if index == 0 else " " + word
+                    self._write_chunk(server.build_stream_chunk(body, completion_id, {"content": piece}, None))
+                    if server.stream_chunk_delay:
+                        time.sleep(server.stream_chunk_delay)
+                self._write_chunk(server.build_stream_chunk(body, completion_id, {}, "stop"))
+                self._write_raw(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, payload: Dict[str, Any]):
+                self._write_raw(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+            def _write_raw(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def pick_completion(self, messages: List[Dict[str, Any]]) -> Tuple[str, int]:
+        """Choose the canned completion whose marker appears in the prompt"""
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        for completion in self.completions:
+            if completion["marker"] in prompt:
+                return completion["content"], _estimate_tokens(prompt)
+        return self.completions[-1]["content"], _estimate_tokens(prompt)
+
+    def build_completion(self, body: Dict[str, Any], content: str, prompt_tokens: int) -> Dict[str, Any]:
+        completion_tokens = _estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def build_stream_chunk(self, body: Dict[str, Any], completion_id: str, delta: Dict[str, Any],
+                           finish_reason: Optional[str]) -> Dict[str, Any]:
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    def start(self) -> "FakeOpenAIServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def load_completions(path: str) -> List[Dict[str, str]]:
+    """Load canned completions from a JSON list of {"marker", "content"} objects"""
+    with open(path, "r", encoding="utf-8") as f:
+        completions = json.load(f)
+    # Always keep a catch-all so every prompt gets an answer
+    if not any(c.get("marker") == "" for c in completions):
+        completions.append(DEFAULT_COMPLETIONS[-1])
+    return completions
+
+
+def main():
+    """Run the stand-in server in the foreground"""
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="lognormal:0.05,0.4",
+                        help="fixed:S | uniform:MIN,MAX | normal:MEAN,STD | lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--completions", help="JSON file with canned completions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    completions = load_completions(args.completions) if args.completions else None
+    server = FakeOpenAIServer(args.host, args.port, args.latency, completions)
+    logger.info(f"Fake OpenAI server listening on {server.base_url} (latency {args.latency})")
+    logger.info(f"Point the app at it with: OPENAI_BASE_URL={server.base_url}")
+
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping fake OpenAI server")
+        server.httpd.server_close()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Offline Load Benchmark for Skillomate AI
+Starts the Flask app against a local fake OpenAI server, drives concurrent mixed traffic
+and reports throughput and p50/p95/p99 latency per endpoint, compared against a stored baseline
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Dict, List, Any, Optional
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baselines", "load_baseline.json")
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fake_openai_server import FakeOpenAIServer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("load_benchmark")
+
+CONTEXTS = [
+    {"grade": "6", "board": "CBSE", "subject": "Mathematics"},
+    {"grade": "8", "board": "ICSE", "subject": "Science"},
+    {"grade": "10", "board": "CBSE", "subject": "Mathematics"},
+    {"grade": "7", "board": "State", "subject": "Social Studies"},
+    {"grade": "9", "board": "CBSE", "subject": "English"}
+]
+
+CHAT_QUESTIONS = [
+    "What is photosynthesis?",
+    "Solve 2x + 5 = 13",
+    "Explain Newton's first law of motion with an example",
+    "Who was the first Prime Minister of India?",
+    "How do I find the area of a triangle with base 6 cm and height 4 cm?",
+    "What is the difference between a noun and a pronoun?",
+    "Can you explain that step again?",
+    "Why is the sky blue?"
+]
+
+GUIDED_QUESTIONS = [
+    "Solve: 3x - 7 = 11",
+    "Find the perimeter of a rectangle with length 8 cm and width 5 cm",
+    "Balance the equation H2 + O2 -> H2O"
+]
+
+DIAGRAM_TYPES = ["triangle", "circle", "bar_chart", "pie_chart"]
+
+SEARCH_QUERIES = ["triangle", "equation", "photosynthesis", "area", "force", "India"]
+
+
+class LoadBenchmark:
+    """
+    Runs the app in-process against the fake OpenAI server and measures mixed traffic
+    """
+
+    def __init__(self, concurrency: int = 8, duration: float = 20.0, warmup: float = 2.0,
+                 latency: str = "lognormal:0.05,0.4", seed: int = 42,
+                 mix: Optional[Dict[str, int]] = None, keep_workdir: bool = False):
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.latency = latency
+        self.seed = seed
+        self.mix = mix or {"chat": 4, "guided_learning": 2, "diagram": 2, "offline_search": 2}
+        self.keep_workdir = keep_workdir
+
+        self.fake_openai = None
+        self.app_server = None
+        self.base_url = None
+        self.workdir = None
+        self.original_cwd = os.getcwd()
+
+        self.samples = {name: [] for name in self.mix}  # scenario -> list of (latency_seconds, ok)
+        self._samples_lock = threading.Lock()
+
+    def _scenarios(self) -> Dict[str, Any]:
+        """Request builders for each traffic type"""
+        return {
+            "chat": self._chat_request,
+            "guided_learning": self._guided_request,
+            "diagram": self._diagram_request,
+            "offline_search": self._search_request
+        }
+
+    def _chat_request(self, http: requests.Session, rng: random.Random, state: Dict[str, Any]) -> requests.Response:
+        payload = {
+            "message": rng.choice(CHAT_QUESTIONS),
+            "context": state["context"]
+        }
+        if state.get("session_id"):
+            payload["session_id"] = state["session_id"]
+
+        response = http.post(f"{self.base_url}/api/chat", json=payload, timeout=60)
+        if response.ok:
+            state["session_id"] = response.json().get("session_id")
+        return response
+
+    def _guided_request(self, http: requests.Session, rng: random.Random, state: Dict[str, Any]) -> requests.Response:
+        payload = {
+            "question": rng.choice(GUIDED_QUESTIONS),
+            "context": dict(state["context"]),
+            "current_level": rng.randint(1, 4)
+        }
+        return http.post(f"{self.base_url}/api/guided-learning", json=payload, timeout=60)
+
+    def _diagram_request(self, http: requests.Session, rng: random.Random, state: Dict[str, Any]) -> requests.Response:
+        diagram_type = rng.choice(DIAGRAM_TYPES)
+        payload = {
+            "question": f"Draw a {diagram_type.replace('_', ' ')}",
+            "diagram_type": diagram_type,
+            "context": {**state["context"], "subject": "Mathematics"}
+        }
+        return http.post(f"{self.base_url}/api/diagram", json=payload, timeout=60)
+
+    def _search_request(self, http: requests.Session, rng: random.Random, state: Dict[str, Any]) -> requests.Response:
+        params = {
+            "q": rng.choice(SEARCH_QUERIES),
+            "grade": state["context"]["grade"],
+            "subject": state["context"]["subject"]
+        }
+        return http.get(f"{self.base_url}/api/offline/search", params=params, timeout=60)
+
+    def start(self):
+        """Start the fake OpenAI server and the app in a scratch working directory"""
+        self.fake_openai = FakeOpenAIServer(latency=self.latency).start()
+        logger.info(f"Fake OpenAI server on {self.fake_openai.base_url} (latency {self.latency})")
+
+        # The app writes caches and SQLite files relative to the cwd; keep the checkout clean
+        self.workdir = tempfile.mkdtemp(prefix="skillomate_bench_")
+        shutil.copytree(os.path.join(APP_DIR, "data"), os.path.join(self.workdir, "data"))
+        os.chdir(self.workdir)
+
+        os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+        os.environ["OPENAI_BASE_URL"] = self.fake_openai.base_url
+        os.environ["API_RATE_LIMIT_ENABLED"] = "False"
+
+        from werkzeug.serving import make_server
+        import app as skillomate_app
+
+        # App and agents log every request at INFO; keep the benchmark output readable
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        logger.setLevel(logging.INFO)
+
+        self.app_server = make_server("127.0.0.1", 0, skillomate_app.app, threaded=True)
+        threading.Thread(target=self.app_server.serve_forever, name="skillomate-app", daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.app_server.server_port}"
+        logger.info(f"App serving on {self.base_url} (workdir {self.workdir})")
+
+    def stop(self):
+        """Shut down both servers and remove the scratch directory"""
+        if self.app_server:
+            self.app_server.shutdown()
+        if self.fake_openai:
+            self.fake_openai.stop()
+        os.chdir(self.original_cwd)
+        if self.workdir and not self.keep_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _worker(self, worker_id: int, deadline: float, record_after: float):
+        """Send weighted random requests until the deadline"""
+        rng = random.Random(self.seed + worker_id)
+        scenarios = self._scenarios()
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        state = {"context": CONTEXTS[worker_id % len(CONTEXTS)], "session_id": None}
+
+        with requests.Session() as http:
+            while time.time() < deadline:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    ok = _is_success(scenarios[name](http, rng, state))
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - start
+
+                if time.time() >= record_after:
+                    with self._samples_lock:
+                        self.samples[name].append((elapsed, ok))
+
+    def run(self) -> Dict[str, Any]:
+        """Drive traffic for warmup + duration seconds and summarize the measured window"""
+        logger.info(f"Running {self.concurrency} workers for {self.duration}s (+{self.warmup}s warmup), mix {self.mix}")
+        started = time.time()
+        record_after = started + self.warmup
+        deadline = record_after + self.duration
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for worker_id in range(self.concurrency):
+                pool.submit(self._worker, worker_id, deadline, record_after)
+
+        measured_seconds = time.time() - record_after
+        return self._summarize(measured_seconds)
+
+    def _summarize(self, measured_seconds: float) -> Dict[str, Any]:
+        endpoints = {}
+        total_requests = 0
+        total_errors = 0
+
+        for name, samples in self.samples.items():
+            latencies = sorted(latency for latency, _ in samples)
+            errors = sum(1 for _, ok in samples if not ok)
+            total_requests += len(samples)
+            total_errors += errors
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+                "throughput_rps": round(len(samples) / measured_seconds, 3),
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+                "p50_ms": _percentile_ms(latencies, 50),
+                "p95_ms": _percentile_ms(latencies, 95),
+                "p99_ms": _percentile_ms(latencies, 99)
+            }
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "concurrency": self.concurrency,
+                "duration_seconds": self.duration,
+                "warmup_seconds": self.warmup,
+                "latency": self.latency,
+                "mix": self.mix,
+                "seed": self.seed
+            },
+            "total_requests": total_requests,
+            "total_errors": total_errors,
+            "measured_seconds": round(measured_seconds, 3),
+            "throughput_rps": round(total_requests / measured_seconds, 3),
+            "llm_calls": self.fake_openai.request_count,
+            "endpoints": endpoints
+        }
+
+
+def _is_success(response: requests.Response) -> bool:
+    """A request succeeds when it returns 2xx and the body does not report success: false"""
+    if not response.ok:
+        return False
+    try:
+        return response.json().get("success", True) is not False
+    except ValueError:
+        return False
+
+
+def _percentile_ms(sorted_values: List[float], percentile: float) -> Optional[float]:
+    """Linear-interpolated percentile of sorted seconds, in milliseconds"""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * percentile / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    value = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+    return round(value * 1000, 2)
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                          slack_ms: float = 50.0, min_samples_p99: int = 200) -> List[str]:
+    """
+    List regressions of results against a baseline run
+    Latency regresses when it exceeds the baseline by more than `tolerance` and by more than `slack_ms`;
+    p99 is only checked once there are enough samples for it to be meaningful.
+    """
+    regressions = []
+
+    if results["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(
+            f"overall throughput {results['throughput_rps']} rps < baseline {baseline['throughput_rps']} rps"
+        )
+
+    for name, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous or not current["requests"]:
+            continue
+
+        keys = ["p50_ms", "p95_ms"]
+        if current["requests"] >= min_samples_p99:
+            keys.append("p99_ms")
+
+        for key in keys:
+            if previous.get(key) and current[key] > max(previous[key] * (1 + tolerance), previous[key] + slack_ms):
+                regressions.append(f"{name} {key} {current[key]} > baseline {previous[key]}")
+
+        if current["error_rate"] > previous.get("error_rate", 0) + 0.01:
+            regressions.append(f"{name} error_rate {current['error_rate']} > baseline {previous.get('error_rate', 0)}")
+
+    return regressions
+
+
+def _print_report(results: Dict[str, Any]):
+    logger.info("=" * 78)
+    logger.info(f"{'endpoint':<18}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in results["endpoints"].items():
+        logger.info(
+            f"{name:<18}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10}"
+            f"{str(stats['p50_ms']):>10}{str(stats['p95_ms']):>10}{str(stats['p99_ms']):>10}"
+        )
+    logger.info(f"Total: {results['total_requests']} requests, {results['total_errors']} errors, "
+                f"{results['throughput_rps']} rps, {results['llm_calls']} LLM calls")
+    logger.info("=" * 78)
+
+
+def main():
+    """Run the load benchmark"""
+    parser = argparse.ArgumentParser(description="Skillomate AI Offline Load Benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client workers")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds of traffic")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured warmup seconds")
+    parser.add_argument("--latency", default="lognormal:0.05,0.4", help="Fake OpenAI latency distribution")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative regression (0.5 = 50%%)")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="Latency increase always tolerated, in ms")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load_results_<timestamp>.json)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the scratch directory for inspection")
+    args = parser.parse_args()
+
+    benchmark = LoadBenchmark(
+        concurrency=args.concurrency, duration=args.duration, warmup=args.warmup,
+        latency=args.latency, seed=args.seed, keep_workdir=args.keep_workdir
+    )
+
+    try:
+        benchmark.start()
+        results = benchmark.run()
+    finally:
+        benchmark.stop()
+
+    _print_report(results)
+
+    regressions = []
+    compared = False
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance, args.slack_ms)
+        results["baseline"] = os.path.relpath(args.baseline, APP_DIR)
+        compared = True
+    results["regressions"] = regressions
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"load_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"📄 Results saved to {output}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"📌 Baseline updated: {args.baseline}")
+        sys.exit(0)
+
+    if regressions:
+        for regression in regressions:
+            logger.error(f"❌ Regression: {regression}")
+        sys.exit(1)
+
+    if results["total_requests"] == 0:
+        logger.error("❌ No requests completed")
+        sys.exit(1)
+
+    if compared:
+        logger.info("✅ No regressions against baseline")
+    else:
+        logger.info(f"⚠️  No baseline at {args.baseline}; run with --update-baseline to create one")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the pure-Python hot paths of Skillomate AI
+Reports ops/sec and memory allocated per call over realistic answer corpora
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from typing import Dict, List, Any, Callable, Optional
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+sys.path.insert(0, APP_DIR)
+
+# Agents refuse to construct without a key; nothing here calls the API
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("micro_benchmark")
+logger.setLevel(logging.INFO)
+
+SUBJECTS = ["Mathematics", "Science", "Social Studies", "English"]
+BOARDS = ["CBSE", "ICSE", "IB", "State"]
+GRADES = ["Class 5", "Class 8", "Class 10", "Class 12"]
+
+SHORT_ANSWERS = {
+    "Mathematics": "2x + 5 = 13, so 2x = 8 and x = 4. If John pays $5 for a pen, the change from $20 is $15.",
+    "Science": "Photosynthesis is the process by which green plants make food using sunlight, water and carbon dioxide.",
+    "Social Studies": "The Nile is the longest river in the world. Mary visited New York to learn about the history of the city.",
+    "English": "A noun names a person, place or thing. A pronoun replaces a noun, for example 'he' instead of 'David'."
+}
+
+LONG_ANSWER_PARAGRAPHS = {
+    "Mathematics": [
+        "**Given:** A rectangle has length 12 cm and breadth 8 cm. John wants to fence a garden of this shape.",
+        "**To Find:** The area and the perimeter of the rectangle, and the cost of fencing at $5 per cm.",
+        "**Step 1:** Area = length × breadth = 12 × 8 = 96 cm².",
+        "**Step 2:** Perimeter = 2 × (length + breadth) = 2 × (12 + 8) = 40 cm.",
+        "**Step 3:** Cost of fencing = 40 × $5 = $200. If Mary pays with 10 dollars notes she needs 20 notes.",
+        "Therefore, the area is 96 cm² and the perimeter is 40 cm. The garden is 3 miles from the school.",
+        "**Answer:** Area = 96 cm², Perimeter = 40 cm, Cost = $200."
+    ],
+    "Science": [
+        "**Concept:** Photosynthesis is the process by which green plants prepare their own food.",
+        "**Explanation:** Chlorophyll in the leaves absorbs sunlight. Water from the soil and carbon dioxide from the air combine to form glucose, and oxygen is released.",
+        "6CO2 + 6H2O → C6H12O6 + 6O2",
+        "**Example:** A farmer named Peter in Texas noticed that plants kept in the dark turned yellow.",
+        "**Applications:** Understanding photosynthesis helps farmers improve crop yield and helps scientists study climate change.",
+        "The temperature was 95 degrees and the plant grew 4 inches in a week."
+    ],
+    "Social Studies": [
+        "**Background:** The Industrial Revolution began in Britain in the 18th century.",
+        "**Key Points:** New machines changed the way goods were produced. Factories grew in cities like London and Manchester.",
+        "**Analysis:** Workers such as Thomas and Sarah moved from villages to cities in search of jobs.",
+        "**Significance:** The revolution spread to Europe and America and changed trade across the world, including the Mississippi river ports.",
+        "Historians like David Smith argue that it laid the foundation of the modern economy."
+    ],
+    "English": [
+        "**Analysis:** The poem describes a journey through a snowy forest.",
+        "**Explanation:** The poet uses imagery and rhyme to create a calm mood. The repetition in the last stanza shows determination.",
+        "**Examples:** 'The woods are lovely, dark and deep' uses alliteration. Robert reads it aloud to Jennifer.",
+        "**Conclusion:** The poem teaches that duties must come before rest."
+    ]
+}
+
+QUESTIONS = [
+    "What is photosynthesis?",
+    "Solve 2x + 5 = 13 step by step",
+    "Explain Newton's laws of motion with examples",
+    "Who was the first Prime Minister of India and why is he important?",
+    "Calculate the area of a triangle with base 6 cm and height 4 cm",
+    "What is the difference between a noun and a pronoun?",
+    "Describe the causes of the French Revolution and analyze its impact",
+    "hello",
+    "Can you compare mitosis and meiosis in detail?",
+    "Find the value of x if 3x - 7 = 11 and verify your answer"
+]
+
+
+def build_answer_corpus() -> List[Dict[str, str]]:
+    """Short and long answers across subjects, boards and grades"""
+    corpus = []
+    for index, subject in enumerate(SUBJECTS):
+        long_answer = "\n\n".join(LONG_ANSWER_PARAGRAPHS[subject])
+        for board_index, board in enumerate(BOARDS):
+            grade = GRADES[(index + board_index) % len(GRADES)]
+            corpus.append({"subject": subject, "board": board, "grade": grade, "size": "short",
+                           "answer": SHORT_ANSWERS[subject]})
+            corpus.append({"subject": subject, "board": board, "grade": grade, "size": "long",
+                           "answer": long_answer})
+            # Very long answers (about 4 KB), like a detailed multi-part response
+            corpus.append({"subject": subject, "board": board, "grade": grade, "size": "xlong",
+                           "answer": "\n\n".join([long_answer] * 4)})
+    return corpus
+
+
+class MicroBenchmark:
+    """
+    Times a callable over a list of cases and measures allocations per call
+    """
+
+    def __init__(self, min_time: float = 1.0, alloc_calls: int = 50):
+        self.min_time = min_time
+        self.alloc_calls = alloc_calls
+        self.results = []
+
+    def run(self, name: str, func: Callable[[Any], Any], cases: List[Any]) -> Dict[str, Any]:
+        """Call func over cases (cycling) for at least min_time seconds"""
+        # Warm up caches, lazy imports and compiled regexes
+        for case in cases:
+            func(case)
+
+        gc.collect()
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < self.min_time:
+            for case in cases:
+                func(case)
+            calls += len(cases)
+            elapsed = time.perf_counter() - start
+
+        alloc_bytes, alloc_blocks = self._measure_allocations(func, cases)
+
+        result = {
+            "name": name,
+            "cases": len(cases),
+            "calls": calls,
+            "ops_per_sec": round(calls / elapsed, 2),
+            "us_per_call": round(elapsed / calls * 1e6, 2),
+            "alloc_peak_bytes_per_call": alloc_bytes,
+            "alloc_net_blocks_per_call": alloc_blocks
+        }
+        self.results.append(result)
+        logger.info(
+            f"{name:<42}{result['ops_per_sec']:>14,.1f}{result['us_per_call']:>14,.1f}"
+            f"{alloc_bytes:>14,}{alloc_blocks:>12,}"
+        )
+        return result
+
+    def _measure_allocations(self, func: Callable[[Any], Any], cases: List[Any]):
+        """
+        Average memory allocated per call: peak traced bytes above the starting point,
+        and memory blocks still alive after the call (caches, leaks)
+        """
+        calls = min(self.alloc_calls, max(len(cases), 1) * 5)
+        total_bytes = 0
+        total_blocks = 0
+
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            for index in range(calls):
+                case = cases[index % len(cases)]
+                before = tracemalloc.take_snapshot().filter_traces(ignore)
+                tracemalloc.reset_peak()
+                before_current, _ = tracemalloc.get_traced_memory()
+                func(case)
+                _, peak = tracemalloc.get_traced_memory()
+                after = tracemalloc.take_snapshot().filter_traces(ignore)
+
+                total_bytes += max(0, peak - before_current)
+                total_blocks += sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        finally:
+            tracemalloc.stop()
+
+        return total_bytes // calls, round(total_blocks / calls, 1)
+
+
+def build_benchmarks(workdir: str) -> Dict[str, Callable[[MicroBenchmark], None]]:
+    """Register the benchmarks; each runs against the shared corpora"""
+    from core.india_context_enhancer import IndiaContextEnhancer
+    from core.board_templates import BoardSpecificTemplates
+    from core.response_formatter import TeacherApprovedFormatter
+    from agents.enhanced_question_analyzer import EnhancedQuestionAnalyzer
+    from agents.conversation_context_manager import ConversationContextManager
+    from agents.offline_cache import OfflineCacheAgent
+    from agents.formatter_agent import FormatterAgent
+
+    corpus = build_answer_corpus()
+    by_size = {size: [c for c in corpus if c["size"] == size] for size in ("short", "long", "xlong")}
+
+    india_enhancer = IndiaContextEnhancer()
+    board_templates = BoardSpecificTemplates()
+    formatter = TeacherApprovedFormatter()
+    analyzer = EnhancedQuestionAnalyzer()
+    context_manager = ConversationContextManager()
+    cache = OfflineCacheAgent(cache_dir=os.path.join(workdir, "cache"))
+    formatter_agent = FormatterAgent()
+
+    def india_context(size):
+        return lambda bench: bench.run(
+            f"india_context.enhance[{size}]",
+            lambda c: india_enhancer.enhance_with_indian_context(c["answer"], c["subject"], "general", c["grade"], c["board"]),
+            by_size[size]
+        )
+
+    def board_template(size):
+        return lambda bench: bench.run(
+            f"board_templates.apply[{size}]",
+            lambda c: board_templates.apply_board_template(c["answer"], c["board"], c["subject"], "general"),
+            by_size[size]
+        )
+
+    def response_formatter(size):
+        return lambda bench: bench.run(
+            f"response_formatter.format[{size}]",
+            lambda c: formatter.format_response(c["answer"], c["subject"], c["grade"], "general", c["board"]),
+            by_size[size]
+        )
+
+    def formatter_agent_local(size):
+        # Uncached: format_answer remembers its output, this measures the rule-based pass itself
+        return lambda bench: bench.run(
+            f"formatter_agent.format_locally[{size}]",
+            lambda c: formatter_agent._format_locally(
+                c["answer"], formatter_agent.formatting_templates.get(c["subject"].lower(), formatter_agent.formatting_templates["general"])
+            ),
+            by_size[size]
+        )
+
+    def analyze_patterns(bench):
+        bench.run("question_analyzer._analyze_patterns", analyzer._analyze_patterns, QUESTIONS)
+
+    def detect_subject(bench):
+        bench.run("context_manager.detect_subject", context_manager.detect_subject_from_question, QUESTIONS)
+
+    def nlu_extract(bench):
+        # Uncached: the agents share memoized results, this measures the one pass itself
+        from core.nlu import extract_features
+        bench.run("nlu.extract_features", extract_features, QUESTIONS)
+
+    def cache_write(bench):
+        contexts = [{"subject": c["subject"], "grade": c["grade"], "board": c["board"]} for c in by_size["long"]]
+        cases = [(f"{q} ({i})", corpus[i % len(corpus)]["answer"], contexts[i % len(contexts)])
+                 for i, q in enumerate(QUESTIONS * 3)]
+        bench.run("offline_cache.cache_qa", lambda c: cache.cache_qa(*c), cases)
+
+    def cache_read_hit(bench):
+        cases = [f"{q} ({i})" for i, q in enumerate(QUESTIONS * 3)]
+        bench.run("offline_cache.retrieve_qa[hit]", cache.retrieve_qa, cases)
+
+    def cache_read_miss(bench):
+        cases = [f"uncached question {i}" for i in range(20)]
+        bench.run("offline_cache.retrieve_qa[miss]", cache.retrieve_qa, cases)
+
+    def diagram_render(bench):
+        from diagrams.advanced_diagram_generator import EducationalDiagramGenerator
+        generator = EducationalDiagramGenerator()
+        cases = [(t, {"subject": "Mathematics", "grade": "Class 8", "board": "CBSE"})
+                 for t in ("triangle", "circle", "bar_chart", "pie_chart")]
+        bench.run("diagram.educational.generate", lambda c: generator.generate_diagram(*c), cases)
+
+    def diagram_agent_render(bench):
+        from agents.diagram_generator import DiagramGeneratorAgent
+        agent = DiagramGeneratorAgent()
+        cases = [(t, "Mathematics", {"grade": "8", "board": "CBSE"}) for t in ("triangle", "circle", "bar_chart")]
+        bench.run("diagram.agent.generate", lambda c: agent.generate_diagram(*c), cases)
+
+    benchmarks = {}
+    for size in ("short", "long", "xlong"):
+        benchmarks[f"india_context_{size}"] = india_context(size)
+        benchmarks[f"board_templates_{size}"] = board_template(size)
+        benchmarks[f"response_formatter_{size}"] = response_formatter(size)
+        benchmarks[f"formatter_agent_{size}"] = formatter_agent_local(size)
+    benchmarks.update({
+        "analyze_patterns": analyze_patterns,
+        "detect_subject": detect_subject,
+        "nlu_extract": nlu_extract,
+        "cache_write": cache_write,
+        "cache_read_hit": cache_read_hit,
+        "cache_read_miss": cache_read_miss,
+        "diagram_render": diagram_render,
+        "diagram_agent_render": diagram_agent_render
+    })
+    return benchmarks
+
+
+def _print_comparison(results: List[Dict[str, Any]], previous_path: str):
+    """Show speed-up against a previous results file"""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = {r["name"]: r for r in json.load(f)["benchmarks"]}
+
+    logger.info("=" * 78)
+    logger.info(f"{'benchmark':<42}{'before ops/s':>14}{'after ops/s':>14}{'speed-up':>8}")
+    for result in results:
+        before = previous.get(result["name"])
+        if before:
+            ratio = result["ops_per_sec"] / before["ops_per_sec"] if before["ops_per_sec"] else float("inf")
+            logger.info(f"{result['name']:<42}{before['ops_per_sec']:>14,.1f}{result['ops_per_sec']:>14,.1f}{ratio:>7.2f}x")
+
+
+def main():
+    """Run the micro-benchmark suite"""
+    parser = argparse.ArgumentParser(description="Skillomate AI Micro-Benchmarks")
+    parser.add_argument("--filter", help="Only run benchmarks whose key contains this text")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds to time each benchmark")
+    parser.add_argument("--alloc-calls", type=int, default=50, help="Calls traced for allocation counts")
+    parser.add_argument("--list", action="store_true", help="List benchmark keys and exit")
+    parser.add_argument("--compare", help="Previous results file to compare ops/sec against")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/micro_results_<timestamp>.json)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="skillomate_micro_")
+    try:
+        benchmarks = build_benchmarks(workdir)
+        if args.list:
+            for key in benchmarks:
+                print(key)
+            return
+
+        selected = {k: v for k, v in benchmarks.items() if not args.filter or args.filter in k}
+        bench = MicroBenchmark(min_time=args.min_time, alloc_calls=args.alloc_calls)
+
+        logger.info(f"{'benchmark':<42}{'ops/sec':>14}{'us/call':>14}{'peak B/call':>14}{'net blocks':>12}")
+        for run in selected.values():
+            run(bench)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "min_time": args.min_time,
+        "benchmarks": bench.results
+    }
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"micro_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"📄 Results saved to {output}")
+
+    if args.compare:
+        _print_comparison(bench.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
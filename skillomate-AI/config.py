@@ -12,20 +12,141 @@ FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+OPENAI_ADVANCED_MODEL = os.getenv('OPENAI_ADVANCED_MODEL', OPENAI_MODEL)  # routed to advanced questions from senior grades
+MODEL_ROUTING_FILE = os.getenv('MODEL_ROUTING_FILE', '')  # JSON overriding parts of the tutor's model routing table
 
 # Cache Configuration
 CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
 CACHE_DB_PATH = os.path.join(CACHE_DIR, 'skillomate_cache.db')
 CACHE_JSON_PATH = os.path.join(CACHE_DIR, 'qa_cache.json')
 CACHE_RETENTION_DAYS = int(os.getenv('CACHE_RETENTION_DAYS', 30))
+CACHE_MAX_QA_ENTRIES = int(os.getenv('CACHE_MAX_QA_ENTRIES', 20000))
+CACHE_MAX_DIAGRAM_ENTRIES = int(os.getenv('CACHE_MAX_DIAGRAM_ENTRIES', 2000))
+CACHE_MAX_MB = int(os.getenv('CACHE_MAX_MB', 500))  # answers and diagrams combined
+# Per-subject entry quotas, e.g. "Mathematics:8000,Science:6000"
+CACHE_SUBJECT_QUOTAS = {
+    subject.strip(): int(quota)
+    for subject, quota in (item.split(':') for item in os.getenv('CACHE_SUBJECT_QUOTAS', '').split(',') if ':' in item)
+}
+CACHE_EVICTION_POLICY = os.getenv('CACHE_EVICTION_POLICY', 'lru')  # 'lru', 'lfu' or 'cost' (regeneration cost)
+CACHE_JANITOR_INTERVAL = float(os.getenv('CACHE_JANITOR_INTERVAL', 300))  # seconds between eviction sweeps
+CACHE_EVICTION_BATCH_SIZE = int(os.getenv('CACHE_EVICTION_BATCH_SIZE', 200))  # rows deleted per transaction
+CACHE_IMPORT_BATCH_SIZE = int(os.getenv('CACHE_IMPORT_BATCH_SIZE', 500))  # records per transaction on /api/cache/import
+
+# Offline Question Bank Configuration
+OFFLINE_QUESTION_BANK_DB_PATH = os.getenv('OFFLINE_QUESTION_BANK_DB_PATH', 'data/offline_question_bank.db')
+OFFLINE_QUESTION_BANK_DIR = os.getenv('OFFLINE_QUESTION_BANK_DIR', 'data/question_banks')  # .json/.jsonl files loaded at startup
+OFFLINE_BULK_CACHE_WORKERS = int(os.getenv('OFFLINE_BULK_CACHE_WORKERS', 4))  # concurrent LLM calls per job
+OFFLINE_BULK_CACHE_BATCH_SIZE = int(os.getenv('OFFLINE_BULK_CACHE_BATCH_SIZE', 20))  # responses per transaction
+OFFLINE_BULK_CACHE_MAX_JOBS = int(os.getenv('OFFLINE_BULK_CACHE_MAX_JOBS', 1))  # jobs running at once, across workers
+OFFLINE_BULK_CACHE_MAX_QUESTIONS = int(os.getenv('OFFLINE_BULK_CACHE_MAX_QUESTIONS', 500))  # per API job
+OFFLINE_BULK_CACHE_STALE_SECONDS = float(os.getenv('OFFLINE_BULK_CACHE_STALE_SECONDS', 600))  # no checkpoint for this long = interrupted
+POPULARITY_HALF_LIFE_HOURS = float(os.getenv('POPULARITY_HALF_LIFE_HOURS', 72))  # how fast old accesses stop counting
+POPULARITY_FLUSH_SECONDS = float(os.getenv('POPULARITY_FLUSH_SECONDS', 30))
+POPULARITY_TOP_K = int(os.getenv('POPULARITY_TOP_K', 50))  # questions kept ready per grade/subject
+OFFLINE_BUNDLE_CHUNK_SIZE = int(os.getenv('OFFLINE_BUNDLE_CHUNK_SIZE', 50))  # questions per bundle chunk
+OFFLINE_BUNDLE_KEEP_VERSIONS = int(os.getenv('OFFLINE_BUNDLE_KEEP_VERSIONS', 10))  # older client versions get a full sync
 
 # API Configuration
 API_RATE_LIMIT = int(os.getenv('API_RATE_LIMIT', 100))
 API_RATE_WINDOW = int(os.getenv('API_RATE_WINDOW', 900))  # 15 minutes
+API_RATE_LIMIT_ENABLED = os.getenv('API_RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+API_RATE_LIMIT_STORAGE = os.getenv('API_RATE_LIMIT_STORAGE', 'memory')  # 'memory' or 'sqlite' (shared across workers)
+API_RATE_LIMIT_DB_PATH = os.getenv('API_RATE_LIMIT_DB_PATH', os.path.join(CACHE_DIR, 'rate_limits.db'))
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))  # proxies in front of the app that append X-Forwarded-For
+SERVICE_AUTH_TOKEN = os.getenv('SERVICE_AUTH_TOKEN', '')  # shared with the Node backend; only it may name the user
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN', '')  # X-Admin-Token for admin endpoints; unset closes them
+
+# Tokens spent per request; endpoints not listed cost 1, cost 0 is exempt
+API_ENDPOINT_COSTS = {
+    '/': 0,
+    '/api/health': 0,
+    '/api/metrics': 0,
+    '/api/chat': 5,
+    '/api/chat-enhanced': 5,
+    '/api/chat/new': 5,
+    '/api/homework': 5,
+    '/api/voice-input': 8,
+    '/api/guided-learning': 3,
+    '/api/diagram': 3,
+    '/api/diagram/generate': 3,
+    '/api/voice-output': 2,
+    '/api/offline/generate-question-bank': 5,
+    '/api/offline/bulk-cache': 5
+}
+
+# Response Encoding
+RESPONSE_COMPRESSION_ENABLED = os.getenv('RESPONSE_COMPRESSION_ENABLED', 'True').lower() == 'true'
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', 1024))  # smaller bodies are sent as-is
+RESPONSE_GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', 6))
+RESPONSE_BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', 4))  # used when the Brotli package is installed
+
+# LLM Resilience Configuration
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 30))  # per call; the OpenAI client default is 10 minutes
+LLM_CIRCUIT_WINDOW_SECONDS = float(os.getenv('LLM_CIRCUIT_WINDOW_SECONDS', 60))  # outcomes considered for tripping
+LLM_CIRCUIT_MIN_CALLS = int(os.getenv('LLM_CIRCUIT_MIN_CALLS', 5))  # calls in the window before it can trip
+LLM_CIRCUIT_FAILURE_RATE = float(os.getenv('LLM_CIRCUIT_FAILURE_RATE', 0.5))
+LLM_CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv('LLM_CIRCUIT_SLOW_CALL_SECONDS', 15))
+LLM_CIRCUIT_SLOW_CALL_RATE = float(os.getenv('LLM_CIRCUIT_SLOW_CALL_RATE', 0.8))
+LLM_CIRCUIT_OPEN_SECONDS = float(os.getenv('LLM_CIRCUIT_OPEN_SECONDS', 30))  # before the first recovery probe; doubles while probes fail
+LLM_CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv('LLM_CIRCUIT_MAX_OPEN_SECONDS', 300))
+REQUEST_BUDGET_SECONDS = float(os.getenv('REQUEST_BUDGET_SECONDS', 45))  # end-to-end budget of a homework/chat request
+TUTOR_RESERVE_SECONDS = float(os.getenv('TUTOR_RESERVE_SECONDS', 20))  # optional stages are skipped once less than this is left
+LLM_HEDGING_ENABLED = os.getenv('LLM_HEDGING_ENABLED', 'True').lower() == 'true'  # duplicate slow analysis/summary calls
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY_SECONDS', 3))  # until the p95 latency is known
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv('LLM_HEDGE_MIN_DELAY_SECONDS', 0.5))
+LLM_HEDGE_WORKERS = int(os.getenv('LLM_HEDGE_WORKERS', 16))
+DEGRADED_MIN_MATCH_SCORE = float(os.getenv('DEGRADED_MIN_MATCH_SCORE', 0.6))  # similarity needed to reuse another question's answer
+
+# Background Task Configuration (work done after the response: summaries, cache writes, access counts)
+BACKGROUND_TASKS_ENABLED = os.getenv('BACKGROUND_TASKS_ENABLED', 'True').lower() == 'true'  # False runs them inline
+BACKGROUND_TASK_QUEUE_SIZE = int(os.getenv('BACKGROUND_TASK_QUEUE_SIZE', 1000))  # tasks waiting for a worker; more are dropped
+BACKGROUND_TASK_WORKERS = int(os.getenv('BACKGROUND_TASK_WORKERS', 2))
+BACKGROUND_TASK_MAX_RETRIES = int(os.getenv('BACKGROUND_TASK_MAX_RETRIES', 2))
+BACKGROUND_TASK_RETRY_DELAY_SECONDS = float(os.getenv('BACKGROUND_TASK_RETRY_DELAY_SECONDS', 0.5))  # doubles per retry
+BACKGROUND_TASK_DRAIN_SECONDS = float(os.getenv('BACKGROUND_TASK_DRAIN_SECONDS', 10))  # wait for queued tasks on shutdown
+
+# Answer Formatting Configuration
+FORMATTER_USE_LLM = os.getenv('FORMATTER_USE_LLM', 'False').lower() == 'true'  # rewrite answers with the LLM instead of local rules
+FORMATTER_CACHE_SIZE = int(os.getenv('FORMATTER_CACHE_SIZE', 1024))  # formatted answers kept in memory
+
+# Guided Learning Configuration
+HINT_LADDER_CACHE_SIZE = int(os.getenv('HINT_LADDER_CACHE_SIZE', 500))  # questions whose hint ladders stay in memory
+HINT_LADDER_TTL_SECONDS = float(os.getenv('HINT_LADDER_TTL_SECONDS', 86400))
+HINT_WAIT_TIMEOUT_SECONDS = float(os.getenv('HINT_WAIT_TIMEOUT_SECONDS', 60))  # wait for a level still being generated
+
+# Voice Configuration
+VOICE_RECOGNIZER_BACKEND = os.getenv('VOICE_RECOGNIZER_BACKEND', 'google')  # 'google', 'sphinx' (offline) or 'local' (stand-in)
+VOICE_RECOGNITION_LANGUAGE = os.getenv('VOICE_RECOGNITION_LANGUAGE', 'en-US')
+VOICE_CHUNK_SECONDS = float(os.getenv('VOICE_CHUNK_SECONDS', 15))
+VOICE_RECOGNITION_WORKERS = int(os.getenv('VOICE_RECOGNITION_WORKERS', 4))
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', 25))
+VOICE_SYNTHESIZER_BACKEND = os.getenv('VOICE_SYNTHESIZER_BACKEND', 'gtts')  # 'gtts' or 'local' (stand-in)
+VOICE_DEFAULT_VOICE = os.getenv('VOICE_DEFAULT_VOICE', 'en-IN')
+VOICE_AUDIO_CACHE_DIR = os.getenv('VOICE_AUDIO_CACHE_DIR', os.path.join(CACHE_DIR, 'audio'))
+VOICE_AUDIO_CACHE_MAX_MB = int(os.getenv('VOICE_AUDIO_CACHE_MAX_MB', 200))
+VOICE_SYNTHESIS_PREFETCH = int(os.getenv('VOICE_SYNTHESIS_PREFETCH', 2))
+VOICE_SYNTHESIS_WORKERS = int(os.getenv('VOICE_SYNTHESIS_WORKERS', 8))
+VOICE_MAX_TEXT_CHARS = int(os.getenv('VOICE_MAX_TEXT_CHARS', 5000))
+VOICE_MIN_SPEED = float(os.getenv('VOICE_MIN_SPEED', 0.5))
+VOICE_MAX_SPEED = float(os.getenv('VOICE_MAX_SPEED', 2.0))
 
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_JSON = os.getenv('LOG_JSON', 'True').lower() == 'true'  # one JSON object per line instead of LOG_FORMAT text
+LOG_REDACT_PII = os.getenv('LOG_REDACT_PII', 'True').lower() == 'true'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # records waiting for the writer thread; more are dropped
+# Fraction of INFO/DEBUG records kept per logger, e.g. "agents.conversational_homework_tutor:0.1,ai_orchestrator:0.25"
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')
+
+# Production Server Configuration (gunicorn.conf.py)
+PREFORK = os.getenv('SKILLOMATE_PREFORK', '0') == '1'  # set by gunicorn.conf.py; background services start per worker
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')  # 'memory' or 'sqlite' (shared across workers)
+SESSION_STORE_DB_PATH = os.getenv('SESSION_STORE_DB_PATH', os.path.join(CACHE_DIR, 'sessions.db'))
+SESSION_TTL_HOURS = float(os.getenv('SESSION_TTL_HOURS', 24))
+JANITOR_LOCK_PATH = os.getenv('JANITOR_LOCK_PATH', os.path.join(CACHE_DIR, 'janitor.lock'))  # one worker runs the cache janitor
+WARMUP_TIMEOUT_SECONDS = float(os.getenv('WARMUP_TIMEOUT_SECONDS', 10))  # per LLM connection opened before a worker accepts
 
 # Frontend Configuration
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
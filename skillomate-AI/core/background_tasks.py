@@ -0,0 +1,181 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from typing import Dict, Any, Callable, Optional
+
+from core.deadline import deadline_scope
+from core.metrics import BACKGROUND_TASKS_TOTAL, BACKGROUND_TASK_SECONDS, BACKGROUND_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BackgroundTask:
+    def __init__(self, name: str, func: Callable, args: tuple, kwargs: Dict[str, Any], retries: int):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.retries = retries
+        self.attempts = 0
+        # Run in a copy of the submitting context so log records keep the request ID
+        self.context = contextvars.copy_context()
+
+
+class BackgroundTaskQueue:
+    """
+    Bounded queue of work the user doesn't wait for (cache writes, summaries, analytics)
+    A pool of worker threads runs the tasks after the response has been sent; a failing task is
+    retried with exponential backoff. When the queue is full new tasks are dropped, not waited for.
+    Workers start with the first task in each process, so a pre-fork master never owns them.
+    """
+
+    def __init__(self, max_size: int = 1000, workers: int = 2, max_retries: int = 2, retry_delay: float = 0.5,
+                 drain_seconds: float = 10.0):
+        self.max_size = max_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.drain_seconds = drain_seconds
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._threads = []
+        self._pid = None
+        self._accepting = True
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0, "dropped": 0}
+        BACKGROUND_QUEUE_DEPTH.set_function(self._queue.qsize)
+        atexit.register(self.shutdown)
+
+    def _ensure_workers(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f"background-task-{index}", daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def submit(self, name: str, func: Callable, *args, retries: Optional[int] = None, **kwargs) -> bool:
+        """Queue func(*args, **kwargs) to run after the response; False when it was dropped"""
+        if not self._accepting:
+            BACKGROUND_TASKS_TOTAL.inc(task=name, outcome="dropped")
+            self._count("dropped")
+            return False
+        self._ensure_workers()
+        task = BackgroundTask(name, func, args, kwargs, self.max_retries if retries is None else retries)
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            logger.warning("Background queue full, dropped task %s", name)
+            BACKGROUND_TASKS_TOTAL.inc(task=name, outcome="dropped")
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is _STOP:
+                    return
+                self._run(task)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _call(task: BackgroundTask):
+        # The request's deadline no longer applies once its response has been sent
+        with deadline_scope(None):
+            task.func(*task.args, **task.kwargs)
+
+    def _run(self, task: BackgroundTask):
+        while True:
+            task.attempts += 1
+            start = time.perf_counter()
+            try:
+                task.context.copy().run(self._call, task)
+                BACKGROUND_TASK_SECONDS.observe(time.perf_counter() - start, task=task.name)
+                BACKGROUND_TASKS_TOTAL.inc(task=task.name, outcome="completed")
+                self._count("completed")
+                return
+            except Exception as e:
+                BACKGROUND_TASK_SECONDS.observe(time.perf_counter() - start, task=task.name)
+                if task.attempts > task.retries or self._stop.is_set():
+                    logger.error(f"Background task {task.name} failed after {task.attempts} attempts: {str(e)}")
+                    BACKGROUND_TASKS_TOTAL.inc(task=task.name, outcome="failed")
+                    self._count("failed")
+                    return
+                BACKGROUND_TASKS_TOTAL.inc(task=task.name, outcome="retried")
+                self._count("retried")
+                # Retried on this worker; the wait ends early when shutting down
+                if self._stop.wait(self.retry_delay * 2 ** (task.attempts - 1)):
+                    logger.error(f"Background task {task.name} abandoned at shutdown: {str(e)}")
+                    BACKGROUND_TASKS_TOTAL.inc(task=task.name, outcome="failed")
+                    self._count("failed")
+                    return
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop accepting tasks and wait for the queued ones; True when all finished in time"""
+        self._accepting = False
+        if self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + (self.drain_seconds if timeout is None else timeout)
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("Background queue drain timed out with %d tasks left", self._queue.unfinished_tasks)
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Drain, then stop the workers; pending retries are abandoned"""
+        drained = self.drain(timeout)
+        self._stop.set()
+        if self._pid == os.getpid():
+            for _ in self._threads:
+                try:
+                    self._queue.put_nowait(_STOP)
+                except queue.Full:
+                    break
+            if drained:
+                for thread in self._threads:
+                    thread.join(timeout=1.0)
+        self._pid = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(queued=self._queue.qsize(), max_size=self.max_size, workers=self.workers,
+                     accepting=self._accepting)
+        return stats
+
+
+def run_after_response(background_tasks: Optional[BackgroundTaskQueue], name: str, func: Callable, *args, **kwargs) -> bool:
+    """Queue a task on background_tasks, or run it right away when there is no queue; False if it was dropped or failed"""
+    if background_tasks is not None:
+        return background_tasks.submit(name, func, *args, **kwargs)
+    try:
+        func(*args, **kwargs)
+        return True
+    except Exception as e:
+        logger.error(f"Task {name} failed: {str(e)}")
+        return False
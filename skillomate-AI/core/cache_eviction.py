@@ -0,0 +1,165 @@
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Regeneration cost is measured in estimated seconds of work to rebuild an entry
+LLM_BASE_SECONDS = 1.0
+LLM_TOKENS_PER_SECOND = 50.0
+CHARS_PER_TOKEN = 4.0
+DIAGRAM_REGENERATION_SECONDS = 0.5
+
+
+def estimate_answer_cost(answer: str) -> float:
+    """Estimated seconds for the LLM to regenerate an answer of this length"""
+    return round(LLM_BASE_SECONDS + len(answer or "") / CHARS_PER_TOKEN / LLM_TOKENS_PER_SECOND, 3)
+
+
+class EvictionPolicy:
+    """
+    Order in which cached entries are evicted, first entry goes first
+    order_by is applied in SQL to rows exposing last_accessed, access_count, regeneration_cost
+    and size_bytes; sort_key does the same for entries of the JSON mirror.
+    """
+
+    name = "base"
+    order_by = "last_accessed ASC"
+
+    def sort_key(self, entry: Dict[str, Any]) -> tuple:
+        return (entry.get("last_accessed") or "",)
+
+
+class LRUPolicy(EvictionPolicy):
+    """Least recently used first"""
+
+    name = "lru"
+    order_by = "last_accessed ASC"
+
+
+class LFUPolicy(EvictionPolicy):
+    """Least frequently used first, least recently used among equals"""
+
+    name = "lfu"
+    order_by = "access_count ASC, last_accessed ASC"
+
+    def sort_key(self, entry: Dict[str, Any]) -> tuple:
+        return (entry.get("access_count") or 1, entry.get("last_accessed") or "")
+
+
+class CostAwarePolicy(EvictionPolicy):
+    """
+    Greedy-dual-size-frequency: keep entries that are popular, expensive to regenerate and small
+    An answer that took many LLM tokens outlives a diagram that renders locally in half a second.
+    """
+
+    name = "cost"
+    order_by = "(access_count * regeneration_cost) / (size_bytes + 1.0) ASC, last_accessed ASC"
+
+    def sort_key(self, entry: Dict[str, Any]) -> tuple:
+        size = sum(len(str(entry.get(field) or "")) for field in ("question", "answer", "context", "image_data"))
+        cost = entry.get("regeneration_cost") or estimate_answer_cost(entry.get("answer", ""))
+        return ((entry.get("access_count") or 1) * cost / (size + 1.0), entry.get("last_accessed") or "")
+
+
+EVICTION_POLICIES = {policy.name: policy for policy in (LRUPolicy, LFUPolicy, CostAwarePolicy)}
+
+
+def create_eviction_policy(name: str) -> EvictionPolicy:
+    """Create an eviction policy by name (lru, lfu or cost)"""
+    return EVICTION_POLICIES.get((name or "lru").lower(), LRUPolicy)()
+
+
+class CacheLimits:
+    """Capacity limits for the offline cache; None disables a limit"""
+
+    def __init__(self, max_qa_entries: Optional[int] = None, max_diagram_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, subject_quotas: Optional[Dict[str, int]] = None,
+                 max_age_days: Optional[float] = None):
+        self.max_qa_entries = max_qa_entries
+        self.max_diagram_entries = max_diagram_entries
+        self.max_bytes = max_bytes
+        self.subject_quotas = subject_quotas or {}  # subject -> max entries per table
+        self.max_age_days = max_age_days
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "max_qa_entries": self.max_qa_entries,
+            "max_diagram_entries": self.max_diagram_entries,
+            "max_bytes": self.max_bytes,
+            "subject_quotas": self.subject_quotas,
+            "max_age_days": self.max_age_days
+        }
+
+
+class CacheJanitor:
+    """
+    Background thread that keeps a cache within its limits
+    Every interval it calls enforce() repeatedly; each call evicts at most one small batch per rule
+    in short transactions and reports whether more work is left, so requests never wait behind a
+    long delete.
+    """
+
+    def __init__(self, enforce: Callable[[], Dict[str, Any]], interval: float = 300.0,
+                 pause: float = 0.05, max_passes: int = 1000):
+        self.enforce = enforce
+        self.interval = interval
+        self.pause = pause
+        self.max_passes = max_passes
+
+        self.runs = 0
+        self.evicted_total = 0
+        self.last_run = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="cache-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # First sweep right away so a cache that outgrew new limits shrinks at startup
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def run_once(self) -> int:
+        """Enforce the limits in batches until nothing is left to evict, returns entries evicted"""
+        evicted = 0
+        start_time = time.time()
+        for _ in range(self.max_passes):
+            if self._stop.is_set():
+                break
+            result = self.enforce()
+            if not result.get("success"):
+                self.last_error = result.get("error")
+                break
+            evicted += result["evicted"]["total"]
+            if result["done"]:
+                break
+            # Give request threads a turn at the write lock between batches
+            time.sleep(self.pause)
+
+        self.runs += 1
+        self.evicted_total += evicted
+        self.last_run = time.strftime("%Y-%m-%dT%H:%M:%S")
+        if evicted:
+            logger.info(f"Cache janitor evicted {evicted} entries in {time.time() - start_time:.2f}s")
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "evicted_total": self.evicted_total,
+            "last_run": self.last_run,
+            "last_error": self.last_error
+        }
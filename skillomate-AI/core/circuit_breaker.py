@@ -0,0 +1,156 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+from core.metrics import LLM_CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency the breaker considers down"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stop calling a dependency that keeps failing or answering too slowly
+    Closed: calls go through and their outcomes are kept for window_seconds. Once at least min_calls
+    are in the window and the failure rate or the slow-call rate reaches its threshold, the breaker
+    opens and calls fail immediately. After open_seconds a few probe calls are let through
+    (half-open): a fast success closes the breaker, anything else opens it again for twice as long,
+    up to max_open_seconds.
+    """
+
+    def __init__(self, name: str, window_seconds: float = 60.0, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 15.0, slow_call_rate: float = 0.8, open_seconds: float = 30.0,
+                 max_open_seconds: float = 300.0, half_open_probes: int = 1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._state = CLOSED
+        self._calls = deque()  # (finished_at, failed, slow) within the window
+        self._opened_at = 0.0
+        self._open_for = open_seconds
+        self._probes = 0  # probe calls in flight while half-open
+        self._trips = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+        LLM_CIRCUIT_STATE.set(STATE_VALUES[CLOSED], circuit=name)
+
+    def configure(self, **settings):
+        """Change thresholds, e.g. from config; unknown names are rejected"""
+        with self._lock:
+            for key, value in settings.items():
+                if key.startswith("_") or not hasattr(self, key):
+                    raise ValueError(f"Unknown circuit breaker setting: {key}")
+                setattr(self, key, value)
+            self._open_for = self.open_seconds
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.warning("Circuit %s: %s -> %s", self.name, self._state, state)
+        self._state = state
+        LLM_CIRCUIT_STATE.set(STATE_VALUES[state], circuit=self.name)
+
+    def _trim(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float, backoff: bool = False):
+        self._open_for = min(self.max_open_seconds, self._open_for * 2) if backoff else self.open_seconds
+        self._opened_at = now
+        self._probes = 0
+        self._trips += 1
+        self._calls.clear()
+        self._set_state(OPEN)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self._open_for:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now; every allowed call must be followed by record()"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                if now - self._opened_at < self._open_for:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, self._open_for - (now - self._opened_at))
+                self._set_state(HALF_OPEN)
+
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probes += 1
+
+    def record(self, duration: float, failed: Optional[bool]):
+        """
+        Outcome of an allowed call
+        failed=None means no verdict (the caller gave up, or the error was the request's fault), which
+        only frees a probe slot.
+        """
+        now = time.monotonic()
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failed is None:
+                    return
+                if failed or slow:
+                    self._open(now, backoff=True)
+                else:
+                    self._calls.clear()
+                    self._open_for = self.open_seconds
+                    self._set_state(CLOSED)
+                return
+
+            if self._state != CLOSED or failed is None:
+                return
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slow_calls = sum(1 for _, _, s in self._calls if s)
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                logger.error("Circuit %s tripped: %d of %d calls failed, %d slow in the last %.0fs",
+                             self.name, failures, total, slow_calls, self.window_seconds)
+                self._open(now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "state": state,
+                "calls_in_window": len(self._calls),
+                "failures_in_window": sum(1 for _, f, _ in self._calls if f),
+                "slow_in_window": sum(1 for _, _, s in self._calls if s),
+                "trips": self._trips,
+                "rejected": self._rejected,
+                "open_seconds": self._open_for
+            }
@@ -0,0 +1,214 @@
+import re
+import logging
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.nlu import GRADE_PATTERN, analyze, extract_features, singular
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOARD = "CBSE"
+DEFAULT_GRADE = "8"
+DEFAULT_BAND = "primary"  # style used for grades outside grade_levels, as before
+
+# (highest grade, vocabulary level, explanation depth); grades above the last row use the last row
+GRADE_GUIDELINES = [
+    (5, "simple, basic words, short sentences", "very detailed, step-by-step, visual aids"),
+    (8, "moderate, clear explanations, examples", "detailed with examples, clear steps"),
+    (10, "standard, subject-specific terms", "comprehensive, exam-ready format"),
+    (12, "advanced, technical terms, detailed explanations", "concise, analytical, research-oriented")
+]
+
+# Everyday names students use for a subject, on top of the subject key itself
+SUBJECT_ALIASES = {
+    "mathematics": ["math", "maths"],
+    "science": ["evs"],
+    "social_studies": ["sst", "social science", "history", "civics"],
+    "english": []
+}
+
+# Keyword weights: curriculum topic names are the strongest signal, a bare subject name the weakest
+TOPIC_NAME_WEIGHT = 1.5
+KEYWORD_WEIGHT = 1.0
+SUBJECT_NAME_WEIGHT = 0.75
+
+BOARD_PATTERN = re.compile(r"(?i:\b(cbse|icse|state board)\b)|\b(IB)\b")
+
+
+def normalize_grade(grade: Any) -> str:
+    """'Class 8', 'grade 8' and 8 all become '8'; anything without a number is returned stripped"""
+    text = str(grade or "").strip()
+    match = re.search(r"\d+", text)
+    return match.group() if match else text
+
+
+class CurriculumIndex:
+    """
+    curriculum.json compiled into lookup tables
+    Grade → band, style and vocabulary tables replace the per-call scans of the raw dict, and an
+    inverted index of keyword → (subject, topic, band) postings lets detect() guess the subject,
+    topic and grade of a question locally without an LLM call.
+    """
+
+    def __init__(self, curriculum_data: Dict[str, Any]):
+        self.boards = curriculum_data.get("boards", {})
+        self.grade_levels = curriculum_data.get("grade_levels", {})
+
+        self.grade_bands = {}  # grade -> band
+        self.band_grades = {}  # band -> representative grade
+        for band, data in self.grade_levels.items():
+            grades = [str(grade) for grade in data.get("grades", [])]
+            for grade in grades:
+                self.grade_bands.setdefault(grade, band)
+            if grades:
+                self.band_grades[band] = grades[len(grades) // 2]
+
+        self.guidelines = {}  # grade -> (vocabulary level, explanation depth)
+        for grade in range(1, GRADE_GUIDELINES[-1][0] + 1):
+            self.guidelines[str(grade)] = next(
+                (vocabulary, depth) for limit, vocabulary, depth in GRADE_GUIDELINES if grade <= limit
+            )
+
+        self.board_names = {board.lower(): board for board in self.boards}
+        self.board_names["state board"] = "State"
+
+        self.subject_names = {}  # subject key -> display name
+        self.postings = defaultdict(list)  # keyword -> [(subject, topic, bands, weight)]
+        self._build_postings(curriculum_data.get("subjects", {}), curriculum_data.get("topic_keywords", {}))
+        self.max_ngram = max((len(keyword.split()) for keyword in self.postings), default=1)
+
+    def _build_postings(self, subjects: Dict[str, Any], topic_keywords: Dict[str, Any]):
+        for subject_key, subject_data in subjects.items():
+            subject = subject_key.replace("_", " ").title()
+            self.subject_names[subject_key] = subject
+
+            topic_bands = defaultdict(list)
+            for band, topics in subject_data.get("topics", {}).items():
+                for topic in topics:
+                    topic_bands[topic].append(band)
+
+            for name in [subject_key.replace("_", " ")] + SUBJECT_ALIASES.get(subject_key, []):
+                self._add_posting(name, subject, None, (), SUBJECT_NAME_WEIGHT)
+
+            for topic, bands in topic_bands.items():
+                self._add_posting(topic, subject, topic, tuple(bands), TOPIC_NAME_WEIGHT)
+                for keyword in topic_keywords.get(subject_key, {}).get(topic, []):
+                    self._add_posting(keyword, subject, topic, tuple(bands), KEYWORD_WEIGHT)
+
+    def _add_posting(self, keyword: str, subject: str, topic: Optional[str], bands: Tuple[str, ...],
+                     weight: float):
+        keyword = " ".join(extract_features(keyword).words)
+        if not keyword:
+            return
+        # Multi-word keywords ("laws of motion") are more specific than any of their words
+        weight *= len(keyword.split()) ** 0.5
+        postings = self.postings[keyword]
+        for i, (p_subject, p_topic, p_bands, p_weight) in enumerate(postings):
+            if p_subject == subject and p_topic == topic:
+                postings[i] = (subject, topic, p_bands, max(p_weight, weight))
+                return
+        postings.append((subject, topic, bands, weight))
+
+    def band_for_grade(self, grade: Any) -> str:
+        return self.grade_bands.get(normalize_grade(grade), DEFAULT_BAND)
+
+    def grade_style(self, grade: Any) -> str:
+        return self.grade_levels.get(self.band_for_grade(grade), {}).get("style", "detailed")
+
+    def board_style(self, board: str) -> str:
+        return self.boards.get(board, {}).get("style", "comprehensive")
+
+    def _guidelines(self, grade: Any) -> Tuple[str, str]:
+        grade = normalize_grade(grade)
+        if grade in self.guidelines:
+            return self.guidelines[grade]
+        if grade.isdigit() and int(grade) > GRADE_GUIDELINES[-1][0]:
+            return self.guidelines[str(GRADE_GUIDELINES[-1][0])]
+        if grade.isdigit():
+            return self.guidelines["1"]
+        return self.guidelines[DEFAULT_GRADE]
+
+    def vocabulary_level(self, grade: Any) -> str:
+        return self._guidelines(grade)[0]
+
+    def explanation_depth(self, grade: Any) -> str:
+        return self._guidelines(grade)[1]
+
+    def _ngrams(self, question: str) -> List[str]:
+        words = analyze(question).words
+        ngrams = [
+            " ".join(words[start:start + size])
+            for size in range(1, self.max_ngram + 1)
+            for start in range(len(words) - size + 1)
+        ]
+        # Plurals and possessives ("equations", "newton's") also look up their singular
+        return ngrams + [singular(word) for word in words if singular(word) != word]
+
+    def detect(self, question: str) -> Dict[str, Any]:
+        """
+        Guess board, grade, subject and topic from the question text alone
+        confidence is 0 when nothing matched and drops when a second subject scores close to the
+        best one, so callers can fall back to a slower detector below a threshold.
+        """
+        subject_scores = defaultdict(float)
+        topic_scores = defaultdict(float)
+        band_scores = defaultdict(float)
+        matched = []
+
+        for ngram in self._ngrams(question):
+            for subject, topic, bands, weight in self.postings.get(ngram, ()):
+                subject_scores[subject] += weight
+                matched.append(ngram)
+                if topic:
+                    topic_scores[(subject, topic)] += weight
+                    for band in bands:
+                        band_scores[(subject, band)] += weight / len(bands)
+
+        result = {
+            "board": None,
+            "grade": None,
+            "grade_band": None,
+            "subject": "General",
+            "topic": "General",
+            "confidence": 0.0,
+            "matched_keywords": sorted(set(matched))
+        }
+
+        board_match = BOARD_PATTERN.search(question)
+        if board_match:
+            result["board"] = self.board_names.get((board_match.group(1) or board_match.group(2)).lower())
+
+        grade_match = GRADE_PATTERN.search(question)
+        if grade_match:
+            result["grade"] = grade_match.group(1) or grade_match.group(2)
+            result["grade_band"] = self.band_for_grade(result["grade"])
+
+        if not subject_scores:
+            return result
+
+        ranked = sorted(subject_scores.items(), key=lambda item: item[1], reverse=True)
+        subject, best = ranked[0]
+        share = best / sum(subject_scores.values())
+        result["subject"] = subject
+        result["confidence"] = round(share * min(0.95, 0.6 + 0.15 * best), 3)
+
+        topics = [(score, topic) for (s, topic), score in topic_scores.items() if s == subject]
+        if topics:
+            result["topic"] = max(topics)[1]
+
+        if result["grade"] is None:
+            bands = sorted(((score, band) for (s, band), score in band_scores.items() if s == subject), reverse=True)
+            # Only commit to a band the keywords clearly point at
+            if bands and (len(bands) == 1 or bands[0][0] > bands[1][0]):
+                result["grade_band"] = bands[0][1]
+                result["grade"] = self.band_grades.get(bands[0][1])
+
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "keywords": len(self.postings),
+            "postings": sum(len(postings) for postings in self.postings.values()),
+            "subjects": len(self.subject_names),
+            "grades": len(self.grade_bands)
+        }
@@ -0,0 +1,292 @@
+import sqlite3
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each migration is (version, description, statements). Versions only ever get appended:
+# never edit a migration that has shipped, add a new one instead.
+# Version 1 is the schema that used to be created ad hoc, so existing databases adopt it unchanged.
+
+CACHE_DB_MIGRATIONS = [
+    (1, "Initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS qa_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_hash TEXT UNIQUE NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            subject TEXT,
+            grade TEXT,
+            board TEXT,
+            context TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            access_count INTEGER DEFAULT 1,
+            is_offline_ready BOOLEAN DEFAULT 1
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS diagram_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            diagram_hash TEXT UNIQUE NOT NULL,
+            diagram_type TEXT NOT NULL,
+            subject TEXT,
+            grade TEXT,
+            image_data TEXT,
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS syllabus_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject TEXT NOT NULL,
+            grade TEXT NOT NULL,
+            board TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(subject, grade, board, topic)
+        )
+        '''
+    ]),
+    (2, "Indexes for search, stats and expiry", [
+        "CREATE INDEX IF NOT EXISTS idx_qa_cache_subject_grade ON qa_cache (subject, grade)",
+        "CREATE INDEX IF NOT EXISTS idx_qa_cache_last_accessed ON qa_cache (last_accessed)",
+        "CREATE INDEX IF NOT EXISTS idx_qa_cache_access_count ON qa_cache (access_count DESC, last_accessed DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_diagram_cache_last_accessed ON diagram_cache (last_accessed)"
+    ]),
+    (3, "Eviction bookkeeping: regeneration cost and diagram access counts", [
+        "ALTER TABLE qa_cache ADD COLUMN regeneration_cost REAL DEFAULT 1.0",
+        "ALTER TABLE diagram_cache ADD COLUMN access_count INTEGER DEFAULT 1",
+        "ALTER TABLE diagram_cache ADD COLUMN regeneration_cost REAL DEFAULT 0.5",
+        "CREATE INDEX IF NOT EXISTS idx_diagram_cache_subject ON diagram_cache (subject)",
+        "CREATE INDEX IF NOT EXISTS idx_diagram_cache_access_count ON diagram_cache (access_count, last_accessed)"
+    ]),
+    (4, "Incremental export and resumable import", [
+        "CREATE INDEX IF NOT EXISTS idx_qa_cache_created_at ON qa_cache (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_diagram_cache_created_at ON diagram_cache (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_syllabus_cache_created_at ON syllabus_cache (created_at)",
+        '''
+        CREATE TABLE IF NOT EXISTS cache_imports (
+            import_id TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            file_size INTEGER,
+            file_mtime REAL,
+            status TEXT DEFAULT 'running',
+            lines_done INTEGER DEFAULT 0,
+            imported INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_cache_imports_file ON cache_imports (file_path, file_size, file_mtime)"
+    ]),
+    # Rows written with datetime.now().isoformat() (local time, 'T' separator) sorted after newer
+    # CURRENT_TIMESTAMP values (UTC, space separator); bring them all to the CURRENT_TIMESTAMP form
+    (5, "One timestamp format (UTC, CURRENT_TIMESTAMP form)", [
+        "UPDATE qa_cache SET created_at = COALESCE(datetime(created_at, 'utc'), created_at) WHERE created_at LIKE '%T%'",
+        "UPDATE qa_cache SET last_accessed = COALESCE(datetime(last_accessed, 'utc'), last_accessed) WHERE last_accessed LIKE '%T%'",
+        "UPDATE diagram_cache SET created_at = COALESCE(datetime(created_at, 'utc'), created_at) WHERE created_at LIKE '%T%'",
+        "UPDATE diagram_cache SET last_accessed = COALESCE(datetime(last_accessed, 'utc'), last_accessed) WHERE last_accessed LIKE '%T%'",
+        "UPDATE syllabus_cache SET created_at = COALESCE(datetime(created_at, 'utc'), created_at) WHERE created_at LIKE '%T%'"
+    ])
+]
+
+QUESTION_BANK_MIGRATIONS = [
+    (1, "Initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_text TEXT NOT NULL,
+            question_hash VARCHAR(64) UNIQUE,
+            subject VARCHAR(50),
+            grade VARCHAR(20),
+            board VARCHAR(30),
+            difficulty_level INTEGER,
+            topic VARCHAR(100),
+            category VARCHAR(50),
+            popularity_score INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS pre_cached_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_hash VARCHAR(64) UNIQUE,
+            formatted_response TEXT,
+            raw_response TEXT,
+            diagrams JSON,
+            related_questions TEXT,
+            metadata JSON,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (question_hash) REFERENCES question_bank(question_hash)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS offline_sync_status (
+            grade VARCHAR(20),
+            subject VARCHAR(50),
+            board VARCHAR(30),
+            total_questions INTEGER DEFAULT 0,
+            cached_responses INTEGER DEFAULT 0,
+            last_sync TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sync_status VARCHAR(20) DEFAULT 'pending',
+            PRIMARY KEY(grade, subject, board)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS usage_analytics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_hash VARCHAR(64),
+            access_count INTEGER DEFAULT 1,
+            last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_feedback INTEGER DEFAULT 0,
+            FOREIGN KEY (question_hash) REFERENCES question_bank(question_hash)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS question_bank_files (
+            file_path TEXT PRIMARY KEY,
+            file_size INTEGER,
+            file_mtime REAL,
+            questions_loaded INTEGER DEFAULT 0,
+            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS bulk_cache_jobs (
+            job_id VARCHAR(36) PRIMARY KEY,
+            status VARCHAR(20) DEFAULT 'queued',
+            total INTEGER DEFAULT 0,
+            completed INTEGER DEFAULT 0,
+            skipped INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            questions JSON,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        '''
+    ]),
+    (2, "Indexes for grade/subject/board listings and analytics", [
+        # Serves WHERE grade/subject/board and ORDER BY popularity_score DESC, difficulty_level without a sort
+        '''
+        CREATE INDEX IF NOT EXISTS idx_question_bank_grade_subject_board
+        ON question_bank (grade, subject, board, popularity_score DESC, difficulty_level)
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_question_bank_subject ON question_bank (subject)",
+        "CREATE INDEX IF NOT EXISTS idx_usage_analytics_question_hash ON usage_analytics (question_hash)"
+    ]),
+    (3, "Offline bundles: versioned manifests and content-addressed chunks", [
+        '''
+        CREATE TABLE IF NOT EXISTS offline_bundles (
+            grade VARCHAR(20),
+            subject VARCHAR(50),
+            board VARCHAR(30),
+            version INTEGER,
+            source_fingerprint VARCHAR(64),
+            manifest BLOB,
+            built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY(grade, subject, board, version)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS offline_bundle_chunks (
+            chunk_id VARCHAR(64) PRIMARY KEY,
+            kind VARCHAR(20),
+            data BLOB,
+            size INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        '''
+    ]),
+    # Created ad hoc by core/popularity.py before this migration, hence IF NOT EXISTS / OR IGNORE
+    (4, "Time-decayed question popularity and its decay landmark", [
+        '''
+        CREATE TABLE IF NOT EXISTS question_popularity (
+            question_hash VARCHAR(64) PRIMARY KEY,
+            grade VARCHAR(20),
+            subject VARCHAR(50),
+            access_count INTEGER DEFAULT 0,
+            decayed_score REAL DEFAULT 0,
+            last_accessed TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_question_popularity_grade_subject_score
+        ON question_popularity (grade, subject, decayed_score DESC)
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS popularity_meta (
+            key VARCHAR(50) PRIMARY KEY,
+            value REAL
+        )
+        ''',
+        # Landmark as Unix seconds, like time.time()
+        "INSERT OR IGNORE INTO popularity_meta (key, value) VALUES ('landmark', (julianday('now') - 2440587.5) * 86400.0)"
+    ])
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Current schema version (0 for a database that has never been migrated)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(db_path: str, migrations: List[Tuple[int, str, List[str]]]) -> int:
+    """
+    Apply pending migrations, each in its own transaction, and return the resulting version
+    BEGIN IMMEDIATE makes concurrent workers wait instead of applying the same migration twice.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        version = get_schema_version(conn)
+        for migration_version, description, statements in sorted(migrations):
+            if migration_version <= version:
+                continue
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have migrated while we waited for the lock
+                if get_schema_version(conn) >= migration_version:
+                    conn.execute("COMMIT")
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                             (migration_version, description))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            version = migration_version
+            logger.info(f"Migrated {db_path} to schema version {version}: {description}")
+
+        return version
+    finally:
+        conn.close()
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def full_table_scans(plan: List[str]) -> List[str]:
+    """Plan steps that read a whole table without an index ("SCAN t" rather than "SCAN t USING INDEX ...")"""
+    return [step for step in plan if step.startswith("SCAN ") and " USING " not in step]
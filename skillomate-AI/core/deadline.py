@@ -0,0 +1,58 @@
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Iterator
+
+# Calls with less budget than this left are not started
+MIN_CALL_SECONDS = 0.5
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before a call or stage could start"""
+
+
+class Deadline:
+    """Point in time by which a request (or one stage of it) must be finished"""
+
+    def __init__(self, seconds: float, expires_at: Optional[float] = None):
+        self.budget = seconds
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() < MIN_CALL_SECONDS
+
+    def child(self, reserve: float) -> "Deadline":
+        """Deadline for an optional stage, ending early enough to leave reserve seconds for what follows"""
+        expires_at = self.expires_at - reserve
+        return Deadline(max(0.0, expires_at - time.monotonic()), expires_at)
+
+    def elapsed(self) -> float:
+        return self.budget - (self.expires_at - time.monotonic())
+
+
+# Deadline of the work running in this context; copied into threads started with contextvars.copy_context()
+_current_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current deadline, None when there is none"""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make a deadline current for the calls made inside the block"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
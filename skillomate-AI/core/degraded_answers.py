@@ -0,0 +1,117 @@
+import logging
+from typing import Dict, Any, Optional, List, Set
+
+from core.metrics import DEGRADED_ANSWERS_TOTAL
+from core.nlu import analyze, singular
+
+logger = logging.getLogger(__name__)
+
+# Words that say nothing about what a question is about
+STOP_WORDS = {
+    "the", "and", "are", "was", "were", "what", "which", "who", "whom", "whose", "why", "how", "when", "where",
+    "does", "did", "can", "could", "would", "should", "will", "this", "that", "these", "those", "with", "from",
+    "for", "into", "about", "explain", "describe", "define", "tell", "give", "find", "show", "please", "help",
+    "me", "you", "your", "its", "their", "there", "here", "between", "some", "any", "all", "also", "then",
+    "than", "has", "have", "had", "been", "being", "use", "using", "used", "step", "steps", "answer", "question"
+}
+
+# Dice similarity of content words needed to reuse another question's answer
+MIN_MATCH_SCORE = 0.6
+
+# Keywords searched for similar questions, longest first
+SEARCH_KEYWORDS = 3
+
+NO_MATCH_MESSAGE = ("I can't reach my full tutor right now and I don't have a saved answer for this question yet. "
+                    "Please try again in a minute.")
+
+
+def content_words(text: str) -> Set[str]:
+    return {singular(word) for word in analyze(text or "").words
+            if len(word) > 2 and word not in STOP_WORDS and not word[0].isdigit()}
+
+
+def match_score(words: Set[str], other: Set[str]) -> float:
+    if not words or not other:
+        return 0.0
+    return 2 * len(words & other) / (len(words) + len(other))
+
+
+class DegradedAnswerer:
+    """
+    Best offline answer for a question while the LLM is unavailable
+    Tries, in order: the exact question in the offline cache, a pre-cached question-bank response for
+    the exact question, then the most similar cached or pre-cached question.
+    """
+
+    def __init__(self, offline_cache, question_bank=None, min_score: float = MIN_MATCH_SCORE):
+        self.offline_cache = offline_cache
+        self.question_bank = question_bank
+        self.min_score = min_score
+
+    def configure(self, question_bank=None, min_score: Optional[float] = None):
+        if question_bank is not None:
+            self.question_bank = question_bank
+        if min_score is not None:
+            self.min_score = min_score
+
+    def _bank_response(self, question: str) -> Optional[str]:
+        if self.question_bank is None:
+            return None
+        cached = self.question_bank.get_offline_response(self.question_bank._generate_question_hash(question))
+        if not cached:
+            return None
+        return cached.get("formatted_response") or cached.get("raw_response")
+
+    def _candidates(self, keywords: List[str], grade: Optional[str]) -> List[Dict[str, Any]]:
+        candidates = {}
+        for keyword in keywords:
+            for row in self.offline_cache.search_cache(keyword).get("results", []):
+                candidates.setdefault(row["question"], {"question": row["question"], "answer": row["answer"],
+                                                        "match": "similar_cache"})
+            if self.question_bank is not None:
+                for row in self.question_bank.search_offline_questions(keyword, grade=grade):
+                    candidates.setdefault(row["question"], {"question": row["question"], "answer": None,
+                                                            "match": "similar_question_bank"})
+        return list(candidates.values())
+
+    def _similar(self, question: str, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        words = content_words(question)
+        if not words:
+            return None
+        keywords = sorted(words, key=len, reverse=True)[:SEARCH_KEYWORDS]
+        scored = sorted(
+            ((match_score(words, content_words(candidate["question"])), candidate)
+             for candidate in self._candidates(keywords, context.get("grade"))),
+            key=lambda item: item[0], reverse=True
+        )
+        for score, candidate in scored:
+            if score < self.min_score:
+                break
+            answer = candidate["answer"] or self._bank_response(candidate["question"])
+            if answer:
+                return dict(candidate, answer=answer, score=round(score, 2))
+        return None
+
+    def answer(self, question: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """{"found", "answer", "match", "matched_question", "score"}; found is False when nothing matched"""
+        context = context or {}
+        result = {"found": False, "answer": NO_MATCH_MESSAGE, "match": "none", "matched_question": None, "score": 0.0}
+        try:
+            cached = self.offline_cache.retrieve_qa(question, context)
+            if cached.get("found"):
+                result.update(found=True, answer=cached["answer"], match="cache", matched_question=question, score=1.0)
+            else:
+                bank_answer = self._bank_response(question)
+                if bank_answer:
+                    result.update(found=True, answer=bank_answer, match="question_bank",
+                                  matched_question=question, score=1.0)
+                else:
+                    similar = self._similar(question, context)
+                    if similar:
+                        result.update(found=True, answer=similar["answer"], match=similar["match"],
+                                      matched_question=similar["question"], score=similar["score"])
+        except Exception as e:
+            logger.error(f"Error finding offline answer: {str(e)}")
+
+        DEGRADED_ANSWERS_TOTAL.inc(match=result["match"])
+        return result
@@ -0,0 +1,320 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterator
+
+from core.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# Section headings the ladder prompt asks for: "### Hint 1" ... "### Hint 4"
+LEVEL_HEADING = re.compile(r"^[ \t]*#{2,4}[ \t]*(?:hint|level)[ \t]*(\d+)\b[^\n]*\n", re.IGNORECASE | re.MULTILINE)
+
+
+def hint_ladder_key(question: str, grade: str, subject: str) -> str:
+    """Cache key for a question's ladder; case and spacing of the question don't matter"""
+    normalized = " ".join((question or "").lower().split())
+    return hashlib.sha256(f"{normalized}|{grade}|{subject}".lower().encode("utf-8")).hexdigest()
+
+
+class HintLadderParser:
+    """
+    Split a streamed ladder into levels
+    A level is complete once the heading of the next one has arrived, so level 1 is available long
+    before the full solution has been generated.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.emitted = 0
+
+    def _sections(self) -> List[Tuple[int, int]]:
+        return [(match.start(), match.end()) for match in LEVEL_HEADING.finditer(self.buffer)]
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text, returns the levels completed by it"""
+        self.buffer += text
+        sections = self._sections()
+        completed = []
+        # Every section but the last is followed by another heading, so it is complete
+        while self.emitted < len(sections) - 1:
+            _, body_start = sections[self.emitted]
+            body_end = sections[self.emitted + 1][0]
+            completed.append(self.buffer[body_start:body_end].strip())
+            self.emitted += 1
+        return completed
+
+    def close(self) -> List[str]:
+        """End of stream, returns the final level"""
+        sections = self._sections()
+        if self.emitted < len(sections):
+            self.emitted += 1
+            return [self.buffer[sections[-1][1]:].strip()]
+        return []
+
+
+class HintLadder:
+    """Hints for one question, from a nudge to the full solution, filled in as they are generated"""
+
+    def __init__(self, key: str, max_levels: int = 4, created_at: Optional[float] = None,
+                 on_change: Optional[Callable[["HintLadder"], None]] = None):
+        self.key = key
+        self.max_levels = max_levels
+        self.levels = []
+        self.done = False
+        self.error = None
+        self.created_at = created_at if created_at is not None else time.time()
+        self.on_change = on_change  # called after each level and at the end, e.g. to write through to a store
+        self._condition = threading.Condition()
+
+    def publish(self, text: str):
+        with self._condition:
+            if len(self.levels) < self.max_levels:
+                self.levels.append(text)
+            self._condition.notify_all()
+        self._changed()
+
+    def finish(self, error: Optional[str] = None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            try:
+                self.on_change(self)
+            except Exception as e:
+                logger.error(f"Error saving hint ladder: {str(e)}")
+
+    @property
+    def failed(self) -> bool:
+        return self.done and self.error is not None
+
+    def wait_for(self, level: int, timeout: float) -> Optional[str]:
+        """Hint text for a level, waiting while it is still being generated; None if it never arrives"""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.levels) >= level or self.done, timeout)
+            return self.levels[level - 1] if len(self.levels) >= level else None
+
+    def iter_levels(self, timeout: float) -> Iterator[Tuple[int, str]]:
+        """Yield (level, text) as each level becomes available, until the ladder is finished"""
+        level = 1
+        while level <= self.max_levels:
+            text = self.wait_for(level, timeout)
+            if text is None:
+                return
+            yield level, text
+            level += 1
+
+
+class SQLiteHintLadderStore:
+    """
+    Hint ladders in a SQLite file shared by all worker processes (the session database)
+    The worker that claims a ladder generates it and writes each level as it arrives; the others copy
+    the levels from here, so a "next hint" request served by another worker costs no LLM call.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._init_database()
+
+    def _init_database(self):
+        """Create the ladder table"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS hint_ladders (
+                    ladder_key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    levels TEXT NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error initializing hint ladder database: {str(e)}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread and process; a connection is never used across a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT owner, levels, done, error, created_at, updated_at FROM hint_ladders WHERE ladder_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        owner, levels, done, error, created_at, updated_at = row
+        return {"owner": owner, "levels": json.loads(levels), "done": bool(done), "error": error,
+                "created_at": created_at, "updated_at": updated_at}
+
+    def claim(self, key: str, owner: str, ttl: float, stale_after: float) -> Optional[Dict[str, Any]]:
+        """
+        Take over generating a ladder unless a usable one is stored; returns the stored ladder, or None
+        when the caller now owns it. Failed, expired and stalled ladders (no level for stale_after
+        seconds) can be claimed again.
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = self.load(key)
+            usable = (stored is not None and not stored["error"] and now - stored["created_at"] < ttl
+                      and (stored["done"] or now - stored["updated_at"] < stale_after))
+            if not usable:
+                conn.execute('''
+                    INSERT INTO hint_ladders (ladder_key, owner, levels, done, error, created_at, updated_at)
+                    VALUES (?, ?, '[]', 0, NULL, ?, ?)
+                    ON CONFLICT(ladder_key) DO UPDATE SET owner = excluded.owner, levels = '[]', done = 0,
+                        error = NULL, created_at = excluded.created_at, updated_at = excluded.updated_at
+                ''', (key, owner, now, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return stored if usable else None
+
+    def save(self, key: str, owner: str, levels: List[str], done: bool, error: Optional[str]):
+        """Write the owner's progress; ignored once another worker has reclaimed the ladder"""
+        self._connection().execute('''
+            UPDATE hint_ladders SET levels = ?, done = ?, error = ?, updated_at = ?
+            WHERE ladder_key = ? AND owner = ?
+        ''', (json.dumps(levels, ensure_ascii=False), int(done), error, time.time(), key, owner))
+
+    def delete_expired(self, ttl: float):
+        self._connection().execute("DELETE FROM hint_ladders WHERE created_at < ?", (time.time() - ttl,))
+
+
+class HintLadderCache:
+    """
+    Hint ladders by (question, grade, subject), least recently used evicted first
+    Each ladder is generated once, in a background thread; concurrent requests for the same question
+    share it instead of starting another generation. With a shared store, that holds across workers:
+    a ladder generated by another worker is copied from the store level by level.
+    """
+
+    def __init__(self, max_entries: int = 500, ttl: float = 86400.0, store: Optional[SQLiteHintLadderStore] = None,
+                 stale_after: float = 60.0, poll_interval: float = 0.2):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self._ladders = OrderedDict()  # key -> HintLadder
+        self._lock = threading.Lock()
+        self.generated = 0
+        self._claims = 0
+
+    def get_or_create(self, key: str, generate: Callable[[HintLadder], None], max_levels: int = 4) -> HintLadder:
+        with self._lock:
+            ladder = self._ladders.get(key)
+            # A failed or expired ladder is regenerated on the next request
+            if ladder is not None and not ladder.failed and time.time() - ladder.created_at < self.ttl:
+                self._ladders.move_to_end(key)
+                record_cache_lookup("hint_ladder", True)
+                return ladder
+
+            ladder, stored = self._new_ladder(key, max_levels)
+            self._ladders[key] = ladder
+            self._ladders.move_to_end(key)
+            while len(self._ladders) > self.max_entries:
+                self._ladders.popitem(last=False)
+            if stored is None:
+                self.generated += 1
+
+        if stored is not None:
+            record_cache_lookup("hint_ladder", True)
+            if not ladder.done:
+                threading.Thread(target=self._follow, args=(ladder,), name="hint-ladder", daemon=True).start()
+            return ladder
+
+        record_cache_lookup("hint_ladder", False)
+        threading.Thread(target=self._generate, args=(ladder, generate), name="hint-ladder", daemon=True).start()
+        return ladder
+
+    def _new_ladder(self, key: str, max_levels: int) -> Tuple[HintLadder, Optional[Dict[str, Any]]]:
+        """A ladder to generate here, or (with the stored state) one filled from the shared store"""
+        if self.store is None:
+            return HintLadder(key, max_levels), None
+
+        owner = uuid.uuid4().hex
+        try:
+            stored = self.store.claim(key, owner, self.ttl, self.stale_after)
+        except Exception as e:
+            logger.error(f"Error claiming hint ladder: {str(e)}")
+            return HintLadder(key, max_levels), None
+
+        if stored is None:
+            self._claims += 1
+            if self._claims % 500 == 0:
+                self.store.delete_expired(self.ttl)
+            store = self.store
+            on_change = lambda ladder: store.save(key, owner, list(ladder.levels), ladder.done, ladder.error)
+            return HintLadder(key, max_levels, on_change=on_change), None
+
+        ladder = HintLadder(key, max_levels, created_at=stored["created_at"])
+        self._copy(ladder, stored)
+        return ladder, stored
+
+    @staticmethod
+    def _copy(ladder: HintLadder, stored: Dict[str, Any]):
+        for text in stored["levels"][len(ladder.levels):]:
+            ladder.publish(text)
+        if stored["done"]:
+            ladder.finish(stored["error"])
+
+    def _follow(self, ladder: HintLadder):
+        """Copy levels another worker is generating until it finishes, fails or stalls"""
+        try:
+            while not ladder.done:
+                time.sleep(self.poll_interval)
+                stored = self.store.load(ladder.key)
+                if stored is None or stored["created_at"] != ladder.created_at:
+                    raise RuntimeError("Hint ladder was replaced in the shared store")
+                self._copy(ladder, stored)
+                if not ladder.done and time.time() - stored["updated_at"] >= self.stale_after:
+                    raise RuntimeError("Hint ladder generation stalled in another worker")
+        except Exception as e:
+            logger.error(f"Error following hint ladder: {str(e)}")
+            ladder.finish(str(e))
+
+    def _generate(self, ladder: HintLadder, generate: Callable[[HintLadder], None]):
+        try:
+            generate(ladder)
+            ladder.finish()
+        except Exception as e:
+            logger.error(f"Error generating hint ladder: {str(e)}")
+            ladder.finish(str(e))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ladders": len(self._ladders),
+                "max_entries": self.max_entries,
+                "generated": self.generated
+            }
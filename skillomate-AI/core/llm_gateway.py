@@ -0,0 +1,413 @@
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Iterator, Optional, Dict, Tuple
+
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.deadline import DeadlineExceeded, remaining_budget, current_deadline, MIN_CALL_SECONDS
+from core.metrics import (LLM_REQUEST_SECONDS, LLM_REQUESTS_TOTAL, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS,
+                          LLM_HEDGED_REQUESTS_TOTAL)
+
+logger = logging.getLogger(__name__)
+
+# Every agent calls the same provider, so they share one breaker per process
+LLM_CIRCUIT = CircuitBreaker("openai")
+
+# Per-call timeout in seconds (None keeps the client's own, 10 minutes for OpenAI)
+_call_timeout = None
+
+# Hedging of idempotent calls: a duplicate is sent when the first hasn't answered within the p95 latency
+_hedging = {"enabled": True, "default_delay": 3.0, "min_delay": 0.5, "max_workers": 16}
+_hedge_executor = None
+_hedge_executor_pid = None
+_hedge_executor_lock = threading.Lock()
+
+
+def configure_llm_gateway(timeout: Optional[float] = None, **breaker_settings):
+    """Set the per-call timeout and the shared circuit breaker's thresholds"""
+    global _call_timeout
+    _call_timeout = timeout
+    LLM_CIRCUIT.configure(**breaker_settings)
+
+
+def configure_hedging(enabled: bool = True, default_delay: float = 3.0, min_delay: float = 0.5,
+                      max_workers: int = 16):
+    """default_delay is used until an agent has enough latency samples for a p95"""
+    _hedging.update(enabled=enabled, default_delay=default_delay, min_delay=min_delay, max_workers=max_workers)
+
+
+def _executor() -> ThreadPoolExecutor:
+    """Threads for hedges, created on first use in each process (threads don't survive a fork)"""
+    global _hedge_executor, _hedge_executor_pid
+    with _hedge_executor_lock:
+        if _hedge_executor is None or _hedge_executor_pid != os.getpid():
+            _hedge_executor = ThreadPoolExecutor(max_workers=_hedging["max_workers"], thread_name_prefix="llm-hedge")
+            _hedge_executor_pid = os.getpid()
+        return _hedge_executor
+
+
+class _HedgeTimer:
+    """
+    One thread per process that sends hedges whose delay has run out
+    The request thread runs its primary call itself, so pool threads are only taken by hedges actually sent.
+    """
+
+    def __init__(self):
+        self._heap = []  # [due, seq, func, args]; func is None once cancelled
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pid = None
+
+    def schedule(self, delay: float, func, *args) -> list:
+        entry = [time.monotonic() + delay, next(self._seq), func, args]
+        with self._cond:
+            if self._pid != os.getpid():
+                # Threads don't survive a fork; start this process's own
+                self._heap = []
+                threading.Thread(target=self._run, name="llm-hedge-timer", daemon=True).start()
+                self._pid = os.getpid()
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+        return entry
+
+    def cancel(self, entry: list):
+        with self._cond:
+            entry[2] = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, func, args = heapq.heappop(self._heap)
+            if func is not None:
+                try:
+                    func(*args)
+                except Exception as e:
+                    logger.error(f"Error sending hedged LLM call: {str(e)}")
+
+
+_hedge_timer = _HedgeTimer()
+
+
+class _HedgedCall:
+    """Race between a primary call and its hedge; the first to finish closes the other's stream"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = {}  # attempt -> open response stream
+        self.winner = None
+        self.response = None
+        self.primary_done = False
+        self.hedge = None  # Future of the hedge once sent
+
+    def open(self, attempt: str, stream) -> bool:
+        """Register an attempt's stream; False when the race is already decided"""
+        with self.lock:
+            if self.winner is not None:
+                return False
+            self.streams[attempt] = stream
+            return True
+
+    def win(self, attempt: str, response: Any) -> bool:
+        with self.lock:
+            if self.winner is not None:
+                return False
+            self.winner, self.response = attempt, response
+            losers = [stream for name, stream in self.streams.items() if name != attempt]
+            if self.hedge is not None and attempt != "hedge":
+                self.hedge.cancel()
+        for stream in losers:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        return True
+
+    def lost(self, attempt: str) -> bool:
+        with self.lock:
+            return self.winner is not None and self.winner != attempt
+
+
+def _collect_stream(stream) -> Any:
+    """Join a streamed completion into the shape callers read from a regular one"""
+    parts = []
+    finish_reason = None
+    usage = None
+    chunk = None
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None) or usage
+        for choice in chunk.choices or []:
+            content = getattr(choice.delta, "content", None)
+            if content:
+                parts.append(content)
+            finish_reason = choice.finish_reason or finish_reason
+    message = SimpleNamespace(role="assistant", content="".join(parts))
+    return SimpleNamespace(
+        id=getattr(chunk, "id", None),
+        model=getattr(chunk, "model", None),
+        choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+        usage=usage
+    )
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx count against the provider; other 4xx are the request's fault"""
+    status = getattr(error, "status_code", None)
+    return status is None or status >= 500 or status in (408, 409, 429)
+
+
+def is_timeout(error: Exception) -> bool:
+    return "timeout" in type(error).__name__.lower()
+
+
+class LatencyTracker:
+    """Recent successful call latencies per (agent, model), for hedging delays"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, recompute_every: int = 10):
+        self.window = window
+        self.min_samples = min_samples
+        self.recompute_every = recompute_every
+        self._samples = {}  # (agent, model) -> deque of seconds
+        self._p95 = {}  # (agent, model) -> (p95, samples seen when computed)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, model: str, seconds: float):
+        key = (agent, model)
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def p95(self, agent: str, model: str) -> Optional[float]:
+        key = (agent, model)
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            cached = self._p95.get(key)
+            if cached and self._counts[key] - cached[1] < self.recompute_every:
+                return cached[0]
+            ordered = sorted(samples)
+            value = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self._p95[key] = (value, self._counts[key])
+            return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {f"{agent}:{model}": self.p95(agent, model) for agent, model in list(self._samples)}
+
+
+LLM_LATENCY = LatencyTracker()
+
+
+class LLMGateway:
+    """
+    Single entry point for chat-completion calls made by the agents
+    Records latency and token usage per agent and model. Calls go through the circuit breaker: while
+    it is open they raise CircuitOpenError at once instead of waiting for the provider. Inside a
+    deadline_scope a call's timeout is cut to the budget left, and no call starts once it is spent.
+    """
+
+    def __init__(self, client, agent: str, breaker: Optional[CircuitBreaker] = None):
+        self.client = client
+        self.agent = agent
+        self.breaker = breaker or LLM_CIRCUIT
+
+    def _before_call(self, model: str, kwargs: dict) -> bool:
+        """Check deadline and breaker and set the call's timeout; True when the deadline cut the timeout"""
+        timeout = kwargs.get("timeout", _call_timeout)
+        remaining = remaining_budget()
+        cut = False
+        if remaining is not None:
+            if remaining < MIN_CALL_SECONDS:
+                LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome="deadline")
+                raise DeadlineExceeded(f"No time left for a {self.agent} call")
+            if timeout is None or remaining < timeout:
+                timeout, cut = remaining, True
+
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome="rejected")
+            raise
+        if timeout:
+            kwargs["timeout"] = timeout
+        return cut
+
+    def chat(self, hedge: bool = False, **kwargs) -> Any:
+        """
+        Call chat.completions.create with the given arguments and record metrics
+        hedge=True is for idempotent calls: if no answer has arrived within the agent's p95 latency, a
+        duplicate request is sent and whichever answers first is used. Hedged calls are streamed so the
+        loser's connection can be closed; the result only carries choices[].message, finish_reason and usage.
+        """
+        if hedge and _hedging["enabled"]:
+            return self._hedged_chat(kwargs)
+        return self._chat(dict(kwargs))
+
+    def _chat(self, kwargs: dict) -> Any:
+        model = kwargs.get("model", "unknown")
+        cut = self._before_call(model, kwargs)
+        start = time.perf_counter()
+
+        try:
+            response = self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            duration = time.perf_counter() - start
+            # Running out of request budget says nothing about the provider
+            provider_failure = is_provider_failure(e) and not (cut and is_timeout(e))
+            self.breaker.record(duration, True if provider_failure else None)
+            LLM_REQUEST_SECONDS.observe(duration, agent=self.agent, model=model)
+            LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome="error")
+            raise
+
+        duration = time.perf_counter() - start
+        self.breaker.record(duration, False)
+        LLM_LATENCY.record(self.agent, model, duration)
+        LLM_REQUEST_SECONDS.observe(duration, agent=self.agent, model=model)
+        LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome="success")
+        self._record_usage(getattr(response, "usage", None), model)
+
+        return response
+
+    def _hedge_delay(self, model: str) -> float:
+        p95 = LLM_LATENCY.p95(self.agent, model)
+        return max(_hedging["min_delay"], p95 if p95 is not None else _hedging["default_delay"])
+
+    def _hedged_chat(self, kwargs: dict) -> Any:
+        model = kwargs.get("model", "unknown")
+        call = _HedgedCall()
+        # The hedge runs in a copy of this context so it sees the request's deadline and request ID
+        timer = _hedge_timer.schedule(self._hedge_delay(model), self._send_hedge, call, dict(kwargs),
+                                      contextvars.copy_context(), current_deadline())
+        try:
+            response = self._stream_attempt(call, "primary", dict(kwargs))
+            primary_error = None
+        except Exception as e:
+            response, primary_error = None, e
+        finally:
+            _hedge_timer.cancel(timer)
+            with call.lock:
+                call.primary_done = True
+                hedge = call.hedge
+
+        if hedge is None:
+            if primary_error is not None:
+                raise primary_error
+            return response
+
+        if response is None and primary_error is None:
+            # Closed by the hedge, which answered first
+            LLM_HEDGED_REQUESTS_TOTAL.inc(agent=self.agent, winner="hedge")
+            return call.response
+        if primary_error is None:
+            LLM_HEDGED_REQUESTS_TOTAL.inc(agent=self.agent, winner="primary")
+            return response
+
+        # The primary failed; the hedge may still answer
+        try:
+            response = hedge.result()
+        except Exception:
+            response = None
+        if response is None:
+            # The hedge may only have been refused by the breaker, so report the primary's error
+            LLM_HEDGED_REQUESTS_TOTAL.inc(agent=self.agent, winner="none")
+            raise primary_error
+        LLM_HEDGED_REQUESTS_TOTAL.inc(agent=self.agent, winner="hedge")
+        return response
+
+    def _send_hedge(self, call: _HedgedCall, kwargs: dict, context: contextvars.Context, deadline):
+        """Timer callback: queue the hedge unless the primary has finished or the budget is nearly spent"""
+        if deadline is not None and deadline.remaining() < MIN_CALL_SECONDS:
+            return
+        with call.lock:
+            if call.primary_done or call.winner is not None:
+                return
+            call.hedge = _executor().submit(context.run, self._stream_attempt, call, "hedge", kwargs)
+
+    def _stream_attempt(self, call: _HedgedCall, attempt: str, kwargs: dict) -> Any:
+        """One side of a hedged call; None when the other side won and closed this one"""
+        model = kwargs.get("model", "unknown")
+        cut = self._before_call(model, kwargs)
+        start = time.perf_counter()
+
+        try:
+            stream = self.client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs)
+            if not call.open(attempt, stream):
+                stream.close()
+            response = _collect_stream(stream)
+        except Exception as e:
+            if call.lost(attempt):
+                response = None
+            else:
+                duration = time.perf_counter() - start
+                provider_failure = is_provider_failure(e) and not (cut and is_timeout(e))
+                self.breaker.record(duration, True if provider_failure else None)
+                LLM_REQUEST_SECONDS.observe(duration, agent=self.agent, model=model)
+                LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome="error")
+                raise
+
+        duration = time.perf_counter() - start
+        if response is None or not call.win(attempt, response):
+            self.breaker.record(duration, None)
+            LLM_REQUEST_SECONDS.observe(duration, agent=self.agent, model=model)
+            LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome="cancelled")
+            return None
+
+        self.breaker.record(duration, False)
+        LLM_LATENCY.record(self.agent, model, duration)
+        LLM_REQUEST_SECONDS.observe(duration, agent=self.agent, model=model)
+        LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome="success")
+        self._record_usage(response.usage, model)
+        return response
+
+    def chat_stream(self, **kwargs) -> Iterator[str]:
+        """
+        Streaming chat call that yields content deltas; metrics are recorded when the stream ends
+        The breaker judges the stream by its time to first token and by how it ended.
+        """
+        model = kwargs.get("model", "unknown")
+        cut = self._before_call(model, kwargs)
+        start = time.perf_counter()
+        first_token = None
+        outcome = "error"
+        failed = None
+
+        try:
+            stream = self.client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs)
+            for chunk in stream:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                self._record_usage(getattr(chunk, "usage", None), model)
+                for choice in chunk.choices or []:
+                    content = getattr(choice.delta, "content", None)
+                    if content:
+                        yield content
+            outcome = "success"
+            failed = False
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            failed = True if is_provider_failure(e) and not (cut and is_timeout(e)) else None
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.breaker.record(duration if first_token is None else first_token, failed)
+            LLM_REQUEST_SECONDS.observe(duration, agent=self.agent, model=model)
+            LLM_REQUESTS_TOTAL.inc(agent=self.agent, model=model, outcome=outcome)
+
+    def _record_usage(self, usage: Any, model: str):
+        if usage is None:
+            return
+        if getattr(usage, "prompt_tokens", None) is not None:
+            LLM_PROMPT_TOKENS.observe(usage.prompt_tokens, agent=self.agent, model=model)
+        if getattr(usage, "completion_tokens", None) is not None:
+            LLM_COMPLETION_TOKENS.observe(usage.completion_tokens, agent=self.agent, model=model)
@@ -0,0 +1,195 @@
+import re
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import zlib
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from core.metrics import LOG_RECORDS_DROPPED_TOTAL
+
+# Request ID of the request being handled on this thread, "-" outside a request
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed with extra= and goes into the JSON record
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+# Personal data that must not reach the logs
+PII_KEYS = ("name", "email", "phone", "mobile", "address", "school", "parent_name", "password", "token")
+PII_PATTERNS = [
+    # 'name': 'Asha' / "email": "..." in logged dicts and JSON
+    (re.compile(r"""(['"](?:%s)['"]\s*:\s*)(['"])(?:(?!\2).)*\2""" % "|".join(PII_KEYS), re.IGNORECASE), r"\1\2[REDACTED]\2"),
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "[EMAIL]"),
+    (re.compile(r"(?<!\d)(?:\+?91[\s-]?)?[6-9]\d{4}[\s-]?\d{5}(?!\d)"), "[PHONE]"),
+    (re.compile(r"\b(?:sk|pk)-[A-Za-z0-9_-]{8,}"), "[SECRET]"),
+    (re.compile(r"(?i)\b(bearer)\s+[A-Za-z0-9._~+/=-]+"), r"\1 [SECRET]"),
+    (re.compile(r"(?i)\b(my name is|call me)\s+[A-Z][a-z]+"), r"\1 [NAME]")
+]
+
+
+def set_request_id(request_id: str) -> contextvars.Token:
+    return request_id_var.set(request_id)
+
+
+def get_request_id() -> str:
+    return request_id_var.get()
+
+
+def redact(text: str) -> str:
+    """Mask names, emails, phone numbers and secrets"""
+    for pattern, replacement in PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _redact_value(value, key: str = ""):
+    """Redact an extra= field: strings, values under PII keys, and containers and objects recursively"""
+    if key.lower() in PII_KEYS and value is not None:
+        return "[REDACTED]"
+    if isinstance(value, str):
+        return redact(value)
+    if isinstance(value, dict):
+        return {k: _redact_value(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_redact_value(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return redact(str(value))
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """'agents.conversational_homework_tutor:0.1,ai_orchestrator:0.25' -> {logger: rate}"""
+    rates = {}
+    for item in (spec or "").split(","):
+        if ":" in item:
+            name, rate = item.rsplit(":", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request ID; runs on the logging thread, before the queue"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the records below WARNING per logger (longest matching name prefix)
+    The decision is made per request ID, so a sampled request keeps all of its records.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _rate(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            return (zlib.crc32(request_id.encode("utf-8")) % 10000) / 10000 < rate
+        return random.random() < rate
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Hand records to the listener thread without formatting them on the request thread
+    A full queue drops the record instead of blocking the request.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener formats the message; only the traceback must be captured while it still exists
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED_TOTAL.inc(logger=record.name)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request ID, message and any extra= fields"""
+
+    def __init__(self, redact_pii: bool = True):
+        super().__init__()
+        self.redact_pii = redact_pii
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": redact(message) if self.redact_pii else message
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = _redact_value(value, key) if self.redact_pii else value
+        if record.exc_text:
+            entry["exception"] = redact(record.exc_text) if self.redact_pii else record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RedactingFormatter(logging.Formatter):
+    """Plain text format with the request ID and PII redaction"""
+
+    def __init__(self, fmt: str, redact_pii: bool = True):
+        super().__init__(fmt)
+        self.redact_pii = redact_pii
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        text = super().format(record)
+        return redact(text) if self.redact_pii else text
+
+
+def configure_logging(level: str = "INFO", json_format: bool = True, sampling: Optional[Dict[str, float]] = None,
+                      redact_pii: bool = True, queue_size: int = 10000,
+                      fmt: str = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s") -> QueueListener:
+    """
+    Route all logging through a bounded queue to a listener thread writing to stderr
+    The request thread only stamps, samples and enqueues records; formatting, redaction and I/O
+    happen on the listener thread.
+    """
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = AsyncQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(SamplingFilter(sampling or {}))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter(redact_pii) if json_format else RedactingFormatter(fmt, redact_pii))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
@@ -0,0 +1,357 @@
+"""
+In-process metrics for Skillomate AI
+Counters, gauges and histograms rendered in the Prometheus text exposition format
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Callable, Tuple
+
+# Latency buckets in seconds, from fast CPU stages up to slow LLM calls
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Token-count buckets for prompt/completion sizes
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Fraction of a max_tokens budget actually generated; 1.0 means the answer was cut off
+BUDGET_RATIO_BUCKETS = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0)
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value for the text exposition format"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set as {name="value",...}"""
+    parts = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value"""
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback at scrape time"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._callback = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], float]):
+        """Read the (unlabelled) value from a callback whenever metrics are scraped"""
+        self._callback = callback
+
+    def get(self, **labels) -> float:
+        if self._callback is not None:
+            return self._callback()
+        return self._values.get(self._label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        if self._callback is not None:
+            try:
+                lines.append(f"{self.name} {_format_value(self._callback())}")
+            except Exception:
+                pass
+            return lines
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed bucket boundaries"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of a block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels) -> int:
+        series = self._series.get(self._label_key(labels))
+        return series[-1] if series else 0
+
+    def get_sum(self, **labels) -> float:
+        series = self._series.get(self._label_key(labels))
+        return series[-2] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of named metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_cls, name: str, documentation: str, labelnames, **kwargs):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                return existing
+            metric = metric_cls(name, documentation, tuple(labelnames), **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames=(),
+                  buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry and the metrics shared by the app and agents
+registry = MetricsRegistry()
+
+PIPELINE_STAGE_SECONDS = registry.histogram(
+    "skillomate_pipeline_stage_seconds",
+    "Time spent in each stage of the homework pipeline",
+    ("stage",)
+)
+REQUEST_SECONDS = registry.histogram(
+    "skillomate_request_seconds",
+    "HTTP request latency by endpoint",
+    ("endpoint", "method", "status")
+)
+LLM_REQUEST_SECONDS = registry.histogram(
+    "skillomate_llm_request_seconds",
+    "Latency of LLM calls by agent and model",
+    ("agent", "model")
+)
+LLM_REQUESTS_TOTAL = registry.counter(
+    "skillomate_llm_requests_total",
+    "LLM calls by agent, model and outcome",
+    ("agent", "model", "outcome")
+)
+LLM_PROMPT_TOKENS = registry.histogram(
+    "skillomate_llm_prompt_tokens",
+    "Prompt tokens per LLM call",
+    ("agent", "model"),
+    buckets=TOKEN_BUCKETS
+)
+LLM_COMPLETION_TOKENS = registry.histogram(
+    "skillomate_llm_completion_tokens",
+    "Completion tokens per LLM call",
+    ("agent", "model"),
+    buckets=TOKEN_BUCKETS
+)
+LLM_OUTPUT_BUDGET_RATIO = registry.histogram(
+    "skillomate_llm_output_budget_ratio",
+    "Completion tokens used as a fraction of the routed max_tokens",
+    ("route", "handler"),
+    buckets=BUDGET_RATIO_BUCKETS
+)
+LLM_TRUNCATED_TOTAL = registry.counter(
+    "skillomate_llm_truncated_total",
+    "Routed LLM calls cut off by their max_tokens budget",
+    ("route", "handler")
+)
+LLM_HEDGED_REQUESTS_TOTAL = registry.counter(
+    "skillomate_llm_hedged_requests_total",
+    "LLM calls that got a duplicate request because the first was slow, by which answered first",
+    ("agent", "winner")
+)
+PIPELINE_STAGES_SKIPPED_TOTAL = registry.counter(
+    "skillomate_pipeline_stages_skipped_total",
+    "Optional pipeline stages skipped because the request's time budget was running out",
+    ("stage",)
+)
+LLM_CIRCUIT_STATE = registry.gauge(
+    "skillomate_llm_circuit_state",
+    "LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ("circuit",)
+)
+DEGRADED_ANSWERS_TOTAL = registry.counter(
+    "skillomate_degraded_answers_total",
+    "Questions answered from offline content because the LLM was unavailable, by match (none when nothing matched)",
+    ("match",)
+)
+CACHE_LOOKUPS_TOTAL = registry.counter(
+    "skillomate_cache_lookups_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ("cache", "result")
+)
+CACHE_EVICTIONS_TOTAL = registry.counter(
+    "skillomate_cache_evictions_total",
+    "Offline cache entries evicted by table and reason (age/quota/entries/bytes)",
+    ("cache", "reason")
+)
+RESPONSE_BYTES_TOTAL = registry.counter(
+    "skillomate_response_bytes_total",
+    "Response body bytes sent by endpoint and content encoding",
+    ("endpoint", "encoding")
+)
+RESPONSE_BYTES_SAVED_TOTAL = registry.counter(
+    "skillomate_response_bytes_saved_total",
+    "Bytes saved by response compression by endpoint and content encoding",
+    ("endpoint", "encoding")
+)
+DIAGRAM_RENDER_SECONDS = registry.histogram(
+    "skillomate_diagram_render_seconds",
+    "Time to render a diagram to an image",
+    ("generator", "diagram_type")
+)
+LOG_RECORDS_DROPPED_TOTAL = registry.counter(
+    "skillomate_log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+    ("logger",)
+)
+BACKGROUND_TASKS_TOTAL = registry.counter(
+    "skillomate_background_tasks_total",
+    "After-response background tasks by task and outcome (completed/retried/failed/dropped)",
+    ("task", "outcome")
+)
+BACKGROUND_TASK_SECONDS = registry.histogram(
+    "skillomate_background_task_seconds",
+    "Run time of each background task attempt",
+    ("task",)
+)
+BACKGROUND_QUEUE_DEPTH = registry.gauge(
+    "skillomate_background_queue_depth",
+    "Background tasks waiting for a worker"
+)
+ACTIVE_SESSIONS = registry.gauge(
+    "skillomate_active_sessions",
+    "Conversation sessions currently held in memory"
+)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """Record the duration of a pipeline stage"""
+    with PIPELINE_STAGE_SECONDS.time(stage=stage):
+        yield
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache hit or miss"""
+    CACHE_LOOKUPS_TOTAL.inc(cache=cache, result="hit" if hit else "miss")
@@ -0,0 +1,170 @@
+import json
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from core.curriculum_index import normalize_grade
+from core.metrics import LLM_OUTPUT_BUDGET_RATIO, LLM_TRUNCATED_TOTAL
+from core.nlu import analyze
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Budgets the tutor handlers used before routing: handler -> (max_tokens, temperature)
+HANDLER_BUDGETS = {
+    "math_problem": (400, 0.7),
+    "concept_explanation": (300, 0.8),
+    "step_by_step": (200, 0.8),
+    "factual": (150, 0.7),
+    "general": (250, 0.8)
+}
+
+# Routing table; a JSON file with any of these keys replaces the matching entry
+DEFAULT_ROUTING_TABLE = {
+    "handlers": {handler: {"max_tokens": tokens, "temperature": temperature}
+                 for handler, (tokens, temperature) in HANDLER_BUDGETS.items()},
+    # Multipliers on the handler's max_tokens
+    "answer_styles": {"Simple": 0.5, "Detailed": 1.0, "Step-by-step": 1.25, "Visual": 1.0, "Interactive": 0.75},
+    "complexity": {"basic": 0.75, "intermediate": 1.0, "advanced": 1.5},
+    # (highest grade, multiplier); grades above the last row use the last row
+    "grades": [[5, 0.8], [8, 1.0], [10, 1.1], [12, 1.25]],
+    "min_tokens": 64,
+    "max_tokens": 1200,
+    # Model aliases rules can refer to, on top of "default" (OPENAI_MODEL) and "advanced" (OPENAI_ADVANCED_MODEL)
+    "models": {},
+    # First matching rule wins. Conditions: handler, answer_style, complexity, min_grade, max_grade.
+    # Overrides: model, max_tokens, max_tokens_factor, temperature
+    "rules": [
+        {"name": "simple_basic", "answer_style": "Simple", "complexity": "basic", "temperature": 0.5},
+        {"name": "senior_advanced", "complexity": "advanced", "min_grade": 11, "model": "advanced"}
+    ]
+}
+
+# Questions this short with no complexity cue are treated as basic
+SHORT_QUESTION_WORDS = 8
+
+
+def load_routing_table(path: Optional[str] = None) -> Dict[str, Any]:
+    """Default routing table with the top-level keys of a JSON file, if given, replacing the defaults"""
+    table = dict(DEFAULT_ROUTING_TABLE)
+    if not path:
+        return table
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            table.update(json.load(f))
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading model routing table {path}: {str(e)}")
+    return table
+
+
+class ModelRouter:
+    """
+    Picks model, max_tokens and temperature for each tutor call
+    The handler's budget is scaled by answer style, question complexity and grade, then the first
+    matching rule of the routing table may override any of them. record() compares the budget with
+    the tokens actually generated so the table can be tuned from /api/metrics.
+    """
+
+    def __init__(self, default_model: str = DEFAULT_MODEL, routing_table: Optional[Dict[str, Any]] = None,
+                 advanced_model: Optional[str] = None):
+        self.default_model = default_model or DEFAULT_MODEL
+        self.table = routing_table or load_routing_table()
+        self.models = {"default": self.default_model, "advanced": advanced_model or self.default_model}
+        self.models.update(self.table.get("models", {}))
+        self._stats = {}  # route -> {"calls", "budget_tokens", "used_tokens", "truncated"}
+        self._lock = threading.Lock()
+
+    def _complexity(self, question: str) -> str:
+        features = analyze(question)
+        if not any(features.complexity_scores.values()) and len(features.words) <= SHORT_QUESTION_WORDS:
+            return "basic"
+        return features.complexity
+
+    def _grade_factor(self, grade: str) -> float:
+        rows = self.table["grades"]
+        if not grade.isdigit():
+            return 1.0
+        return next((factor for limit, factor in rows if int(grade) <= limit), rows[-1][1])
+
+    def _matches(self, rule: Dict[str, Any], handler: str, answer_style: str, complexity: str, grade: str) -> bool:
+        for key, value in (("handler", handler), ("answer_style", answer_style), ("complexity", complexity)):
+            if key in rule and rule[key] != value:
+                return False
+        if "min_grade" in rule or "max_grade" in rule:
+            if not grade.isdigit():
+                return False
+            if int(grade) < rule.get("min_grade", 0) or int(grade) > rule.get("max_grade", 99):
+                return False
+        return True
+
+    def route(self, handler: str, question: str, answer_style: str = "Detailed",
+              user_context: Optional[Dict] = None) -> Dict[str, Any]:
+        """Model, max_tokens and temperature for one call, with the inputs that chose them"""
+        table = self.table
+        budget = table["handlers"].get(handler, table["handlers"]["general"])
+        if answer_style not in table["answer_styles"]:
+            answer_style = "Detailed"
+        complexity = self._complexity(question)
+        grade = normalize_grade((user_context or {}).get("grade", ""))
+
+        max_tokens = (budget["max_tokens"] * table["answer_styles"][answer_style]
+                      * table["complexity"].get(complexity, 1.0) * self._grade_factor(grade))
+        route = {
+            "route": "default",
+            "handler": handler,
+            "answer_style": answer_style,
+            "complexity": complexity,
+            "grade": grade,
+            "model": self.default_model,
+            "temperature": budget["temperature"]
+        }
+
+        rule = next((r for r in table["rules"] if self._matches(r, handler, answer_style, complexity, grade)), None)
+        if rule:
+            route["route"] = rule.get("name", "rule")
+            if "model" in rule:
+                route["model"] = self.models.get(rule["model"], rule["model"])
+            if "temperature" in rule:
+                route["temperature"] = rule["temperature"]
+            max_tokens = rule.get("max_tokens", max_tokens * rule.get("max_tokens_factor", 1.0))
+
+        route["max_tokens"] = int(min(table["max_tokens"], max(table["min_tokens"], round(max_tokens / 10) * 10)))
+        return route
+
+    def chat_kwargs(self, route: Dict[str, Any]) -> Dict[str, Any]:
+        return {"model": route["model"], "max_tokens": route["max_tokens"], "temperature": route["temperature"]}
+
+    def record(self, route: Dict[str, Any], response: Any):
+        """Compare the predicted budget with the tokens the call actually generated"""
+        try:
+            usage = getattr(response, "usage", None)
+            used = getattr(usage, "completion_tokens", None)
+            if used is None:
+                return
+            finish_reason = response.choices[0].finish_reason if response.choices else None
+            truncated = finish_reason == "length"
+
+            LLM_OUTPUT_BUDGET_RATIO.observe(used / route["max_tokens"], route=route["route"], handler=route["handler"])
+            if truncated:
+                LLM_TRUNCATED_TOTAL.inc(route=route["route"], handler=route["handler"])
+
+            key = f"{route['route']}:{route['handler']}"
+            with self._lock:
+                stats = self._stats.setdefault(key, {"calls": 0, "budget_tokens": 0, "used_tokens": 0, "truncated": 0})
+                stats["calls"] += 1
+                stats["budget_tokens"] += route["max_tokens"]
+                stats["used_tokens"] += used
+                stats["truncated"] += int(truncated)
+
+            logger.info(
+                "Route %s (%s, %s, %s, grade %s): %s budget %d tokens, used %d%s",
+                route['route'], route['handler'], route['answer_style'], route['complexity'], route['grade'] or '?',
+                route['model'], route['max_tokens'], used, " (truncated)" if truncated else ""
+            )
+        except Exception as e:
+            logger.error(f"Error recording model route: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
@@ -0,0 +1,341 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+# Shared natural-language front end: a question is tokenized once and every keyword list the agents
+# used to scan separately is matched in the same pass, through one phrase -> labels table.
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<word>[a-z]+(?:['’-][a-z]+)*)|(?P<number>\d+(?:\.\d+)?[a-z]*)|(?P<symbol>[-+*/=<>^%()\[\]{}])"
+)
+ARITHMETIC_OPERATORS = {"+", "-", "*", "/"}
+MATH_SYMBOLS = {"+", "-", "*", "/", "="}
+
+GRADE_PATTERN = re.compile(
+    r"\b(?:class|grade|std|standard)\s*(1[0-2]|[1-9])\b"
+    r"|\b(1[0-2]|[1-9])(?:st|nd|rd|th)\s*(?:class|grade|std|standard)\b",
+    re.IGNORECASE
+)
+NAME_PATTERN = re.compile(r"\b(?:my name is|i'm|i’m|call me)\s+([a-z]+)\b|^i am ([a-z]+)\b", re.IGNORECASE)
+# Words that follow "i'm" / "i am" without being a name ("I'm stuck on this")
+NOT_NAMES = {
+    "a", "an", "the", "not", "in", "at", "from", "so", "very", "really", "also", "just", "still", "now",
+    "here", "back", "done", "ok", "okay", "fine", "good", "great", "well", "sorry", "sure", "ready",
+    "stuck", "confused", "lost", "tired", "bored", "happy", "sad", "new", "unable", "having", "trying",
+    "doing", "going", "getting", "looking", "learning", "studying", "working", "struggling", "preparing"
+}
+
+# group -> label -> phrases. Phrases are matched on whole words, hyphenated words also match as
+# separate words ("real-world" matches "real world").
+LEXICON = {
+    # ConversationalHomeworkTutor question types, checked in TUTOR_TYPE_ORDER
+    "tutor_type": {
+        "math_problem": ["solve", "calculate", "find", "equation", "formula"],
+        "identity": ["who am i", "what is my name", "do you know me"],
+        "concept_explanation": ["explain", "what is", "how does", "why does", "define"],
+        "step_by_step": ["how to", "steps", "procedure", "method"],
+        "factual": ["when", "where", "who", "what year"]
+    },
+    "greeting": {
+        "greeting": ["hi", "hello", "hey", "namaste", "good morning", "good afternoon", "good evening"]
+    },
+    # EnhancedQuestionAnalyzer type scores
+    "question_type": {
+        "mathematical": [
+            "solve", "calculate", "find", "compute", "evaluate", "simplify", "factor", "expand", "derive",
+            "integrate", "differentiate", "equation", "formula", "theorem", "proof", "problem",
+            "percentage", "fraction", "decimal", "ratio", "proportion"
+        ],
+        "conceptual": [
+            "explain", "describe", "define", "what is", "how does", "why does", "compare", "contrast", "analyze",
+            "concept", "theory", "principle", "mechanism", "process", "system",
+            "understand", "meaning", "significance", "importance", "role"
+        ],
+        "factual": [
+            "when", "where", "who", "what year", "which", "how many", "how much",
+            "date", "year", "place", "person", "number", "amount", "quantity",
+            "fact", "information", "data", "statistic", "figure"
+        ],
+        "analytical": [
+            "analyze", "evaluate", "assess", "examine", "investigate", "study",
+            "cause", "effect", "relationship", "correlation", "impact", "influence",
+            "argument", "opinion", "perspective", "viewpoint", "position"
+        ],
+        "creative": [
+            "imagine", "create", "design", "develop", "invent", "suggest", "propose",
+            "story", "essay", "poem", "drawing", "model", "project",
+            "creative", "original", "unique", "innovative"
+        ],
+        "practical": [
+            "how to", "steps", "procedure", "method", "technique", "approach",
+            "apply", "implement", "use", "practice", "demonstrate",
+            "real world", "practical", "application", "example"
+        ]
+    },
+    "complexity": {
+        "basic": [
+            "simple", "basic", "easy", "fundamental", "elementary", "what is", "define", "explain", "describe",
+            "one", "single", "first"
+        ],
+        "intermediate": [
+            "compare", "contrast", "analyze", "evaluate", "relationship", "connection", "difference",
+            "similarity", "example", "case", "scenario", "situation"
+        ],
+        "advanced": [
+            "synthesize", "evaluate", "critique", "assess", "theory", "hypothesis", "research", "study",
+            "complex", "advanced", "sophisticated", "detailed"
+        ]
+    },
+    # ConversationContextManager subjects, checked in SUBJECT_ORDER
+    "subject": {
+        "History": [
+            "gandhi", "independence", "freedom", "british", "colonial", "history", "war", "battle", "revolution",
+            "empire", "king", "queen", "emperor", "ancient", "medieval", "modern", "century", "year", "date",
+            "timeline", "civilization", "culture", "tradition", "heritage", "monument", "temple", "palace",
+            "fort", "museum", "archaeology", "artifact", "document"
+        ],
+        "Science": [
+            "photosynthesis", "cell", "atom", "molecule", "element", "compound", "reaction", "experiment",
+            "hypothesis", "theory", "law", "principle", "biology", "chemistry", "physics", "laboratory",
+            "microscope", "test", "observation", "data", "analysis", "conclusion", "energy", "force", "motion",
+            "gravity", "electricity", "magnetism", "light", "sound", "heat", "temperature", "pressure",
+            "density", "mass", "weight"
+        ],
+        "English": [
+            "grammar", "essay", "poem", "literature", "writing", "reading", "comprehension", "vocabulary",
+            "spelling", "pronunciation", "sentence", "paragraph", "story", "novel", "character", "plot",
+            "theme", "setting", "author", "poet", "writer", "book", "chapter", "verse", "stanza", "metaphor",
+            "simile", "alliteration", "rhyme", "prose", "poetry"
+        ],
+        "Mathematics": [
+            "solve", "equation", "calculate", "math", "maths", "algebra", "geometry", "trigonometry", "calculus",
+            "statistics", "probability", "fraction", "decimal", "percentage", "ratio", "proportion", "graph",
+            "function", "derivative", "integral", "matrix", "vector", "polynomial", "quadratic", "linear",
+            "exponential", "logarithm", "triangle", "circle", "square", "rectangle", "area", "perimeter",
+            "volume", "angle", "degree", "radian", "x", "y", "z", "2x", "3x", "4x", "5x", "6x", "7x", "8x", "9x",
+            "plus", "minus", "times", "divided", "equals", "equal to", "sum", "difference", "product",
+            "quotient", "add", "subtract", "multiply", "divide"
+        ]
+    },
+    # Messages that are nothing but small talk get a canned reply without any LLM call
+    "small_talk": {
+        "greeting": [
+            "hi", "hello", "hey", "hiya", "howdy", "namaste", "namaskar", "greetings", "yo", "sup",
+            "good morning", "good afternoon", "good evening", "nice to meet you"
+        ],
+        "wellbeing": ["how are you", "how are you doing", "how do you do", "what's up", "whats up", "how's it going"],
+        "thanks": ["thanks", "thank you", "thanks a lot", "thank you so much", "thx", "ty", "dhanyavad", "shukriya"],
+        "goodbye": ["bye", "goodbye", "good bye", "bye bye", "see you", "see you later", "good night", "take care"],
+        "identity": [
+            "who am i", "what is my name", "what's my name", "do you know me", "do you know my name",
+            "what do you know about me", "tell me about myself", "remember me", "do you remember me"
+        ],
+        "capabilities": [
+            "who are you", "what are you", "what can you do", "what do you do", "tell me about yourself",
+            "how can you help", "how can you help me", "what is your name", "what's your name"
+        ]
+    },
+    # Words that suggest an answer is clearer with a diagram
+    "diagram_cue": {
+        "diagram": [
+            "draw", "sketch", "diagram", "graph", "chart", "figure", "plot", "visualize", "show", "illustrate",
+            "represent", "geometry", "triangle", "circle", "rectangle", "coordinate", "axis", "circuit", "cell",
+            "atom", "molecule", "timeline", "map"
+        ]
+    },
+    # What a diagram should show; consumers map intents to their own diagram types
+    "diagram_intent": {
+        "triangle": ["triangle", "triangles", "angle", "angles", "geometry"],
+        "circle": ["circle", "circles", "circular", "radius", "diameter"],
+        "graph": ["graph", "plot"],
+        "chart": ["chart", "data", "statistics"],
+        "coordinate": ["coordinate", "coordinates", "axis", "point"],
+        "circuit": ["circuit", "electric", "battery", "current"],
+        "cell": ["cell", "nucleus", "organelle"],
+        "atom": ["atom", "molecule"],
+        "climate": ["climate", "weather", "temperature"],
+        "map": ["map", "india", "location"],
+        "timeline": ["timeline", "history", "event"]
+    }
+}
+
+TUTOR_TYPE_ORDER = ["identity", "concept_explanation", "step_by_step", "factual"]
+SMALL_TALK_ORDER = ["identity", "capabilities", "wellbeing", "thanks", "goodbye", "greeting"]
+# Words that may surround small talk without making it a real question ("hi there, thanks so much ji")
+SMALL_TALK_FILLER = {
+    "there", "everyone", "all", "again", "so", "much", "very", "a", "lot", "too", "ji", "sir", "maam", "ma'am",
+    "madam", "friend", "buddy", "bro", "dear", "teacher", "please", "ok", "okay", "hmm", "and", "today", "now",
+    "skillomate", "getskilled", "my", "name", "is", "i", "am", "i'm", "call", "me", "this", "from", "in", "it", "oh"
+}
+SMALL_TALK_MAX_WORDS = 12
+SUBJECT_ORDER = ["History", "Science", "English", "Mathematics"]
+
+
+def _compile_lexicon(lexicon: Dict[str, Dict[str, List[str]]]) -> Tuple[Dict[str, Tuple], int]:
+    """Invert the lexicon into phrase -> ((group, label), ...) and the longest phrase length"""
+    phrases = defaultdict(list)
+    for group, labels in lexicon.items():
+        for label, words in labels.items():
+            for phrase in words:
+                key = " ".join(phrase.lower().replace("-", " ").split())
+                if (group, label) not in phrases[key]:
+                    phrases[key].append((group, label))
+    return {phrase: tuple(entries) for phrase, entries in phrases.items()}, max(len(p.split()) for p in phrases)
+
+
+PHRASES, MAX_PHRASE_WORDS = _compile_lexicon(LEXICON)
+SMALL_TALK_WORDS = SMALL_TALK_FILLER | {
+    word for phrases in LEXICON["small_talk"].values() for phrase in phrases for word in phrase.split()
+}
+
+
+class QuestionFeatures:
+    """
+    Everything the agents read from a question, computed in one pass
+    Instances returned by analyze() are shared between callers and must not be modified.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.normalized = " ".join(text.lower().split())
+        self.words = []  # words (hyphenated words split) and numbers, in order
+        self.symbols = []
+        self.arithmetic_expressions = 0
+        self.matches = defaultdict(lambda: defaultdict(int))  # group -> label -> hits
+        self.leading = set()  # (group, label) matched by a phrase at the very start
+
+        self.tutor_type = "general"
+        self.type_scores = {}
+        self.complexity_scores = {}
+        self.primary_type = "general"
+        self.complexity = "intermediate"
+        self.subject = "General"
+        self.grade = None
+        self.name = None
+        self.is_greeting = False
+        self.small_talk = None  # intent when the whole message is small talk
+        self.needs_diagram = False
+        self.diagram_intents = frozenset()
+
+    def has(self, group: str, label: str) -> bool:
+        return label in self.matches.get(group, {})
+
+    def _derive(self):
+        """Fill in the derived features once the token stream has been matched"""
+        has_math_symbol = any(symbol in MATH_SYMBOLS for symbol in self.symbols)
+
+        self.type_scores = {label: self.matches["question_type"].get(label, 0) for label in LEXICON["question_type"]}
+        # Operators, brackets and "2+3" style expressions count towards a mathematical question
+        self.type_scores["mathematical"] += (
+            sum(1 for symbol in self.symbols if symbol not in ("^", "%")) + self.arithmetic_expressions
+        )
+        self.complexity_scores = {label: self.matches["complexity"].get(label, 0) for label in LEXICON["complexity"]}
+        if any(self.type_scores.values()):
+            self.primary_type = max(self.type_scores, key=self.type_scores.get)
+        if any(self.complexity_scores.values()):
+            self.complexity = max(self.complexity_scores, key=self.complexity_scores.get)
+
+        self.is_greeting = ("greeting", "greeting") in self.leading
+        if self.has("tutor_type", "math_problem") or has_math_symbol:
+            self.tutor_type = "math_problem"
+        elif self.is_greeting:
+            self.tutor_type = "greeting"
+        else:
+            self.tutor_type = next((label for label in TUTOR_TYPE_ORDER if self.has("tutor_type", label)), "general")
+
+        self.subject = next((subject for subject in SUBJECT_ORDER if self.has("subject", subject)),
+                            "Mathematics" if has_math_symbol else "General")
+
+        self.needs_diagram = bool(self.matches.get("diagram_cue"))
+        self.diagram_intents = frozenset(self.matches.get("diagram_intent", {}))
+
+        grade_match = GRADE_PATTERN.search(self.text)
+        if grade_match:
+            self.grade = f"Class {grade_match.group(1) or grade_match.group(2)}"
+        for name_match in NAME_PATTERN.finditer(self.normalized):
+            name = name_match.group(1) or name_match.group(2)
+            if name not in NOT_NAMES:
+                self.name = name.title()
+                break
+
+        self.small_talk = self._small_talk_intent()
+
+    def _small_talk_intent(self):
+        """
+        Small-talk intent if every word is small talk, an introduction ("I'm Riya, class 8") or filler
+        A bare introduction is the "introduction" intent.
+        """
+        if not (self.matches.get("small_talk") or self.name) or len(self.words) > SMALL_TALK_MAX_WORDS:
+            return None
+        remainder = GRADE_PATTERN.sub(" ", NAME_PATTERN.sub(" ", self.normalized))
+        for match in TOKEN_PATTERN.finditer(remainder):
+            if match.lastgroup != "symbol" and match.group().replace("’", "'") not in SMALL_TALK_WORDS:
+                return None
+        return next((label for label in SMALL_TALK_ORDER if self.has("small_talk", label)), "introduction")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tutor_type": self.tutor_type,
+            "primary_type": self.primary_type,
+            "complexity": self.complexity,
+            "type_scores": dict(self.type_scores),
+            "complexity_scores": dict(self.complexity_scores),
+            "subject": self.subject,
+            "grade": self.grade,
+            "name": self.name,
+            "is_greeting": self.is_greeting,
+            "small_talk": self.small_talk,
+            "needs_diagram": self.needs_diagram,
+            "diagram_intents": sorted(self.diagram_intents),
+            "word_count": len(self.words)
+        }
+
+
+def singular(word: str) -> str:
+    """Crude singular so plurals and possessives hit the lexicon ("fractions", "gandhi's")"""
+    if word.endswith("'s"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def extract_features(text: str) -> QuestionFeatures:
+    """Tokenize once and match every lexicon phrase against the token stream"""
+    features = QuestionFeatures(text or "")
+    previous = []  # last two tokens as (kind, value), for "2 + 3" style expressions
+    for match in TOKEN_PATTERN.finditer(features.normalized):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "symbol":
+            features.symbols.append(value)
+        elif kind == "number":
+            features.words.append(value)
+            if (len(previous) == 2 and previous[0][0] == "number" and previous[1][0] == "symbol"
+                    and previous[1][1] in ARITHMETIC_OPERATORS):
+                features.arithmetic_expressions += 1
+        else:
+            features.words.extend(value.replace("’", "'").split("-"))
+        previous = (previous + [(kind, value)])[-2:]
+
+    words = features.words
+    for start in range(len(words)):
+        for size in range(1, min(MAX_PHRASE_WORDS, len(words) - start) + 1):
+            entries = PHRASES.get(" ".join(words[start:start + size]), ())
+            if size == 1 and singular(words[start]) != words[start]:
+                entries = set(entries) | set(PHRASES.get(singular(words[start]), ()))
+            if not entries:
+                continue
+            for group, label in entries:
+                features.matches[group][label] += 1
+                if start == 0:
+                    features.leading.add((group, label))
+    features._derive()
+    return features
+
+
+@lru_cache(maxsize=1024)
+def analyze(text: str) -> QuestionFeatures:
+    """Features of a question, memoized so every agent handling the same turn shares one analysis"""
+    return extract_features(text)
@@ -0,0 +1,318 @@
+import json
+import gzip
+import math
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = "skillomate-offline-bundle"
+BUNDLE_FORMAT_VERSION = 1
+
+
+def canonical_json(value: Any) -> bytes:
+    """Deterministic JSON encoding, so equal content always hashes to the same chunk id"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def compress(data: bytes) -> bytes:
+    # mtime=0 keeps the gzip header, and so the bytes, identical across builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class OfflineBundleBuilder:
+    """
+    Versioned offline bundles per (grade, subject, board) for low-bandwidth sync
+    A bundle is a manifest plus content-addressed, gzip-compressed chunks: questions with their
+    pre-cached responses, grouped by topic and question hash, and one chunk per distinct diagram.
+    A chunk's id is the SHA-256 of its content, so an unchanged topic keeps its chunk id across
+    versions and clients only download chunks they don't already hold.
+    """
+
+    def __init__(self, db_path: str, chunk_size: int = 50, keep_versions: int = 10):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.keep_versions = keep_versions
+        self._build_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _fingerprint(self, conn: sqlite3.Connection, grade: str, subject: str, board: str) -> str:
+        """Cheap summary of the source rows; a bundle is rebuilt only when it changes"""
+        row = conn.execute('''
+            SELECT COUNT(*), MAX(qb.id), COUNT(pcr.id), MAX(pcr.last_updated),
+                   TOTAL(LENGTH(pcr.formatted_response)), TOTAL(LENGTH(pcr.raw_response))
+            FROM question_bank qb
+            LEFT JOIN pre_cached_responses pcr ON pcr.question_hash = qb.question_hash
+            WHERE qb.grade = ? AND qb.subject = ? AND qb.board = ?
+        ''', (grade, subject, board)).fetchone()
+        return hashlib.sha256(json.dumps(row).encode("utf-8")).hexdigest()
+
+    def _latest(self, conn: sqlite3.Connection, grade: str, subject: str,
+                board: str) -> Optional[Tuple[int, str, bytes]]:
+        return conn.execute('''
+            SELECT version, source_fingerprint, manifest
+            FROM offline_bundles
+            WHERE grade = ? AND subject = ? AND board = ?
+            ORDER BY version DESC LIMIT 1
+        ''', (grade, subject, board)).fetchone()
+
+    def get_manifest(self, grade: str, subject: str, board: str) -> Dict[str, Any]:
+        """Current manifest, rebuilding the bundle first if the question bank changed"""
+        conn = self._connect()
+        try:
+            latest = self._latest(conn, grade, subject, board)
+            if latest and latest[1] == self._fingerprint(conn, grade, subject, board):
+                return json.loads(gzip.decompress(latest[2]))
+        finally:
+            conn.close()
+        return self.build(grade, subject, board)
+
+    def get_compressed_manifest(self, grade: str, subject: str, board: str) -> Tuple[Dict[str, Any], bytes]:
+        """(manifest, gzip bytes as stored) for serving without re-encoding"""
+        manifest = self.get_manifest(grade, subject, board)
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT manifest FROM offline_bundles
+                WHERE grade = ? AND subject = ? AND board = ? AND version = ?
+            ''', (grade, subject, board, manifest["version"])).fetchone()
+        finally:
+            conn.close()
+        return manifest, row[0]
+
+    def build(self, grade: str, subject: str, board: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Build the bundle incrementally: every chunk is hashed, but only chunks not stored yet are
+        compressed and written. A new version is recorded only when the set of chunks changed.
+        """
+        with self._build_lock:
+            start_time = time.time()
+            conn = self._connect()
+            try:
+                fingerprint = self._fingerprint(conn, grade, subject, board)
+                latest = self._latest(conn, grade, subject, board)
+                if latest and latest[1] == fingerprint and not force:
+                    return json.loads(gzip.decompress(latest[2]))
+
+                chunks, question_count, response_count = self._make_chunks(conn, grade, subject, board)
+                chunk_ids = [chunk["id"] for chunk, _ in chunks]
+                existing = self._existing_chunks(conn, chunk_ids)
+
+                new_chunks = []
+                for chunk, data in chunks:
+                    if chunk["id"] in existing:
+                        chunk["size"] = existing[chunk["id"]]
+                    else:
+                        compressed = compress(data)
+                        chunk["size"] = len(compressed)
+                        new_chunks.append((chunk["id"], chunk["kind"], compressed, len(compressed)))
+                        existing[chunk["id"]] = len(compressed)
+
+                if latest:
+                    latest_manifest = json.loads(gzip.decompress(latest[2]))
+                    if sorted(c["id"] for c in latest_manifest["chunks"]) == sorted(chunk_ids):
+                        # Same content (e.g. only popularity moved): keep the version, remember the fingerprint
+                        with conn:
+                            conn.execute('''
+                                UPDATE offline_bundles SET source_fingerprint = ?
+                                WHERE grade = ? AND subject = ? AND board = ? AND version = ?
+                            ''', (fingerprint, grade, subject, board, latest[0]))
+                        return latest_manifest
+
+                conn.isolation_level = None
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = conn.execute('''
+                        SELECT COALESCE(MAX(version), 0) + 1 FROM offline_bundles
+                        WHERE grade = ? AND subject = ? AND board = ?
+                    ''', (grade, subject, board)).fetchone()[0]
+                    manifest = {
+                        "format": BUNDLE_FORMAT,
+                        "format_version": BUNDLE_FORMAT_VERSION,
+                        "grade": grade,
+                        "subject": subject,
+                        "board": board,
+                        "version": version,
+                        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "question_count": question_count,
+                        "response_count": response_count,
+                        "total_size": sum(chunk["size"] for chunk, _ in chunks),
+                        "chunks": [chunk for chunk, _ in chunks]
+                    }
+                    conn.executemany('''
+                        INSERT OR IGNORE INTO offline_bundle_chunks (chunk_id, kind, data, size)
+                        VALUES (?, ?, ?, ?)
+                    ''', new_chunks)
+                    conn.execute('''
+                        INSERT INTO offline_bundles (grade, subject, board, version, source_fingerprint, manifest)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (grade, subject, board, version, fingerprint, compress(canonical_json(manifest))))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                finally:
+                    conn.isolation_level = ""
+
+                self._collect_garbage(conn, grade, subject, board)
+            finally:
+                conn.close()
+
+            logger.info(
+                f"Built offline bundle {grade}/{subject}/{board} v{version}: {len(chunks)} chunks, "
+                f"{len(new_chunks)} new, {time.time() - start_time:.2f}s"
+            )
+            return manifest
+
+    def _make_chunks(self, conn: sqlite3.Connection, grade: str, subject: str,
+                     board: str) -> Tuple[List[Tuple[Dict[str, Any], bytes]], int, int]:
+        """Split the question bank into (chunk entry, uncompressed content) pairs"""
+        topics = defaultdict(list)
+        diagrams = {}
+        response_count = 0
+
+        for row in conn.execute('''
+            SELECT qb.question_hash, qb.question_text, qb.topic, qb.difficulty_level, qb.category,
+                   pcr.formatted_response, pcr.raw_response, pcr.diagrams, pcr.related_questions, pcr.metadata,
+                   pcr.id IS NOT NULL
+            FROM question_bank qb
+            LEFT JOIN pre_cached_responses pcr ON pcr.question_hash = qb.question_hash
+            WHERE qb.grade = ? AND qb.subject = ? AND qb.board = ?
+        ''', (grade, subject, board)):
+            (question_hash, question_text, topic, difficulty, category,
+             formatted, raw, diagrams_json, related_json, metadata_json, has_response) = row
+
+            record = {
+                "question_hash": question_hash,
+                "question": question_text,
+                "topic": topic,
+                "difficulty": difficulty,
+                "category": category,
+                "response": None
+            }
+            if has_response:
+                response_count += 1
+                diagram_ids = []
+                for diagram in json.loads(diagrams_json) if diagrams_json else []:
+                    data = canonical_json(diagram)
+                    diagram_id = hashlib.sha256(data).hexdigest()
+                    diagrams[diagram_id] = data
+                    diagram_ids.append(diagram_id)
+                record["response"] = {
+                    "formatted_response": formatted,
+                    "raw_response": raw,
+                    "related_questions": json.loads(related_json) if related_json else [],
+                    "metadata": json.loads(metadata_json) if metadata_json else {},
+                    "diagrams": diagram_ids
+                }
+            topics[topic or "general"].append(record)
+
+        chunks = []
+        question_count = 0
+        for topic in sorted(topics):
+            records = topics[topic]
+            question_count += len(records)
+            # Power-of-two bucket counts only change when a topic doubles, so adding one question
+            # rewrites one chunk instead of reshuffling the whole topic
+            buckets = 1 << max(0, math.ceil(math.log2(max(1, math.ceil(len(records) / self.chunk_size)))))
+            grouped = defaultdict(list)
+            for record in records:
+                grouped[int(record["question_hash"][:8], 16) % buckets].append(record)
+
+            for bucket in sorted(grouped):
+                items = sorted(grouped[bucket], key=lambda record: record["question_hash"])
+                data = canonical_json({"topic": topic, "questions": items})
+                chunks.append(({
+                    "id": hashlib.sha256(data).hexdigest(),
+                    "kind": "questions",
+                    "topic": topic,
+                    "count": len(items)
+                }, data))
+
+        for diagram_id in sorted(diagrams):
+            chunks.append(({"id": diagram_id, "kind": "diagram", "count": 1}, diagrams[diagram_id]))
+
+        return chunks, question_count, response_count
+
+    @staticmethod
+    def _existing_chunks(conn: sqlite3.Connection, chunk_ids: List[str]) -> Dict[str, int]:
+        existing = {}
+        for i in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[i:i + 500]
+            existing.update(conn.execute(
+                f"SELECT chunk_id, size FROM offline_bundle_chunks WHERE chunk_id IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall())
+        return existing
+
+    def _collect_garbage(self, conn: sqlite3.Connection, grade: str, subject: str, board: str):
+        """Drop manifests beyond keep_versions and chunks no remaining manifest refers to"""
+        with conn:
+            conn.execute('''
+                DELETE FROM offline_bundles
+                WHERE grade = ? AND subject = ? AND board = ? AND version <= (
+                    SELECT MAX(version) FROM offline_bundles WHERE grade = ? AND subject = ? AND board = ?
+                ) - ?
+            ''', (grade, subject, board, grade, subject, board, self.keep_versions))
+
+            referenced = set()
+            for (manifest,) in conn.execute("SELECT manifest FROM offline_bundles"):
+                referenced.update(chunk["id"] for chunk in json.loads(gzip.decompress(manifest))["chunks"])
+            stale = [(chunk_id,) for (chunk_id,) in conn.execute("SELECT chunk_id FROM offline_bundle_chunks")
+                     if chunk_id not in referenced]
+            conn.executemany("DELETE FROM offline_bundle_chunks WHERE chunk_id = ?", stale)
+
+    def _manifest_version(self, conn: sqlite3.Connection, grade: str, subject: str, board: str,
+                          version: int) -> Optional[Dict[str, Any]]:
+        row = conn.execute('''
+            SELECT manifest FROM offline_bundles
+            WHERE grade = ? AND subject = ? AND board = ? AND version = ?
+        ''', (grade, subject, board, version)).fetchone()
+        return json.loads(gzip.decompress(row[0])) if row else None
+
+    def sync(self, grade: str, subject: str, board: str, client_version: Optional[int] = None,
+             have: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        What a client at client_version (or holding the `have` chunk ids) must download
+        A client version that is unknown or already pruned gets a full sync.
+        """
+        manifest = self.get_manifest(grade, subject, board)
+
+        held = set(have or [])
+        if client_version:
+            conn = self._connect()
+            try:
+                old_manifest = self._manifest_version(conn, grade, subject, board, int(client_version))
+            finally:
+                conn.close()
+            if old_manifest:
+                held.update(chunk["id"] for chunk in old_manifest["chunks"])
+
+        current = {chunk["id"] for chunk in manifest["chunks"]}
+        missing = [chunk for chunk in manifest["chunks"] if chunk["id"] not in held]
+        return {
+            "version": manifest["version"],
+            "up_to_date": not missing and client_version == manifest["version"],
+            "manifest": manifest,
+            "missing": missing,
+            "removed": sorted(held - current),
+            "download_bytes": sum(chunk["size"] for chunk in missing),
+            "total_bytes": manifest["total_size"]
+        }
+
+    def get_chunk(self, chunk_id: str) -> Optional[bytes]:
+        """Compressed chunk content (gzip of canonical JSON) or None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT data FROM offline_bundle_chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
@@ -1,23 +1,51 @@
 import json
+import time
+import uuid
 import hashlib
 import sqlite3
 import logging
+import threading
 import os
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime, timedelta
 import pickle
 import gzip
 
+from core.metrics import record_cache_lookup
+from core.popularity import PopularityTracker
+from core.offline_bundles import OfflineBundleBuilder
+from core.db_migrations import migrate, QUESTION_BANK_MIGRATIONS
+
 logger = logging.getLogger(__name__)
 
+
+class BulkCacheBusyError(Exception):
+    """A bulk caching job can't start because it, or the maximum number of jobs, is already running"""
+
+
 class OfflineQuestionBank:
     """
     Manages pre-cached questions and responses for offline usage
     Provides comprehensive offline capability with pre-computed responses
     """
     
-    def __init__(self, db_path: str = "data/offline_question_bank.db"):
+    def __init__(self, db_path: str = "data/offline_question_bank.db",
+                 response_generator: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 bulk_workers: int = 4, bulk_batch_size: int = 20, bulk_max_jobs: int = 1,
+                 bulk_max_questions: int = 500, bulk_stale_seconds: float = 600.0,
+                 question_bank_dir: str = "data/question_banks", popularity_half_life_hours: float = 72.0,
+                 popularity_flush_seconds: float = 30.0, popularity_top_k: int = 50,
+                 bundle_chunk_size: int = 50, bundle_keep_versions: int = 10):
         self.db_path = db_path
+        self.question_bank_dir = question_bank_dir
+        self.response_generator = response_generator
+        self.bulk_workers = bulk_workers
+        self.bulk_batch_size = bulk_batch_size
+        self.bulk_max_jobs = max(1, bulk_max_jobs)
+        self.bulk_max_questions = bulk_max_questions
+        # A queued/running job whose checkpoint is older than this was interrupted and may be resumed
+        self.bulk_stale_seconds = bulk_stale_seconds
         self.question_categories = {
             "high_frequency": [],  # Most asked questions
             "exam_important": [],  # Previous year questions
@@ -31,78 +59,24 @@ class OfflineQuestionBank:
         # Initialize database
         self._init_database()
         
+        # Access counts and time-decayed popularity (batched writes, in-memory top-K)
+        self.popularity = PopularityTracker(
+            db_path,
+            half_life_hours=popularity_half_life_hours,
+            flush_interval=popularity_flush_seconds,
+            top_k=popularity_top_k
+        )
+        
+        # Compressed, delta-synced bundles for low-bandwidth clients (rebuilt lazily when the bank changes)
+        self.bundles = OfflineBundleBuilder(db_path, chunk_size=bundle_chunk_size, keep_versions=bundle_keep_versions)
+        
         # Load question banks
         self._load_question_banks()
     
     def _init_database(self):
         """Initialize SQLite database for offline question bank"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create question_bank table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS question_bank (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    question_text TEXT NOT NULL,
-                    question_hash VARCHAR(64) UNIQUE,
-                    subject VARCHAR(50),
-                    grade VARCHAR(20), 
-                    board VARCHAR(30),
-                    difficulty_level INTEGER,
-                    topic VARCHAR(100),
-                    category VARCHAR(50),
-                    popularity_score INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create pre_cached_responses table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS pre_cached_responses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    question_hash VARCHAR(64) UNIQUE,
-                    formatted_response TEXT,
-                    raw_response TEXT,
-                    diagrams JSON,
-                    related_questions TEXT,
-                    metadata JSON,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (question_hash) REFERENCES question_bank(question_hash)
-                )
-            ''')
-            
-            # Create offline_sync_status table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS offline_sync_status (
-                    grade VARCHAR(20),
-                    subject VARCHAR(50), 
-                    board VARCHAR(30),
-                    total_questions INTEGER DEFAULT 0,
-                    cached_responses INTEGER DEFAULT 0,
-                    last_sync TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    sync_status VARCHAR(20) DEFAULT 'pending',
-                    PRIMARY KEY(grade, subject, board)
-                )
-            ''')
-            
-            # Create usage_analytics table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usage_analytics (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    question_hash VARCHAR(64),
-                    access_count INTEGER DEFAULT 1,
-                    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    user_feedback INTEGER DEFAULT 0,
-                    FOREIGN KEY (question_hash) REFERENCES question_bank(question_hash)
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
-            
+            migrate(self.db_path, QUESTION_BANK_MIGRATIONS)
             logger.info("Offline question bank database initialized successfully")
             
         except Exception as e:
@@ -111,13 +85,9 @@ class OfflineQuestionBank:
     def _load_question_banks(self):
         """Load predefined question banks for different subjects and grades"""
         try:
-            # Load from JSON files if they exist
-            question_bank_path = "data/question_banks"
-            if os.path.exists(question_bank_path):
-                for filename in os.listdir(question_bank_path):
-                    if filename.endswith('.json'):
-                        file_path = os.path.join(question_bank_path, filename)
-                        self._load_question_bank_from_file(file_path)
+            # Load new or changed JSON files, one transaction per file
+            if os.path.exists(self.question_bank_dir):
+                self.load_question_bank_files([self.question_bank_dir])
             
             # If no files exist, create default question banks
             if not self._has_questions():
@@ -126,17 +96,132 @@ class OfflineQuestionBank:
         except Exception as e:
             logger.error(f"Error loading question banks: {str(e)}")
     
-    def _load_question_bank_from_file(self, file_path: str):
-        """Load question bank from JSON file"""
+    def load_question_bank_files(self, paths: List[str], force: bool = False) -> Dict[str, Any]:
+        """
+        Bulk-load question bank files (.json / .jsonl, or directories of them)
+        Files whose size and modification time match the last load are skipped unless force is set.
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, filename) for filename in sorted(os.listdir(path))
+                    if filename.endswith(('.json', '.jsonl'))
+                )
+            else:
+                files.append(path)
+        
+        conn = sqlite3.connect(self.db_path)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            loaded = {row[0]: (row[1], row[2]) for row in conn.execute(
+                "SELECT file_path, file_size, file_mtime FROM question_bank_files"
+            )}
+        finally:
+            conn.close()
+        
+        changed = []
+        for file_path in files:
+            stat = os.stat(file_path)
+            if force or loaded.get(os.path.abspath(file_path)) != (stat.st_size, stat.st_mtime):
+                changed.append((file_path, stat))
+        
+        # One transaction per file, so a malformed file is skipped without rolling back the others
+        start_time = time.perf_counter()
+        result = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "files_failed": []}
+        for file_path, stat in changed:
+            stats = self.bulk_load_questions(iter_question_file(file_path))
+            for key in ("read", "inserted", "duplicates", "invalid"):
+                result[key] += stats[key]
+            
+            if stats.get("error"):
+                logger.error(f"Skipped question bank file {file_path}: {stats['error']}")
+                result["files_failed"].append({"file": file_path, "error": stats["error"]})
+                continue
+            
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO question_bank_files (file_path, file_size, file_mtime, loaded_at)
+                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ''', (os.path.abspath(file_path), stat.st_size, stat.st_mtime))
+            finally:
+                conn.close()
+        
+        result["elapsed_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        result["files_loaded"] = len(changed) - len(result["files_failed"])
+        result["files_skipped"] = len(files) - len(changed)
+        return result
+    
+    def bulk_load_questions(self, questions, batch_size: int = 5000) -> Dict[str, Any]:
+        """
+        Insert questions from any iterable in a single transaction
+        Duplicates are dropped in memory by hash and against the table by INSERT OR IGNORE.
+        """
+        start_time = time.perf_counter()
+        seen = set()
+        stats = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                changes_before = conn.total_changes
+                rows = []
+                for question_data in questions:
+                    stats["read"] += 1
+                    question_text = question_data.get("question") if isinstance(question_data, dict) else None
+                    if not question_text:
+                        stats["invalid"] += 1
+                        continue
+                    
+                    question_hash = self._generate_question_hash(question_text)
+                    if question_hash in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add(question_hash)
+                    
+                    rows.append((
+                        question_text,
+                        question_hash,
+                        question_data.get("subject", "General"),
+                        question_data.get("grade", "Class 8"),
+                        question_data.get("board", "CBSE"),
+                        question_data.get("difficulty", 1),
+                        question_data.get("topic", "general"),
+                        question_data.get("category", "basic")
+                    ))
+                    
+                    if len(rows) >= batch_size:
+                        self._insert_question_rows(conn, rows)
+                        rows = []
                 
-            for question_data in data.get('questions', []):
-                self._add_question_to_bank(question_data)
+                if rows:
+                    self._insert_question_rows(conn, rows)
                 
+                stats["inserted"] = conn.total_changes - changes_before
+                stats["duplicates"] += len(seen) - stats["inserted"]
         except Exception as e:
-            logger.error(f"Error loading question bank from {file_path}: {str(e)}")
+            logger.error(f"Error bulk loading questions: {str(e)}")
+            stats["error"] = str(e)
+        finally:
+            conn.close()
+        
+        stats["elapsed_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        if stats["read"]:
+            logger.info(f"Loaded {stats['inserted']} new questions ({stats['duplicates']} duplicates, "
+                        f"{stats['invalid']} invalid) in {stats['elapsed_ms']} ms")
+        return stats
+    
+    def _insert_question_rows(self, conn: sqlite3.Connection, rows: List[tuple]):
+        conn.executemany('''
+            INSERT OR IGNORE INTO question_bank
+            (question_text, question_hash, subject, grade, board, difficulty_level, topic, category)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    
+    def _load_question_bank_from_file(self, file_path: str):
+        """Load question bank from JSON file"""
+        self.bulk_load_questions(iter_question_file(file_path))
     
     def _create_default_question_banks(self):
         """Create default question banks for common subjects"""
@@ -211,13 +296,12 @@ class OfflineQuestionBank:
             }
         }
         
-        for subject, grades in default_questions.items():
-            for grade, questions in grades.items():
-                for question_data in questions:
-                    question_data["subject"] = subject
-                    question_data["grade"] = grade
-                    question_data["board"] = "CBSE"
-                    self._add_question_to_bank(question_data)
+        self.bulk_load_questions(
+            {**question_data, "subject": subject, "grade": grade, "board": "CBSE"}
+            for subject, grades in default_questions.items()
+            for grade, questions in grades.items()
+            for question_data in questions
+        )
     
     def _add_question_to_bank(self, question_data: Dict[str, Any]):
         """Add a question to the question bank"""
@@ -318,30 +402,392 @@ class OfflineQuestionBank:
             logger.error(f"Error generating question bank: {str(e)}")
             return {"error": str(e)}
     
-    def cache_responses_bulk(self, questions_list: List[Dict[str, Any]]) -> bool:
-        """Pre-compute and cache responses for question list"""
+    def set_response_generator(self, response_generator: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """Set the function used to generate answers for bulk caching"""
+        self.response_generator = response_generator
+    
+    def cache_responses_bulk(self, questions_list: List[Dict[str, Any]], job_id: Optional[str] = None,
+                             max_workers: Optional[int] = None, batch_size: Optional[int] = None,
+                             overwrite: bool = False,
+                             progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Pre-compute and cache responses for question list
+        Answers are generated concurrently (at most max_workers LLM calls in flight) and written in
+        batched transactions together with the job checkpoint, so an interrupted run can be resumed:
+        questions that already have a cached response are skipped unless overwrite is set.
+        """
+        max_workers = max_workers or self.bulk_workers
+        batch_size = batch_size or self.bulk_batch_size
+        
         try:
-            success_count = 0
+            questions = [q for q in questions_list if q.get("question")]
+            if job_id is None:
+                job_id = self._create_bulk_job(questions)
+            
+            done_hashes = set() if overwrite else self._get_cached_hashes(
+                [self._generate_question_hash(q["question"]) for q in questions]
+            )
+            pending = [q for q in questions if self._generate_question_hash(q["question"]) not in done_hashes]
+            
+            progress = {
+                "total": len(questions),
+                "completed": 0,
+                "skipped": len(questions) - len(pending),
+                "failed": 0
+            }
+            self._update_bulk_job(job_id, status="running", **progress)
+            
+            generate = self.response_generator or self._generate_placeholder_response
+            if self.response_generator is None:
+                logger.warning("No response generator configured, caching placeholder responses")
+            
+            start_time = time.perf_counter()
+            checkpoint_at = start_time
+            batch = []
             
-            for question_data in questions_list:
-                question_text = question_data.get("question", "")
-                if not question_text:
-                    continue
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-cache") as executor:
+                remaining = iter(pending)
+                in_flight = {}
                 
-                # Generate response using AI (this would be called from the main AI service)
-                # For now, we'll create a placeholder response
-                response_data = self._generate_placeholder_response(question_data)
+                while True:
+                    # Keep a bounded number of generations queued instead of submitting everything up front
+                    while len(in_flight) < max_workers * 2:
+                        question_data = next(remaining, None)
+                        if question_data is None:
+                            break
+                        in_flight[executor.submit(generate, question_data)] = question_data
+                    
+                    if not in_flight:
+                        break
+                    
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        question_data = in_flight.pop(future)
+                        try:
+                            batch.append((question_data, future.result()))
+                        except Exception as e:
+                            progress["failed"] += 1
+                            logger.error(f"Error generating response for '{question_data['question'][:60]}': {str(e)}")
+                    
+                    if len(batch) >= batch_size:
+                        progress["completed"] += self._write_response_batch(batch, job_id, progress)
+                        batch = []
+                        checkpoint_at = time.perf_counter()
+                        self._report_bulk_progress(job_id, progress, start_time, progress_callback)
+                    elif time.perf_counter() - checkpoint_at >= self.bulk_stale_seconds / 4:
+                        # Keep the job from looking interrupted while no batch fills up (e.g. every call failing)
+                        self._update_bulk_job(job_id, failed=progress["failed"])
+                        checkpoint_at = time.perf_counter()
                 
-                # Cache the response
-                if self._cache_response(question_text, response_data):
-                    success_count += 1
+                if batch:
+                    progress["completed"] += self._write_response_batch(batch, job_id, progress)
+                    self._report_bulk_progress(job_id, progress, start_time, progress_callback)
             
-            logger.info(f"Successfully cached {success_count}/{len(questions_list)} responses")
-            return success_count > 0
+            self._update_sync_status(questions)
+            self._update_bulk_job(job_id, status="completed", **progress)
+            
+            logger.info(f"Successfully cached {progress['completed']}/{len(questions)} responses "
+                        f"({progress['skipped']} already cached, {progress['failed']} failed)")
+            
+            return {
+                "success": progress["failed"] == 0 or progress["completed"] > 0,
+                "job_id": job_id,
+                "status": "completed",
+                **progress
+            }
             
         except Exception as e:
             logger.error(f"Error caching responses bulk: {str(e)}")
-            return False
+            if job_id:
+                self._update_bulk_job(job_id, status="failed", error=str(e))
+            return {"success": False, "job_id": job_id, "status": "failed", "error": str(e)}
+    
+    def start_bulk_cache_job(self, questions_list: List[Dict[str, Any]], overwrite: bool = False) -> str:
+        """
+        Run cache_responses_bulk in a background thread, returns the job id
+        Raises ValueError for more than bulk_max_questions questions and BulkCacheBusyError when
+        bulk_max_jobs jobs are already running.
+        """
+        questions = [q for q in questions_list if q.get("question")]
+        if len(questions) > self.bulk_max_questions:
+            raise ValueError(f"A bulk cache job takes at most {self.bulk_max_questions} questions")
+        
+        job_id = self._create_bulk_job(questions)
+        threading.Thread(
+            target=self.cache_responses_bulk,
+            args=(questions,),
+            kwargs={"job_id": job_id, "overwrite": overwrite},
+            name=f"bulk-cache-{job_id[:8]}",
+            daemon=True
+        ).start()
+        return job_id
+    
+    def resume_bulk_cache_job(self, job_id: str, background: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Resume an interrupted job from its stored question list; already cached questions are skipped
+        Returns None for an unknown job and raises BulkCacheBusyError while the job (or too many others) is running.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("SELECT questions FROM bulk_cache_jobs WHERE job_id = ?", (job_id,))
+            result = cursor.fetchone()
+            conn.close()
+            
+            if not result:
+                return None
+            
+            questions = json.loads(result[0]) if result[0] else []
+            self._claim_bulk_job(job_id)
+            if not background:
+                return self.cache_responses_bulk(questions, job_id=job_id)
+            
+            threading.Thread(
+                target=self.cache_responses_bulk,
+                args=(questions,),
+                kwargs={"job_id": job_id},
+                name=f"bulk-cache-{job_id[:8]}",
+                daemon=True
+            ).start()
+            return self.get_bulk_job_status(job_id)
+            
+        except BulkCacheBusyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error resuming bulk cache job: {str(e)}")
+            return None
+    
+    def get_bulk_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get progress of a bulk caching job"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT status, total, completed, skipped, failed, error, created_at, updated_at
+                FROM bulk_cache_jobs WHERE job_id = ?
+            ''', (job_id,))
+            result = cursor.fetchone()
+            conn.close()
+            
+            if not result:
+                return None
+            
+            status, total, completed, skipped, failed, error, created_at, updated_at = result
+            processed = completed + skipped + failed
+            return {
+                "job_id": job_id,
+                "status": status,
+                "total": total,
+                "completed": completed,
+                "skipped": skipped,
+                "failed": failed,
+                "progress_percentage": round(processed / total * 100, 1) if total > 0 else 100.0,
+                "error": error,
+                "created_at": created_at,
+                "updated_at": updated_at
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting bulk job status: {str(e)}")
+            return None
+    
+    def _create_bulk_job(self, questions: List[Dict[str, Any]]) -> str:
+        """Record a new bulk caching job with its question list (used for resuming)"""
+        job_id = str(uuid.uuid4())
+        self._claim_bulk_job(job_id, questions)
+        return job_id
+    
+    def _claim_bulk_job(self, job_id: str, questions: Optional[List[Dict[str, Any]]] = None):
+        """
+        Queue a job (inserting it when questions are given) unless it or bulk_max_jobs others are active
+        Checked and written in one BEGIN IMMEDIATE transaction, so workers sharing the database can't
+        both claim the last slot. Jobs without a checkpoint for bulk_stale_seconds don't count.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                active = {row[0] for row in conn.execute(
+                    "SELECT job_id FROM bulk_cache_jobs WHERE status IN ('queued', 'running') AND updated_at > datetime('now', ?)",
+                    (f"-{int(self.bulk_stale_seconds)} seconds",)
+                )}
+                if job_id in active:
+                    raise BulkCacheBusyError(f"Bulk cache job {job_id} is already running")
+                if len(active) >= self.bulk_max_jobs:
+                    raise BulkCacheBusyError(f"{len(active)} bulk cache jobs are already running")
+                
+                if questions is None:
+                    conn.execute(
+                        "UPDATE bulk_cache_jobs SET status = 'queued', error = NULL, updated_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+                        (job_id,)
+                    )
+                else:
+                    conn.execute(
+                        "INSERT INTO bulk_cache_jobs (job_id, status, total, questions) VALUES (?, 'queued', ?, ?)",
+                        (job_id, len(questions), json.dumps(questions, ensure_ascii=False))
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+    
+    def _update_bulk_job(self, job_id: str, **fields):
+        """Update job status/counters"""
+        columns = [c for c in ("status", "total", "completed", "skipped", "failed", "error") if c in fields]
+        if not columns:
+            return
+        try:
+            conn = sqlite3.connect(self.db_path)
+            with conn:
+                conn.execute(
+                    f"UPDATE bulk_cache_jobs SET {', '.join(f'{c} = ?' for c in columns)}, "
+                    f"updated_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+                    [fields[c] for c in columns] + [job_id]
+                )
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error updating bulk cache job: {str(e)}")
+    
+    def _get_cached_hashes(self, question_hashes: List[str]) -> set:
+        """Return the subset of hashes that already have a cached response"""
+        cached = set()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for i in range(0, len(question_hashes), 500):
+            chunk = question_hashes[i:i + 500]
+            cursor.execute(
+                f"SELECT question_hash FROM pre_cached_responses WHERE question_hash IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            cached.update(row[0] for row in cursor.fetchall())
+        conn.close()
+        return cached
+    
+    def _write_response_batch(self, batch: List, job_id: str, progress: Dict[str, Any]) -> int:
+        """Write generated responses and the job checkpoint in one transaction"""
+        question_rows = []
+        response_rows = []
+        for question_data, response_data in batch:
+            question_hash = self._generate_question_hash(question_data["question"])
+            question_rows.append((
+                question_data["question"],
+                question_hash,
+                question_data.get("subject", "General"),
+                question_data.get("grade", "Class 8"),
+                question_data.get("board", "CBSE"),
+                question_data.get("difficulty", 1),
+                question_data.get("topic", "general"),
+                question_data.get("category", "basic")
+            ))
+            response_rows.append((
+                question_hash,
+                response_data.get("formatted_response", ""),
+                response_data.get("raw_response", ""),
+                json.dumps(response_data.get("diagrams", [])),
+                json.dumps(response_data.get("related_questions", [])),
+                json.dumps(response_data.get("metadata", {}))
+            ))
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT OR IGNORE INTO question_bank
+                    (question_text, question_hash, subject, grade, board, difficulty_level, topic, category)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', question_rows)
+                conn.executemany('''
+                    INSERT INTO pre_cached_responses
+                    (question_hash, formatted_response, raw_response, diagrams, related_questions, metadata)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(question_hash) DO UPDATE SET
+                        formatted_response = excluded.formatted_response,
+                        raw_response = excluded.raw_response,
+                        diagrams = excluded.diagrams,
+                        related_questions = excluded.related_questions,
+                        metadata = excluded.metadata,
+                        last_updated = CURRENT_TIMESTAMP
+                ''', response_rows)
+                conn.execute('''
+                    UPDATE bulk_cache_jobs SET completed = ?, failed = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE job_id = ?
+                ''', (progress["completed"] + len(batch), progress["failed"], job_id))
+        finally:
+            conn.close()
+        
+        return len(batch)
+    
+    def _report_bulk_progress(self, job_id: str, progress: Dict[str, Any], start_time: float,
+                              progress_callback: Optional[Callable[[Dict[str, Any]], None]]):
+        """Log progress with throughput and ETA"""
+        elapsed = time.perf_counter() - start_time
+        processed = progress["completed"] + progress["failed"]
+        remaining = progress["total"] - progress["skipped"] - processed
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        report = {
+            "job_id": job_id,
+            **progress,
+            "rate_per_second": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None
+        }
+        logger.info(f"Bulk cache {job_id[:8]}: {processed + progress['skipped']}/{progress['total']} "
+                    f"({progress['failed']} failed, {rate:.2f}/s)")
+        if progress_callback:
+            progress_callback(report)
+    
+    def _update_sync_status(self, questions: List[Dict[str, Any]]):
+        """Refresh offline_sync_status for every grade/subject/board touched by a bulk run"""
+        combos = {
+            (q.get("grade", "Class 8"), q.get("subject", "General"), q.get("board", "CBSE"))
+            for q in questions
+        }
+        try:
+            conn = sqlite3.connect(self.db_path)
+            with conn:
+                for grade, subject, board in combos:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO offline_sync_status
+                        (grade, subject, board, total_questions, cached_responses, last_sync, sync_status)
+                        SELECT ?, ?, ?, COUNT(qb.question_hash), COUNT(pcr.question_hash), CURRENT_TIMESTAMP,
+                               CASE WHEN COUNT(qb.question_hash) = COUNT(pcr.question_hash) THEN 'synced' ELSE 'partial' END
+                        FROM question_bank qb
+                        LEFT JOIN pre_cached_responses pcr ON qb.question_hash = pcr.question_hash
+                        WHERE qb.grade = ? AND qb.subject = ? AND qb.board = ?
+                    ''', (grade, subject, board, grade, subject, board))
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error updating sync status: {str(e)}")
+    
+    def get_uncached_questions(self, grade: str, subject: str, board: str) -> List[Dict[str, Any]]:
+        """Questions in the bank for a grade/subject/board that have no cached response yet"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT qb.question_text, qb.topic, qb.difficulty_level, qb.category
+                FROM question_bank qb
+                LEFT JOIN pre_cached_responses pcr ON qb.question_hash = pcr.question_hash
+                WHERE qb.grade = ? AND qb.subject = ? AND qb.board = ? AND pcr.question_hash IS NULL
+                ORDER BY qb.popularity_score DESC
+            ''', (grade, subject, board))
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [{
+                "question": question_text,
+                "topic": topic,
+                "difficulty": difficulty,
+                "category": category,
+                "grade": grade,
+                "subject": subject,
+                "board": board
+            } for question_text, topic, difficulty, category in results]
+            
+        except Exception as e:
+            logger.error(f"Error getting uncached questions: {str(e)}")
+            return []
     
     def _generate_placeholder_response(self, question_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate placeholder response for caching"""
@@ -428,6 +874,7 @@ class OfflineQuestionBank:
             
             if result:
                 formatted_response, raw_response, diagrams_json, related_questions_json, metadata_json = result
+                record_cache_lookup("question_bank", True)
                 
                 # Update access count
                 self._update_access_count(question_hash)
@@ -442,6 +889,7 @@ class OfflineQuestionBank:
                     "source": "offline_cache"
                 }
             
+            record_cache_lookup("question_bank", False)
             return None
             
         except Exception as e:
@@ -449,38 +897,19 @@ class OfflineQuestionBank:
             return None
     
     def _update_access_count(self, question_hash: str):
-        """Update access count for analytics"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO usage_analytics (question_hash, access_count, last_accessed)
-                VALUES (?, 
-                    COALESCE((SELECT access_count FROM usage_analytics WHERE question_hash = ?), 0) + 1,
-                    CURRENT_TIMESTAMP)
-            ''', (question_hash, question_hash))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logger.error(f"Error updating access count: {str(e)}")
+        """Update access count for analytics (buffered, written on the next popularity flush)"""
+        self.popularity.record(question_hash)
     
     def update_popularity_scores(self, question_patterns: Dict[str, int]) -> None:
         """Update question priority based on usage patterns"""
         try:
             conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            for question_hash, popularity in question_patterns.items():
-                cursor.execute('''
+            with conn:
+                conn.executemany('''
                     UPDATE question_bank 
                     SET popularity_score = popularity_score + ?
                     WHERE question_hash = ?
-                ''', (popularity, question_hash))
-            
-            conn.commit()
+                ''', [(popularity, question_hash) for question_hash, popularity in question_patterns.items()])
             conn.close()
             
         except Exception as e:
@@ -530,18 +959,24 @@ class OfflineQuestionBank:
             return {"error": str(e)}
     
     def get_popular_questions(self, grade: str, subject: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get most popular questions for a grade and subject"""
+        """Get most popular questions for a grade and subject (recent accesses count most)"""
         try:
+            popular_questions = self.popularity.top(grade, subject, limit)
+            if popular_questions is not None:
+                return popular_questions
+            
+            # Larger than the in-memory top-K: read straight from the popularity index
+            self.popularity.flush()
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT qb.question_text, qb.topic, qb.difficulty_level, 
-                       COALESCE(ua.access_count, 0) as access_count
+                       COALESCE(qp.access_count, 0) as access_count
                 FROM question_bank qb
-                LEFT JOIN usage_analytics ua ON qb.question_hash = ua.question_hash
+                LEFT JOIN question_popularity qp ON qb.question_hash = qp.question_hash
                 WHERE qb.grade = ? AND qb.subject = ?
-                ORDER BY access_count DESC, qb.popularity_score DESC
+                ORDER BY COALESCE(qp.decayed_score, 0) DESC, qb.popularity_score DESC
                 LIMIT ?
             ''', (grade, subject, limit))
             
@@ -652,6 +1087,7 @@ class OfflineQuestionBank:
     def get_analytics(self, grade: str = None, subject: str = None) -> Dict[str, Any]:
         """Get analytics for question bank usage"""
         try:
+            self.popularity.flush()
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
@@ -660,11 +1096,11 @@ class OfflineQuestionBank:
                 SELECT 
                     COUNT(DISTINCT qb.question_hash) as total_questions,
                     COUNT(DISTINCT pcr.question_hash) as cached_responses,
-                    AVG(COALESCE(ua.access_count, 0)) as avg_access_count,
-                    MAX(ua.last_accessed) as last_accessed
+                    AVG(COALESCE(qp.access_count, 0)) as avg_access_count,
+                    MAX(qp.last_accessed) as last_accessed
                 FROM question_bank qb
                 LEFT JOIN pre_cached_responses pcr ON qb.question_hash = pcr.question_hash
-                LEFT JOIN usage_analytics ua ON qb.question_hash = ua.question_hash
+                LEFT JOIN question_popularity qp ON qb.question_hash = qp.question_hash
             '''
             
             params = []
@@ -695,3 +1131,193 @@ class OfflineQuestionBank:
         except Exception as e:
             logger.error(f"Error getting analytics: {str(e)}")
             return {}
+
+
+def _read_more(f, buffer: str, chunk_size: int) -> str:
+    chunk = f.read(chunk_size)
+    if not chunk:
+        raise EOFError
+    return buffer + chunk
+
+
+def _skip_whitespace(f, buffer: str, pos: int, chunk_size: int, skip: str = " \t\r\n"):
+    """Advance past whitespace (and any extra characters in skip), reading more input as needed"""
+    while True:
+        while pos < len(buffer) and buffer[pos] in skip:
+            pos += 1
+        if pos < len(buffer):
+            return buffer, pos
+        buffer, pos = _read_more(f, "", chunk_size), 0
+
+
+def _decode_value(f, decoder: json.JSONDecoder, buffer: str, pos: int, chunk_size: int):
+    """Decode one JSON value at pos, reading more input until it is complete"""
+    while True:
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+            # A number at the end of the buffer may continue in the next chunk
+            if end < len(buffer) or isinstance(value, (dict, list, str)):
+                return value, buffer, end
+        except json.JSONDecodeError:
+            pass
+        try:
+            buffer = _read_more(f, buffer[pos:], chunk_size)
+            pos = 0
+        except EOFError:
+            value, end = decoder.raw_decode(buffer, pos)  # raises the real error on truncated input
+            return value, buffer, end
+
+
+def iter_question_file(file_path: str, chunk_size: int = 1 << 16):
+    """
+    Stream questions from a question bank file without loading it all into memory
+    Accepts {"questions": [...]} (other top-level keys are skipped), a bare [...] array, or JSON Lines.
+    """
+    decoder = json.JSONDecoder()
+    
+    with open(file_path, "r", encoding="utf-8") as f:
+        if file_path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        
+        try:
+            buffer, pos = _skip_whitespace(f, "", 0, chunk_size)
+            
+            if buffer[pos] == "{":
+                buffer, pos = _skip_whitespace(f, buffer, pos + 1, chunk_size)
+                while buffer[pos] != "}":
+                    key, buffer, pos = _decode_value(f, decoder, buffer, pos, chunk_size)
+                    buffer, pos = _skip_whitespace(f, buffer, pos, chunk_size, " \t\r\n:")
+                    if key == "questions" and buffer[pos] == "[":
+                        break
+                    _, buffer, pos = _decode_value(f, decoder, buffer, pos, chunk_size)
+                    buffer, pos = _skip_whitespace(f, buffer, pos, chunk_size, " \t\r\n,")
+                else:
+                    return  # no questions array
+            
+            if buffer[pos] != "[":
+                raise ValueError(f"Expected a questions array in {file_path}")
+            
+            buffer, pos = _skip_whitespace(f, buffer, pos + 1, chunk_size)
+            while buffer[pos] != "]":
+                question_data, buffer, pos = _decode_value(f, decoder, buffer, pos, chunk_size)
+                yield question_data
+                # Drop consumed input so memory stays bounded by one question plus one chunk
+                buffer, pos = buffer[pos:], 0
+                buffer, pos = _skip_whitespace(f, buffer, pos, chunk_size, " \t\r\n,")
+        except EOFError:
+            raise ValueError(f"Unexpected end of file in {file_path}")
+
+
+def make_tutor_response_generator(tutor, board_templates=None) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build a bulk-cache response generator backed by the conversational tutor
+    Raises on tutor failures so fallback text is never cached as an answer.
+    """
+    def generate(question_data: Dict[str, Any]) -> Dict[str, Any]:
+        subject = question_data.get("subject", "General")
+        grade = question_data.get("grade", "Class 8")
+        board = question_data.get("board", "CBSE")
+        user_context = {"subject": subject, "grade": grade, "board": board, "topic": question_data.get("topic", "general")}
+        
+        result = tutor.generate_conversational_response(question_data["question"], user_context, [], None)
+        if not result.get("success", True) or result.get("fallback"):
+            raise RuntimeError(result.get("error", "Tutor returned a fallback response"))
+        
+        raw_response = result["response"]
+        formatted_response = raw_response
+        if board_templates:
+            formatted_response = board_templates.apply_board_template(raw_response, board, subject, "general")
+        
+        return {
+            "formatted_response": formatted_response,
+            "raw_response": raw_response,
+            "diagrams": [],
+            "related_questions": result.get("suggestions", []),
+            "metadata": {
+                "subject": subject,
+                "grade": grade,
+                "board": board,
+                "topic": question_data.get("topic", "general"),
+                "difficulty": question_data.get("difficulty", 1),
+                "generated_by": "conversational_tutor",
+                "generated_at": datetime.now().isoformat()
+            }
+        }
+    
+    return generate
+
+
+def main():
+    """Pre-generate offline responses from the command line"""
+    import argparse
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    from config import (OFFLINE_QUESTION_BANK_DB_PATH, OFFLINE_QUESTION_BANK_DIR, OFFLINE_BULK_CACHE_WORKERS,
+                        OFFLINE_BULK_CACHE_BATCH_SIZE, OFFLINE_BULK_CACHE_MAX_JOBS, OFFLINE_BULK_CACHE_STALE_SECONDS,
+                        LOG_FORMAT)
+    
+    parser = argparse.ArgumentParser(description="Pre-generate and cache answers for the offline question bank")
+    parser.add_argument("--grade", help="Cache uncached bank questions for this grade (e.g. 'Class 8')")
+    parser.add_argument("--subject", help="Subject for --grade")
+    parser.add_argument("--board", default="CBSE", help="Board for --grade (default CBSE)")
+    parser.add_argument("--file", help="JSON file with a 'questions' list to cache instead")
+    parser.add_argument("--resume", metavar="JOB_ID", help="Resume an interrupted job")
+    parser.add_argument("--status", metavar="JOB_ID", help="Show progress of a job and exit")
+    parser.add_argument("--load", nargs="+", metavar="PATH",
+                        help="Bulk-load question bank files or directories (.json/.jsonl) and exit")
+    parser.add_argument("--force", action="store_true", help="With --load, reload files even if unchanged")
+    parser.add_argument("--workers", type=int, default=OFFLINE_BULK_CACHE_WORKERS, help="Concurrent LLM calls")
+    parser.add_argument("--batch-size", type=int, default=OFFLINE_BULK_CACHE_BATCH_SIZE, help="Responses per transaction")
+    parser.add_argument("--overwrite", action="store_true", help="Regenerate questions that already have answers")
+    parser.add_argument("--placeholder", action="store_true", help="Cache placeholder answers (no LLM calls)")
+    parser.add_argument("--db", default=OFFLINE_QUESTION_BANK_DB_PATH, help="Question bank database path")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    
+    bank = OfflineQuestionBank(args.db, bulk_workers=args.workers, bulk_batch_size=args.batch_size,
+                               bulk_max_jobs=OFFLINE_BULK_CACHE_MAX_JOBS, bulk_stale_seconds=OFFLINE_BULK_CACHE_STALE_SECONDS,
+                               question_bank_dir=OFFLINE_QUESTION_BANK_DIR)
+    
+    if args.load:
+        print(json.dumps(bank.load_question_bank_files(args.load, force=args.force), indent=2))
+        return
+    
+    if args.status:
+        print(json.dumps(bank.get_bulk_job_status(args.status), indent=2))
+        return
+    
+    if not (args.resume or args.file or (args.grade and args.subject)):
+        parser.error("Pass --file, --grade and --subject, --resume, --status or --load")
+    
+    if not args.placeholder:
+        from agents.conversational_homework_tutor import ConversationalHomeworkTutor
+        from core.board_templates import BoardSpecificTemplates
+        bank.set_response_generator(make_tutor_response_generator(ConversationalHomeworkTutor(), BoardSpecificTemplates()))
+    
+    if args.resume:
+        try:
+            result = bank.resume_bulk_cache_job(args.resume, background=False)
+        except BulkCacheBusyError as e:
+            parser.error(str(e))
+        if result is None:
+            parser.error(f"Unknown job: {args.resume}")
+    else:
+        if args.file:
+            with open(args.file, "r", encoding="utf-8") as f:
+                questions = json.load(f).get("questions", [])
+        else:
+            questions = bank.get_uncached_questions(args.grade, args.subject, args.board)
+        
+        logger.info(f"Caching {len(questions)} questions with {args.workers} workers")
+        result = bank.cache_responses_bulk(questions, overwrite=args.overwrite)
+    
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
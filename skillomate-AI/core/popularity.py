@@ -0,0 +1,323 @@
+import math
+import time
+import atexit
+import bisect
+import sqlite3
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rebase the decay landmark before exp() gets anywhere near float overflow (~709)
+MAX_DECAY_EXPONENT = 500.0
+
+
+class TopK:
+    """
+    Top-K questions by score for one (grade, subject), kept sorted on update
+    Forward-decayed scores only ever grow, so a question can only enter the list when its
+    score rises, which is exactly when update() is called.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._order = []   # (-score, question_hash), ascending == most popular first
+        self._scores = {}  # question_hash -> score
+
+    def update(self, question_hash: str, score: float) -> Tuple[bool, Optional[str]]:
+        """Set a question's score, returns (is_in_list, hash pushed out of the list or None)"""
+        old_score = self._scores.get(question_hash)
+        if old_score is not None:
+            del self._order[bisect.bisect_left(self._order, (-old_score, question_hash))]
+        elif len(self._order) >= self.capacity and score <= -self._order[-1][0]:
+            return False, None
+
+        bisect.insort(self._order, (-score, question_hash))
+        self._scores[question_hash] = score
+
+        if len(self._order) > self.capacity:
+            _, dropped = self._order.pop()
+            del self._scores[dropped]
+            return True, dropped
+        return True, None
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        return [(question_hash, -neg_score) for neg_score, question_hash in self._order[:k]]
+
+    def rescale(self, factor: float):
+        self._order = [(neg_score * factor, question_hash) for neg_score, question_hash in self._order]
+        self._scores = {question_hash: score * factor for question_hash, score in self._scores.items()}
+
+
+class PopularityTracker:
+    """
+    Time-decayed question popularity with batched writes
+    Each access adds exp(lambda * (t - landmark)) to the question's score (forward decay), so
+    stored scores never need rewriting as time passes; dividing by exp(lambda * (now - landmark))
+    turns a score into "recent accesses" with the configured half-life.
+    Accesses are accumulated in memory and flushed as one batched upsert every flush_interval seconds.
+    Several worker processes can share the database: each flush picks up a landmark rebased by another
+    worker, and loaded top-K lists are reloaded once they are flush_interval old, so accesses counted
+    by other workers show up too.
+    """
+
+    def __init__(self, db_path: str, half_life_hours: float = 72.0, flush_interval: float = 30.0,
+                 top_k: int = 50, max_pending: int = 1000):
+        self.db_path = db_path
+        self.decay_rate = math.log(2) / (half_life_hours * 3600)
+        self.flush_interval = flush_interval
+        self.top_k = top_k
+        self.max_pending = max_pending
+
+        self._pending = defaultdict(lambda: [0, 0.0])  # question_hash -> [access_count, score_increment]
+        self._top = {}  # (grade, subject) -> TopK, loaded on first read
+        self._loaded_at = {}  # (grade, subject) -> when its TopK was read from the database
+        self._meta = {}  # question_hash -> question fields for top-K entries
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._load_landmark()
+        atexit.register(self.close)
+
+    def _load_landmark(self):
+        """Read the decay landmark (tables and landmark come from QUESTION_BANK_MIGRATIONS)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.landmark = conn.execute("SELECT value FROM popularity_meta WHERE key = 'landmark'").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _weight(self, now: float) -> float:
+        return math.exp(self.decay_rate * (now - self.landmark))
+
+    def record(self, question_hash: str, weight: float = 1.0, now: Optional[float] = None):
+        """Count one access (no database work; written on the next flush)"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self._pending[question_hash]
+            entry[0] += 1
+            entry[1] += weight * self._weight(now)
+            pending = len(self._pending)
+
+        if self._thread is None:
+            self._start_flusher()
+        if pending >= self.max_pending:
+            self.flush()
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._flush_loop, name="popularity-flush", daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending accesses as one batched upsert and refresh loaded top-K lists"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(lambda: [0, 0.0])
+            if not pending:
+                return 0
+
+            now_text = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    self._sync_landmark(conn, pending)
+                    # Questions missing from question_bank are dropped by the SELECT
+                    conn.executemany('''
+                        INSERT INTO question_popularity
+                        (question_hash, grade, subject, access_count, decayed_score, last_accessed)
+                        SELECT question_hash, grade, subject, ?, ?, ? FROM question_bank WHERE question_hash = ?
+                        ON CONFLICT(question_hash) DO UPDATE SET
+                            access_count = access_count + excluded.access_count,
+                            decayed_score = decayed_score + excluded.decayed_score,
+                            last_accessed = excluded.last_accessed
+                    ''', [(count, score, now_text, question_hash) for question_hash, (count, score) in pending.items()])
+            except Exception as e:
+                conn.close()
+                logger.error(f"Error flushing popularity updates: {str(e)}")
+                # Nothing was written: keep the accesses for the next flush
+                self._restore(pending)
+                return 0
+
+            try:
+                self._maybe_rebase(conn)
+                rows = self._fetch(conn, list(pending.keys()))
+            except Exception as e:
+                logger.error(f"Error refreshing popularity top-K lists: {str(e)}")
+                rows = []
+            finally:
+                conn.close()
+
+            with self._lock:
+                for row in rows:
+                    top = self._top.get((row["grade"], row["subject"]))
+                    if top is not None:
+                        self._update_top(top, row)
+
+            return len(pending)
+
+    def _restore(self, pending: Dict[str, List]):
+        """Merge accesses from a failed flush back into the pending batch"""
+        with self._lock:
+            for question_hash, (count, score) in pending.items():
+                entry = self._pending[question_hash]
+                entry[0] += count
+                entry[1] += score
+
+    def _fetch(self, conn: sqlite3.Connection, question_hashes: List[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for i in range(0, len(question_hashes), 500):
+            chunk = question_hashes[i:i + 500]
+            rows.extend(self._row_dict(row) for row in conn.execute(f'''
+                SELECT qp.question_hash, qp.grade, qp.subject, qp.decayed_score, qp.access_count,
+                       qb.question_text, qb.topic, qb.difficulty_level
+                FROM question_popularity qp
+                JOIN question_bank qb ON qb.question_hash = qp.question_hash
+                WHERE qp.question_hash IN ({','.join('?' * len(chunk))})
+            ''', chunk))
+        return rows
+
+    @staticmethod
+    def _row_dict(row: tuple) -> Dict[str, Any]:
+        question_hash, grade, subject, score, access_count, question_text, topic, difficulty = row
+        return {
+            "question_hash": question_hash,
+            "grade": grade,
+            "subject": subject,
+            "score": score or 0.0,
+            "access_count": access_count or 0,
+            "question": question_text,
+            "topic": topic,
+            "difficulty": difficulty
+        }
+
+    def _maybe_rebase(self, conn: sqlite3.Connection):
+        """Move the landmark forward and shrink stored scores before exp() overflows"""
+        now = time.time()
+        if self.decay_rate * (now - self.landmark) < MAX_DECAY_EXPONENT:
+            return
+
+        factor = 1.0 / self._weight(now)
+        with self._lock:
+            with conn:
+                conn.execute("UPDATE question_popularity SET decayed_score = decayed_score * ?", (factor,))
+                conn.execute("UPDATE popularity_meta SET value = ? WHERE key = 'landmark'", (now,))
+            self._rescale(factor, now)
+        logger.info("Rebased popularity decay landmark")
+
+    def _sync_landmark(self, conn: sqlite3.Connection, pending: Dict[str, List]):
+        """Adopt a landmark another worker rebased to, rescaling scores held in memory (inside the flush transaction)"""
+        landmark = conn.execute("SELECT value FROM popularity_meta WHERE key = 'landmark'").fetchone()[0]
+        if landmark == self.landmark:
+            return
+        factor = math.exp(self.decay_rate * (self.landmark - landmark))
+        with self._lock:
+            self._rescale(factor, landmark)
+        for entry in pending.values():
+            entry[1] *= factor
+
+    def _rescale(self, factor: float, landmark: float):
+        """Move in-memory scores onto a new landmark (caller holds the lock)"""
+        self.landmark = landmark
+        for top in self._top.values():
+            top.rescale(factor)
+        for meta in self._meta.values():
+            meta["score"] *= factor
+        for entry in self._pending.values():
+            entry[1] *= factor
+
+    def _load(self, grade: str, subject: str) -> TopK:
+        """Build the top-K list for a (grade, subject) from the index; unseen questions fill any gap"""
+        top = TopK(self.top_k)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = [self._row_dict(row) for row in conn.execute('''
+                SELECT qp.question_hash, qp.grade, qp.subject, qp.decayed_score, qp.access_count,
+                       qb.question_text, qb.topic, qb.difficulty_level
+                FROM question_popularity qp
+                JOIN question_bank qb ON qb.question_hash = qp.question_hash
+                WHERE qp.grade = ? AND qp.subject = ?
+                ORDER BY qp.decayed_score DESC
+                LIMIT ?
+            ''', (grade, subject, self.top_k))]
+
+            if len(rows) < self.top_k:
+                rows.extend(self._row_dict((question_hash, grade, subject, 0.0, 0, text, topic, difficulty))
+                            for question_hash, text, topic, difficulty in conn.execute('''
+                    SELECT question_hash, question_text, topic, difficulty_level
+                    FROM question_bank
+                    WHERE grade = ? AND subject = ?
+                      AND question_hash NOT IN (SELECT question_hash FROM question_popularity)
+                    ORDER BY popularity_score DESC
+                    LIMIT ?
+                ''', (grade, subject, self.top_k - len(rows))))
+        finally:
+            conn.close()
+
+        with self._lock:
+            for row in rows:
+                self._update_top(top, row)
+        return top
+
+    def _update_top(self, top: TopK, row: Dict[str, Any]):
+        """Apply a fresh score to a top-K list, keeping question fields only for listed questions"""
+        listed, dropped = top.update(row["question_hash"], row["score"])
+        if listed:
+            self._meta[row["question_hash"]] = row
+        if dropped:
+            self._meta.pop(dropped, None)
+
+    def top(self, grade: str, subject: str, k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """
+        Most popular questions, most popular first (O(k), no sorting)
+        Returns None when k is larger than the tracked list; callers should query the database instead.
+        """
+        if k > self.top_k:
+            return None
+
+        key = (grade, subject)
+        with self._lock:
+            top = self._top.get(key)
+            # Other workers' accesses only reach this list through the database
+            if top is not None and time.time() - self._loaded_at[key] >= self.flush_interval:
+                top = None
+        if top is None:
+            loaded = self._load(grade, subject)
+            with self._lock:
+                old = self._top.get(key)
+                if old is None or time.time() - self._loaded_at[key] >= self.flush_interval:
+                    self._top[key] = loaded
+                    self._loaded_at[key] = time.time()
+                    if old is not None:
+                        listed = {question_hash for question_hash, _ in loaded.top(self.top_k)}
+                        for question_hash, _ in old.top(self.top_k):
+                            if question_hash not in listed:
+                                self._meta.pop(question_hash, None)
+                top = self._top[key]
+
+        recent_factor = 1.0 / self._weight(time.time())
+        with self._lock:
+            top = self._top.get(key, top)  # a list replaced meanwhile has had its question fields dropped
+            return [{
+                "question": self._meta[question_hash]["question"],
+                "topic": self._meta[question_hash]["topic"],
+                "difficulty": self._meta[question_hash]["difficulty"],
+                "access_count": self._meta[question_hash]["access_count"],
+                "recent_score": round(score * recent_factor, 3)
+            } for question_hash, score in top.top(k)]
+
+    def close(self):
+        """Stop the flush thread and write anything still pending"""
+        self._stop.set()
+        self.flush()
@@ -0,0 +1,232 @@
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+class InMemoryRateLimitStore:
+    """
+    Token buckets kept in process memory
+    Suitable for a single worker process
+    """
+
+    def __init__(self):
+        self._buckets = {}  # bucket_key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def consume(self, key: str, capacity: float, refill_rate: float,
+                cost: float, now: float) -> Tuple[bool, float]:
+        """Take `cost` tokens from a bucket, returns (allowed, tokens_left)"""
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+
+            self._buckets[key] = (tokens, now)
+
+            # Drop buckets that have refilled completely so memory stays bounded
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                self._prune(capacity, refill_rate, now)
+
+            return allowed, tokens
+
+    def refund(self, key: str, capacity: float, cost: float):
+        """Give tokens back to a bucket (used when a sibling bucket rejected the request)"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + cost), updated_at)
+
+    def _prune(self, capacity: float, refill_rate: float, now: float):
+        """Remove buckets that would be full by now"""
+        full_after = capacity / refill_rate if refill_rate > 0 else float('inf')
+        stale = [key for key, (_, updated_at) in self._buckets.items() if now - updated_at >= full_after]
+        for key in stale:
+            del self._buckets[key]
+
+
+class SQLiteRateLimitStore:
+    """
+    Token buckets shared across worker processes through a local SQLite file
+    Every consume runs inside a BEGIN IMMEDIATE transaction so concurrent workers serialize
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._calls = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._init_database()
+
+    def _init_database(self):
+        """Create the bucket table"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    bucket_key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error initializing rate limit database: {str(e)}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, opened in autocommit mode so we control transactions"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key: str, capacity: float, refill_rate: float,
+                cost: float, now: float) -> Tuple[bool, float]:
+        """Take `cost` tokens from a bucket, returns (allowed, tokens_left)"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?", (key,)
+            ).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+
+            conn.execute('''
+                INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(bucket_key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+            ''', (key, tokens, now))
+
+            self._calls += 1
+            if self._calls % 1000 == 0 and refill_rate > 0:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - capacity / refill_rate,))
+
+            conn.execute("COMMIT")
+            return allowed, tokens
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def refund(self, key: str, capacity: float, cost: float):
+        """Give tokens back to a bucket (used when a sibling bucket rejected the request)"""
+        conn = self._connection()
+        conn.execute(
+            "UPDATE rate_limit_buckets SET tokens = MIN(?, tokens + ?) WHERE bucket_key = ?",
+            (capacity, cost, key)
+        )
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter with per-endpoint cost weights
+    Each identity (IP address, user id) owns a bucket of `limit` tokens that refills over `window` seconds.
+    Expensive endpoints spend more tokens per request than cheap ones.
+    """
+
+    def __init__(self, limit: int, window: int, endpoint_costs: Optional[Dict[str, int]] = None,
+                 default_cost: int = 1, store: Optional[Any] = None):
+        self.limit = max(1, int(limit))
+        self.window = max(1, int(window))
+        self.refill_rate = self.limit / self.window  # tokens per second
+        self.endpoint_costs = endpoint_costs or {}
+        self.default_cost = default_cost
+        self.store = store or InMemoryRateLimitStore()
+
+    def cost_for(self, endpoint: str) -> int:
+        """Get the token cost of an endpoint (route rule or path)"""
+        cost = self.endpoint_costs.get(endpoint, self.default_cost)
+        return min(int(cost), self.limit)
+
+    def check(self, identities: List[str], endpoint: str) -> Dict[str, Any]:
+        """
+        Charge every identity bucket for one request to `endpoint`
+        The request is allowed only if all buckets have enough tokens.
+        """
+        cost = self.cost_for(endpoint)
+        result = {
+            "allowed": True,
+            "cost": cost,
+            "limit": self.limit,
+            "remaining": self.limit,
+            "reset": 0,
+            "retry_after": 0
+        }
+
+        if cost <= 0 or not identities:
+            return result
+
+        now = time.time()
+        charged = []
+        lowest_tokens = float(self.limit)
+
+        for identity in identities:
+            try:
+                allowed, tokens = self.store.consume(identity, self.limit, self.refill_rate, cost, now)
+            except Exception as e:
+                # Never take the API down because the limiter store is unavailable
+                logger.error(f"Rate limit store error: {str(e)}")
+                continue
+
+            lowest_tokens = min(lowest_tokens, tokens)
+
+            if not allowed:
+                # Give back what the other buckets were already charged
+                for charged_identity in charged:
+                    self.store.refund(charged_identity, self.limit, cost)
+
+                result["allowed"] = False
+                result["retry_after"] = max(1, math.ceil((cost - tokens) / self.refill_rate))
+                break
+
+            charged.append(identity)
+
+        result["remaining"] = max(0, int(lowest_tokens))
+        result["reset"] = math.ceil((self.limit - lowest_tokens) / self.refill_rate)
+        return result
+
+    def headers(self, result: Dict[str, Any]) -> Dict[str, str]:
+        """Build rate-limit response headers for a check result"""
+        headers = {
+            "RateLimit-Limit": str(result["limit"]),
+            "RateLimit-Remaining": str(result["remaining"]),
+            "RateLimit-Reset": str(result["reset"]),
+            "X-RateLimit-Limit": str(result["limit"]),
+            "X-RateLimit-Remaining": str(result["remaining"]),
+            "X-RateLimit-Reset": str(int(time.time()) + result["reset"])
+        }
+
+        if not result["allowed"]:
+            headers["Retry-After"] = str(result["retry_after"])
+
+        return headers
+
+
+def create_rate_limiter(limit: int, window: int, endpoint_costs: Optional[Dict[str, int]] = None,
+                        storage: str = "memory", db_path: Optional[str] = None) -> RateLimiter:
+    """Create a rate limiter backed by in-memory or shared SQLite storage"""
+    if storage == "sqlite":
+        store = SQLiteRateLimitStore(db_path or os.path.join("cache", "rate_limits.db"))
+    else:
+        store = InMemoryRateLimitStore()
+
+    return RateLimiter(limit, window, endpoint_costs=endpoint_costs, store=store)
@@ -0,0 +1,137 @@
+import gzip
+import logging
+from typing import Any, Optional
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from core.metrics import RESPONSE_BYTES_TOTAL, RESPONSE_BYTES_SAVED_TOTAL
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/x-ndjson", "application/javascript",
+    "text/html", "text/plain", "text/css", "text/csv", "image/svg+xml"
+}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when it is installed
+    Output is always compact UTF-8; values orjson can't encode (e.g. integers over 64 bits)
+    fall back to the standard library with the same defaults.
+    """
+
+    compact = True
+    ensure_ascii = False
+
+    def _orjson_options(self) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def _dumps_bytes(self, obj: Any) -> Optional[bytes]:
+        if orjson is None:
+            return None
+        try:
+            # Datetimes pass through to Flask's default so they keep its HTTP date format
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        except TypeError:
+            return None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if not kwargs.get("indent"):
+            data = self._dumps_bytes(obj)
+            if data is not None:
+                return data.decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # e.g. NaN, which the standard library accepts
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        data = self._dumps_bytes(obj)
+        if data is None:
+            data = super().dumps(obj, separators=(",", ":")).encode("utf-8")
+        return self._app.response_class(data + b"\n", mimetype=self.mimetype)
+
+
+class ResponseCompressor:
+    """
+    Compress responses with brotli or gzip as negotiated by Accept-Encoding
+    Skips small bodies (min_size), streamed and file responses, and anything already encoded,
+    and counts bytes sent and saved per endpoint.
+    """
+
+    def __init__(self, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def init_app(self, app):
+        app.after_request(self.compress_response)
+
+    def _choose_encoding(self) -> Optional[str]:
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def _compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def compress_response(self, response):
+        if (request.method == "HEAD" or response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        data = response.get_data()
+        encoding = self._choose_encoding() if len(data) >= self.min_size else None
+        if encoding is None:
+            RESPONSE_BYTES_TOTAL.inc(len(data), endpoint=endpoint, encoding="identity")
+            return response
+
+        try:
+            compressed = self._compress(data, encoding)
+        except Exception as e:
+            logger.error(f"Error compressing response: {str(e)}")
+            RESPONSE_BYTES_TOTAL.inc(len(data), endpoint=endpoint, encoding="identity")
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if len(compressed) >= len(data):
+            RESPONSE_BYTES_TOTAL.inc(len(data), endpoint=endpoint, encoding="identity")
+            return response
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        # The body differs per encoding, so a strong validator must not be shared with the identity form
+        if response.headers.get("ETag") and not response.headers["ETag"].startswith("W/"):
+            response.headers["ETag"] = f"W/{response.headers['ETag']}"
+        RESPONSE_BYTES_TOTAL.inc(len(compressed), endpoint=endpoint, encoding=encoding)
+        RESPONSE_BYTES_SAVED_TOTAL.inc(len(data) - len(compressed), endpoint=endpoint, encoding=encoding)
+        return response
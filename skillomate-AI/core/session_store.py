@@ -0,0 +1,283 @@
+import os
+import copy
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in a session")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _appended(base: List[Any], ours: List[Any]) -> Optional[List[Any]]:
+    """Entries added to the end of base (which may have been trimmed at the front), None if ours isn't one"""
+    if not base:
+        return list(ours)
+    for i in range(len(ours) - 1, -1, -1):
+        if ours[i] == base[-1]:
+            return ours[i + 1:]
+    return None
+
+
+def merge_sessions(base: Any, ours: Any, theirs: Any) -> Any:
+    """
+    Three-way merge of a session changed here (ours) and by another worker (theirs) since base
+    Dicts are merged key by key; lists that only grew at the end (conversation history) keep
+    theirs plus what was appended here; any other value changed here wins.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base:
+        return ours
+    if isinstance(base, dict) and isinstance(ours, dict) and isinstance(theirs, dict):
+        merged = {}
+        for key in list(theirs) + [key for key in ours if key not in theirs]:
+            if key not in ours:
+                if key not in base:
+                    merged[key] = theirs[key]
+            elif key not in theirs:
+                if key not in base or ours[key] != base[key]:
+                    merged[key] = ours[key]
+            else:
+                merged[key] = merge_sessions(base.get(key), ours[key], theirs[key])
+        return merged
+    if isinstance(base, list) and isinstance(ours, list) and isinstance(theirs, list):
+        appended = _appended(base, ours)
+        if appended is not None:
+            return theirs + appended
+    return ours
+
+
+class SQLiteSessionStore:
+    """
+    Conversation sessions in a SQLite file shared by all worker processes
+    Each save bumps the session's version, so a worker only re-reads a session another worker changed.
+    Saves are conditional on the version the writer last read, so concurrent writers can't silently
+    overwrite each other.
+    """
+
+    def __init__(self, db_path: str, ttl: float = 86400.0):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._saves = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._init_database()
+
+    def _init_database(self):
+        """Create the session table"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversation_sessions_updated ON conversation_sessions(updated_at)"
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error initializing session database: {str(e)}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread and process; a connection is never used across a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def version(self, session_id: str) -> Optional[int]:
+        row = self._connection().execute(
+            "SELECT version FROM conversation_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str) -> Optional[tuple]:
+        """(version, session) or None"""
+        row = self._connection().execute(
+            "SELECT version, data FROM conversation_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return (row[0], json.loads(row[1], object_hook=_decode)) if row else None
+
+    def save(self, session_id: str, session: Dict[str, Any], expected_version: Optional[int] = None) -> Optional[int]:
+        """
+        Write the session if its stored version is still expected_version (None: not stored yet)
+        Returns the new version, or None when another writer got there first.
+        """
+        now = time.time()
+        conn = self._connection()
+        data = json.dumps(session, default=_encode, ensure_ascii=False)
+        if expected_version is None:
+            row = conn.execute('''
+                INSERT INTO conversation_sessions (session_id, version, data, updated_at) VALUES (?, 1, ?, ?)
+                ON CONFLICT(session_id) DO NOTHING
+                RETURNING version
+            ''', (session_id, data, now)).fetchone()
+        else:
+            row = conn.execute('''
+                UPDATE conversation_sessions SET version = version + 1, data = ?, updated_at = ?
+                WHERE session_id = ? AND version = ?
+                RETURNING version
+            ''', (data, now, session_id, expected_version)).fetchone()
+        if row is None:
+            return None
+
+        self._saves += 1
+        if self._saves % 500 == 0:
+            conn.execute("DELETE FROM conversation_sessions WHERE updated_at < ?", (now - self.ttl,))
+        return row[0]
+
+    def delete(self, session_id: str):
+        self._connection().execute("DELETE FROM conversation_sessions WHERE session_id = ?", (session_id,))
+
+
+class SessionMap(MutableMapping):
+    """
+    session_id -> session dict, kept in memory and written through to a shared store
+    Lookups pick up a newer version saved by another worker (checked at most every refresh_interval
+    seconds per session); callers that change a session in place call save(). Both merge the other
+    worker's changes into the same dict object, so references held by callers stay live, and a save
+    that lost a race is merged and retried instead of overwriting the other worker's changes.
+    Callers that change a session from several threads hold lock(session_id) around change and save.
+    """
+
+    def __init__(self, store: SQLiteSessionStore, refresh_interval: float = 0.05, max_save_attempts: int = 5):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.max_save_attempts = max_save_attempts
+        self._sessions = {}  # session_id -> session
+        self._versions = {}  # session_id -> (version, checked_at)
+        self._bases = {}  # session_id -> copy of the session as last read from or written to the store
+        self._locks = {}  # session_id -> RLock around changes, merges and saves
+        self._lock = threading.Lock()
+
+    def lock(self, session_id: str) -> threading.RLock:
+        with self._lock:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.RLock()
+            return lock
+
+    def _adopt(self, session_id: str, version: int, stored: Dict[str, Any]):
+        """Merge a stored version into the in-memory session (caller holds the session lock)"""
+        session = self._sessions.get(session_id)
+        base = self._bases.get(session_id)
+        if session is None:
+            self._sessions[session_id] = copy.deepcopy(stored)
+        elif base is not None:
+            merged = copy.deepcopy(merge_sessions(base, session, stored))
+            session.clear()
+            session.update(merged)
+        # else: a session set here replaces the stored one
+        self._bases[session_id] = stored
+        self._versions[session_id] = (version, time.monotonic())
+
+    def _refresh(self, session_id: str):
+        if not isinstance(session_id, str):
+            return
+        now = time.monotonic()
+        version, checked_at = self._versions.get(session_id, (None, 0.0))
+        if session_id in self._sessions and now - checked_at < self.refresh_interval:
+            return
+        try:
+            stored_version = self.store.version(session_id)
+            if stored_version is None:
+                if session_id in self._sessions and version is not None:
+                    # Deleted by another worker
+                    with self._lock:
+                        self._sessions.pop(session_id, None)
+                        self._locks.pop(session_id, None)
+                    self._versions.pop(session_id, None)
+                    self._bases.pop(session_id, None)
+                return
+            if stored_version != version:
+                with self.lock(session_id):
+                    loaded = self.store.load(session_id)
+                    if loaded:
+                        self._adopt(session_id, *loaded)
+                return
+            self._versions[session_id] = (stored_version, now)
+        except Exception as e:
+            logger.error(f"Error loading session {session_id}: {str(e)}")
+
+    def save(self, session_id: str):
+        with self.lock(session_id):
+            try:
+                for _ in range(self.max_save_attempts):
+                    session = self._sessions.get(session_id)
+                    if session is None:
+                        return
+                    snapshot = copy.deepcopy(session)
+                    version = self.store.save(session_id, snapshot, self._versions.get(session_id, (None, 0.0))[0])
+                    if version is not None:
+                        self._bases[session_id] = snapshot
+                        self._versions[session_id] = (version, time.monotonic())
+                        return
+                    # Another worker saved first: merge its changes and try again
+                    loaded = self.store.load(session_id)
+                    if loaded:
+                        self._adopt(session_id, *loaded)
+                    else:
+                        self._versions.pop(session_id, None)  # deleted meanwhile, write it back
+                logger.error(f"Error saving session {session_id}: still conflicting after {self.max_save_attempts} attempts")
+            except Exception as e:
+                logger.error(f"Error saving session {session_id}: {str(e)}")
+
+    def __contains__(self, session_id) -> bool:
+        self._refresh(session_id)
+        return session_id in self._sessions
+
+    def __getitem__(self, session_id: str) -> Dict[str, Any]:
+        self._refresh(session_id)
+        return self._sessions[session_id]
+
+    def __setitem__(self, session_id: str, session: Dict[str, Any]):
+        with self.lock(session_id):
+            self._sessions[session_id] = session
+            # A new session object replaces whatever was stored rather than merging into it
+            self._bases.pop(session_id, None)
+            self.save(session_id)
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            del self._sessions[session_id]
+            self._locks.pop(session_id, None)
+        self._versions.pop(session_id, None)
+        self._bases.pop(session_id, None)
+        try:
+            self.store.delete(session_id)
+        except Exception as e:
+            logger.error(f"Error deleting session {session_id}: {str(e)}")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._sessions))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
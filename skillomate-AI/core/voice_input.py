@@ -0,0 +1,277 @@
+import io
+import os
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+import numpy as np
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class AudioDecodeError(ValueError):
+    """Raised when uploaded audio cannot be decoded"""
+
+
+class RecognizerBackend:
+    """
+    Speech-to-text backend interface
+    transcribe() receives one chunk of 16-bit mono audio and returns its text ("" when nothing was recognized).
+    Service failures should raise sr.RequestError.
+    """
+
+    name = "base"
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        raise NotImplementedError
+
+
+class GoogleRecognizerBackend(RecognizerBackend):
+    """Google Web Speech API (network, free tier)"""
+
+    name = "google"
+
+    def __init__(self, language: str = "en-US"):
+        self.language = language
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        try:
+            return sr.Recognizer().recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+
+class SphinxRecognizerBackend(RecognizerBackend):
+    """CMU PocketSphinx (fully offline, needs the optional pocketsphinx package)"""
+
+    name = "sphinx"
+
+    def __init__(self, language: str = "en-US"):
+        import pocketsphinx  # noqa: F401  fail at startup rather than on the first request
+        self.language = language
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        try:
+            return sr.Recognizer().recognize_sphinx(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+
+class LocalRecognizerBackend(RecognizerBackend):
+    """
+    Offline stand-in recognizer for tests and local development
+    Silent chunks (by RMS energy) yield no text; voiced chunks are passed to `transcriber`,
+    which defaults to returning a fixed transcript.
+    """
+
+    name = "local"
+
+    def __init__(self, transcriber: Optional[Callable[[sr.AudioData], str]] = None,
+                 default_text: str = "", silence_rms: float = 200.0):
+        self.transcriber = transcriber
+        self.default_text = default_text
+        self.silence_rms = silence_rms
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        samples = np.frombuffer(audio.get_raw_data(), dtype=np.int16)
+        if samples.size == 0 or float(np.sqrt(np.mean(samples.astype(np.float64) ** 2))) < self.silence_rms:
+            return ""
+        if self.transcriber:
+            return self.transcriber(audio)
+        return self.default_text
+
+
+def create_recognizer_backend(name: str, language: str = "en-US") -> RecognizerBackend:
+    """Create a recognizer backend by name, falling back to Google if an offline engine is missing"""
+    if name == "local":
+        return LocalRecognizerBackend(default_text=os.getenv("VOICE_LOCAL_TRANSCRIPT", ""))
+    if name == "sphinx":
+        try:
+            return SphinxRecognizerBackend(language)
+        except ImportError:
+            logger.warning("pocketsphinx is not installed, falling back to Google speech recognition")
+    return GoogleRecognizerBackend(language)
+
+
+def _read_exact(stream, size: int) -> bytes:
+    """Read up to `size` bytes, looping over short reads from network streams"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
+
+
+def _to_mono_int16(pcm: bytes, sample_width: int, channels: int) -> bytes:
+    """Convert little-endian PCM of any common width/channel count to 16-bit mono"""
+    if sample_width == 1:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif sample_width == 2:
+        samples = np.frombuffer(pcm, dtype="<i2")
+    elif sample_width == 3:
+        raw = np.frombuffer(pcm[:len(pcm) - len(pcm) % 3], dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)) << 8 >> 16).astype(np.int16)
+    elif sample_width == 4:
+        samples = (np.frombuffer(pcm, dtype="<i4") >> 16).astype(np.int16)
+    else:
+        raise AudioDecodeError(f"Unsupported sample width: {sample_width} bytes")
+
+    if channels > 1:
+        usable = samples.size - samples.size % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1).astype(np.int16)
+
+    return samples.astype("<i2", copy=False).tobytes()
+
+
+class StreamingTranscriber:
+    """
+    Decodes audio from a request stream in memory and recognizes it in chunks
+    For WAV input, each chunk is handed to a worker thread as soon as it has been read,
+    so transcription of long clips overlaps with the rest of the upload.
+    Chunks are cut at the quietest point near the chunk boundary to avoid splitting words.
+    """
+
+    def __init__(self, backend: RecognizerBackend, chunk_seconds: float = 15.0, max_workers: int = 4):
+        self.backend = backend
+        self.chunk_seconds = chunk_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voice-recognition")
+
+    def transcribe_stream(self, stream) -> Dict[str, Any]:
+        """Recognize speech from a binary stream (WAV streamed; AIFF/FLAC decoded in memory)"""
+        prefix = _read_exact(stream, 12)
+        if len(prefix) == 12 and prefix[:4] == b"RIFF" and prefix[8:12] == b"WAVE":
+            return self._transcribe_wav_stream(stream)
+
+        # Not WAV: let speech_recognition decode the whole clip from memory
+        return self._transcribe_buffered(prefix + stream.read())
+
+    def _read_wav_header(self, stream) -> Tuple[int, int, int, Optional[int]]:
+        """Parse RIFF chunks up to 'data', returns (sample_rate, sample_width, channels, data_size)"""
+        fmt = None
+        while True:
+            header = _read_exact(stream, 8)
+            if len(header) < 8:
+                raise AudioDecodeError("WAV file has no data chunk")
+            chunk_id, chunk_size = header[:4], struct.unpack("<I", header[4:])[0]
+
+            if chunk_id == b"fmt ":
+                body = _read_exact(stream, chunk_size + chunk_size % 2)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    format_tag = struct.unpack("<H", body[24:26])[0]
+                if format_tag != WAVE_FORMAT_PCM:
+                    raise AudioDecodeError(f"Unsupported WAV encoding (format {format_tag}), expected PCM")
+                if channels < 1 or sample_rate < 1 or not 1 <= (bits + 7) // 8 <= 4:
+                    raise AudioDecodeError("Invalid WAV format header")
+                fmt = (sample_rate, (bits + 7) // 8, channels)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise AudioDecodeError("WAV data chunk before fmt chunk")
+                # Streaming writers use 0 / 0xFFFFFFFF when the length is unknown
+                data_size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else None
+                return fmt[0], fmt[1], fmt[2], data_size
+            else:
+                _read_exact(stream, chunk_size + chunk_size % 2)
+
+    def _transcribe_wav_stream(self, stream) -> Dict[str, Any]:
+        sample_rate, sample_width, channels, data_size = self._read_wav_header(stream)
+        frame_bytes = sample_width * channels
+        chunk_bytes = max(1, int(self.chunk_seconds * sample_rate)) * 2  # 16-bit mono after conversion
+        read_bytes = frame_bytes * 4096
+
+        futures = []
+        pending = bytearray()  # raw bytes not yet forming a whole frame
+        buffer = bytearray()   # converted 16-bit mono audio not yet submitted
+        remaining = data_size
+        total_frames = 0
+
+        while remaining is None or remaining > 0:
+            block = stream.read(read_bytes if remaining is None else min(read_bytes, remaining))
+            if not block:
+                break
+            if remaining is not None:
+                remaining -= len(block)
+
+            pending += block
+            usable = len(pending) - len(pending) % frame_bytes
+            if not usable:
+                continue
+
+            total_frames += usable // frame_bytes
+            buffer += _to_mono_int16(bytes(pending[:usable]), sample_width, channels)
+            del pending[:usable]
+
+            while len(buffer) >= chunk_bytes:
+                split = self._quiet_split(buffer, chunk_bytes, sample_rate)
+                futures.append(self._submit(bytes(buffer[:split]), sample_rate))
+                del buffer[:split]
+
+        if buffer:
+            futures.append(self._submit(bytes(buffer), sample_rate))
+
+        return self._collect(futures, total_frames / sample_rate if sample_rate else 0.0)
+
+    def _transcribe_buffered(self, data: bytes) -> Dict[str, Any]:
+        try:
+            with sr.AudioFile(io.BytesIO(data)) as source:
+                audio = sr.Recognizer().record(source)
+        except (ValueError, EOFError) as e:
+            raise AudioDecodeError(f"Could not decode audio: {str(e)}")
+
+        pcm = audio.get_raw_data(convert_width=2)
+        sample_rate = audio.sample_rate
+        chunk_bytes = max(1, int(self.chunk_seconds * sample_rate)) * 2
+
+        futures = []
+        buffer = bytearray(pcm)
+        while len(buffer) > chunk_bytes:
+            split = self._quiet_split(buffer, chunk_bytes, sample_rate)
+            futures.append(self._submit(bytes(buffer[:split]), sample_rate))
+            del buffer[:split]
+        if buffer:
+            futures.append(self._submit(bytes(buffer), sample_rate))
+
+        return self._collect(futures, len(pcm) / 2 / sample_rate)
+
+    def _quiet_split(self, buffer: bytearray, chunk_bytes: int, sample_rate: int) -> int:
+        """Byte offset to cut at: the middle of the quietest 50 ms window in the last second before chunk_bytes"""
+        window = max(2, int(sample_rate * 0.05) * 2)
+        search_start = max(0, chunk_bytes - sample_rate * 2)
+        windows = (chunk_bytes - search_start) // window
+        if windows < 2:
+            return chunk_bytes
+
+        region = np.frombuffer(bytes(buffer[search_start:search_start + windows * window]), dtype="<i2")
+        energy = (region.astype(np.float64).reshape(windows, window // 2) ** 2).mean(axis=1)
+        quietest = int(np.argmin(energy))
+        split = search_start + quietest * window + window // 2
+        return max(2, split - split % 2)
+
+    def _submit(self, pcm: bytes, sample_rate: int):
+        return self.executor.submit(self.backend.transcribe, sr.AudioData(pcm, sample_rate, 2))
+
+    def _collect(self, futures: List, duration: float) -> Dict[str, Any]:
+        """Join chunk transcripts in order"""
+        texts = []
+        for future in futures:
+            text = future.result()  # propagates sr.RequestError from the backend
+            if text:
+                texts.append(text.strip())
+
+        if not texts:
+            raise sr.UnknownValueError()
+
+        return {
+            "text": " ".join(texts),
+            "chunks": len(futures),
+            "duration_seconds": round(duration, 2),
+            "backend": self.backend.name
+        }
@@ -0,0 +1,300 @@
+import io
+import os
+import re
+import math
+import wave
+import struct
+import hashlib
+import logging
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Iterator
+
+from core.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+class SpeechSynthesizer:
+    """
+    Text-to-speech engine interface
+    synthesize() turns one short piece of text into a complete audio file.
+    """
+
+    name = "base"
+    mimetype = "application/octet-stream"
+    extension = "bin"
+
+    def synthesize(self, text: str, voice: str, speed: float) -> bytes:
+        raise NotImplementedError
+
+
+class GTTSSynthesizer(SpeechSynthesizer):
+    """Google Translate TTS via gTTS (network), MP3 output"""
+
+    name = "gtts"
+    mimetype = "audio/mpeg"
+    extension = "mp3"
+
+    # Voice -> (language, accent top-level domain)
+    VOICES = {
+        "en-IN": ("en", "co.in"),
+        "en-US": ("en", "com"),
+        "en-GB": ("en", "co.uk"),
+        "hi-IN": ("hi", "co.in"),
+        "mr-IN": ("mr", "co.in"),
+        "ta-IN": ("ta", "co.in"),
+        "te-IN": ("te", "co.in"),
+        "bn-IN": ("bn", "co.in"),
+        "kn-IN": ("kn", "co.in")
+    }
+
+    def synthesize(self, text: str, voice: str, speed: float) -> bytes:
+        from gtts import gTTS
+
+        lang, tld = self.VOICES.get(voice, ("en", "co.in"))
+        buffer = io.BytesIO()
+        # gTTS only offers normal or slow speech
+        gTTS(text=text, lang=lang, tld=tld, slow=speed < 0.9).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class LocalToneSynthesizer(SpeechSynthesizer):
+    """
+    Offline stand-in synthesizer for tests and local development
+    Produces a WAV with one short tone per word, so output length tracks text length and speed.
+    """
+
+    name = "local"
+    mimetype = "audio/wav"
+    extension = "wav"
+
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text: str, voice: str, speed: float) -> bytes:
+        word_seconds = 0.25 / max(speed, 0.1)
+        frames = bytearray()
+        for word in text.split():
+            frequency = 300 + (sum(map(ord, word)) % 40) * 10
+            tone = int(self.sample_rate * word_seconds * 0.8)
+            gap = int(self.sample_rate * word_seconds * 0.2)
+            for n in range(tone):
+                frames += struct.pack("<h", int(6000 * math.sin(2 * math.pi * frequency * n / self.sample_rate)))
+            frames += b"\x00\x00" * gap
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(bytes(frames))
+        return buffer.getvalue()
+
+
+def create_synthesizer(name: str) -> SpeechSynthesizer:
+    """Create a synthesizer by name"""
+    if name == "local":
+        return LocalToneSynthesizer()
+    return GTTSSynthesizer()
+
+
+class AudioCache:
+    """
+    Content-addressed on-disk cache for synthesized audio segments
+    Files are named by the SHA-256 of (engine, voice, speed, text); the least recently used
+    files are evicted once the cache grows past max_bytes.
+    Worker processes share the directory: a hit touches the file's mtime, and the index is rebuilt
+    from the directory before evicting (and every rescan_seconds), so the size limit and the LRU
+    order cover files written by every worker.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, rescan_seconds: float = 60.0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.rescan_seconds = rescan_seconds
+        self._entries = OrderedDict()  # filename -> size, least recently used first
+        self._total_bytes = 0
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from file access times (caller holds the lock or is __init__)"""
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._scanned_at = time.monotonic()
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if filename.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # evicted by another worker meanwhile
+            files.append((max(stat.st_atime, stat.st_mtime), filename, stat.st_size))
+
+        for _, filename, size in sorted(files):
+            self._entries[filename] = size
+            self._total_bytes += size
+
+        self._evict()
+
+    @staticmethod
+    def make_key(engine: str, text: str, voice: str, speed: float) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{engine}|{voice}|{speed:.2f}|{text_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str, extension: str) -> Optional[bytes]:
+        filename = f"{key}.{extension}"
+        path = os.path.join(self.cache_dir, filename)
+        # Files missing from the index may have been written by another worker, so the disk decides
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(filename, 0)
+            return None
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(filename, 0)
+            self._entries[filename] = len(data)
+        return data
+
+    def put(self, key: str, extension: str, data: bytes):
+        filename = f"{key}.{extension}"
+        path = os.path.join(self.cache_dir, filename)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing audio cache entry: {str(e)}")
+            return
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(filename, 0)
+            self._entries[filename] = len(data)
+            if self._total_bytes > self.max_bytes or time.monotonic() - self._scanned_at >= self.rescan_seconds:
+                self._load_index()
+
+    def _evict(self):
+        """Remove least recently used files until the cache fits (caller holds the lock or is __init__)"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Leave some room so a full cache isn't rescanned on every put
+        target = self.max_bytes * 0.9
+        while self._total_bytes > target and self._entries:
+            filename, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+_MARKDOWN = re.compile(r"[*_`#>|]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+|\n+")
+
+
+def split_sentences(text: str, min_chars: int = 40, max_chars: int = 250) -> List[str]:
+    """
+    Split text into speakable segments: sentences, with very short ones merged
+    and very long ones broken at commas or spaces
+    """
+    text = _MARKDOWN.sub("", text)
+    segments = []
+    current = ""
+
+    for sentence in _SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(", ", 0, max_chars)
+            if cut < min_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                segments.append(current)
+                current = ""
+            segments.append(sentence[:cut + 1].strip())
+            sentence = sentence[cut + 1:].strip()
+
+        current = f"{current} {sentence}".strip() if current else sentence
+        if len(current) >= min_chars:
+            segments.append(current)
+            current = ""
+
+    if current:
+        segments.append(current)
+    return segments
+
+
+class TextToSpeechService:
+    """
+    Sentence-level synthesis with a shared audio cache
+    Segments are synthesized a few sentences ahead in worker threads and yielded in order,
+    so the first sentence can be sent before the rest of the answer is ready.
+    `prefetch` is the look-ahead of one request; `max_workers` sizes the pool that all
+    concurrent requests share.
+    """
+
+    def __init__(self, synthesizer: SpeechSynthesizer, cache: Optional[AudioCache] = None,
+                 prefetch: int = 2, default_voice: str = "en-IN", max_workers: int = 8):
+        self.synthesizer = synthesizer
+        self.cache = cache
+        self.prefetch = max(1, prefetch)
+        self.default_voice = default_voice
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="tts")
+
+    def _segment_audio(self, sentence: str, voice: str, speed: float) -> Dict[str, Any]:
+        extension = self.synthesizer.extension
+        key = AudioCache.make_key(self.synthesizer.name, sentence, voice, speed)
+
+        audio = self.cache.get(key, extension) if self.cache else None
+        record_cache_lookup("audio", audio is not None)
+        if audio is not None:
+            return {"key": key, "audio": audio, "cached": True}
+
+        audio = self.synthesizer.synthesize(sentence, voice, speed)
+        if self.cache:
+            self.cache.put(key, extension, audio)
+        return {"key": key, "audio": audio, "cached": False}
+
+    def iter_segments(self, text: str, voice: Optional[str] = None, speed: float = 1.0) -> Iterator[Dict[str, Any]]:
+        """Yield {index, text, key, audio, cached} for each sentence, in order"""
+        voice = voice or self.default_voice
+        sentences = split_sentences(text)
+        pending = {}
+
+        for index in range(len(sentences)):
+            # Keep up to `prefetch` segments in flight ahead of the one being yielded
+            for ahead in range(index, min(index + self.prefetch, len(sentences))):
+                if ahead not in pending:
+                    pending[ahead] = self.executor.submit(self._segment_audio, sentences[ahead], voice, speed)
+
+            segment = pending.pop(index).result()
+            yield {"index": index, "text": sentences[index], **segment}
+
+    @property
+    def mimetype(self) -> str:
+        return self.synthesizer.mimetype
@@ -0,0 +1,149 @@
+import gc
+import os
+import time
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Exercised once before forking so lazily compiled regexes and first-use imports land in shared memory
+SAMPLE_QUESTIONS = [
+    "What is photosynthesis?",
+    "Solve 2x + 5 = 13 step by step",
+    "Explain Newton's laws of motion for class 9",
+    "What were the causes of the French Revolution?"
+]
+SAMPLE_ANSWER = """**Given**
+A rectangle has length 5 cm and breadth 4 cm.
+
+1. Area = length × breadth
+2. Area = 5 × 4 = 20
+
+Therefore, the area is 20 sq cm."""
+SAMPLE_DIAGRAMS = ["triangle", "bar_chart"]
+
+_held_locks = {}  # path -> open file descriptor, kept for the life of the process
+
+
+def _timed(results: Dict[str, Any], name: str, func, *args):
+    start = time.perf_counter()
+    try:
+        func(*args)
+        results[name] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        logger.error(f"Warm-up step {name} failed: {str(e)}")
+        results[name] = f"failed: {str(e)}"
+
+
+def _warm_text_pipeline(app_module):
+    orchestrator = app_module.ai_orchestrator
+    for question in SAMPLE_QUESTIONS:
+        context = orchestrator.curriculum_mapper.curriculum_index.detect(question)
+        orchestrator.question_analyzer._analyze_patterns(question)
+        orchestrator.formatter_agent._format_locally(SAMPLE_ANSWER, orchestrator.formatter_agent.formatting_templates["mathematics"])
+        app_module.response_formatter.format_response(SAMPLE_ANSWER, context["subject"], "8", "general", "CBSE")
+        app_module.india_context_enhancer.enhance_with_indian_context(SAMPLE_ANSWER, context["subject"], "general", "8", "CBSE")
+        app_module.board_templates.apply_board_template(SAMPLE_ANSWER, "CBSE", context["subject"], "general")
+
+
+def _warm_question_bank(app_module):
+    """Load the in-memory popularity top-K list of every grade and subject in the question bank"""
+    bank = app_module.offline_question_bank
+    conn = sqlite3.connect(bank.db_path)
+    try:
+        pairs = conn.execute("SELECT DISTINCT grade, subject FROM question_bank").fetchall()
+    finally:
+        conn.close()
+    for grade, subject in pairs:
+        bank.popularity.top(grade, subject, 1)
+
+
+def _warm_diagrams(app_module):
+    context = {"subject": "Mathematics", "grade": "Class 8", "board": "CBSE"}
+    for diagram_type in SAMPLE_DIAGRAMS:
+        app_module.diagram_generator.generate_diagram(diagram_type, context)
+
+
+def preload_shared_state(app_module) -> Dict[str, Any]:
+    """
+    Run in the master after the app is imported and before workers are forked
+    Curriculum data, templates and compiled tables are already loaded by the import; this exercises
+    the text pipeline, question-bank top-K lists and matplotlib once, then moves everything into the
+    permanent GC generation so collections in the workers don't dirty the shared pages.
+    """
+    results = {}
+    _timed(results, "text_pipeline", _warm_text_pipeline, app_module)
+    _timed(results, "question_bank", _warm_question_bank, app_module)
+    _timed(results, "diagrams", _warm_diagrams, app_module)
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded shared state before fork: %s", results)
+    return results
+
+
+def _openai_clients(orchestrator) -> List[Any]:
+    """Distinct OpenAI clients held by the orchestrator and its agents (each has its own connection pool)"""
+    clients = {}
+    for owner in [orchestrator] + list(vars(orchestrator).values()):
+        client = getattr(owner, "client", None)
+        if client is not None and hasattr(client, "models"):
+            clients[id(client)] = client
+    return list(clients.values())
+
+
+def warm_llm_connections(orchestrator, timeout: float = 10.0) -> Dict[str, Any]:
+    """Open a connection in every client's pool (DNS, TCP and TLS) with one cheap authenticated call"""
+    clients = _openai_clients(orchestrator)
+
+    def connect(client):
+        client.with_options(timeout=timeout, max_retries=0).models.list()
+
+    ok = 0
+    with ThreadPoolExecutor(max_workers=max(1, len(clients)), thread_name_prefix="warmup") as executor:
+        for future in [executor.submit(connect, client) for client in clients]:
+            try:
+                future.result()
+                ok += 1
+            except Exception as e:
+                logger.warning("LLM connection warm-up failed: %s", e)
+    return {"clients": len(clients), "connected": ok}
+
+
+def warm_worker(app_module, timeout: float = 10.0) -> Dict[str, Any]:
+    """Run in each worker after fork, before it accepts requests; sockets can't be shared across a fork"""
+    start = time.perf_counter()
+    results = {"llm": warm_llm_connections(app_module.ai_orchestrator, timeout)}
+    _timed(results, "diagrams", _warm_diagrams, app_module)
+    results["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info("Worker %d warmed up: %s", os.getpid(), results)
+    return results
+
+
+def acquire_process_lock(path: str) -> bool:
+    """
+    Non-blocking exclusive lock on a file, held until the process exits
+    Lets exactly one worker run a singleton background task; when it dies, the next worker started
+    takes the lock over.
+    """
+    if fcntl is None:
+        return True
+    if path in _held_locks:
+        return True
+    lock_dir = os.path.dirname(path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    _held_locks[path] = fd
+    return True
@@ -9,6 +9,10 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import math
 import re
+import time
+
+from core.metrics import DIAGRAM_RENDER_SECONDS
+from core.nlu import analyze
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +71,7 @@ class EducationalDiagramGenerator:
     def generate_diagram(self, diagram_type: str, content_context: Dict[str, Any]) -> Dict[str, Any]:
         """Generate educational diagram with labels"""
         try:
+            render_start = time.perf_counter()
             subject = content_context.get("subject", "Mathematics")
             grade = content_context.get("grade", "Class 8")
             board = content_context.get("board", "CBSE")
@@ -99,6 +104,7 @@ class EducationalDiagramGenerator:
             
             # Convert to base64 for web display
             image_base64 = self._convert_to_base64(diagram_data["figure"])
+            DIAGRAM_RENDER_SECONDS.observe(time.perf_counter() - render_start, generator="educational", diagram_type=diagram_type)
             
             return {
                 "success": True,
@@ -603,30 +609,30 @@ class EducationalDiagramGenerator:
         suggestions = []
         
         # Analyze question for diagram opportunities
-        question_lower = question.lower()
+        intents = analyze(question).diagram_intents
         
         if subject == "Mathematics":
-            if any(word in question_lower for word in ["triangle", "angle", "geometry"]):
+            if "triangle" in intents:
                 suggestions.append("triangle")
-            elif any(word in question_lower for word in ["circle", "radius", "diameter"]):
+            elif "circle" in intents:
                 suggestions.append("circle")
-            elif any(word in question_lower for word in ["graph", "coordinate", "plot"]):
+            elif intents & {"graph", "coordinate"}:
                 suggestions.append("coordinate_geometry")
-            elif any(word in question_lower for word in ["chart", "data", "statistics"]):
+            elif "chart" in intents:
                 suggestions.extend(["bar_chart", "pie_chart"])
         
         elif subject in ["Physics", "Chemistry", "Biology"]:
-            if any(word in question_lower for word in ["cell", "structure", "organelle"]):
+            if "cell" in intents:
                 suggestions.append("cell_structure")
-            elif any(word in question_lower for word in ["circuit", "electric", "current"]):
+            elif "circuit" in intents:
                 suggestions.append("circuit_diagram")
         
         elif subject == "Geography":
-            if any(word in question_lower for word in ["map", "india", "location"]):
+            if "map" in intents:
                 suggestions.append("india_map")
         
         elif subject == "History":
-            if any(word in question_lower for word in ["timeline", "history", "event"]):
+            if "timeline" in intents:
                 suggestions.append("timeline")
         
         return suggestions[:3]  # Return top 3 suggestions
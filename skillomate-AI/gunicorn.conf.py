@@ -0,0 +1,58 @@
+"""
+Production server: gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app), so curriculum data, templates, regex tables
+and the question-bank indexes are built before the workers are forked and shared copy-on-write.
+Each worker then opens its own LLM connections before it accepts requests.
+"""
+import os
+import multiprocessing
+
+# Read by config.py when the app is imported below; state shared between workers lives in SQLite
+os.environ.setdefault("SKILLOMATE_PREFORK", "1")
+os.environ.setdefault("SESSION_STORE", "sqlite")
+os.environ.setdefault("API_RATE_LIMIT_STORAGE", "sqlite")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Requests mostly wait on the LLM, so each worker serves several at once
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = "-" if os.getenv("GUNICORN_ACCESS_LOG", "False").lower() == "true" else None
+
+
+def when_ready(server):
+    """Master, after the app is loaded and before the first fork"""
+    import app
+    from core.warmup import preload_shared_state
+
+    results = preload_shared_state(app)
+    server.log.info("Shared state preloaded: %s", results)
+
+
+def post_fork(server, worker):
+    import app
+
+    app.start_worker_services()
+
+
+def post_worker_init(worker):
+    """Worker, before it accepts its first request"""
+    import app
+    from core.warmup import warm_worker
+
+    warm_worker(app, app.WARMUP_TIMEOUT_SECONDS)
+
+
+def worker_exit(server, worker):
+    """Worker, on its way out: finish the after-response tasks it has queued"""
+    import app
+
+    if app.background_tasks is not None:
+        app.background_tasks.shutdown(app.BACKGROUND_TASK_DRAIN_SECONDS)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Background work after the response: bounded queue, retries and drain (core/background_tasks.py)
+Run with: python -m pytest -q test_background_tasks.py
+"""
+
+import time
+import threading
+
+import pytest
+
+from core.background_tasks import BackgroundTaskQueue, run_after_response
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(**kwargs):
+        kwargs.setdefault("retry_delay", 0.05)
+        background_tasks = BackgroundTaskQueue(**kwargs)
+        queues.append(background_tasks)
+        return background_tasks
+
+    yield make
+    for background_tasks in queues:
+        background_tasks.shutdown(timeout=TIMEOUT)
+
+
+def test_tasks_are_dropped_when_queue_is_full(make_queue):
+    background_tasks = make_queue(max_size=1, workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait(TIMEOUT)
+
+    assert background_tasks.submit("blocked", blocked)
+    assert started.wait(TIMEOUT)
+    assert background_tasks.submit("queued", lambda: None)
+
+    assert not background_tasks.submit("dropped", lambda: None)
+    release.set()
+
+    assert background_tasks.drain(TIMEOUT)
+    stats = background_tasks.get_stats()
+    assert (stats["submitted"], stats["completed"], stats["dropped"]) == (2, 2, 1)
+
+
+def test_failing_task_is_retried_with_backoff(make_queue):
+    background_tasks = make_queue(max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RuntimeError("temporary failure")
+
+    background_tasks.submit("flaky", flaky)
+
+    assert background_tasks.drain(TIMEOUT)
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.05
+    assert attempts[2] - attempts[1] >= 0.1
+    stats = background_tasks.get_stats()
+    assert (stats["retried"], stats["completed"], stats["failed"]) == (2, 1, 0)
+
+
+def test_task_fails_once_retries_are_used_up(make_queue):
+    background_tasks = make_queue(max_retries=2)
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise RuntimeError("permanent failure")
+
+    background_tasks.submit("broken", broken, retries=1)
+
+    assert background_tasks.drain(TIMEOUT)
+    assert len(attempts) == 2
+    assert background_tasks.get_stats()["failed"] == 1
+
+
+def test_shutdown_drains_queued_tasks_then_rejects_new_ones(make_queue):
+    background_tasks = make_queue(workers=1)
+    done = []
+    for index in range(5):
+        background_tasks.submit("slow", lambda index=index: (time.sleep(0.02), done.append(index)))
+
+    background_tasks.shutdown(timeout=TIMEOUT)
+
+    assert done == [0, 1, 2, 3, 4]
+    assert not background_tasks.submit("late", lambda: None)
+    assert background_tasks.get_stats()["accepting"] is False
+
+
+def test_drain_gives_up_at_timeout(make_queue):
+    background_tasks = make_queue(workers=1)
+    release = threading.Event()
+    background_tasks.submit("blocked", release.wait, TIMEOUT)
+
+    try:
+        assert not background_tasks.drain(timeout=0.05)
+    finally:
+        release.set()
+
+
+def test_without_queue_task_runs_inline():
+    ran = []
+
+    assert run_after_response(None, "inline", ran.append, 1)
+    assert ran == [1]
+    assert not run_after_response(None, "inline", lambda: 1 / 0)
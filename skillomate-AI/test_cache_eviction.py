@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Eviction order checks for the offline cache (agents/offline_cache.py, core/cache_eviction.py)
+Run with: python -m pytest -q test_cache_eviction.py
+"""
+
+import re
+import time
+import sqlite3
+
+import pytest
+
+from agents.offline_cache import OfflineCacheAgent, _normalize_timestamp
+from core.cache_eviction import CacheLimits, create_eviction_policy
+from core.db_migrations import CACHE_DB_MIGRATIONS, migrate
+
+CURRENT_TIMESTAMP_FORM = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+CONTEXT = {"subject": "Mathematics", "grade": "8", "board": "CBSE"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return OfflineCacheAgent(cache_dir=str(tmp_path))
+
+
+def _age(cache, question, hours):
+    """Move an entry's timestamps into the past, keeping SQLite's format"""
+    conn = sqlite3.connect(cache.db_path)
+    with conn:
+        conn.execute(
+            "UPDATE qa_cache SET created_at = datetime('now', ?), last_accessed = datetime('now', ?) WHERE question = ?",
+            (f"-{hours} hours", f"-{hours} hours", question)
+        )
+    conn.close()
+
+
+def _questions(cache):
+    conn = sqlite3.connect(cache.db_path)
+    rows = {row[0] for row in conn.execute("SELECT question FROM qa_cache")}
+    conn.close()
+    return rows
+
+
+def _evict(cache, policy, **limits):
+    result = cache.enforce_cache_limits(CacheLimits(**limits), create_eviction_policy(policy))
+    assert result["success"], result
+    return result
+
+
+def test_timestamps_use_one_format(cache):
+    cache.cache_qa("What is 2 + 2?", "4", CONTEXT)
+    cache.retrieve_qa("What is 2 + 2?")
+    cache.cache_diagram("number_line", "Mathematics", CONTEXT, "img", {})
+
+    conn = sqlite3.connect(cache.db_path)
+    values = conn.execute("SELECT created_at, last_accessed FROM qa_cache").fetchall()
+    values += conn.execute("SELECT created_at, last_accessed FROM diagram_cache").fetchall()
+    conn.close()
+    for value in (v for row in values for v in row):
+        assert CURRENT_TIMESTAMP_FORM.match(value), value
+    entry = next(iter(cache.json_cache["qa_entries"].values()))
+    assert CURRENT_TIMESTAMP_FORM.match(entry["last_accessed"])
+
+
+def test_lru_evicts_least_recently_used(cache):
+    cache.cache_qa("A", "answer a", CONTEXT)
+    cache.cache_qa("B", "answer b", CONTEXT)
+    time.sleep(1.1)  # timestamps have one-second resolution
+    assert cache.retrieve_qa("A")["found"]
+
+    _evict(cache, "lru", max_qa_entries=1)
+
+    assert _questions(cache) == {"A"}
+
+
+def test_lfu_evicts_least_frequently_used(cache):
+    cache.cache_qa("A", "answer a", CONTEXT)
+    cache.cache_qa("B", "answer b", CONTEXT)
+    _age(cache, "A", 1)
+    for _ in range(3):
+        cache.retrieve_qa("A")
+
+    _evict(cache, "lfu", max_qa_entries=1)
+
+    assert _questions(cache) == {"A"}
+
+
+def test_cost_policy_evicts_cheap_large_entries(cache):
+    cache.cache_qa("Cheap", "x" * 5000, CONTEXT, regeneration_cost=0.1)
+    cache.cache_qa("Costly", "short answer", CONTEXT, regeneration_cost=20.0)
+
+    _evict(cache, "cost", max_qa_entries=1)
+
+    assert _questions(cache) == {"Costly"}
+
+
+def test_age_rule_evicts_only_expired_entries(cache):
+    cache.cache_qa("Old", "old answer", CONTEXT)
+    cache.cache_qa("Recent", "recent answer", CONTEXT)
+    _age(cache, "Old", 49)
+    _age(cache, "Recent", 47)
+
+    result = _evict(cache, "lru", max_age_days=2)
+
+    assert _questions(cache) == {"Recent"}
+    assert result["evicted"]["qa_entries"] == 1
+    assert set(e["question"] for e in cache.json_cache["qa_entries"].values()) == {"Recent"}
+
+
+def test_migration_normalizes_local_iso_timestamps(tmp_path):
+    db_path = str(tmp_path / "skillomate_cache.db")
+    migrate(db_path, CACHE_DB_MIGRATIONS[:4])
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT INTO qa_cache (question_hash, question, answer, created_at, last_accessed) "
+            "VALUES ('h', 'Q', 'A', '2026-01-05T10:30:00.123456', '2026-01-05 04:00:00')"
+        )
+    conn.close()
+
+    migrate(db_path, CACHE_DB_MIGRATIONS)
+
+    conn = sqlite3.connect(db_path)
+    created_at, last_accessed = conn.execute("SELECT created_at, last_accessed FROM qa_cache").fetchone()
+    conn.close()
+    assert created_at == _normalize_timestamp("2026-01-05T10:30:00.123456")
+    assert CURRENT_TIMESTAMP_FORM.match(created_at)
+    assert last_accessed == "2026-01-05 04:00:00"
+
+
+def test_normalize_timestamp_keeps_sqlite_values_and_converts_offsets():
+    assert _normalize_timestamp("2026-01-05 04:00:00") == "2026-01-05 04:00:00"
+    assert _normalize_timestamp("2026-01-05T04:00:00Z") == "2026-01-05 04:00:00"
+    assert _normalize_timestamp("2026-01-05T09:30:00+05:30") == "2026-01-05 04:00:00"
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Schema migration and query plan checks for skillomate_cache.db and offline_question_bank.db
+Run with: python -m pytest -q test_db_migrations.py
+"""
+
+import time
+import sqlite3
+
+import pytest
+
+from core.db_migrations import (
+    CACHE_DB_MIGRATIONS, QUESTION_BANK_MIGRATIONS, migrate, get_schema_version,
+    explain_query_plan, full_table_scans
+)
+from core.popularity import PopularityTracker
+
+# Hot queries, as issued by agents/offline_cache.py, core/offline_question_bank.py and core/popularity.py.
+# Substring searches (LIKE '%...%') can never use a b-tree index and are deliberately not listed.
+CACHE_DB_QUERIES = {
+    "retrieve_qa": ("SELECT question, answer FROM qa_cache WHERE question_hash = ?", ("h",)),
+    "retrieve_qa_touch": ("UPDATE qa_cache SET access_count = access_count + 1 WHERE question_hash = ?", ("h",)),
+    "retrieve_diagram": ("SELECT image_data, metadata FROM diagram_cache WHERE diagram_hash = ?", ("h",)),
+    "retrieve_syllabus": (
+        "SELECT content, created_at FROM syllabus_cache WHERE subject = ? AND grade = ? AND board = ? AND topic = ?",
+        ("Mathematics", "8", "CBSE", "algebra")
+    ),
+    "search_cache_filtered": (
+        "SELECT question, answer FROM qa_cache WHERE (question LIKE ? OR answer LIKE ?) AND subject = ? AND grade = ? "
+        "ORDER BY access_count DESC, last_accessed DESC LIMIT 10",
+        ("%x%", "%x%", "Mathematics", "8")
+    ),
+    "cache_stats_top_accessed": (
+        "SELECT question, subject, grade, access_count FROM qa_cache ORDER BY access_count DESC LIMIT 5", ()
+    ),
+    "clear_old_qa": ("DELETE FROM qa_cache WHERE last_accessed < ?", ("2024-01-01",)),
+    "clear_old_diagrams": ("DELETE FROM diagram_cache WHERE last_accessed < ?", ("2024-01-01",)),
+    "evict_qa_lru": ("SELECT id, question_hash FROM qa_cache ORDER BY last_accessed ASC LIMIT 200", ()),
+    "evict_qa_lfu": (
+        "SELECT id, question_hash FROM qa_cache ORDER BY access_count ASC, last_accessed ASC LIMIT 200", ()
+    ),
+    "evict_diagram_lfu": (
+        "SELECT id, diagram_hash FROM diagram_cache ORDER BY access_count ASC, last_accessed ASC LIMIT 200", ()
+    ),
+    "quota_count_qa": ("SELECT COUNT(*) FROM qa_cache WHERE subject = ?", ("Mathematics",)),
+    "quota_count_diagram": ("SELECT COUNT(*) FROM diagram_cache WHERE subject = ?", ("Mathematics",)),
+    "export_qa_since": ("SELECT question_hash, answer FROM qa_cache WHERE created_at >= ?", ("2025-01-01",)),
+    "export_syllabus_since": ("SELECT topic, content FROM syllabus_cache WHERE created_at >= ?", ("2025-01-01",)),
+    "import_checkpoint": (
+        "SELECT import_id, lines_done FROM cache_imports WHERE file_path = ? AND file_size = ? AND file_mtime = ?",
+        ("/tmp/x.ndjson", 1, 1.0)
+    )
+}
+
+QUESTION_BANK_QUERIES = {
+    "generate_question_bank": (
+        "SELECT question_text, topic, difficulty_level, category, popularity_score FROM question_bank "
+        "WHERE grade = ? AND subject = ? AND board = ? ORDER BY popularity_score DESC, difficulty_level ASC",
+        ("Class 8", "Mathematics", "CBSE")
+    ),
+    "get_uncached_questions": (
+        "SELECT qb.question_text FROM question_bank qb "
+        "LEFT JOIN pre_cached_responses pcr ON qb.question_hash = pcr.question_hash "
+        "WHERE qb.grade = ? AND qb.subject = ? AND qb.board = ? AND pcr.question_hash IS NULL "
+        "ORDER BY qb.popularity_score DESC",
+        ("Class 8", "Mathematics", "CBSE")
+    ),
+    "get_offline_response": (
+        "SELECT formatted_response, raw_response FROM pre_cached_responses WHERE question_hash = ?", ("h",)
+    ),
+    "get_sync_status": (
+        "SELECT total_questions FROM offline_sync_status WHERE grade = ? AND subject = ? AND board = ?",
+        ("Class 8", "Mathematics", "CBSE")
+    ),
+    "popular_questions_fallback": (
+        "SELECT qb.question_text FROM question_bank qb "
+        "LEFT JOIN question_popularity qp ON qb.question_hash = qp.question_hash "
+        "WHERE qb.grade = ? AND qb.subject = ? "
+        "ORDER BY COALESCE(qp.decayed_score, 0) DESC, qb.popularity_score DESC LIMIT ?",
+        ("Class 8", "Mathematics", 100)
+    ),
+    "popularity_top_k": (
+        "SELECT qp.question_hash FROM question_popularity qp JOIN question_bank qb ON qb.question_hash = qp.question_hash "
+        "WHERE qp.grade = ? AND qp.subject = ? ORDER BY qp.decayed_score DESC LIMIT ?",
+        ("Class 8", "Mathematics", 50)
+    ),
+    "analytics_by_grade": (
+        "SELECT COUNT(DISTINCT qb.question_hash) FROM question_bank qb "
+        "LEFT JOIN pre_cached_responses pcr ON qb.question_hash = pcr.question_hash "
+        "LEFT JOIN question_popularity qp ON qb.question_hash = qp.question_hash WHERE qb.grade = ?",
+        ("Class 8",)
+    ),
+    "analytics_by_subject": (
+        "SELECT COUNT(DISTINCT qb.question_hash) FROM question_bank qb "
+        "LEFT JOIN pre_cached_responses pcr ON qb.question_hash = pcr.question_hash "
+        "LEFT JOIN question_popularity qp ON qb.question_hash = qp.question_hash WHERE qb.subject = ?",
+        ("Mathematics",)
+    ),
+    "bulk_job_status": ("SELECT status, total FROM bulk_cache_jobs WHERE job_id = ?", ("j",)),
+    "usage_analytics_by_hash": ("SELECT access_count FROM usage_analytics WHERE question_hash = ?", ("h",)),
+    "bundle_fingerprint": (
+        "SELECT COUNT(*), MAX(qb.id), COUNT(pcr.id), MAX(pcr.last_updated) FROM question_bank qb "
+        "LEFT JOIN pre_cached_responses pcr ON pcr.question_hash = qb.question_hash "
+        "WHERE qb.grade = ? AND qb.subject = ? AND qb.board = ?",
+        ("Class 8", "Mathematics", "CBSE")
+    ),
+    "bundle_latest_manifest": (
+        "SELECT version, manifest FROM offline_bundles WHERE grade = ? AND subject = ? AND board = ? "
+        "ORDER BY version DESC LIMIT 1",
+        ("Class 8", "Mathematics", "CBSE")
+    ),
+    "bundle_chunk": ("SELECT data FROM offline_bundle_chunks WHERE chunk_id = ?", ("c",))
+}
+
+
+@pytest.fixture
+def cache_db(tmp_path):
+    db_path = str(tmp_path / "skillomate_cache.db")
+    migrate(db_path, CACHE_DB_MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def question_bank_db(tmp_path):
+    db_path = str(tmp_path / "offline_question_bank.db")
+    migrate(db_path, QUESTION_BANK_MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("migrations", [CACHE_DB_MIGRATIONS, QUESTION_BANK_MIGRATIONS])
+def test_migrations_are_ordered_and_idempotent(tmp_path, migrations):
+    versions = [version for version, _, _ in migrations]
+    assert versions == sorted(set(versions))
+
+    db_path = str(tmp_path / "test.db")
+    assert migrate(db_path, migrations) == versions[-1]
+    assert migrate(db_path, migrations) == versions[-1]
+
+    conn = sqlite3.connect(db_path)
+    assert get_schema_version(conn) == versions[-1]
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(versions)
+    conn.close()
+
+
+def test_unversioned_database_is_adopted(tmp_path):
+    """Databases created before migrations existed keep their data and gain the indexes"""
+    db_path = str(tmp_path / "offline_question_bank.db")
+    conn = sqlite3.connect(db_path)
+    for statement in QUESTION_BANK_MIGRATIONS[0][2]:
+        conn.execute(statement)
+    conn.execute("INSERT INTO question_bank (question_text, question_hash, grade) VALUES ('Q', 'h', 'Class 8')")
+    conn.commit()
+    conn.close()
+
+    migrate(db_path, QUESTION_BANK_MIGRATIONS)
+
+    conn = sqlite3.connect(db_path)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_question_bank_grade_subject_board" in indexes
+    assert conn.execute("SELECT COUNT(*) FROM question_bank").fetchone()[0] == 1
+    conn.close()
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    broken = CACHE_DB_MIGRATIONS + [(99, "Broken", ["CREATE TABLE extra (id INTEGER)", "NOT SQL"])]
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(db_path, broken)
+
+    conn = sqlite3.connect(db_path)
+    assert get_schema_version(conn) == CACHE_DB_MIGRATIONS[-1][0]
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'extra'").fetchone()[0] == 0
+    conn.close()
+
+
+@pytest.mark.parametrize("name", sorted(CACHE_DB_QUERIES))
+def test_cache_db_hot_queries_use_indexes(cache_db, name):
+    sql, params = CACHE_DB_QUERIES[name]
+    plan = explain_query_plan(cache_db, sql, params)
+    assert not full_table_scans(plan), f"{name} scans a whole table: {plan}"
+
+
+@pytest.mark.parametrize("name", sorted(QUESTION_BANK_QUERIES))
+def test_question_bank_hot_queries_use_indexes(question_bank_db, name):
+    sql, params = QUESTION_BANK_QUERIES[name]
+    plan = explain_query_plan(question_bank_db, sql, params)
+    assert not full_table_scans(plan), f"{name} scans a whole table: {plan}"
+
+
+def test_question_bank_listing_needs_no_sort(question_bank_db):
+    sql, params = QUESTION_BANK_QUERIES["generate_question_bank"]
+    plan = explain_query_plan(question_bank_db, sql, params)
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_popularity_tables_come_from_migrations(tmp_path):
+    db_path = str(tmp_path / "offline_question_bank.db")
+    migrate(db_path, QUESTION_BANK_MIGRATIONS)
+
+    tracker = PopularityTracker(db_path)
+    tracker.close()
+
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
+    assert {"question_popularity", "idx_question_popularity_grade_subject_score", "popularity_meta"} <= tables
+    conn.close()
+    assert tracker.landmark == pytest.approx(time.time(), abs=60)
+
+
+def test_ad_hoc_popularity_tables_keep_their_landmark(tmp_path):
+    """Databases whose popularity tables predate the migration keep their scores and landmark"""
+    db_path = str(tmp_path / "offline_question_bank.db")
+    migrate(db_path, QUESTION_BANK_MIGRATIONS[:3])
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE question_popularity (question_hash VARCHAR(64) PRIMARY KEY, grade VARCHAR(20), "
+                 "subject VARCHAR(50), access_count INTEGER DEFAULT 0, decayed_score REAL DEFAULT 0, last_accessed TIMESTAMP)")
+    conn.execute("CREATE TABLE popularity_meta (key VARCHAR(50) PRIMARY KEY, value REAL)")
+    conn.execute("INSERT INTO popularity_meta VALUES ('landmark', 1000.0)")
+    conn.execute("INSERT INTO question_popularity (question_hash, decayed_score) VALUES ('h', 2.5)")
+    conn.commit()
+    conn.close()
+
+    migrate(db_path, QUESTION_BANK_MIGRATIONS)
+
+    tracker = PopularityTracker(db_path)
+    tracker.close()
+    assert tracker.landmark == 1000.0
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT decayed_score FROM question_popularity").fetchone()[0] == 2.5
+    conn.close()
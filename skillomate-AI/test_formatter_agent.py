@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Rule-based answer formatting checks for agents/formatter_agent.py (no LLM calls)
+Run with: python -m pytest -q test_formatter_agent.py
+"""
+
+import pytest
+
+from agents.formatter_agent import FormatterAgent
+
+
+@pytest.fixture
+def formatter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    return FormatterAgent()
+
+
+@pytest.fixture
+def templates(formatter):
+    return formatter.formatting_templates
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Let x = 5 and y = 3, then x + y = 8.", "Let `x = 5` and `y = 3`, then `x + y = 8`."),
+    ("Area = length × breadth", "`Area = length × breadth`"),
+    ("Area = 5 × 3 = 15", "`Area = 5 × 3 = 15`"),
+    ("2x + 3 = 7, so 2x = 4", "`2x + 3 = 7`, so `2x = 4`"),
+    ("v = u + at where u is the initial velocity", "`v = u + at` where u is the initial velocity"),
+    ("Use pi = 3.14 here. Then r = 7.", "Use `pi = 3.14` here. Then `r = 7`."),
+    ("x <= 5 and a == b", "x <= 5 and a == b"),
+    ("Use `x = 1` and y = 2 here.", "Use `x = 1` and y = 2 here."),
+    ("To solve 2x + 3 = 7: subtract 3.", "To solve `2x + 3 = 7`: subtract 3."),
+    ("Check x = 2:", "Check `x = 2`:"),
+])
+def test_equations_are_marked_one_by_one(formatter, templates, line, expected):
+    assert formatter._format_locally(line, templates["mathematics"]) == expected
+
+
+def test_formulas_are_only_marked_for_formula_styles(formatter, templates):
+    assert formatter._format_locally("Energy E = mc^2 applies.", templates["science"]) == "Energy E = mc^2 applies."
+
+
+def test_paragraphs_fill_template_sections_and_answer_is_highlighted(formatter, templates):
+    content = (
+        "We know the sides.\n\n"
+        "1. Area = length × breadth\n"
+        "2. Area = 5 × 3 = 15\n\n"
+        "Therefore the area is 15 sq cm."
+    )
+
+    assert formatter._format_locally(content, templates["mathematics"]) == (
+        "**Given**\nWe know the sides.\n\n"
+        "**Solution**\n**Step 1.** `Area = length × breadth`\n**Step 2.** `Area = 5 × 3 = 15`\n\n"
+        "**Answer**\n**The area is 15 sq cm.**"
+    )
+
+
+@pytest.mark.parametrize("last_line", ["Answer: x = 2", "**Answer:** x = 2", "Final answer: x = 2"])
+def test_answer_label_is_not_repeated_in_answer_block(formatter, templates, last_line):
+    content = "Subtract 3 from both sides.\n\n2x = 4\n\n" + last_line
+
+    assert formatter._format_locally(content, templates["mathematics"]).endswith("\n\n**Answer**\n**x = 2**")
+    assert formatter._format_locally(content, templates["general"], exam=True).endswith(
+        "\n\n**Final Answer**\n**Final Answer:** **x = 2**"
+    )
+
+
+def test_existing_headings_and_bullets_are_kept(formatter, templates):
+    content = "## Concept\nPhotosynthesis makes food.\n- Needs light\n- Needs water"
+
+    assert formatter._format_locally(content, templates["science"]) == (
+        "**Concept**\nPhotosynthesis makes food.\n• Needs light\n• Needs water"
+    )
+
+
+def test_exam_format_numbers_points_and_labels_final_answer(formatter, templates):
+    content = "- First point\n- Second point\n\nHence the result is 42."
+
+    formatted = formatter._format_locally(content, templates["general"], exam=True)
+
+    assert "**1.** First point\n**2.** Second point" in formatted
+    assert formatted.endswith("\n\n**Final Answer**\n**Final Answer:** **The result is 42.**")
+
+
+def test_single_paragraph_gets_no_section_headings(formatter, templates):
+    assert formatter._format_locally("Just one short reply.", templates["general"]) == "Just one short reply."
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+/api/guided-learning: hint levels remembered by the session (app.py, ai_orchestrator.py)
+Run with: python -m pytest -q test_guided_learning_route.py
+"""
+
+import os
+import importlib
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    """Import the app with every cache and database under a temporary directory"""
+    workdir = tmp_path_factory.mktemp("app")
+    cwd = os.getcwd()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("CACHE_DIR", str(workdir / "cache"))
+        mp.setenv("OFFLINE_QUESTION_BANK_DB_PATH", str(workdir / "offline_question_bank.db"))
+        mp.setenv("SKILLOMATE_PREFORK", "1")  # no cache janitor
+        mp.setenv("OPENAI_API_KEY", os.getenv("OPENAI_API_KEY") or "sk-test")
+        mp.syspath_prepend(cwd)
+        # Some agents keep paths relative to the working directory
+        mp.chdir(workdir)
+        yield importlib.import_module("app")
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    solver = app_module.ai_orchestrator.guided_solver
+
+    def hints(question, context, level):
+        return {"success": True, "hint": f"{question} / hint {level}", "level": level}
+
+    monkeypatch.setattr(solver, "generate_progressive_hints", hints)
+    monkeypatch.setattr(solver, "get_hint_ladder", lambda question, context: None)
+    return app_module.app.test_client()
+
+
+def _hint(client, **payload):
+    response = client.post("/api/guided-learning", json={"context": {}, **payload})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_session_remembers_question_and_level(client):
+    session_id = _hint(client, question="Solve 2x + 3 = 7")["session_id"]
+
+    result = _hint(client, session_id=session_id, current_level=2)
+
+    assert result["hint"] == "Solve 2x + 3 = 7 / hint 2"
+
+
+def test_new_question_at_later_level_does_not_advance_previous_question(client, app_module):
+    session_id = _hint(client, question="Solve 2x + 3 = 7")["session_id"]
+
+    result = _hint(client, question="Solve 5y = 20", session_id=session_id, current_level=3)
+
+    assert result["hint"] == "Solve 5y = 20 / hint 3"
+    guided = app_module.ai_orchestrator.get_guided_state(session_id)
+    assert (guided["question"], guided["level"]) == ("Solve 5y = 20", 3)
+
+    # The session now follows the new question
+    assert _hint(client, session_id=session_id, current_level=4)["hint"] == "Solve 5y = 20 / hint 4"
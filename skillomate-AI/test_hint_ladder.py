@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Hint ladder parsing and caching, in one worker and across workers (core/hint_ladder.py)
+Run with: python -m pytest -q test_hint_ladder.py
+"""
+
+import time
+import threading
+
+import pytest
+
+from core.hint_ladder import HintLadderCache, HintLadderParser, SQLiteHintLadderStore
+
+LEVELS = ["Look at both sides.", "Subtract 5.", "2x = 8", "x = 4"]
+TIMEOUT = 5
+
+
+def _generator(calls, release=None):
+    """Publish LEVELS, pausing after the first one until release is set"""
+    def generate(ladder):
+        calls.append(ladder.key)
+        for index, text in enumerate(LEVELS):
+            ladder.publish(text)
+            if index == 0 and release is not None:
+                release.wait(TIMEOUT)
+    return generate
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteHintLadderStore(str(tmp_path / "sessions.db"))
+
+
+def _wait_until_stored(store, key):
+    deadline = time.monotonic() + TIMEOUT
+    while not (store.load(key) or {}).get("done"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _worker(store, **kwargs):
+    """A HintLadderCache as one gunicorn worker would have it"""
+    return HintLadderCache(store=store, stale_after=kwargs.pop("stale_after", TIMEOUT), poll_interval=0.02, **kwargs)
+
+
+def test_parser_emits_levels_as_headings_arrive():
+    parser = HintLadderParser()
+
+    assert parser.feed("### Hint 1\nLook at both") == []
+    assert parser.feed(" sides.\n### Hint 2\nSub") == ["Look at both sides."]
+    assert parser.feed("tract 5.\n## Level 3\n2x = 8\n") == ["Subtract 5."]
+    assert parser.close() == ["2x = 8"]
+
+
+def test_concurrent_requests_share_one_generation():
+    cache = HintLadderCache()
+    calls = []
+
+    first = cache.get_or_create("q", _generator(calls))
+    second = cache.get_or_create("q", _generator(calls))
+
+    assert first is second
+    assert second.wait_for(4, TIMEOUT) == "x = 4"
+    assert calls == ["q"]
+
+
+def test_failed_ladder_is_regenerated():
+    cache = HintLadderCache()
+
+    def fail(ladder):
+        raise ValueError("no levels")
+
+    failed = cache.get_or_create("q", fail)
+    failed.wait_for(1, TIMEOUT)
+    assert failed.failed
+
+    calls = []
+    assert cache.get_or_create("q", _generator(calls)).wait_for(2, TIMEOUT) == "Subtract 5."
+    assert calls == ["q"]
+
+
+def test_other_worker_reuses_finished_ladder(store):
+    calls = []
+    _worker(store).get_or_create("q", _generator(calls))
+    _wait_until_stored(store, "q")
+
+    ladder = _worker(store).get_or_create("q", _generator(calls))
+
+    assert ladder.done and ladder.levels == LEVELS
+    assert calls == ["q"]
+
+
+def test_other_worker_follows_ladder_in_progress(store):
+    calls = []
+    release = threading.Event()
+    owner = _worker(store).get_or_create("q", _generator(calls, release))
+    assert owner.wait_for(1, TIMEOUT) == LEVELS[0]
+
+    follower = _worker(store).get_or_create("q", _generator(calls))
+    assert follower.wait_for(1, TIMEOUT) == LEVELS[0]
+    release.set()
+
+    assert follower.wait_for(4, TIMEOUT) == LEVELS[3]
+    assert calls == ["q"]
+
+
+def test_stalled_ladder_is_regenerated_by_other_worker(store):
+    calls = []
+    release = threading.Event()
+    owner = _worker(store).get_or_create("q", _generator(calls, release))
+    assert owner.wait_for(1, TIMEOUT)
+
+    try:
+        ladder = _worker(store, stale_after=0).get_or_create("q", _generator(calls))
+        assert ladder.wait_for(4, TIMEOUT) == LEVELS[3]
+        assert calls == ["q", "q"]
+    finally:
+        release.set()
+
+
+def test_expired_ladder_is_regenerated(store):
+    calls = []
+    assert _worker(store).get_or_create("q", _generator(calls)).wait_for(4, TIMEOUT)
+
+    ladder = _worker(store, ttl=0).get_or_create("q", _generator(calls))
+
+    assert ladder.wait_for(4, TIMEOUT) == LEVELS[3]
+    assert calls == ["q", "q"]
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+LLM gateway checks: deadlines, circuit breaker and hedged calls (core/llm_gateway.py, core/deadline.py)
+Run with: python -m pytest -q test_llm_gateway.py
+"""
+
+import time
+import threading
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.deadline import Deadline, DeadlineExceeded, deadline_scope, remaining_budget, MIN_CALL_SECONDS
+from core.llm_gateway import LLMGateway, configure_hedging
+
+HEDGE_DELAY = 0.1
+_agents = count()
+
+
+class Reply:
+    """Scripted answer for one create() call: wait `delay` seconds, then answer `content` or raise `error`"""
+
+    def __init__(self, content: str = "", delay: float = 0.0, error: Exception = None):
+        self.content = content
+        self.delay = delay
+        self.error = error
+
+
+class FakeStream:
+    def __init__(self, reply: Reply):
+        self.reply = reply
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+    def __iter__(self):
+        if self.closed.wait(self.reply.delay):
+            raise ConnectionError("stream closed")
+        if self.reply.error:
+            raise self.reply.error
+        delta = SimpleNamespace(content=self.reply.content)
+        yield SimpleNamespace(id="c1", model="m", usage=None,
+                              choices=[SimpleNamespace(delta=delta, finish_reason="stop")])
+        yield SimpleNamespace(id="c1", model="m", choices=[],
+                              usage=SimpleNamespace(prompt_tokens=5, completion_tokens=2))
+
+
+class FakeClient:
+    def __init__(self, *replies: Reply):
+        self.replies = list(replies)
+        self.calls = []  # (thread name, kwargs)
+        self.streams = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append((threading.current_thread().name, kwargs))
+        reply = self.replies.pop(0)
+        if kwargs.get("stream"):
+            self.streams.append(FakeStream(reply))
+            return self.streams[-1]
+        time.sleep(reply.delay)
+        if reply.error:
+            raise reply.error
+        message = SimpleNamespace(content=reply.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class ServerError(Exception):
+    status_code = 500
+
+
+@pytest.fixture(autouse=True)
+def hedging():
+    configure_hedging(enabled=True, default_delay=HEDGE_DELAY, min_delay=HEDGE_DELAY)
+    yield
+    configure_hedging()
+
+
+def _gateway(client):
+    # A fresh agent name keeps latency samples of other tests out of the hedge delay
+    return LLMGateway(client, agent=f"test-{next(_agents)}", breaker=CircuitBreaker(f"test-{next(_agents)}"))
+
+
+def _content(response):
+    return response.choices[0].message.content
+
+
+def test_deadline_scope_and_child():
+    deadline = Deadline(10)
+    assert remaining_budget() is None
+    with deadline_scope(deadline):
+        assert 9 < remaining_budget() <= 10
+    assert remaining_budget() is None
+
+    child = deadline.child(reserve=9.8)
+    assert child.expired and not deadline.expired
+    assert child.expires_at == pytest.approx(deadline.expires_at - 9.8)
+
+
+def test_deadline_cuts_call_timeout():
+    client = FakeClient(Reply("ok"))
+
+    with deadline_scope(Deadline(5)):
+        _gateway(client).chat(model="m", messages=[], timeout=30)
+
+    assert 4 < client.calls[0][1]["timeout"] <= 5
+
+
+def test_no_call_starts_once_budget_is_spent():
+    client = FakeClient(Reply("ok"))
+
+    with deadline_scope(Deadline(MIN_CALL_SECONDS / 2)):
+        with pytest.raises(DeadlineExceeded):
+            _gateway(client).chat(model="m", messages=[])
+    assert client.calls == []
+
+
+def test_open_circuit_rejects_calls_without_calling_provider():
+    client = FakeClient(*[Reply(error=ServerError()) for _ in range(5)])
+    gateway = _gateway(client)
+    for _ in range(5):
+        with pytest.raises(ServerError):
+            gateway.chat(model="m", messages=[])
+
+    with pytest.raises(CircuitOpenError):
+        gateway.chat(model="m", messages=[])
+    assert len(client.calls) == 5
+
+
+def test_fast_primary_runs_on_calling_thread_without_hedge():
+    client = FakeClient(Reply("primary"))
+
+    response = _gateway(client).chat(hedge=True, model="m", messages=[])
+
+    assert _content(response) == "primary"
+    assert response.usage.completion_tokens == 2
+    time.sleep(HEDGE_DELAY * 2)
+    assert [name for name, _ in client.calls] == [threading.current_thread().name]
+
+
+def test_slow_primary_loses_to_hedge_and_is_closed():
+    client = FakeClient(Reply("primary", delay=5), Reply("hedge"))
+
+    start = time.perf_counter()
+    response = _gateway(client).chat(hedge=True, model="m", messages=[])
+
+    assert _content(response) == "hedge"
+    assert time.perf_counter() - start < 1
+    assert client.calls[1][0].startswith("llm-hedge")
+    assert client.streams[0].closed.is_set()
+
+
+def test_primary_win_closes_running_hedge():
+    client = FakeClient(Reply("primary", delay=HEDGE_DELAY * 3), Reply("hedge", delay=5))
+
+    response = _gateway(client).chat(hedge=True, model="m", messages=[])
+
+    assert _content(response) == "primary"
+    assert len(client.calls) == 2
+    assert client.streams[1].closed.wait(1)
+
+
+def test_hedge_answers_when_primary_fails():
+    client = FakeClient(Reply(delay=HEDGE_DELAY * 3, error=ServerError()), Reply("hedge", delay=HEDGE_DELAY * 3))
+
+    response = _gateway(client).chat(hedge=True, model="m", messages=[])
+
+    assert _content(response) == "hedge"
+
+
+def test_early_primary_failure_is_raised_without_hedge():
+    client = FakeClient(Reply(error=ServerError()), Reply("hedge"))
+
+    with pytest.raises(ServerError):
+        _gateway(client).chat(hedge=True, model="m", messages=[])
+    time.sleep(HEDGE_DELAY * 2)
+    assert len(client.calls) == 1
+
+
+def test_no_hedge_when_budget_is_nearly_spent():
+    client = FakeClient(Reply("primary", delay=MIN_CALL_SECONDS), Reply("hedge"))
+
+    with deadline_scope(Deadline(MIN_CALL_SECONDS + HEDGE_DELAY / 2)):
+        response = _gateway(client).chat(hedge=True, model="m", messages=[])
+
+    assert _content(response) == "primary"
+    assert len(client.calls) == 1
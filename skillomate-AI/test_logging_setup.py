@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Structured logging and PII redaction (core/logging_setup.py)
+Run with: python -m pytest -q test_logging_setup.py
+"""
+
+import json
+import logging
+
+import pytest
+
+from core.logging_setup import JsonFormatter
+
+
+def _format(formatter, message="Answered question", **extra):
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, message, (), None)
+    record.__dict__.update(extra)
+    return json.loads(formatter.format(record))
+
+
+def test_message_is_redacted():
+    entry = _format(JsonFormatter(), "Login for asha@example.com with key sk-abcdefghijkl")
+
+    assert entry["message"] == "Login for [EMAIL] with key [SECRET]"
+
+
+@pytest.mark.parametrize("extra, expected", [
+    ({"question": "My name is Asha, call 9876543210"}, {"question": "My name is [NAME], call [PHONE]"}),
+    ({"parent_name": "Asha"}, {"parent_name": "[REDACTED]"}),
+    ({"context": {"email": "a@b.co", "grade": "Class 8"}}, {"context": {"email": "[REDACTED]", "grade": "Class 8"}}),
+    ({"recipients": ["asha@example.com"]}, {"recipients": ["[EMAIL]"]}),
+    ({"latency_ms": 12.5, "cached": True}, {"latency_ms": 12.5, "cached": True}),
+])
+def test_extra_fields_are_redacted(extra, expected):
+    entry = _format(JsonFormatter(), **extra)
+
+    assert {key: entry[key] for key in expected} == expected
+
+
+def test_redaction_can_be_switched_off():
+    entry = _format(JsonFormatter(redact_pii=False), question="email asha@example.com")
+
+    assert entry["question"] == "email asha@example.com"
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Bulk caching job limits of the offline question bank (core/offline_question_bank.py)
+Run with: python -m pytest -q test_offline_bulk_cache.py
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from core.offline_question_bank import OfflineQuestionBank, BulkCacheBusyError
+
+QUESTIONS = [{"question": f"What is {n} + {n}?", "subject": "Mathematics", "grade": "Class 8"} for n in range(3)]
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = OfflineQuestionBank(
+        str(tmp_path / "offline_question_bank.db"),
+        question_bank_dir=str(tmp_path / "question_banks"),
+        bulk_workers=2, bulk_max_jobs=1, bulk_max_questions=5
+    )
+    yield bank
+    bank.popularity.close()
+
+
+@pytest.fixture
+def blocked_generator(bank):
+    """Hold every generation until the test releases it"""
+    release = threading.Event()
+
+    def generate(question_data):
+        release.wait(5)
+        return {"formatted_response": "answer", "raw_response": "answer"}
+
+    bank.set_response_generator(generate)
+    yield release
+    release.set()
+
+
+def _set_job(bank, job_id, status, age_seconds=0):
+    conn = sqlite3.connect(bank.db_path)
+    with conn:
+        conn.execute(
+            "UPDATE bulk_cache_jobs SET status = ?, updated_at = datetime('now', ?) WHERE job_id = ?",
+            (status, f"-{age_seconds} seconds", job_id)
+        )
+    conn.close()
+
+
+def test_rejects_jobs_over_question_limit(bank):
+    with pytest.raises(ValueError):
+        bank.start_bulk_cache_job(QUESTIONS * 2)
+
+
+def test_second_job_waits_for_the_first(bank, blocked_generator):
+    bank.start_bulk_cache_job(QUESTIONS)
+
+    with pytest.raises(BulkCacheBusyError):
+        bank.start_bulk_cache_job(QUESTIONS)
+
+
+def test_refuses_to_resume_running_job(bank, blocked_generator):
+    job_id = bank.start_bulk_cache_job(QUESTIONS)
+
+    with pytest.raises(BulkCacheBusyError):
+        bank.resume_bulk_cache_job(job_id)
+
+
+def test_resumes_interrupted_job(bank):
+    job_id = bank._create_bulk_job(QUESTIONS)
+    _set_job(bank, job_id, "running", age_seconds=bank.bulk_stale_seconds + 60)
+
+    result = bank.resume_bulk_cache_job(job_id, background=False)
+
+    assert result["status"] == "completed"
+    assert result["completed"] == len(QUESTIONS)
+    assert bank.get_bulk_job_status(job_id)["status"] == "completed"
+
+
+def test_finished_jobs_free_their_slot(bank):
+    job_id = bank._create_bulk_job(QUESTIONS)
+    _set_job(bank, job_id, "completed")
+
+    assert bank._create_bulk_job(QUESTIONS) != job_id
+
+
+def test_resume_unknown_job_returns_none(bank):
+    assert bank.resume_bulk_cache_job("missing") is None
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Time-decayed question popularity and its top-K lists (core/popularity.py)
+Run with: python -m pytest -q test_popularity.py
+"""
+
+import math
+import time
+import sqlite3
+
+import pytest
+
+from core.db_migrations import QUESTION_BANK_MIGRATIONS, migrate
+from core.popularity import PopularityTracker, TopK
+
+GRADE, SUBJECT = "Class 8", "Mathematics"
+QUESTIONS = ["q1", "q2", "q3"]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = str(tmp_path / "offline_question_bank.db")
+    migrate(db_path, QUESTION_BANK_MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO question_bank (question_text, question_hash, subject, grade, board, difficulty_level, topic) "
+            "VALUES (?, ?, ?, ?, 'CBSE', 1, 'algebra')",
+            [(f"Question {h}", h, SUBJECT, GRADE) for h in QUESTIONS]
+        )
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def make_tracker(db_path):
+    trackers = []
+
+    def make(**kwargs):
+        kwargs.setdefault("flush_interval", 3600)
+        tracker = PopularityTracker(db_path, top_k=2, **kwargs)
+        trackers.append(tracker)
+        return tracker
+
+    yield make
+    for tracker in trackers:
+        tracker.close()
+
+
+def _top_questions(tracker):
+    return [row["question"] for row in tracker.top(GRADE, SUBJECT, 2)]
+
+
+def _stored(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchone()
+    finally:
+        conn.close()
+
+
+def test_top_k_keeps_highest_scores_in_order():
+    top = TopK(2)
+    assert top.update("a", 1.0) == (True, None)
+    assert top.update("b", 3.0) == (True, None)
+    assert top.update("c", 0.5) == (False, None)
+    assert top.update("c", 2.0) == (True, "a")
+    assert top.update("c", 4.0) == (True, None)
+
+    assert top.top(2) == [("c", 4.0), ("b", 3.0)]
+
+    top.rescale(0.5)
+    assert top.top(1) == [("c", 2.0)]
+
+
+def test_recent_score_halves_every_half_life(make_tracker):
+    tracker = make_tracker(half_life_hours=1)
+    tracker.record("q1", now=time.time() - 3600)
+    tracker.record("q2")
+    tracker.flush()
+
+    rows = tracker.top(GRADE, SUBJECT, 2)
+
+    assert [row["question"] for row in rows] == ["Question q2", "Question q1"]
+    assert rows[0]["recent_score"] == pytest.approx(1.0, abs=0.01)
+    assert rows[1]["recent_score"] == pytest.approx(0.5, abs=0.01)
+
+
+def test_flush_refreshes_loaded_top_k(make_tracker):
+    tracker = make_tracker()
+    assert _top_questions(tracker) == ["Question q1", "Question q2"]
+
+    for _ in range(2):
+        tracker.record("q3")
+    tracker.record("q2")
+    tracker.flush()
+
+    assert _top_questions(tracker) == ["Question q3", "Question q2"]
+    assert tracker.top(GRADE, SUBJECT, 1)[0]["access_count"] == 2
+
+
+def test_landmark_is_rebased_before_weights_overflow(make_tracker, db_path):
+    tracker = make_tracker(half_life_hours=1 / 3600)  # weights double every second
+    old_landmark = tracker.landmark - 1000
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE popularity_meta SET value = ? WHERE key = 'landmark'", (old_landmark,))
+    conn.close()
+    tracker.landmark = old_landmark
+
+    tracker.record("q1")
+    tracker.flush()
+
+    assert tracker.landmark == pytest.approx(time.time(), abs=5)
+    assert _stored(db_path, "SELECT value FROM popularity_meta WHERE key = 'landmark'")[0] == tracker.landmark
+    score = _stored(db_path, "SELECT decayed_score FROM question_popularity WHERE question_hash = 'q1'")[0]
+    assert 0 < score <= 1
+    assert tracker.top(GRADE, SUBJECT, 1)[0]["question"] == "Question q1"
+
+
+def test_failed_flush_keeps_accesses_for_next_flush(make_tracker, db_path):
+    tracker = make_tracker()
+    tracker.record("q1")
+    tracker.record("q1")
+    conn = sqlite3.connect(db_path)
+    conn.execute("ALTER TABLE question_popularity RENAME TO question_popularity_moved")
+    conn.commit()
+
+    assert tracker.flush() == 0
+
+    conn.execute("ALTER TABLE question_popularity_moved RENAME TO question_popularity")
+    conn.commit()
+    conn.close()
+    tracker.record("q1")
+    assert tracker.flush() == 1
+    assert _stored(db_path, "SELECT access_count FROM question_popularity WHERE question_hash = 'q1'")[0] == 3
+
+
+def test_other_workers_accesses_reach_top_k_after_reload(make_tracker):
+    first = make_tracker(flush_interval=0)
+    second = make_tracker()
+    assert _top_questions(first) == ["Question q1", "Question q2"]
+
+    for _ in range(3):
+        second.record("q3")
+    second.flush()
+
+    assert _top_questions(first)[0] == "Question q3"
+
+
+def test_flush_adopts_landmark_rebased_by_other_worker(make_tracker, db_path):
+    first = make_tracker()
+    second = make_tracker()
+    first.record("q1", now=first.landmark)
+
+    # Another worker rebased: the landmark moved a day forward and stored scores shrank to match
+    day = 86400.0
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE popularity_meta SET value = ? WHERE key = 'landmark'", (second.landmark + day,))
+    conn.close()
+    first.flush()
+
+    assert first.landmark == pytest.approx(second.landmark + day)
+    score = _stored(db_path, "SELECT decayed_score FROM question_popularity WHERE question_hash = 'q1'")[0]
+    assert score == pytest.approx(math.exp(-first.decay_rate * day))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Loading question bank files into the offline question bank (core/offline_question_bank.py)
+Run with: python -m pytest -q test_question_bank_files.py
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from core.offline_question_bank import OfflineQuestionBank
+
+GOOD = {"questions": [{"question": f"What is {n} + {n}?", "subject": "Mathematics", "grade": "Class 8"} for n in range(3)]}
+
+
+@pytest.fixture
+def bank_dir(tmp_path):
+    bank_dir = tmp_path / "question_banks"
+    bank_dir.mkdir()
+    (bank_dir / "a.json").write_text(json.dumps(GOOD))
+    (bank_dir / "b.json").write_text(json.dumps(GOOD)[:40])  # truncated
+    return bank_dir
+
+
+@pytest.fixture
+def make_bank(tmp_path, bank_dir):
+    banks = []
+
+    def make():
+        bank = OfflineQuestionBank(str(tmp_path / "offline_question_bank.db"), question_bank_dir=str(bank_dir))
+        banks.append(bank)
+        return bank
+
+    yield make
+    for bank in banks:
+        bank.popularity.close()
+
+
+def _rows(bank, sql):
+    conn = sqlite3.connect(bank.db_path)
+    try:
+        return [row[0] for row in conn.execute(sql)]
+    finally:
+        conn.close()
+
+
+def test_malformed_file_does_not_roll_back_good_files(make_bank, bank_dir):
+    bank = make_bank()
+
+    assert sorted(_rows(bank, "SELECT question_text FROM question_bank")) == [q["question"] for q in GOOD["questions"]]
+    assert _rows(bank, "SELECT file_path FROM question_bank_files") == [str(bank_dir / "a.json")]
+
+
+def test_only_the_failed_file_is_retried(make_bank, bank_dir):
+    bank = make_bank()
+
+    result = bank.load_question_bank_files([str(bank_dir)])
+
+    assert result["files_skipped"] == 1 and result["files_loaded"] == 0
+    assert [failure["file"] for failure in result["files_failed"]] == [str(bank_dir / "b.json")]
+
+    (bank_dir / "b.json").write_text(json.dumps({"questions": [{"question": "What is 7 x 8?"}]}))
+    result = bank.load_question_bank_files([str(bank_dir)])
+
+    assert result["files_loaded"] == 1 and result["inserted"] == 1 and result["files_failed"] == []
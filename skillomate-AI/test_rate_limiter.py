@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Token-bucket checks for the API rate limiter (core/rate_limiter.py)
+Run with: python -m pytest -q test_rate_limiter.py
+"""
+
+import pytest
+
+import core.rate_limiter as rate_limiter_module
+from core.rate_limiter import InMemoryRateLimitStore, RateLimiter, SQLiteRateLimitStore, create_rate_limiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class BrokenStore:
+    def consume(self, *args):
+        raise RuntimeError("database is locked")
+
+    def refund(self, *args):
+        raise AssertionError("nothing was charged")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteRateLimitStore(str(tmp_path / "rate_limits.db"))
+    return InMemoryRateLimitStore()
+
+
+def test_bucket_allows_up_to_limit_then_rejects(clock, store):
+    limiter = RateLimiter(3, 30, store=store)
+
+    results = [limiter.check(["ip:1.2.3.4"], "/api/x") for _ in range(4)]
+
+    assert [r["allowed"] for r in results] == [True, True, True, False]
+    assert [r["remaining"] for r in results[:3]] == [2, 1, 0]
+    assert results[3]["retry_after"] == 10  # one token refills every 10 seconds
+
+
+def test_bucket_refills_over_time(clock, store):
+    limiter = RateLimiter(2, 20, store=store)
+    limiter.check(["ip:a"], "/api/x")
+    limiter.check(["ip:a"], "/api/x")
+    assert not limiter.check(["ip:a"], "/api/x")["allowed"]
+
+    clock.now += 10
+    assert limiter.check(["ip:a"], "/api/x")["allowed"]
+    assert not limiter.check(["ip:a"], "/api/x")["allowed"]
+
+    clock.now += 1000
+    result = limiter.check(["ip:a"], "/api/x")
+    assert result["allowed"] and result["remaining"] == 1  # never refills past the limit
+
+
+def test_buckets_are_independent(clock, store):
+    limiter = RateLimiter(1, 60, store=store)
+
+    assert limiter.check(["ip:a"], "/api/x")["allowed"]
+    assert not limiter.check(["ip:a"], "/api/x")["allowed"]
+    assert limiter.check(["ip:b"], "/api/x")["allowed"]
+
+
+def test_rejection_refunds_already_charged_buckets(clock, store):
+    limiter = RateLimiter(10, 100, endpoint_costs={"/api/chat": 5}, store=store)
+    limiter.check(["user:u1"], "/api/chat")
+    limiter.check(["user:u1"], "/api/chat")
+
+    result = limiter.check(["ip:a", "user:u1"], "/api/chat")
+
+    assert not result["allowed"]
+    # ip:a was charged before user:u1 rejected; it got its tokens back
+    assert limiter.check(["ip:a"], "/api/chat")["remaining"] == 5
+
+
+@pytest.mark.parametrize("endpoint,remaining", [("/api/chat", 5), ("/api/diagram", 7), ("/api/other", 9)])
+def test_endpoint_costs(clock, endpoint, remaining):
+    limiter = RateLimiter(10, 100, endpoint_costs={"/api/chat": 5, "/api/diagram": 3})
+
+    result = limiter.check(["ip:a"], endpoint)
+
+    assert result["remaining"] == remaining
+    assert result["cost"] == 10 - remaining
+
+
+def test_zero_cost_endpoints_are_not_charged(clock):
+    limiter = RateLimiter(1, 60, endpoint_costs={"/api/health": 0})
+    limiter.check(["ip:a"], "/api/x")
+
+    result = limiter.check(["ip:a"], "/api/health")
+
+    assert result["allowed"] and result["cost"] == 0
+
+
+def test_cost_is_capped_at_limit(clock):
+    limiter = RateLimiter(3, 30, endpoint_costs={"/api/voice-input": 8})
+
+    assert limiter.check(["ip:a"], "/api/voice-input")["allowed"]
+
+
+def test_headers_include_retry_after_only_when_rejected(clock):
+    limiter = RateLimiter(1, 60)
+
+    allowed = limiter.headers(limiter.check(["ip:a"], "/api/x"))
+    rejected = limiter.headers(limiter.check(["ip:a"], "/api/x"))
+
+    assert "Retry-After" not in allowed
+    assert allowed["RateLimit-Limit"] == "1" and allowed["RateLimit-Remaining"] == "0"
+    assert allowed["RateLimit-Reset"] == "60"
+    assert allowed["X-RateLimit-Reset"] == str(int(clock.now) + 60)
+    assert rejected["Retry-After"] == "60"
+
+
+def test_sqlite_store_is_shared_between_limiters(clock, tmp_path):
+    db_path = str(tmp_path / "rate_limits.db")
+    first = create_rate_limiter(2, 60, storage="sqlite", db_path=db_path)
+    second = create_rate_limiter(2, 60, storage="sqlite", db_path=db_path)
+
+    assert first.check(["ip:a"], "/api/x")["allowed"]
+    assert second.check(["ip:a"], "/api/x")["allowed"]
+    assert not first.check(["ip:a"], "/api/x")["allowed"]
+
+
+def test_store_errors_fail_open(clock):
+    limiter = RateLimiter(1, 60, store=BrokenStore())
+
+    results = [limiter.check(["ip:a"], "/api/x") for _ in range(3)]
+
+    assert all(r["allowed"] for r in results)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Conversation sessions shared by worker processes (core/session_store.py)
+Run with: python -m pytest -q test_session_store.py
+"""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+from core.session_store import SQLiteSessionStore, SessionMap, merge_sessions
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+@pytest.fixture
+def store(db_path):
+    return SQLiteSessionStore(db_path)
+
+
+def _worker(db_path):
+    """A SessionMap as one gunicorn worker would have it (own store connection, no refresh delay)"""
+    return SessionMap(SQLiteSessionStore(db_path), refresh_interval=0)
+
+
+def _session():
+    return {"user_context": {"name": None, "grade": None}, "conversation_history": [],
+            "created_at": datetime(2025, 1, 1, 9, 30)}
+
+
+def _message(content):
+    return {"role": "user", "content": content, "timestamp": datetime.now()}
+
+
+def test_store_round_trip_and_conditional_save(store):
+    assert store.save("s", _session()) == 1
+    assert store.save("s", _session()) is None  # already stored
+
+    version, session = store.load("s")
+    assert version == 1 and session == _session()
+
+    assert store.save("s", session, expected_version=1) == 2
+    assert store.save("s", session, expected_version=1) is None
+    assert store.version("s") == 2
+
+
+def test_merge_keeps_both_sides_changes():
+    base = {"history": [1, 2], "context": {"name": None, "grade": None}, "level": 1}
+    ours = {"history": [1, 2, 3], "context": {"name": "Asha", "grade": None}, "level": 1}
+    theirs = {"history": [2, 4], "context": {"name": None, "grade": "Class 8"}, "level": 2, "summary": "s"}
+
+    assert merge_sessions(base, ours, theirs) == {
+        "history": [2, 4, 3], "context": {"name": "Asha", "grade": "Class 8"}, "level": 2, "summary": "s"
+    }
+
+
+def test_concurrent_saves_from_two_workers_keep_both_messages(db_path):
+    first, second = _worker(db_path), _worker(db_path)
+    first["s"] = _session()
+    first_session, second_session = first["s"], second["s"]
+
+    first_session["conversation_history"].append(_message("from first"))
+    second_session["conversation_history"].append(_message("from second"))
+    second_session["user_context"]["grade"] = "Class 8"
+    first.save("s")
+    second.save("s")
+
+    stored = _worker(db_path)["s"]
+    assert [m["content"] for m in stored["conversation_history"]] == ["from first", "from second"]
+    assert stored["user_context"]["grade"] == "Class 8"
+
+
+def test_summary_saved_by_other_worker_survives_history_append(db_path):
+    first, second = _worker(db_path), _worker(db_path)
+    first["s"] = _session()
+    second_session = second["s"]
+
+    first["s"]["conversation_summary"] = "Asked about fractions"
+    first.save("s")
+    second_session["conversation_history"].append(_message("next question"))
+    second.save("s")
+
+    stored = _worker(db_path)["s"]
+    assert stored["conversation_summary"] == "Asked about fractions"
+    assert len(stored["conversation_history"]) == 1
+
+
+def test_refresh_updates_the_session_object_callers_hold(db_path):
+    first, second = _worker(db_path), _worker(db_path)
+    first["s"] = _session()
+    held = second["s"]
+
+    first["s"]["user_context"]["name"] = "Asha"
+    first.save("s")
+
+    assert second["s"] is held
+    assert held["user_context"]["name"] == "Asha"
+
+    held["conversation_history"].append(_message("hello"))
+    second.save("s")
+    assert [m["content"] for m in _worker(db_path)["s"]["conversation_history"]] == ["hello"]
+
+
+def test_unsaved_changes_survive_refresh(db_path):
+    first, second = _worker(db_path), _worker(db_path)
+    first["s"] = _session()
+    held = second["s"]
+    held["user_context"]["grade"] = "Class 9"  # not saved yet
+
+    first["s"]["user_context"]["name"] = "Asha"
+    first.save("s")
+
+    assert second["s"]["user_context"] == {"name": "Asha", "grade": "Class 9"}
+
+
+def test_session_deleted_by_other_worker_disappears(db_path):
+    first, second = _worker(db_path), _worker(db_path)
+    first["s"] = _session()
+    assert "s" in second
+
+    del first["s"]
+
+    assert "s" not in second
+
+
+def test_changes_under_session_lock_from_several_threads_are_all_saved(db_path):
+    sessions = _worker(db_path)
+    sessions["s"] = _session()
+
+    def append(thread):
+        for n in range(20):
+            with sessions.lock("s"):
+                sessions["s"]["conversation_history"].append(_message(f"{thread}-{n}"))
+                sessions.save("s")
+
+    def summarize():
+        for n in range(20):
+            with sessions.lock("s"):
+                sessions["s"][f"summary-{n}"] = "text"
+                sessions.save("s")
+
+    threads = [threading.Thread(target=append, args=(t,)) for t in range(3)] + [threading.Thread(target=summarize)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stored = _worker(db_path)["s"]
+    assert len(stored["conversation_history"]) == 60
+    assert sum(key.startswith("summary-") for key in stored) == 20
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Streaming speech recognition: WAV parsing, sample conversion and chunking (core/voice_input.py)
+Run with: python -m pytest -q test_voice_input.py
+"""
+
+import io
+import struct
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from core.voice_input import (
+    AudioDecodeError, LocalRecognizerBackend, StreamingTranscriber, WAVE_FORMAT_PCM, _to_mono_int16
+)
+
+RATE = 8000
+
+
+class TrickleStream(io.BytesIO):
+    """Request stream that returns at most `size` bytes per read, like a slow upload"""
+
+    def __init__(self, data: bytes, size: int = 100):
+        super().__init__(data)
+        self.size = size
+
+    def read(self, n=-1):
+        return super().read(self.size if n is None or n < 0 else min(n, self.size))
+
+
+def _wav(pcm: bytes, sample_width: int = 2, channels: int = 1, rate: int = RATE,
+         format_tag: int = WAVE_FORMAT_PCM, data_size: int = None, extra_chunk: bool = False) -> bytes:
+    fmt = struct.pack("<HHIIHH", format_tag, channels, rate, rate * channels * sample_width,
+                      channels * sample_width, sample_width * 8)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    if extra_chunk:
+        body += b"LIST" + struct.pack("<I", 3) + b"abc\x00"  # odd size, padded
+    body += b"data" + struct.pack("<I", len(pcm) if data_size is None else data_size) + pcm
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _tone(seconds: float, amplitude: int = 8000) -> np.ndarray:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype("<i2")
+
+
+def _transcriber(chunk_seconds: float, chunks: list = None) -> StreamingTranscriber:
+    """Transcriber whose local backend answers each voiced chunk with its length in samples"""
+    def transcribe(audio):
+        samples = len(audio.get_raw_data()) // 2
+        if chunks is not None:
+            chunks.append(samples)
+        return str(samples)
+    return StreamingTranscriber(LocalRecognizerBackend(transcribe), chunk_seconds=chunk_seconds, max_workers=2)
+
+
+@pytest.mark.parametrize("sample_width, pcm, expected", [
+    (1, bytes([0, 128, 255]), [-32768, 0, 32512]),
+    (2, struct.pack("<3h", -5, 0, 1234), [-5, 0, 1234]),
+    (3, b"\x00\x00\x80" + b"\x00\x00\x00" + b"\xff\xff\x7f", [-32768, 0, 32767]),
+    (4, struct.pack("<3i", -2 ** 31, 0, 1234 << 16), [-32768, 0, 1234]),
+])
+def test_samples_are_converted_to_16_bit(sample_width, pcm, expected):
+    assert np.frombuffer(_to_mono_int16(pcm, sample_width, 1), dtype="<i2").tolist() == expected
+
+
+def test_channels_are_mixed_down_to_mono():
+    stereo = struct.pack("<4h", 100, 300, -200, -400)
+
+    assert np.frombuffer(_to_mono_int16(stereo, 2, 2), dtype="<i2").tolist() == [200, -300]
+
+
+def test_unsupported_sample_width_is_rejected():
+    with pytest.raises(AudioDecodeError):
+        _to_mono_int16(b"\x00" * 5, 5, 1)
+
+
+@pytest.mark.parametrize("data_size", [None, 0xFFFFFFFF])
+def test_wav_stream_with_extra_chunks_and_short_reads(data_size):
+    pcm = _tone(1.0).tobytes()
+    stream = TrickleStream(_wav(pcm, data_size=data_size, extra_chunk=True))
+
+    result = _transcriber(chunk_seconds=15).transcribe_stream(stream)
+
+    assert result == {"text": str(RATE), "chunks": 1, "duration_seconds": 1.0, "backend": "local"}
+
+
+@pytest.mark.parametrize("sample_width", [1, 3, 4])
+def test_other_sample_widths_are_transcribed(sample_width):
+    samples = _tone(0.5).astype(np.int32)
+    if sample_width == 1:
+        pcm = ((samples >> 8) + 128).astype(np.uint8).tobytes()
+    elif sample_width == 3:
+        pcm = b"".join(struct.pack("<i", int(s) << 8)[:3] for s in samples)
+    else:
+        pcm = (samples << 16).astype("<i4").tobytes()
+
+    result = _transcriber(chunk_seconds=15).transcribe_stream(io.BytesIO(_wav(pcm, sample_width=sample_width)))
+
+    assert result["text"] == str(RATE // 2)
+    assert result["duration_seconds"] == 0.5
+
+
+def test_chunks_are_cut_at_the_quietest_point_and_joined_in_order():
+    # 2 s chunks; the only pause is 100 ms starting at 1.5 s, inside the last second of the first chunk
+    audio = np.concatenate([_tone(1.5), np.zeros(int(0.1 * RATE), dtype="<i2"), _tone(1.4)])
+    chunks = []
+
+    result = _transcriber(chunk_seconds=2, chunks=chunks).transcribe_stream(io.BytesIO(_wav(audio.tobytes())))
+
+    assert result["chunks"] == 2
+    assert 1.5 * RATE <= chunks[0] <= 1.6 * RATE
+    assert sum(chunks) == audio.size
+    assert result["text"] == " ".join(str(samples) for samples in sorted(chunks, reverse=True))
+
+
+def test_silence_is_not_understood():
+    silence = np.zeros(RATE, dtype="<i2").tobytes()
+
+    with pytest.raises(sr.UnknownValueError):
+        _transcriber(chunk_seconds=15).transcribe_stream(io.BytesIO(_wav(silence)))
+
+
+@pytest.mark.parametrize("data", [
+    _wav(b"\x00\x00" * 10, format_tag=3),  # IEEE float
+    _wav(b"\x00\x00" * 10)[:36],           # cut off before the data chunk
+])
+def test_undecodable_wav_is_rejected(data):
+    with pytest.raises(AudioDecodeError):
+        _transcriber(chunk_seconds=15).transcribe_stream(io.BytesIO(data))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Text-to-speech caching and synthesis (core/voice_output.py)
+Run with: python -m pytest -q test_voice_output.py
+"""
+
+import os
+import threading
+
+import pytest
+
+from core.voice_output import AudioCache, LocalToneSynthesizer, TextToSpeechService
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "audio")
+
+
+def _touch_order(cache_dir, *filenames):
+    """Give files increasing mtimes so the LRU order is deterministic"""
+    for index, filename in enumerate(filenames):
+        os.utime(os.path.join(cache_dir, filename), (1_000_000 + index, 1_000_000 + index))
+
+
+def test_evicts_least_recently_used(cache_dir):
+    cache = AudioCache(cache_dir, max_bytes=300)
+    cache.put("a", "mp3", b"a" * 100)
+    cache.put("b", "mp3", b"b" * 100)
+    _touch_order(cache_dir, "a.mp3", "b.mp3")
+    assert cache.get("a", "mp3") == b"a" * 100
+
+    cache.put("c", "mp3", b"c" * 150)
+
+    assert sorted(os.listdir(cache_dir)) == ["a.mp3", "c.mp3"]
+
+
+def test_workers_share_entries(cache_dir):
+    first = AudioCache(cache_dir, max_bytes=1000)
+    second = AudioCache(cache_dir, max_bytes=1000)
+
+    first.put("a", "mp3", b"audio")
+
+    assert second.get("a", "mp3") == b"audio"
+
+
+def test_size_limit_covers_every_worker(cache_dir):
+    first = AudioCache(cache_dir, max_bytes=250)
+    # Another worker's files are counted from its next rescan on
+    second = AudioCache(cache_dir, max_bytes=250, rescan_seconds=0)
+    first.put("a", "mp3", b"a" * 100)
+    first.put("b", "mp3", b"b" * 100)
+    _touch_order(cache_dir, "a.mp3", "b.mp3")
+
+    second.put("c", "mp3", b"c" * 100)
+
+    assert sorted(os.listdir(cache_dir)) == ["b.mp3", "c.mp3"]
+
+
+def test_hit_in_one_worker_protects_entry_from_eviction_by_another(cache_dir):
+    first = AudioCache(cache_dir, max_bytes=250)
+    # Another worker's files are counted from its next rescan on
+    second = AudioCache(cache_dir, max_bytes=250, rescan_seconds=0)
+    first.put("a", "mp3", b"a" * 100)
+    first.put("b", "mp3", b"b" * 100)
+    _touch_order(cache_dir, "a.mp3", "b.mp3")
+    assert first.get("a", "mp3")
+
+    second.put("c", "mp3", b"c" * 100)
+
+    assert sorted(os.listdir(cache_dir)) == ["a.mp3", "c.mp3"]
+
+
+def test_entry_evicted_by_another_worker_is_a_miss(cache_dir):
+    first = AudioCache(cache_dir, max_bytes=1000)
+    first.put("a", "mp3", b"audio")
+    os.remove(os.path.join(cache_dir, "a.mp3"))
+
+    assert first.get("a", "mp3") is None
+
+
+class BlockingSynthesizer(LocalToneSynthesizer):
+    """Local synthesizer that holds every call until `release` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def synthesize(self, text, voice, speed):
+        self.started.release()
+        self.release.wait(5)
+        return super().synthesize(text, voice, speed)
+
+
+def test_segments_are_yielded_in_order_and_cached(cache_dir):
+    text = " ".join([
+        "The first sentence is long enough to stand on its own.",
+        "The second sentence is also long enough to stand alone.",
+        "And the third one closes the answer for the student."
+    ])
+    service = TextToSpeechService(LocalToneSynthesizer(), AudioCache(cache_dir, max_bytes=10_000_000), prefetch=2)
+
+    first = list(service.iter_segments(text))
+    second = list(service.iter_segments(text))
+
+    assert [segment["index"] for segment in first] == [0, 1, 2]
+    assert [segment["audio"] for segment in second] == [segment["audio"] for segment in first]
+    assert all(segment["cached"] for segment in second)
+
+
+def test_concurrent_requests_are_not_limited_by_prefetch_depth():
+    synthesizer = BlockingSynthesizer()
+    service = TextToSpeechService(synthesizer, prefetch=1, max_workers=4)
+    text = "One two three four five six seven eight nine ten."
+    threads = [threading.Thread(target=lambda: list(service.iter_segments(text))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        # Each request has one segment in flight; all four run at once
+        assert all(synthesizer.started.acquire(timeout=5) for _ in threads)
+    finally:
+        synthesizer.release.set()
+        for thread in threads:
+            thread.join(5)
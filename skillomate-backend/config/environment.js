@@ -33,7 +33,11 @@ const PROD_CONFIG = {
 };
 
 // Export the appropriate configuration based on DEV_MODE
-const config = DEV_MODE ? DEV_CONFIG : PROD_CONFIG;
+const config = {
+  ...(DEV_MODE ? DEV_CONFIG : PROD_CONFIG),
+  // Shared secret sent as X-Service-Token so the AI service rate-limits per user
+  AI_SERVICE_TOKEN: process.env.AI_SERVICE_TOKEN || ''
+};
 
 // Log current configuration for debugging
 console.log('🔧 Backend Environment:', DEV_MODE ? 'DEVELOPMENT' : 'PRODUCTION');
@@ -476,6 +476,7 @@ router.post('/ai-session', async (req, res) => {
       }, {
         headers: {
           'Content-Type': 'application/json',
+          'X-Service-Token': envConfig.AI_SERVICE_TOKEN,
         },
         timeout: 10000 // 10 second timeout
       });
@@ -569,6 +570,7 @@ router.post('/ai-message', checkUsageLimit, async (req, res) => {
         }, {
           headers: {
             'Content-Type': 'application/json',
+            'X-Service-Token': envConfig.AI_SERVICE_TOKEN,
           },
           timeout: 10000
         });
@@ -604,6 +606,7 @@ router.post('/ai-message', checkUsageLimit, async (req, res) => {
       }, {
         headers: {
           'Content-Type': 'application/json',
+          'X-Service-Token': envConfig.AI_SERVICE_TOKEN,
         },
         timeout: 30000 // 30 second timeout for AI processing
       });